@@ -1,25 +1,474 @@
-import boto3
+import base64
+import binascii
 import json
 import os
 import logging
 import datetime
 from zoneinfo import ZoneInfo
 from botocore.exceptions import ClientError
+from prism_common import aws_clients, metrics
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
-s3_client = boto3.client("s3")
+# 안전 필터를 통과한 파일이 옮겨지는 버킷. 설정되어 있으면 이름 충돌 검사에 포함
+ORIGINALS_BUCKET_NAME = os.environ.get("ORIGINALS_BUCKET_NAME")
 
+SINGLE_URL_EXPIRES_SECONDS = 300
+BATCH_URL_EXPIRES_SECONDS = int(os.environ.get("BATCH_URL_EXPIRES_SECONDS", "3600"))
 
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "500"))
+MAX_FILE_SIZE_BYTES = int(os.environ.get("MAX_FILE_SIZE_BYTES", str(10 * 1024**3)))
+MAX_BATCH_TOTAL_BYTES = int(os.environ.get("MAX_BATCH_TOTAL_BYTES", str(50 * 1024**3)))
+
+MULTIPART_THRESHOLD_BYTES = int(os.environ.get("MULTIPART_THRESHOLD_BYTES", str(100 * 1024**2)))
+MULTIPART_PART_SIZE_BYTES = int(os.environ.get("MULTIPART_PART_SIZE_BYTES", str(16 * 1024**2)))
+
+PART_URL_EXPIRES_SECONDS = int(os.environ.get("PART_URL_EXPIRES_SECONDS", "3600"))
+MAX_PARTS_PER_PRESIGN = int(os.environ.get("MAX_PARTS_PER_PRESIGN", "100"))
+# 배치 응답 하나에 미리 서명해 넣는 파트 URL 총수. 나머지는 클라이언트가 presignParts로 받음
+# (URL 하나가 1.5KB 정도이므로 Lambda 응답 한도 6MB보다 충분히 작게 유지)
+MAX_BATCH_PART_URLS = int(os.environ.get("MAX_BATCH_PART_URLS", "1000"))
+
+# 업로드 시 클라이언트가 선언하는 이미지 정보(manifest). 서명된 x-amz-meta-* 헤더로 고정되어
+# image-dispatcher가 원본 전체를 내려받지 않고 판단에 사용함
+MANIFEST_VERSION = "1"
+MANIFEST_FORMATS = {"jpeg", "png", "webp", "heic", "heif", "avif", "gif", "tiff"}
+MAX_IMAGE_DIMENSION = 100000
+
+# S3 multipart 제약
+MIN_PART_SIZE_BYTES = 5 * 1024**2
+MAX_PART_COUNT = 10000
+
+MULTIPART_ACTIONS = {"initiateMultipart", "presignParts", "listParts", "completeMultipart", "abortMultipart"}
+
+# S3 오류 코드 -> (HTTP 상태, 클라이언트에 돌려줄 오류)
+MULTIPART_ERRORS = {
+    "NoSuchUpload": (404, "upload not found or already completed/aborted"),
+    "InvalidPart": (400, "one or more parts were not uploaded or their ETag does not match"),
+    "InvalidPartOrder": (400, "parts must be listed in ascending partNumber order"),
+    "EntityTooSmall": (400, "every part except the last must be at least 5 MiB"),
+}
+
+
+def build_response(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {"Access-Control-Allow-Origin": "*"},
+        "body": json.dumps(body),
+    }
+
+
+def sanitize_file_name(file_name):
+    """Drops any client-supplied directories so keys stay inside the caller's prefix."""
+    if not isinstance(file_name, str):
+        return None
+    name = os.path.basename(file_name.replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        return None
+    return name
+
+
+def list_existing_names(prefix):
+    names = set()
+    paginator = aws_clients.get_client("s3").get_paginator("list_objects_v2")
+    for bucket in sorted({S3_BUCKET_NAME, ORIGINALS_BUCKET_NAME} - {None}):
+        # 하위 폴더(thumbnail/, originals/ 등)는 제외하고 같은 날짜 폴더의 파일만 확인
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+            for obj in page.get("Contents", []):
+                names.add(obj["Key"][len(prefix):])
+    return names
+
+
+def unique_file_name(file_name, taken):
+    """'IMG_0001.jpg' -> 'IMG_0001 (1).jpg', 'IMG_0001 (2).jpg', ... until unused."""
+    candidate = file_name
+    base, extension = os.path.splitext(file_name)
+    counter = 1
+    while candidate in taken:
+        candidate = f"{base} ({counter}){extension}"
+        counter += 1
+    taken.add(candidate)
+    return candidate
+
+
+def parse_manifest(manifest):
+    """
+    Validates client-declared image facts and returns (x-amz-meta-* metadata, base64 SHA-256
+    or None). Raises ValueError for anything malformed.
+    """
+    if not isinstance(manifest, dict):
+        raise ValueError("manifest must be an object")
+
+    dimensions = []
+    for field in ("width", "height"):
+        value = manifest.get(field)
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= MAX_IMAGE_DIMENSION:
+            raise ValueError(f"manifest.{field} must be an integer between 1 and {MAX_IMAGE_DIMENSION}")
+        dimensions.append(value)
+
+    image_format = str(manifest.get("format", "")).lower().replace("jpg", "jpeg")
+    if image_format not in MANIFEST_FORMATS:
+        raise ValueError(f"manifest.format must be one of {sorted(MANIFEST_FORMATS)}")
+
+    metadata = {
+        "manifest-version": MANIFEST_VERSION,
+        "width": str(dimensions[0]),
+        "height": str(dimensions[1]),
+        "format": image_format,
+    }
+
+    checksum = None
+    sha256 = manifest.get("sha256")
+    if sha256 is not None:
+        try:
+            digest = bytes.fromhex(sha256) if len(sha256) == 64 else base64.b64decode(sha256, validate=True)
+        except (TypeError, ValueError, binascii.Error):
+            digest = b""
+        if len(digest) != 32:
+            raise ValueError("manifest.sha256 must be a hex or base64 SHA-256 digest")
+        # S3가 업로드 본문의 해시를 직접 검증하도록 체크섬 헤더로도 서명
+        checksum = base64.b64encode(digest).decode("ascii")
+        metadata["sha256"] = digest.hex()
+
+    captured_at = manifest.get("capturedAt")
+    if captured_at is not None:
+        try:
+            datetime.datetime.fromisoformat(captured_at)
+        except (TypeError, ValueError):
+            raise ValueError("manifest.capturedAt must be an ISO 8601 timestamp")
+        metadata["captured-at"] = captured_at
+
+    return metadata, checksum
+
+
+def put_request(object_key, content_type, size=None, manifest=None):
+    """put_object parameters to presign, plus the headers the client has to send with the PUT."""
+    params = {"Bucket": S3_BUCKET_NAME, "Key": object_key, "ContentType": content_type}
+    headers = {"Content-Type": content_type}
+    if manifest is not None:
+        metadata, checksum = manifest
+        params["Metadata"] = metadata
+        headers.update({f"x-amz-meta-{name}": value for name, value in metadata.items()})
+        if checksum:
+            params["ChecksumSHA256"] = checksum
+            headers["x-amz-checksum-sha256"] = checksum
+        if isinstance(size, int) and not isinstance(size, bool) and size >= 0:
+            params["ContentLength"] = size
+            headers["Content-Length"] = str(size)
+    return params, headers
+
+
+def part_size_for(size):
+    """Configured part size, grown in whole MiB when the file would exceed 10,000 parts."""
+    part_size = max(MULTIPART_PART_SIZE_BYTES, MIN_PART_SIZE_BYTES)
+    if size > part_size * MAX_PART_COUNT:
+        mib = 1024**2
+        minimum = -(-size // MAX_PART_COUNT)
+        part_size = -(-minimum // mib) * mib
+    return part_size
+
+
+def presign_parts(object_key, upload_id, part_numbers, expires_in):
+    s3_client = aws_clients.get_client("s3")
+    return [
+        {
+            "partNumber": part_number,
+            "url": s3_client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": S3_BUCKET_NAME,
+                    "Key": object_key,
+                    "UploadId": upload_id,
+                    "PartNumber": part_number,
+                },
+                ExpiresIn=expires_in,
+            ),
+        }
+        for part_number in part_numbers
+    ]
+
+
+def issue_upload(object_key, content_type, size, expires_in, manifest=None, max_part_urls=MAX_PARTS_PER_PRESIGN):
+    """
+    Single PUT URL, or a multipart upload for large files with URLs for at most the first
+    `max_part_urls` parts; the client requests the rest through the presignParts action.
+    """
+    s3_client = aws_clients.get_client("s3")
+
+    if size is None or size < MULTIPART_THRESHOLD_BYTES:
+        params, headers = put_request(object_key, content_type, size, manifest)
+        return {
+            "objectKey": object_key,
+            "method": "PUT",
+            "uploadUrl": s3_client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in),
+            "headers": headers,
+        }
+
+    upload = s3_client.create_multipart_upload(
+        Bucket=S3_BUCKET_NAME,
+        Key=object_key,
+        ContentType=content_type,
+        Metadata=manifest[0] if manifest else {},
+    )
+    part_size = part_size_for(size)
+    part_count = -(-size // part_size)
+    return {
+        "objectKey": object_key,
+        "method": "MULTIPART",
+        "uploadId": upload["UploadId"],
+        "partSize": part_size,
+        "partCount": part_count,
+        "maxPartsPerRequest": MAX_PARTS_PER_PRESIGN,
+        "parts": presign_parts(
+            object_key,
+            upload["UploadId"],
+            range(1, min(part_count, max_part_urls, MAX_PARTS_PER_PRESIGN) + 1),
+            expires_in,
+        ),
+    }
+
+
+def handle_batch(uuid, seoul_date, files):
+    if not isinstance(files, list) or not files:
+        return build_response(400, {"error": "files must be a non-empty list"})
+    if len(files) > MAX_BATCH_FILES:
+        return build_response(
+            400, {"error": f"at most {MAX_BATCH_FILES} files per request", "maxFiles": MAX_BATCH_FILES}
+        )
+
+    accepted = []
+    rejected = []
+    total_bytes = 0
+    for index, entry in enumerate(files):
+        entry = entry if isinstance(entry, dict) else {}
+        file_name = sanitize_file_name(entry.get("fileName"))
+        size = entry.get("size")
+
+        if not file_name:
+            rejected.append({"index": index, "fileName": entry.get("fileName"), "reason": "INVALID_FILE_NAME"})
+        elif size is not None and (not isinstance(size, int) or isinstance(size, bool) or size < 0):
+            rejected.append({"index": index, "fileName": file_name, "reason": "INVALID_SIZE"})
+        elif size is not None and size > MAX_FILE_SIZE_BYTES:
+            rejected.append({"index": index, "fileName": file_name, "reason": "FILE_TOO_LARGE"})
+        else:
+            try:
+                manifest = parse_manifest(entry["manifest"]) if entry.get("manifest") is not None else None
+            except ValueError as e:
+                rejected.append({"index": index, "fileName": file_name, "reason": "INVALID_MANIFEST", "detail": str(e)})
+                continue
+            total_bytes += size or 0
+            accepted.append((index, entry, file_name, size, manifest))
+
+    if total_bytes > MAX_BATCH_TOTAL_BYTES:
+        return build_response(
+            400, {"error": "total size exceeds the per-request limit", "maxTotalBytes": MAX_BATCH_TOTAL_BYTES}
+        )
+
+    prefix = f"album/{uuid}/{seoul_date}/"
+    taken = list_existing_names(prefix) if accepted else set()
+
+    results = []
+    part_urls_left = MAX_BATCH_PART_URLS
+    for index, entry, file_name, size, manifest in accepted:
+        object_name = unique_file_name(file_name, taken)
+        upload = issue_upload(
+            f"{prefix}{object_name}",
+            entry.get("contentType") or "application/octet-stream",
+            size,
+            BATCH_URL_EXPIRES_SECONDS,
+            manifest,
+            max_part_urls=part_urls_left,
+        )
+        part_urls_left -= len(upload.get("parts", []))
+        results.append({"index": index, "fileName": entry.get("fileName"), **upload})
+
+    metrics.set_property("batchFiles", len(files))
+    return build_response(
+        200,
+        {"files": results, "rejected": rejected, "expiresIn": BATCH_URL_EXPIRES_SECONDS},
+    )
+
+
+def owned_key(uuid, object_key):
+    """True when the key is inside the caller's album/{uuid}/ prefix."""
+    return (
+        isinstance(object_key, str)
+        and object_key.startswith(f"album/{uuid}/")
+        and ".." not in object_key.split("/")
+    )
+
+
+def parse_part_numbers(values):
+    if not isinstance(values, list) or not values or len(values) > MAX_PARTS_PER_PRESIGN:
+        return None
+    if not all(isinstance(n, int) and not isinstance(n, bool) and 1 <= n <= MAX_PART_COUNT for n in values):
+        return None
+    return sorted(set(values))
+
+
+def missing_part_numbers(part_numbers, part_count):
+    """Part numbers in 1..part_count (or up to the highest given) that are not in `part_numbers`."""
+    present = set(part_numbers)
+    return [n for n in range(1, max([part_count, *present]) + 1) if n not in present]
+
+
+def list_uploaded_parts(object_key, upload_id):
+    parts = []
+    paginator = aws_clients.get_client("s3").get_paginator("list_parts")
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Key=object_key, UploadId=upload_id):
+        for part in page.get("Parts", []):
+            parts.append({"partNumber": part["PartNumber"], "etag": part["ETag"], "size": part["Size"]})
+    return parts
+
+
+def initiate_multipart(uuid, seoul_date, body):
+    file_name = sanitize_file_name(body.get("fileName"))
+    if not file_name:
+        return build_response(400, {"error": "fileName is required"})
+
+    size = body.get("size")
+    if size is not None and (not isinstance(size, int) or isinstance(size, bool) or size <= 0):
+        return build_response(400, {"error": "size must be a positive integer"})
+    if size is not None and size > MAX_FILE_SIZE_BYTES:
+        return build_response(400, {"error": "file too large", "maxFileSize": MAX_FILE_SIZE_BYTES})
+
+    try:
+        manifest = parse_manifest(body["manifest"]) if body.get("manifest") is not None else None
+    except ValueError as e:
+        return build_response(400, {"error": str(e)})
+
+    prefix = f"album/{uuid}/{seoul_date}/"
+    object_key = prefix + unique_file_name(file_name, list_existing_names(prefix))
+    content_type = body.get("contentType") or "application/octet-stream"
+
+    upload = aws_clients.get_client("s3").create_multipart_upload(
+        Bucket=S3_BUCKET_NAME,
+        Key=object_key,
+        ContentType=content_type,
+        Metadata=manifest[0] if manifest else {},
+    )
+
+    result = {"objectKey": object_key, "uploadId": upload["UploadId"], "maxPartsPerRequest": MAX_PARTS_PER_PRESIGN}
+    if size is not None:
+        part_size = part_size_for(size)
+        result.update({"partSize": part_size, "partCount": -(-size // part_size)})
+    else:
+        result["partSize"] = part_size_for(0)
+    return build_response(200, result)
+
+
+def handle_multipart(uuid, seoul_date, action, body):
+    """
+    Resumable multipart uploads. Every action except initiate names an existing upload by
+    objectKey + uploadId, and the key must be inside the caller's album/{uuid}/ prefix.
+    """
+    if action not in MULTIPART_ACTIONS:
+        return build_response(400, {"error": f"unknown action '{action}'", "actions": sorted(MULTIPART_ACTIONS)})
+    if action == "initiateMultipart":
+        return initiate_multipart(uuid, seoul_date, body)
+
+    object_key = body.get("objectKey")
+    upload_id = body.get("uploadId")
+    if not owned_key(uuid, object_key):
+        return build_response(403, {"error": "objectKey is outside the caller's album"})
+    if not isinstance(upload_id, str) or not upload_id:
+        return build_response(400, {"error": "uploadId is required"})
+
+    s3_client = aws_clients.get_client("s3")
+    try:
+        if action == "presignParts":
+            part_numbers = parse_part_numbers(body.get("partNumbers"))
+            if part_numbers is None:
+                return build_response(
+                    400,
+                    {"error": f"partNumbers must be 1-{MAX_PARTS_PER_PRESIGN} integers between 1 and {MAX_PART_COUNT}"},
+                )
+            # 업로드가 아직 진행 중인지 확인하지 않고 서명만 하면 완료/취소된 업로드에 URL이 발급됨
+            s3_client.list_parts(Bucket=S3_BUCKET_NAME, Key=object_key, UploadId=upload_id, MaxParts=1)
+            parts = presign_parts(object_key, upload_id, part_numbers, PART_URL_EXPIRES_SECONDS)
+            return build_response(200, {"parts": parts, "expiresIn": PART_URL_EXPIRES_SECONDS})
+
+        if action == "listParts":
+            return build_response(200, {"parts": list_uploaded_parts(object_key, upload_id)})
+
+        if action == "completeMultipart":
+            parts = body.get("parts")
+            if parts is None:
+                # 클라이언트가 ETag를 잃어버린 경우(앱 재시작 등) 서버에 기록된 파트로 완료.
+                # S3는 빠진 파트 번호를 허용하므로, 시작할 때 선언한 크기와 맞는지 확인해야 잘린 원본이 저장되지 않음
+                size = body.get("size")
+                if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+                    return build_response(
+                        400, {"error": "parts is required unless size (as declared at initiateMultipart) is given"}
+                    )
+                parts = list_uploaded_parts(object_key, upload_id)
+                part_count = -(-size // part_size_for(size))
+                missing = missing_part_numbers([part["partNumber"] for part in parts], part_count)
+                uploaded_bytes = sum(part["size"] for part in parts)
+                if missing or len(parts) != part_count or uploaded_bytes != size:
+                    return build_response(
+                        400,
+                        {
+                            "error": "uploaded parts do not match the declared size",
+                            "partCount": part_count,
+                            "missingParts": missing,
+                            "uploadedBytes": uploaded_bytes,
+                        },
+                    )
+            if not parts:
+                return build_response(400, {"error": "no parts to complete"})
+            try:
+                completed_parts = sorted(
+                    ({"PartNumber": int(part["partNumber"]), "ETag": part["etag"]} for part in parts),
+                    key=lambda part: part["PartNumber"],
+                )
+            except (KeyError, TypeError, ValueError):
+                return build_response(400, {"error": "parts must be a list of {partNumber, etag}"})
+            missing = missing_part_numbers([part["PartNumber"] for part in completed_parts], len(completed_parts))
+            if missing:
+                return build_response(
+                    400, {"error": "part numbers must be contiguous from 1", "missingParts": missing}
+                )
+
+            s3_client.complete_multipart_upload(
+                Bucket=S3_BUCKET_NAME,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": completed_parts},
+            )
+            return build_response(200, {"objectKey": object_key, "partCount": len(completed_parts)})
+
+        # abortMultipart
+        s3_client.abort_multipart_upload(Bucket=S3_BUCKET_NAME, Key=object_key, UploadId=upload_id)
+        return build_response(200, {"objectKey": object_key, "aborted": True})
+
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code not in MULTIPART_ERRORS:
+            raise
+        status_code, message = MULTIPART_ERRORS[code]
+        return build_response(status_code, {"error": message, "code": code})
+
+
+@metrics.instrumented
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
+    metrics.log_payload("Received event", event, logger)
     seoul_date = datetime.datetime.now(tz=ZoneInfo("Asia/Seoul")).strftime("%y-%m-%d")
 
     try:
         uuid = event["requestContext"]["authorizer"]["claims"]["sub"]
         body = json.loads(event["body"])
+
+        action = body.get("action")
+        if action:
+            metrics.set_property("action", action)
+            return handle_multipart(uuid, seoul_date, action, body)
+
+        if "files" in body:
+            return handle_batch(uuid, seoul_date, body["files"])
+
         file_name = body.get("fileName")
         content_type = body.get("contentType", "application/octet-stream")
 
@@ -32,20 +481,27 @@ def lambda_handler(event, context):
 
         object_key = f"album/{uuid}/{seoul_date}/{file_name}"
 
-        presigned_url = s3_client.generate_presigned_url(
+        manifest = None
+        if body.get("manifest") is not None:
+            try:
+                manifest = parse_manifest(body["manifest"])
+            except ValueError as e:
+                return build_response(400, {"error": str(e)})
+
+        params, upload_headers = put_request(object_key, content_type, body.get("size"), manifest)
+        presigned_url = aws_clients.get_client("s3").generate_presigned_url(
             "put_object",
-            Params={
-                "Bucket": S3_BUCKET_NAME,
-                "Key": object_key,
-                "ContentType": content_type,
-            },
-            ExpiresIn=300,
+            Params=params,
+            ExpiresIn=SINGLE_URL_EXPIRES_SECONDS,
         )
 
+        response_body = {"uploadUrl": presigned_url, "objectKey": object_key}
+        if manifest is not None:
+            response_body["headers"] = upload_headers
         return {
             "statusCode": 200,
             "headers": {"Access-Control-Allow-Origin": "*"},
-            "body": json.dumps({"uploadUrl": presigned_url, "objectKey": object_key}),
+            "body": json.dumps(response_body),
         }
 
     except ClientError as e:
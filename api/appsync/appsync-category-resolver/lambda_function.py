@@ -0,0 +1,130 @@
+import base64
+import json
+import logging
+from prism_common import aws_clients, categories, metrics
+
+
+CATEGORY_TABLE_NAME = categories.CATEGORY_TABLE_NAME or "MemoryAlbumCategories-dev"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def encode_token(value):
+    return base64.urlsafe_b64encode(json.dumps(value, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_token(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid nextToken")
+
+
+def page_size(arguments):
+    limit = arguments.get("limit") or DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def category_summary(item):
+    return {
+        "categoryId": item["CategoryID"],
+        "categoryName": item["CategoryName"],
+        "description": item.get("Description", ""),
+        "imageCount": int(item.get("ImageCount", 0)),
+        "version": int(item.get("Version", 0)),
+        "updatedAt": item.get("UpdatedAt"),
+    }
+
+
+def list_categories(user_id, arguments):
+    """Category names and counts without the key lists."""
+    kwargs = {
+        "KeyConditionExpression": "UserID = :uid",
+        "ExpressionAttributeValues": {":uid": user_id},
+        "ProjectionExpression": ", ".join(f"#a{i}" for i in range(len(categories.SUMMARY_ATTRIBUTES))),
+        "ExpressionAttributeNames": {f"#a{i}": name for i, name in enumerate(categories.SUMMARY_ATTRIBUTES)},
+        "Limit": page_size(arguments),
+    }
+    if arguments.get("nextToken"):
+        token = decode_token(arguments["nextToken"])
+        kwargs["ExclusiveStartKey"] = {"UserID": user_id, "CategoryID": token["categoryId"]}
+
+    with metrics.phase("ddb_query"):
+        response = aws_clients.get_table(CATEGORY_TABLE_NAME).query(**kwargs)
+
+    next_token = None
+    if "LastEvaluatedKey" in response:
+        next_token = encode_token({"categoryId": response["LastEvaluatedKey"]["CategoryID"]})
+    return {
+        "items": [category_summary(item) for item in response.get("Items", [])],
+        "nextToken": next_token,
+    }
+
+
+def get_category(user_id, arguments):
+    """
+    One page of a category's image keys. Only the page's list elements are read, and nextToken
+    carries the category Version, so a token from before a re-sort is rejected instead of
+    silently skipping or repeating keys.
+    """
+    category_id = arguments["categoryId"]
+    limit = page_size(arguments)
+    offset, version = 0, None
+    if arguments.get("nextToken"):
+        token = decode_token(arguments["nextToken"])
+        offset, version = int(token["offset"]), int(token["version"])
+
+    # ImageKeys[i]만 투영해 큰 카테고리도 페이지 크기만큼만 읽음
+    names = {"#k": "ImageKeys"}
+    names.update({f"#a{i}": name for i, name in enumerate(categories.SUMMARY_ATTRIBUTES)})
+    projection = [f"#a{i}" for i in range(len(categories.SUMMARY_ATTRIBUTES))]
+    projection.extend(f"#k[{index}]" for index in range(offset, offset + limit))
+
+    with metrics.phase("ddb_read"):
+        response = aws_clients.get_table(CATEGORY_TABLE_NAME).get_item(
+            Key={"UserID": user_id, "CategoryID": category_id},
+            ProjectionExpression=", ".join(projection),
+            ExpressionAttributeNames=names,
+        )
+    item = response.get("Item")
+    if not item:
+        return None
+
+    result = category_summary(item)
+    if version is not None and version != result["version"]:
+        raise ValueError("Stale nextToken: the category changed, start again without nextToken")
+
+    # 투영한 인덱스 중 존재하는 원소만 순서대로 돌아옴
+    page = item.get("ImageKeys", [])
+    next_token = None
+    if offset + limit < result["imageCount"]:
+        next_token = encode_token({"offset": offset + limit, "version": result["version"]})
+
+    # 이미지 필드는 appsync-metadata-resolver가 source.imageKey로 채움
+    result["items"] = [{"imageKey": key} for key in page]
+    result["nextToken"] = next_token
+    return result
+
+
+@metrics.instrumented
+def lambda_handler(event, context):
+    metrics.log_payload("Received event", event, logger)
+
+    arguments = event.get("arguments") or {}
+    field_name = (event.get("info") or {}).get("fieldName")
+    user_id = (event.get("identity") or {}).get("sub")
+    if not user_id:
+        raise ValueError("Unauthorized: user identity is missing")
+
+    metrics.set_property("userID", user_id)
+    logger.info(f"Handling {field_name} for user: {user_id}")
+
+    if field_name == "listCategories":
+        return list_categories(user_id, arguments)
+    if field_name == "getCategory":
+        return get_category(user_id, arguments)
+    raise ValueError(f"Unsupported field: {field_name}")
@@ -0,0 +1,78 @@
+import base64
+import json
+import logging
+from prism_common import embeddings, metrics, vector_index
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# 페이지를 넘겨도 상위 결과만 의미가 있으므로 전체 깊이를 제한
+MAX_RESULTS = 500
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def encode_token(value):
+    return base64.urlsafe_b64encode(json.dumps(value, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_token(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid nextToken")
+
+
+def search_images(user_id, arguments):
+    query = (arguments.get("query") or "").strip()
+    if not query:
+        raise ValueError("query is required")
+
+    limit = max(1, min(int(arguments.get("limit") or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    offset = 0
+    if arguments.get("nextToken"):
+        offset = int(decode_token(arguments["nextToken"])["offset"])
+    if offset >= MAX_RESULTS:
+        return {"items": [], "nextToken": None}
+
+    embedder = embeddings.get_embedder()
+    segments = vector_index.load(user_id)
+    if not segments:
+        return {"items": [], "nextToken": None}
+    if segments[0].model != embedder.model:
+        raise ValueError(f"색인의 임베딩 모델({segments[0].model})이 현재 모델({embedder.model})과 다릅니다.")
+
+    query_vector = embedder.embed([query])[0]
+    with metrics.phase("top_k"):
+        # 다음 페이지가 있는지 알기 위해 하나 더 구함
+        ranked = vector_index.top_k(segments, query_vector, min(offset + limit + 1, MAX_RESULTS))
+
+    page = ranked[offset : offset + limit]
+    next_token = None
+    if len(ranked) > offset + limit:
+        next_token = encode_token({"offset": offset + limit})
+
+    # 이미지 필드는 appsync-metadata-resolver가 source.imageKey로 채움
+    return {
+        "items": [{"imageKey": key, "score": round(score, 4)} for score, key in page],
+        "nextToken": next_token,
+    }
+
+
+@metrics.instrumented
+def lambda_handler(event, context):
+    metrics.log_payload("Received event", event, logger)
+
+    arguments = event.get("arguments") or {}
+    field_name = (event.get("info") or {}).get("fieldName")
+    user_id = (event.get("identity") or {}).get("sub")
+    if not user_id:
+        raise ValueError("Unauthorized: user identity is missing")
+
+    metrics.set_property("userID", user_id)
+    logger.info(f"Handling {field_name} for user: {user_id}")
+
+    if field_name == "searchImages":
+        return search_images(user_id, arguments)
+    raise ValueError(f"Unsupported field: {field_name}")
@@ -1,98 +1,127 @@
-import boto3
+import math
 import os
 import logging
-import json
-from datetime import datetime, timezone, timedelta
+from prism_common import aws_clients, ddb_codec, display, metrics, presign, variants
 
 
-s3_client = boto3.client("s3")
-dynamodb = boto3.resource("dynamodb")
-
 PROCESSED_BUCKET = os.environ.get("PROCESSED_BUCKET", "memory-images-processed-dev")
 TABLE_NAME = os.environ.get("DDB_TABLE_NAME", "MemoryImageMetadata-dev")
 INDEX_NAME = "byOriginalKey"
 
-table = dynamodb.Table(TABLE_NAME)
-KST = timezone(timedelta(hours=9))
-
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
-def generate_dynamic_fields(item, thumbnail_format="jpg"):
+def add_variant_fields(item, variant_catalog, arguments):
+    """
+    VariantUrl: the smallest stored variant covering viewportWidth x devicePixelRatio pixels in
+    a format from acceptFormats (the original when none is wide enough). Srcset: every width
+    of the catalog in the best accepted format, for the client to choose with `sizes`.
+    """
+    accept = arguments.get("acceptFormats")
+    required_width = math.ceil(arguments["viewportWidth"] * (arguments.get("devicePixelRatio") or 1))
+
+    chosen = variants.choose(variant_catalog, required_width, accept)
+    item["VariantWidth"] = chosen["Width"] if chosen else None
+    item["VariantFormat"] = chosen["Format"] if chosen else None
+    if not chosen:
+        item["VariantUrl"] = item.get("DisplayUrl")
+    else:
+        try:
+            item["VariantUrl"] = presign.presigned_get_url(PROCESSED_BUCKET, chosen["Key"], expires_in=900)
+        except Exception as e:
+            logger.error(f"Error generating VariantUrl: {e}")
+            item["VariantUrl"] = item.get("DisplayUrl")
+
+    try:
+        item["Srcset"] = ", ".join(
+            f"{presign.presigned_get_url(PROCESSED_BUCKET, entry['Key'], expires_in=900)} {entry['Width']}w"
+            for entry in variants.srcset_entries(variant_catalog, accept)
+        ) or None
+    except Exception as e:
+        logger.error(f"Error generating Srcset: {e}")
+        item["Srcset"] = None
+
+
+def generate_dynamic_fields(item, thumbnail_format="jpg", arguments=None):
     if not item:
         return None
 
     original_key = item.get("OriginalKey")
     source_bucket = item.get("SourceBucket")
-    created_at_iso = item.get("CreatedAt")
 
     if not original_key:
         return item
 
-    directory = os.path.dirname(original_key)
-    filename = os.path.basename(original_key)
-    file_base, _ = os.path.splitext(filename)
-
-    if "Tags" in item and isinstance(item["Tags"], set):
-        item["Tags"] = list(item["Tags"])
+    # result-to-dynamodb가 저장 시점에 계산한 projection을 그대로 사용하고, 이전 아이템만 여기서 계산
+    projection = item.pop("Display", None) or display.build_display(
+        original_key, item.get("CreatedAt"), item.get("Tags")
+    )
 
-    item["ImageName"] = filename
+    variant_catalog = variants.catalog({"Variants": item.pop("Variants", None), "Display": projection})
 
-    if created_at_iso:
-        try:
-            dt_object = datetime.fromisoformat(created_at_iso)
-            item["FormattedCreatedAt"] = dt_object.astimezone(KST).strftime(
-                "%Y년 %m월 %d일 %p %I:%M"
-            )
-        except:
-            item["FormattedCreatedAt"] = created_at_iso
+    item["ImageName"] = projection["ImageName"]
+    if projection.get("FormattedCreatedAt"):
+        item["FormattedCreatedAt"] = projection["FormattedCreatedAt"]
+    if "Tags" in item or projection["TagList"]:
+        item["Tags"] = projection["TagList"]
 
     display_bucket, display_key = (source_bucket, original_key)
     if thumbnail_format == "avif":
-        processed_key = f"{directory}/transcoded/{file_base}.avif"
+        processed_key = projection["TranscodedKey"]
         try:
-            s3_client.head_object(Bucket=PROCESSED_BUCKET, Key=processed_key)
+            with metrics.phase("s3_head"):
+                aws_clients.get_client("s3").head_object(Bucket=PROCESSED_BUCKET, Key=processed_key)
             display_bucket, display_key = (PROCESSED_BUCKET, processed_key)
         except Exception:
             pass
 
     try:
-        item["DisplayUrl"] = s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": display_bucket, "Key": display_key},
-            ExpiresIn=900,
-        )
+        item["DisplayUrl"] = presign.presigned_get_url(display_bucket, display_key, expires_in=900)
     except Exception as e:
         logger.error(f"Error generating DisplayUrl: {e}")
         item["DisplayUrl"] = None
 
-    thumbnail_key = f"{directory}/thumbnail/{file_base}.{thumbnail_format}"
+    thumbnail_key = projection["ThumbnailKeys"].get(thumbnail_format)
+    if not thumbnail_key:
+        file_base = os.path.splitext(projection["ImageName"])[0]
+        thumbnail_key = f"{os.path.dirname(original_key)}/thumbnail/{file_base}.{thumbnail_format}"
     try:
-        item["ThumbnailUrl"] = s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": PROCESSED_BUCKET, "Key": thumbnail_key},
-            ExpiresIn=900,
-        )
+        item["ThumbnailUrl"] = presign.presigned_get_url(PROCESSED_BUCKET, thumbnail_key, expires_in=900)
     except Exception as e:
         logger.error(f"Error generating ThumbnailUrl: {e}")
         item["ThumbnailUrl"] = None
 
     try:
-        item["presignedUrl"] = s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": source_bucket, "Key": original_key},
-            ExpiresIn=900,
-        )
+        item["presignedUrl"] = presign.presigned_get_url(source_bucket, original_key, expires_in=900)
     except Exception as e:
         logger.error(f"Error generating presignedUrl: {e}")
         item["presignedUrl"] = None
 
+    # 반응형 필드는 클라이언트가 그릴 너비를 알려줄 때만 계산
+    if arguments and arguments.get("viewportWidth"):
+        add_variant_fields(item, variant_catalog, arguments)
+
     return item
 
 
+def get_item_by_original_key(original_key):
+    # 저수준 클라이언트 + 스키마 디코딩: TypeDeserializer를 거치지 않고 Tags는 바로 정렬된 list로 받음
+    with metrics.phase("ddb_query"):
+        response = aws_clients.get_client("dynamodb").query(
+            TableName=TABLE_NAME,
+            IndexName=INDEX_NAME,
+            KeyConditionExpression="OriginalKey = :ok",
+            ExpressionAttributeValues={":ok": {"S": original_key}},
+            Limit=1,
+        )
+    items = response.get("Items")
+    return ddb_codec.METADATA.decode(items[0]) if items else None
+
+
+@metrics.instrumented
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event, indent=2)}")
+    metrics.log_payload("Received event", event, logger)
 
     source_data = event.get("source", {})
     info = event.get("info", {})
@@ -105,17 +134,11 @@ def lambda_handler(event, context):
         logger.info(f"Handling top-level query for OriginalKey: {original_key}")
 
         try:
-            response = table.query(
-                IndexName=INDEX_NAME,
-                KeyConditionExpression="OriginalKey = :ok",
-                ExpressionAttributeValues={":ok": original_key},
-            )
-            if not response.get("Items"):
+            item = get_item_by_original_key(original_key)
+            if not item:
                 return None
-
-            item = response["Items"][0]
             thumbnail_format = arguments.get("thumbnailFormat", "jpg")
-            return generate_dynamic_fields(item, thumbnail_format)
+            return generate_dynamic_fields(item, thumbnail_format, arguments)
         except Exception as e:
             logger.error(f"Error in top-level query: {e}")
             raise e
@@ -127,18 +150,12 @@ def lambda_handler(event, context):
         )
 
         try:
-            response = table.query(
-                IndexName=INDEX_NAME,
-                KeyConditionExpression="OriginalKey = :ok",
-                ExpressionAttributeValues={":ok": original_key},
-            )
-            if not response.get("Items"):
+            item = get_item_by_original_key(original_key)
+            if not item:
                 return None
 
-            item = response["Items"][0]
-
             thumbnail_format = arguments.get("thumbnailFormat", "jpg")
-            enhanced_item = generate_dynamic_fields(item, thumbnail_format)
+            enhanced_item = generate_dynamic_fields(item, thumbnail_format, arguments)
 
             return enhanced_item.get(field_name)
         except Exception as e:
@@ -152,7 +169,7 @@ def lambda_handler(event, context):
 
         if field_name not in source_data:
             generate_dynamic_fields(
-                source_data, arguments.get("thumbnailFormat", "jpg")
+                source_data, arguments.get("thumbnailFormat", "jpg"), arguments
             )
 
         return source_data.get(field_name)
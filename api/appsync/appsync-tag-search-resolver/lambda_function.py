@@ -0,0 +1,177 @@
+import base64
+import json
+import logging
+from prism_common import aws_clients, metrics, tags as tag_index
+
+
+TAG_INDEX_TABLE_NAME = tag_index.TAG_INDEX_TABLE_NAME or "MemoryImageTagIndex-dev"
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+MAX_QUERY_TAGS = 10
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class PostingList:
+    """
+    One tag's postings in descending OriginalKey order, read a page at a time.
+
+    `seek` jumps to the first posting at or below a key with a new Query instead of reading
+    the postings in between, so an AND search over a rare and a common tag reads about as many
+    postings as the rare tag has.
+    """
+
+    def __init__(self, table, user_id, normalized_tag, below, page_size):
+        self.table = table
+        self.partition = tag_index.partition_key(user_id, normalized_tag)
+        self.page_size = page_size
+        self.buffer = []
+        self.position = 0
+        self.exhausted = False
+        self._fetch("<", below)
+
+    def _fetch(self, operator, bound):
+        kwargs = {
+            "KeyConditionExpression": "UserTag = :tag",
+            "ExpressionAttributeValues": {":tag": self.partition},
+            "ProjectionExpression": "OriginalKey",
+            "ScanIndexForward": False,
+            "Limit": self.page_size,
+        }
+        if bound is not None:
+            kwargs["KeyConditionExpression"] += f" AND OriginalKey {operator} :bound"
+            kwargs["ExpressionAttributeValues"][":bound"] = bound
+
+        with metrics.phase("ddb_query"):
+            response = self.table.query(**kwargs)
+        self.buffer = [item["OriginalKey"] for item in response.get("Items", [])]
+        self.position = 0
+        self.exhausted = "LastEvaluatedKey" not in response
+
+    def peek(self):
+        if self.position < len(self.buffer):
+            return self.buffer[self.position]
+        if self.exhausted or not self.buffer:
+            return None
+        self._fetch("<", self.buffer[-1])
+        return self.peek()
+
+    def advance(self):
+        self.peek()
+        self.position += 1
+
+    def seek(self, key):
+        """Moves to the first posting <= key."""
+        head = self.peek()
+        if head is None or head <= key:
+            return
+        # 버퍼 안에 있으면 건너뛰기만 하고, 버퍼를 넘어가면 그 위치부터 다시 조회
+        if self.buffer[-1] <= key:
+            while self.buffer[self.position] > key:
+                self.position += 1
+            return
+        if self.exhausted:
+            self.position = len(self.buffer)
+            return
+        self._fetch("<=", key)
+
+
+def search_all(lists, limit):
+    """Intersection (leapfrog): every list is moved to the largest head until all agree."""
+    results = []
+    while len(results) < limit:
+        heads = [posting.peek() for posting in lists]
+        if any(head is None for head in heads):
+            break
+        candidate = min(heads)
+        if all(head == candidate for head in heads):
+            results.append(candidate)
+            for posting in lists:
+                posting.advance()
+            continue
+        for posting in lists:
+            posting.seek(candidate)
+    return results
+
+
+def search_any(lists, limit):
+    """Union: k-way merge of the descending lists without duplicates."""
+    results = []
+    while len(results) < limit:
+        heads = [posting.peek() for posting in lists]
+        live = [head for head in heads if head is not None]
+        if not live:
+            break
+        candidate = max(live)
+        results.append(candidate)
+        for posting, head in zip(lists, heads):
+            if head == candidate:
+                posting.advance()
+    return results
+
+
+def encode_token(value):
+    return base64.urlsafe_b64encode(json.dumps(value, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_token(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid nextToken")
+
+
+def search_by_tags(user_id, arguments):
+    normalized = sorted({tag_index.normalize(tag) for tag in arguments.get("tags") or []} - {""})
+    if not normalized:
+        raise ValueError("At least one tag is required")
+    if len(normalized) > MAX_QUERY_TAGS:
+        raise ValueError(f"At most {MAX_QUERY_TAGS} tags can be searched at once")
+
+    mode = (arguments.get("mode") or "AND").upper()
+    if mode not in ("AND", "OR"):
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    limit = max(1, min(int(arguments.get("limit") or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    below = None
+    if arguments.get("nextToken"):
+        below = decode_token(arguments["nextToken"])["after"]
+
+    table = aws_clients.get_table(TAG_INDEX_TABLE_NAME)
+    # 다음 페이지가 있는지 알기 위해 하나 더 읽음
+    lists = [PostingList(table, user_id, tag, below, limit + 1) for tag in normalized]
+    search = search_all if mode == "AND" else search_any
+    keys = search(lists, limit + 1)
+
+    next_token = None
+    if len(keys) > limit:
+        keys = keys[:limit]
+        next_token = encode_token({"after": keys[-1]})
+
+    # 이미지 필드는 appsync-metadata-resolver가 source.imageKey로 채움
+    return {
+        "items": [{"imageKey": key} for key in keys],
+        "tags": normalized,
+        "mode": mode,
+        "nextToken": next_token,
+    }
+
+
+@metrics.instrumented
+def lambda_handler(event, context):
+    metrics.log_payload("Received event", event, logger)
+
+    arguments = event.get("arguments") or {}
+    field_name = (event.get("info") or {}).get("fieldName")
+    user_id = (event.get("identity") or {}).get("sub")
+    if not user_id:
+        raise ValueError("Unauthorized: user identity is missing")
+
+    metrics.set_property("userID", user_id)
+    logger.info(f"Handling {field_name} for user: {user_id}")
+
+    if field_name == "searchByTags":
+        return search_by_tags(user_id, arguments)
+    raise ValueError(f"Unsupported field: {field_name}")
@@ -1,17 +1,17 @@
-import boto3
 import os
 from botocore.exceptions import ClientError
 import logging
+from prism_common import aws_clients, metrics, presign
 
-s3_client = boto3.client("s3")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 URL_EXPIRATION_SECONDS = 3600
 
 
+@metrics.instrumented
 def lambda_handler(event, context):
-    logger.info(f"Received event: {event}")
+    metrics.log_payload("Received event", event, logger)
 
     bucket_name = None
     object_key = None
@@ -55,7 +55,7 @@ def lambda_handler(event, context):
         final_key = original_key
         if processed_key:
             try:
-                s3_client.head_object(Bucket=processed_bucket, Key=processed_key)
+                aws_clients.get_client("s3").head_object(Bucket=processed_bucket, Key=processed_key)
                 final_bucket = processed_bucket
                 final_key = processed_key
             except ClientError:
@@ -73,13 +73,11 @@ def lambda_handler(event, context):
         return None
 
     try:
-        presigned_url = s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket_name, "Key": object_key},
-            ExpiresIn=URL_EXPIRATION_SECONDS,
+        presigned_url = presign.presigned_get_url(
+            bucket_name, object_key, expires_in=URL_EXPIRATION_SECONDS
         )
         return presigned_url
-    except ClientError as e:
+    except (ClientError, ValueError) as e:
         logger.error(
             f"Error generating presigned URL for {bucket_name}/{object_key}: {e}"
         )
@@ -1,52 +1,286 @@
 import json
 import logging
+import os
+import time
+from prism_common import aws_clients, claim_check, ddb_batch, metrics, transcode_status
+from prism_common.lazy_import import lazy_module
+
+# 상태 인덱스를 쓰지 않는 경로에서는 botocore를 로드하지 않도록 지연 import
+botocore_exceptions = lazy_module("botocore.exceptions")
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# SQS *MessageBatch API가 한 번에 받을 수 있는 최대 엔트리 수
+SQS_BATCH_LIMIT = 10
+
+# 이 횟수 이상 수신된 메시지는 재시도하지 않고 DLQ 목록으로 보냄
+MAX_RECEIVE_COUNT = int(os.environ.get("MAX_RECEIVE_COUNT", "5"))
+RETRY_BASE_VISIBILITY_SECONDS = int(os.environ.get("RETRY_BASE_VISIBILITY_SECONDS", "60"))
+MAX_VISIBILITY_SECONDS = 43200
+
+# sqs-to-batch가 중복 변환을 건너뛸 때 참조하는 상태 인덱스
+TRANSCODE_STATUS_TABLE_NAME = os.environ.get("TRANSCODE_STATUS_TABLE_NAME")
+
+
+def chunk(entries, size=SQS_BATCH_LIMIT):
+    return [entries[i : i + size] for i in range(0, len(entries), size)]
+
+
+def get_correlation_id(job_summary):
+    """Map 결과에서 sqs-to-batch가 부여한 correlationId를 찾습니다 (JobName으로 전달됨)."""
+    if not isinstance(job_summary, dict):
+        return None
+    for source in (
+        job_summary,
+        job_summary.get("Parameters") or {},
+        job_summary.get("Tags") or {},
+    ):
+        if source.get("correlationId"):
+            return source["correlationId"]
+    return job_summary.get("JobName")
+
+
+def get_job_status(job_summary):
+    if "Status" in job_summary:
+        return job_summary["Status"]
+    return (job_summary.get("jobResult") or {}).get("Status", "FAILED")
+
+
+def read_job_result(job):
+    """
+    image-transcoding이 S3에 남긴 묶음 작업 결과({"status", "results"}). Batch .sync 결과(DescribeJobs)에는
+    컨테이너의 반환값이 없으므로 PARTIAL 여부는 이 객체로만 알 수 있습니다. 위치가 없거나 객체가 없으면 None.
+    """
+    location = job.get("result")
+    if not location:
+        return None
+    try:
+        with metrics.phase("s3_get"):
+            response = aws_clients.get_client("s3").get_object(Bucket=location["bucket"], Key=location["key"])
+            return json.loads(response["Body"].read())
+    except botocore_exceptions.ClientError as e:
+        if e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+            raise
+        return None
+
+
+def job_outcome(job, job_summary):
+    """(status, per-image results) of a packed job, preferring the result object the container wrote."""
+    status = get_job_status(job_summary)
+    # Lambda로 호출한 경우에는 반환값이 jobResult로 들어옴
+    results = (job_summary.get("jobResult") or {}).get("Results") or []
+    if status == "SUCCEEDED":
+        stored = read_job_result(job)
+        if stored is None:
+            # 결과를 남기지 않는 이전 컨테이너: 모든 이미지가 성공한 것으로 봄
+            logger.warning(f"작업 '{job['correlationId']}'의 결과 객체가 없어 모두 성공한 것으로 처리합니다.")
+        else:
+            status, results = stored.get("status", "FAILED"), stored.get("results") or []
+    return status, results
+
+
+def converted_message_ids(results):
+    """image-transcoding의 이미지별 결과에서 변환에 성공한 이미지의 messageId 집합."""
+    return {
+        result["messageId"]
+        for result in results
+        if result.get("status") == "CONVERTED" and result.get("messageId")
+    }
+
+
+def retry_visibility_timeout(receive_count):
+    return min(
+        RETRY_BASE_VISIBILITY_SECONDS * (2 ** max(receive_count - 1, 0)),
+        MAX_VISIBILITY_SECONDS,
+    )
+
+
+def record_converted(images):
+    """성공한 이미지를 상태 인덱스에 기록합니다. 실패해도 메시지 삭제는 계속 진행합니다."""
+    if not TRANSCODE_STATUS_TABLE_NAME or not images:
+        return
+
+    dynamodb_client = aws_clients.get_client("dynamodb")
 
+    converted_at = str(int(time.time() * 1000))
+    requests = {}
+    for image in images:
+        requests[image["sourceKey"]] = {
+            "PutRequest": {
+                "Item": {
+                    "SourceKey": {"S": image["sourceKey"]},
+                    "Status": {"S": "CONVERTED"},
+                    "EncodingKey": {"S": transcode_status.encoding_key(image["avifEncoding"])},
+                    "ConvertedAt": {"N": converted_at},
+                }
+            }
+        }
+
+    write_requests = list(requests.values())
+    try:
+        for i in range(0, len(write_requests), 25):
+            request = {TRANSCODE_STATUS_TABLE_NAME: write_requests[i : i + 25]}
+            with metrics.phase("ddb_write"):
+                unprocessed = ddb_batch.write(dynamodb_client, request)
+            if unprocessed:
+                # 기록되지 않은 이미지는 다음 메시지에서 다시 변환될 뿐이므로 경고만 남김
+                logger.warning(f"변환 상태 인덱스에 {ddb_batch.count(unprocessed)}개를 기록하지 못했습니다.")
+    except botocore_exceptions.ClientError as e:
+        logger.error(f"변환 상태 인덱스 기록 실패: {e}")
+
+
+def job_detail(job, field):
+    """A job's images/messages, fetched from S3 on first use when sqs-to-batch offloaded them."""
+    job[field] = claim_check.resolve(job[field])
+    return job[field]
+
+
+@metrics.instrumented
 def lambda_handler(event, context):
+    metrics.log_payload("Received event", event, logger)
+
+    map_result = claim_check.resolve(event.get("mapResult", []))
+    # 이전 상태 머신 정의는 오타가 있는 'lamdaOutput' 키로 전달함
+    lambda_output = event.get("lambdaOutput") or event.get("lamdaOutput") or {}
+
+    batch_jobs = lambda_output.get("batch_jobs", [])
+    jobs_by_id = {job["correlationId"]: job for job in batch_jobs}
+
+    logger.info(
+        f"총 {len(map_result)}개의 작업 결과를 {len(jobs_by_id)}개의 Batch 작업과 대조합니다."
+    )
 
-    map_result = event.get("mapResult", [])
-    logger.info(f"Map 결과: {json.dumps(map_result, ensure_ascii=False)}")
+    succeeded_ids = set()
+    failed_ids = {}
+    # PARTIAL 작업: correlationId -> 변환에 성공한 이미지의 messageId 집합
+    partial_ids = {}
 
-    lambda_output = event.get("lamdaOutput", {})
-    logger.info(f"원본 메시지: {json.dumps(lambda_output, ensure_ascii=False)}")
+    for job_summary in map_result:
+        correlation_id = get_correlation_id(job_summary)
+        if correlation_id not in jobs_by_id:
+            logger.error(
+                f"오류: correlationId '{correlation_id}'에 해당하는 Batch 작업이 없습니다. "
+                f"(JobId: {job_summary.get('JobId', 'N/A') if isinstance(job_summary, dict) else 'N/A'})"
+            )
+            continue
 
-    logger.info(f"총 {len(map_result)}개의 작업 결과를 필터링합니다.")
+        status, results = job_outcome(jobs_by_id[correlation_id], job_summary)
+        if status in ("SUCCEEDED", "CONVERTED"):
+            succeeded_ids.add(correlation_id)
+        elif status == "PARTIAL":
+            partial_ids[correlation_id] = converted_message_ids(results)
+            failed_ids[correlation_id] = status
+        else:
+            failed_ids[correlation_id] = (
+                job_summary.get("StatusReason")
+                or job_summary.get("Cause")
+                or job_summary.get("Error")
+                or status
+            )
 
-    messages_to_delete_list = lambda_output.get("messages_to_delete", [])
+    # 결과가 돌아오지 않은 작업은 실패로 간주하여 재시도
+    for correlation_id in jobs_by_id.keys() - succeeded_ids - failed_ids.keys():
+        logger.warning(f"작업 '{correlation_id}'의 Map 결과가 없습니다. 재시도합니다.")
+        failed_ids[correlation_id] = "MISSING_RESULT"
+
+    delete_entries = {}
+    visibility_entries = {}
+    dead_letter_entries = {}
+
+    # 이미 변환된 것으로 확인되어 Batch에 보내지 않은 메시지
+    skipped_messages = claim_check.resolve(lambda_output.get("skipped_messages", []))
+    for message in skipped_messages:
+        delete_entries[message["Id"]] = {
+            "Id": message["Id"],
+            "ReceiptHandle": message["ReceiptHandle"],
+        }
+
+    converted_images = []
+    for correlation_id in succeeded_ids:
+        converted_images.extend(job_detail(jobs_by_id[correlation_id], "images"))
+        for message in job_detail(jobs_by_id[correlation_id], "messages"):
+            delete_entries[message["Id"]] = {
+                "Id": message["Id"],
+                "ReceiptHandle": message["ReceiptHandle"],
+            }
+
+    for correlation_id, reason in failed_ids.items():
+        job = jobs_by_id[correlation_id]
+        images_by_message = {}
+        for image in job_detail(job, "images"):
+            for message_id in [image.get("messageId"), *image.get("duplicateMessageIds", [])]:
+                images_by_message[message_id] = image
+
+        # 부분 성공한 작업은 변환된 이미지의 메시지(중복 포함)만 삭제하고 나머지를 재시도
+        converted_ids = partial_ids.get(correlation_id, set())
+        for image in job_detail(job, "images"):
+            if image.get("messageId") in converted_ids:
+                converted_images.append(image)
+        converted_messages = {
+            message_id
+            for message_id, image in images_by_message.items()
+            if image.get("messageId") in converted_ids
+        }
+
+        for message in job_detail(job, "messages"):
+            if message["Id"] in delete_entries:
+                continue
+            if message["Id"] in converted_messages:
+                delete_entries[message["Id"]] = {
+                    "Id": message["Id"],
+                    "ReceiptHandle": message["ReceiptHandle"],
+                }
+                continue
+
+            receive_count = int(message.get("ReceiveCount", 1))
+            if receive_count >= MAX_RECEIVE_COUNT:
+                dead_letter_entries[message["Id"]] = {
+                    "Id": message["Id"],
+                    "ReceiptHandle": message["ReceiptHandle"],
+                    "MessageBody": json.dumps(
+                        {
+                            "correlationId": correlation_id,
+                            "reason": str(reason),
+                            "receiveCount": receive_count,
+                            "MessageBody": images_by_message.get(message["Id"]),
+                        },
+                        ensure_ascii=False,
+                    ),
+                }
+            else:
+                visibility_entries[message["Id"]] = {
+                    "Id": message["Id"],
+                    "ReceiptHandle": message["ReceiptHandle"],
+                    "VisibilityTimeout": retry_visibility_timeout(receive_count),
+                }
+
+    dead_letters = list(dead_letter_entries.values())
+
+    record_converted(converted_images)
 
     logger.info(
-        f"삭제할 원본 메시지 후보: {json.dumps(messages_to_delete_list, ensure_ascii=False)}"
+        f"삭제: {len(delete_entries)}개, 재시도 지연: {len(visibility_entries)}개, "
+        f"DLQ: {len(dead_letters)}개"
     )
-    logger.info(f"총 {len(map_result)}개의 작업 결과를 필터링합니다.")
-
-    successful_entries = []
-
-    for index, job_summary in enumerate(map_result):
-        if job_summary.get("Status") == "SUCCEEDED":
-            try:
-                message_to_delete = messages_to_delete_list[index]
-
-                successful_entries.append(
-                    {
-                        "Id": message_to_delete["Id"],
-                        "ReceiptHandle": message_to_delete["ReceiptHandle"],
-                    }
-                )
-                logger.info(
-                    f"성공 작업(JobId: {job_summary.get('JobId', 'N/A')})에 해당하는 메시지(Id: {message_to_delete['Id']})를 삭제 목록에 추가했습니다."
-                )
-            except IndexError:
-                logger.error(
-                    f"오류: Map 결과 인덱스 {index}에 해당하는 원본 메시지가 없습니다."
-                )
-            except KeyError:
-                logger.error(
-                    f"오류: 메시지 객체에 'Id' 또는 'ReceiptHandle' 키가 없습니다. 메시지: {message_to_delete}"
-                )
-
-    logger.info(f"최종 삭제 목록: {json.dumps(successful_entries, ensure_ascii=False)}")
-
-    return successful_entries
+
+    return {
+        "deleteBatches": chunk(list(delete_entries.values())),
+        "visibilityBatches": chunk(list(visibility_entries.values())),
+        "deadLetterBatches": chunk(
+            [{"Id": m["Id"], "MessageBody": m["MessageBody"]} for m in dead_letters]
+        ),
+        # DLQ 전송이 성공한 뒤에 원본 큐에서 삭제
+        "deadLetterDeleteBatches": chunk(
+            [{"Id": m["Id"], "ReceiptHandle": m["ReceiptHandle"]} for m in dead_letters]
+        ),
+        "summary": {
+            "succeededJobs": len(succeeded_ids),
+            "partialJobs": len(partial_ids),
+            "failedJobs": len(failed_ids) - len(partial_ids),
+            "skipped": len(skipped_messages),
+            "deleted": len(delete_entries),
+            "retried": len(visibility_entries),
+            "deadLettered": len(dead_letters),
+        },
+    }
@@ -0,0 +1,207 @@
+// Package avifparams picks AVIF encoding parameters from cheap image statistics
+// instead of relying on the per-image guess returned by the Bedrock analysis.
+package avifparams
+
+import (
+	"bytes"
+	"fmt"
+	"image"
+	"image/color"
+	_ "image/jpeg"
+	_ "image/png"
+	"math"
+)
+
+// Version changes whenever the calibration table changes, so stored results can be re-encoded.
+// prism_common.transcode_status records it in the EncodingKey (AVIF_PARAMS_VERSION).
+const Version = "stats-v1"
+
+// PreviewSize is the longest edge of the preview the statistics are computed on.
+const PreviewSize = 256
+
+// edgeThreshold is the Sobel gradient magnitude (0-255 luma scale) counted as an edge.
+const edgeThreshold = 48.0
+
+type Stats struct {
+	Width       int     `json:"width"`
+	Height      int     `json:"height"`
+	Megapixels  float64 `json:"megapixels"`
+	Entropy     float64 `json:"entropy"`     // Shannon entropy of the luma histogram, 0-8 bits
+	EdgeDensity float64 `json:"edgeDensity"` // fraction of preview pixels above edgeThreshold
+}
+
+type Options struct {
+	Quality  int `json:"quality"`
+	Effort   int `json:"effort"`
+	Bitdepth int `json:"bitdepth"`
+}
+
+// qualityTable is indexed by [entropy band][edge band]. The values are initial estimates, not
+// measurements: no calibration corpus or benchmark output is committed yet. cmd/avif-bench
+// reports the SSIM each choice reaches on a set of images; recalibrate with it (and bump
+// Version) before relying on the table for a quality target such as SSIM >= 0.95.
+// Smooth, low-detail images hide AV1 artefacts well; busy textures need more bits.
+var qualityTable = [3][3]int{
+	// edges: low, mid, high
+	{48, 52, 56}, // entropy < 6.0 (flat skies, screenshots, night shots)
+	{52, 56, 60}, // 6.0 <= entropy < 7.2
+	{55, 60, 64}, // entropy >= 7.2 (foliage, crowds, textures)
+}
+
+var entropyBands = []float64{6.0, 7.2}
+var edgeBands = []float64{0.04, 0.12}
+
+// effortBands bounds encode time: larger images get a lower effort so one job stays inside the
+// per-job runtime budget used by sqs-to-batch.
+var effortBands = []struct {
+	maxMegapixels float64
+	effort        int
+}{
+	{4, 6},
+	{12, 5},
+	{24, 4},
+	{math.Inf(1), 3},
+}
+
+func band(value float64, limits []float64) int {
+	for i, limit := range limits {
+		if value < limit {
+			return i
+		}
+	}
+	return len(limits)
+}
+
+// Select maps image statistics to AVIF encoding options.
+func Select(stats Stats) Options {
+	quality := qualityTable[band(stats.Entropy, entropyBands)][band(stats.EdgeDensity, edgeBands)]
+
+	effort := effortBands[len(effortBands)-1].effort
+	for _, b := range effortBands {
+		if stats.Megapixels <= b.maxMegapixels {
+			effort = b.effort
+			break
+		}
+	}
+
+	return Options{Quality: quality, Effort: effort, Bitdepth: 8}
+}
+
+// StatsFromPreview decodes a small JPEG/PNG preview of the image and computes its statistics.
+// width and height are the dimensions of the full-size original.
+func StatsFromPreview(preview []byte, width, height int) (Stats, error) {
+	img, _, err := image.Decode(bytes.NewReader(preview))
+	if err != nil {
+		return Stats{}, fmt.Errorf("failed to decode preview: %w", err)
+	}
+
+	gray := ToGray(img)
+	return Stats{
+		Width:       width,
+		Height:      height,
+		Megapixels:  float64(width) * float64(height) / 1e6,
+		Entropy:     Entropy(gray),
+		EdgeDensity: EdgeDensity(gray),
+	}, nil
+}
+
+func ToGray(img image.Image) *image.Gray {
+	if gray, ok := img.(*image.Gray); ok {
+		return gray
+	}
+	bounds := img.Bounds()
+	gray := image.NewGray(image.Rect(0, 0, bounds.Dx(), bounds.Dy()))
+	for y := 0; y < bounds.Dy(); y++ {
+		for x := 0; x < bounds.Dx(); x++ {
+			gray.Set(x, y, color.GrayModel.Convert(img.At(bounds.Min.X+x, bounds.Min.Y+y)))
+		}
+	}
+	return gray
+}
+
+func Entropy(gray *image.Gray) float64 {
+	var histogram [256]int
+	bounds := gray.Bounds()
+	for y := bounds.Min.Y; y < bounds.Max.Y; y++ {
+		row := gray.Pix[(y-bounds.Min.Y)*gray.Stride:]
+		for x := 0; x < bounds.Dx(); x++ {
+			histogram[row[x]]++
+		}
+	}
+
+	total := float64(bounds.Dx() * bounds.Dy())
+	if total == 0 {
+		return 0
+	}
+	entropy := 0.0
+	for _, count := range histogram {
+		if count == 0 {
+			continue
+		}
+		p := float64(count) / total
+		entropy -= p * math.Log2(p)
+	}
+	return entropy
+}
+
+func EdgeDensity(gray *image.Gray) float64 {
+	w, h := gray.Bounds().Dx(), gray.Bounds().Dy()
+	if w < 3 || h < 3 {
+		return 0
+	}
+
+	at := func(x, y int) float64 { return float64(gray.Pix[y*gray.Stride+x]) }
+	edges := 0
+	for y := 1; y < h-1; y++ {
+		for x := 1; x < w-1; x++ {
+			gx := at(x+1, y-1) + 2*at(x+1, y) + at(x+1, y+1) - at(x-1, y-1) - 2*at(x-1, y) - at(x-1, y+1)
+			gy := at(x-1, y+1) + 2*at(x, y+1) + at(x+1, y+1) - at(x-1, y-1) - 2*at(x, y-1) - at(x+1, y-1)
+			// Sobel kernels sum to 4x the luma step, so scale back to the 0-255 range.
+			if math.Hypot(gx, gy)/4 > edgeThreshold {
+				edges++
+			}
+		}
+	}
+	return float64(edges) / float64((w-2)*(h-2))
+}
+
+// SSIM computes the mean structural similarity of two equally sized grayscale images over 8x8 windows.
+func SSIM(a, b *image.Gray) (float64, error) {
+	if a.Bounds().Dx() != b.Bounds().Dx() || a.Bounds().Dy() != b.Bounds().Dy() {
+		return 0, fmt.Errorf("image size mismatch: %v vs %v", a.Bounds().Size(), b.Bounds().Size())
+	}
+
+	const window = 8
+	const c1 = (0.01 * 255) * (0.01 * 255)
+	const c2 = (0.03 * 255) * (0.03 * 255)
+
+	w, h := a.Bounds().Dx(), a.Bounds().Dy()
+	total, windows := 0.0, 0
+	for y := 0; y+window <= h; y += window {
+		for x := 0; x+window <= w; x += window {
+			var sumA, sumB, sumAA, sumBB, sumAB float64
+			for dy := 0; dy < window; dy++ {
+				for dx := 0; dx < window; dx++ {
+					pa := float64(a.Pix[(y+dy)*a.Stride+x+dx])
+					pb := float64(b.Pix[(y+dy)*b.Stride+x+dx])
+					sumA += pa
+					sumB += pb
+					sumAA += pa * pa
+					sumBB += pb * pb
+					sumAB += pa * pb
+				}
+			}
+			n := float64(window * window)
+			meanA, meanB := sumA/n, sumB/n
+			varA := sumAA/n - meanA*meanA
+			varB := sumBB/n - meanB*meanB
+			cov := sumAB/n - meanA*meanB
+			total += ((2*meanA*meanB + c1) * (2*cov + c2)) / ((meanA*meanA + meanB*meanB + c1) * (varA + varB + c2))
+			windows++
+		}
+	}
+	if windows == 0 {
+		return 0, fmt.Errorf("image too small for SSIM: %dx%d", w, h)
+	}
+	return total / float64(windows), nil
+}
@@ -0,0 +1,199 @@
+package avifparams
+
+import (
+	"bytes"
+	"image"
+	"image/png"
+	"math"
+	"testing"
+)
+
+func grayImage(w, h int, pixel func(x, y int) uint8) *image.Gray {
+	gray := image.NewGray(image.Rect(0, 0, w, h))
+	for y := 0; y < h; y++ {
+		for x := 0; x < w; x++ {
+			gray.Pix[y*gray.Stride+x] = pixel(x, y)
+		}
+	}
+	return gray
+}
+
+func flat(w, h int) *image.Gray {
+	return grayImage(w, h, func(x, y int) uint8 { return 128 })
+}
+
+// noise is deterministic pseudo-random luma (LCG), standing in for foliage or sensor noise.
+func noise(w, h int) *image.Gray {
+	state := uint32(1)
+	return grayImage(w, h, func(x, y int) uint8 {
+		state = state*1664525 + 1013904223
+		return uint8(state >> 24)
+	})
+}
+
+func TestEntropy(t *testing.T) {
+	tests := []struct {
+		name string
+		img  *image.Gray
+		want float64
+	}{
+		{"flat", flat(16, 16), 0},
+		{"two halves", grayImage(16, 16, func(x, y int) uint8 { return uint8(255 * (x / 8)) }), 1},
+		{"every level once", grayImage(16, 16, func(x, y int) uint8 { return uint8(y*16 + x) }), 8},
+		{"empty", flat(0, 0), 0},
+		{"single pixel", flat(1, 1), 0},
+	}
+	for _, tt := range tests {
+		if got := Entropy(tt.img); math.Abs(got-tt.want) > 1e-9 {
+			t.Errorf("%s: Entropy = %v, want %v", tt.name, got, tt.want)
+		}
+	}
+
+	if got := Entropy(noise(64, 64)); got < 7.2 {
+		t.Errorf("noise: Entropy = %v, want >= 7.2 (top band)", got)
+	}
+}
+
+func TestEntropyOfSubImage(t *testing.T) {
+	// The left half of the image holds a single luma value.
+	img := grayImage(16, 16, func(x, y int) uint8 { return uint8(255 * (x / 8)) })
+	sub := img.SubImage(image.Rect(0, 0, 8, 16)).(*image.Gray)
+	if got := Entropy(sub); got != 0 {
+		t.Errorf("Entropy(sub) = %v, want 0", got)
+	}
+}
+
+func TestEdgeDensity(t *testing.T) {
+	step := grayImage(10, 10, func(x, y int) uint8 {
+		if x < 5 {
+			return 0
+		}
+		return 255
+	})
+	tests := []struct {
+		name string
+		img  *image.Gray
+		want float64
+	}{
+		{"flat", flat(32, 32), 0},
+		// columns 4 and 5 of the 8x8 interior straddle the step
+		{"vertical step", step, 16.0 / 64.0},
+		{"too small", noise(2, 2), 0},
+		{"single row", noise(64, 1), 0},
+	}
+	for _, tt := range tests {
+		if got := EdgeDensity(tt.img); math.Abs(got-tt.want) > 1e-9 {
+			t.Errorf("%s: EdgeDensity = %v, want %v", tt.name, got, tt.want)
+		}
+	}
+
+	if got := EdgeDensity(noise(64, 64)); got < 0.12 {
+		t.Errorf("noise: EdgeDensity = %v, want >= 0.12 (top band)", got)
+	}
+}
+
+func TestBandEdges(t *testing.T) {
+	tests := []struct {
+		value  float64
+		limits []float64
+		want   int
+	}{
+		{0, entropyBands, 0},
+		{5.999, entropyBands, 0},
+		{6.0, entropyBands, 1},
+		{7.199, entropyBands, 1},
+		{7.2, entropyBands, 2},
+		{8, entropyBands, 2},
+		{0.039, edgeBands, 0},
+		{0.04, edgeBands, 1},
+		{0.12, edgeBands, 2},
+	}
+	for _, tt := range tests {
+		if got := band(tt.value, tt.limits); got != tt.want {
+			t.Errorf("band(%v, %v) = %d, want %d", tt.value, tt.limits, got, tt.want)
+		}
+	}
+}
+
+func TestSelect(t *testing.T) {
+	tests := []struct {
+		name  string
+		stats Stats
+		want  Options
+	}{
+		{"flat small", Stats{Megapixels: 0.01, Entropy: 0, EdgeDensity: 0}, Options{48, 6, 8}},
+		{"mid detail", Stats{Megapixels: 12, Entropy: 6.5, EdgeDensity: 0.05}, Options{56, 5, 8}},
+		{"noisy large", Stats{Megapixels: 48, Entropy: 7.9, EdgeDensity: 0.5}, Options{64, 3, 8}},
+		{"effort band edge 4 MP", Stats{Megapixels: 4}, Options{48, 6, 8}},
+		{"effort just over 4 MP", Stats{Megapixels: 4.01}, Options{48, 5, 8}},
+		{"effort band edge 24 MP", Stats{Megapixels: 24}, Options{48, 4, 8}},
+	}
+	for _, tt := range tests {
+		if got := Select(tt.stats); got != tt.want {
+			t.Errorf("%s: Select = %+v, want %+v", tt.name, got, tt.want)
+		}
+	}
+}
+
+func TestQualityGrowsWithDetail(t *testing.T) {
+	for i := range qualityTable {
+		for j := range qualityTable[i] {
+			if i > 0 && qualityTable[i][j] < qualityTable[i-1][j] {
+				t.Errorf("quality[%d][%d] < quality[%d][%d]", i, j, i-1, j)
+			}
+			if j > 0 && qualityTable[i][j] < qualityTable[i][j-1] {
+				t.Errorf("quality[%d][%d] < quality[%d][%d]", i, j, i, j-1)
+			}
+		}
+	}
+}
+
+func encodePNG(t *testing.T, img image.Image) []byte {
+	t.Helper()
+	var buf bytes.Buffer
+	if err := png.Encode(&buf, img); err != nil {
+		t.Fatal(err)
+	}
+	return buf.Bytes()
+}
+
+func TestStatsFromPreview(t *testing.T) {
+	stats, err := StatsFromPreview(encodePNG(t, noise(64, 48)), 4000, 3000)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if stats.Megapixels != 12 || stats.Width != 4000 || stats.Height != 3000 {
+		t.Errorf("dimensions come from the original: %+v", stats)
+	}
+	if got := Select(stats); got.Quality != 64 {
+		t.Errorf("noisy preview: Select = %+v, want quality 64", got)
+	}
+
+	tiny, err := StatsFromPreview(encodePNG(t, flat(1, 1)), 1, 1)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if tiny.Entropy != 0 || tiny.EdgeDensity != 0 {
+		t.Errorf("1x1 preview: %+v", tiny)
+	}
+
+	if _, err := StatsFromPreview([]byte("not an image"), 1, 1); err == nil {
+		t.Error("expected a decode error")
+	}
+}
+
+func TestSSIM(t *testing.T) {
+	img := noise(32, 32)
+	if got, err := SSIM(img, img); err != nil || math.Abs(got-1) > 1e-9 {
+		t.Errorf("SSIM(img, img) = %v, %v; want 1", got, err)
+	}
+	if got, _ := SSIM(img, flat(32, 32)); got > 0.5 {
+		t.Errorf("SSIM(noise, flat) = %v, want well below 1", got)
+	}
+	if _, err := SSIM(img, noise(16, 16)); err == nil {
+		t.Error("expected a size mismatch error")
+	}
+	if _, err := SSIM(flat(4, 4), flat(4, 4)); err == nil {
+		t.Error("expected an error for an image smaller than the window")
+	}
+}
@@ -0,0 +1,53 @@
+package main
+
+import (
+	"compress/gzip"
+	"context"
+	"encoding/json"
+	"fmt"
+	"io"
+	"log"
+
+	"github.com/aws/aws-sdk-go-v2/aws"
+	"github.com/aws/aws-sdk-go-v2/service/s3"
+)
+
+// claimCheckReference is what sqs-to-batch passes instead of a job payload that would not fit
+// the Step Functions state (prism_common/claim_check.py): the payload is stored gzip-compressed
+// JSON in S3.
+type claimCheckReference struct {
+	ClaimCheck *struct {
+		Bucket string `json:"bucket"`
+		Key    string `json:"key"`
+	} `json:"$claimCheck"`
+}
+
+// resolveClaimCheck returns the stored payload for a reference and any other payload unchanged.
+func resolveClaimCheck(ctx context.Context, payload json.RawMessage) (json.RawMessage, error) {
+	var reference claimCheckReference
+	if err := json.Unmarshal(payload, &reference); err != nil || reference.ClaimCheck == nil {
+		return payload, nil
+	}
+
+	log.Printf("Resolving claim-check payload: s3://%s/%s", reference.ClaimCheck.Bucket, reference.ClaimCheck.Key)
+	s3Object, err := s3Client.GetObject(ctx, &s3.GetObjectInput{
+		Bucket: aws.String(reference.ClaimCheck.Bucket),
+		Key:    aws.String(reference.ClaimCheck.Key),
+	})
+	if err != nil {
+		return nil, fmt.Errorf("failed to get claim-check payload from S3: %w", err)
+	}
+	defer s3Object.Body.Close()
+
+	reader, err := gzip.NewReader(s3Object.Body)
+	if err != nil {
+		return nil, fmt.Errorf("failed to decompress claim-check payload: %w", err)
+	}
+	defer reader.Close()
+
+	body, err := io.ReadAll(reader)
+	if err != nil {
+		return nil, fmt.Errorf("failed to read claim-check payload: %w", err)
+	}
+	return body, nil
+}
@@ -0,0 +1,212 @@
+// Benchmark harness for the AVIF parameter selector.
+//
+// Encodes every image of a local corpus twice, with fixed baseline options and with the options
+// chosen by avifparams.Select, and reports bytes saved, encode time and SSIM for both.
+//
+//	go run ./cmd/avif-bench -corpus ./samples -baseline-quality 60 -baseline-effort 4
+package main
+
+import (
+	"bytes"
+	"flag"
+	"fmt"
+	"image"
+	"log"
+	"os"
+	"path/filepath"
+	"strings"
+	"text/tabwriter"
+	"time"
+
+	"github.com/cshum/vipsgen/vips"
+
+	"github.com/prism-memory/backend/batch/step-function/image-transcoding/avifparams"
+)
+
+// ssimSize is the longest edge both images are reduced to before SSIM is computed.
+const ssimSize = 512
+
+type encodeResult struct {
+	bytes    int
+	duration time.Duration
+	ssim     float64
+}
+
+func main() {
+	corpus := flag.String("corpus", "", "directory containing sample images")
+	baselineQuality := flag.Int("baseline-quality", 60, "baseline AVIF quality")
+	baselineEffort := flag.Int("baseline-effort", 4, "baseline AVIF effort")
+	flag.Parse()
+
+	if *corpus == "" {
+		log.Fatal("-corpus is required")
+	}
+
+	vips.Startup(nil)
+	defer vips.Shutdown()
+
+	files, err := corpusFiles(*corpus)
+	if err != nil {
+		log.Fatalf("failed to read corpus: %v", err)
+	}
+
+	baseline := avifparams.Options{Quality: *baselineQuality, Effort: *baselineEffort, Bitdepth: 8}
+
+	table := tabwriter.NewWriter(os.Stdout, 0, 0, 2, ' ', 0)
+	fmt.Fprintln(table, "file\tentropy\tedges\tQ/effort\tbase bytes\tsel bytes\tsaved\tbase ms\tsel ms\tbase ssim\tsel ssim")
+
+	var totalBase, totalSelected int
+	var timeBase, timeSelected time.Duration
+	var ssimBase, ssimSelected float64
+	count := 0
+
+	for _, path := range files {
+		buffer, err := os.ReadFile(path)
+		if err != nil {
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+
+		img, err := vips.NewImageFromBuffer(buffer, nil)
+		if err != nil {
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+
+		reference, err := grayPreview(img)
+		if err != nil {
+			img.Close()
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+
+		stats, err := computeStats(img)
+		if err != nil {
+			img.Close()
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+		selected := avifparams.Select(stats)
+
+		base, errBase := encode(img, baseline, reference)
+		sel, errSel := encode(img, selected, reference)
+		img.Close()
+		if errBase != nil || errSel != nil {
+			log.Printf("skip %s: baseline=%v selected=%v", path, errBase, errSel)
+			continue
+		}
+
+		fmt.Fprintf(table, "%s\t%.2f\t%.3f\t%d/%d\t%d\t%d\t%.1f%%\t%d\t%d\t%.4f\t%.4f\n",
+			filepath.Base(path), stats.Entropy, stats.EdgeDensity, selected.Quality, selected.Effort,
+			base.bytes, sel.bytes, 100*(1-float64(sel.bytes)/float64(base.bytes)),
+			base.duration.Milliseconds(), sel.duration.Milliseconds(), base.ssim, sel.ssim)
+
+		totalBase += base.bytes
+		totalSelected += sel.bytes
+		timeBase += base.duration
+		timeSelected += sel.duration
+		ssimBase += base.ssim
+		ssimSelected += sel.ssim
+		count++
+	}
+	table.Flush()
+
+	if count == 0 {
+		log.Fatal("no images could be benchmarked")
+	}
+
+	fmt.Printf("\n%d images (%s)\n", count, avifparams.Version)
+	fmt.Printf("bytes:       baseline %d, selected %d, saved %.1f%%\n",
+		totalBase, totalSelected, 100*(1-float64(totalSelected)/float64(totalBase)))
+	fmt.Printf("encode time: baseline %s, selected %s\n", timeBase, timeSelected)
+	fmt.Printf("mean SSIM:   baseline %.4f, selected %.4f\n", ssimBase/float64(count), ssimSelected/float64(count))
+}
+
+func corpusFiles(dir string) ([]string, error) {
+	var files []string
+	err := filepath.WalkDir(dir, func(path string, entry os.DirEntry, err error) error {
+		if err != nil {
+			return err
+		}
+		switch strings.ToLower(filepath.Ext(path)) {
+		case ".jpg", ".jpeg", ".png", ".webp", ".heic", ".tif", ".tiff":
+			files = append(files, path)
+		}
+		return nil
+	})
+	return files, err
+}
+
+func computeStats(img *vips.Image) (avifparams.Stats, error) {
+	preview, err := img.Copy(nil)
+	if err != nil {
+		return avifparams.Stats{}, err
+	}
+	defer preview.Close()
+
+	if err := preview.ThumbnailImage(avifparams.PreviewSize, &vips.ThumbnailImageOptions{Crop: vips.InterestingNone}); err != nil {
+		return avifparams.Stats{}, err
+	}
+	previewBytes, err := preview.JpegsaveBuffer(&vips.JpegsaveBufferOptions{Q: 95})
+	if err != nil {
+		return avifparams.Stats{}, err
+	}
+	return avifparams.StatsFromPreview(previewBytes, img.Width(), img.Height())
+}
+
+func encode(img *vips.Image, options avifparams.Options, reference *image.Gray) (encodeResult, error) {
+	start := time.Now()
+	avifBuffer, err := img.HeifsaveBuffer(&vips.HeifsaveBufferOptions{
+		Q:             options.Quality,
+		Bitdepth:      options.Bitdepth,
+		Effort:        options.Effort,
+		Lossless:      false,
+		SubsampleMode: vips.SubsampleAuto,
+		Compression:   vips.HeifCompressionAv1,
+		Encoder:       vips.HeifEncoderSvt,
+	})
+	duration := time.Since(start)
+	if err != nil {
+		return encodeResult{}, err
+	}
+
+	decoded, err := vips.NewImageFromBuffer(avifBuffer, nil)
+	if err != nil {
+		return encodeResult{}, err
+	}
+	defer decoded.Close()
+
+	candidate, err := grayPreview(decoded)
+	if err != nil {
+		return encodeResult{}, err
+	}
+	ssim, err := avifparams.SSIM(reference, candidate)
+	if err != nil {
+		return encodeResult{}, err
+	}
+
+	return encodeResult{bytes: len(avifBuffer), duration: duration, ssim: ssim}, nil
+}
+
+// grayPreview reduces an image to a lossless grayscale preview used for SSIM comparison.
+func grayPreview(img *vips.Image) (*image.Gray, error) {
+	preview, err := img.Copy(nil)
+	if err != nil {
+		return nil, err
+	}
+	defer preview.Close()
+
+	if err := preview.ThumbnailImage(ssimSize, &vips.ThumbnailImageOptions{Crop: vips.InterestingNone}); err != nil {
+		return nil, err
+	}
+	pngBytes, err := preview.PngsaveBuffer(nil)
+	if err != nil {
+		return nil, err
+	}
+
+	decoded, _, err := image.Decode(bytes.NewReader(pngBytes))
+	if err != nil {
+		return nil, err
+	}
+	return avifparams.ToGray(decoded), nil
+}
@@ -18,6 +18,8 @@ import (
 	"github.com/aws/aws-sdk-go-v2/service/s3"
 	"github.com/aws/aws-sdk-go-v2/service/s3/types"
 	"github.com/cshum/vipsgen/vips"
+
+	"github.com/prism-memory/backend/batch/step-function/image-transcoding/avifparams"
 )
 
 type AvifEncodingOptions struct {
@@ -30,19 +32,45 @@ type TranscodeEvent struct {
 	SourceBucket string              `json:"sourceBucket"`
 	SourceKey    string              `json:"sourceKey"`
 	AvifEncoding AvifEncodingOptions `json:"avifEncoding"`
+	MessageId    string              `json:"messageId,omitempty"`
+}
+
+// TranscodeBatchEvent is a packed job built by sqs-to-batch: several images in one container run.
+// Result is where the per-image results are written: an AWS Batch .sync task only returns
+// DescribeJobs, so check-succeed-batch-job reads a PARTIAL outcome from there.
+type TranscodeBatchEvent struct {
+	Images []TranscodeEvent `json:"images"`
+	Result *ResultLocation  `json:"result,omitempty"`
+}
+
+type ResultLocation struct {
+	Bucket string `json:"bucket"`
+	Key    string `json:"key"`
 }
 
 
 type ConversionResult struct {
-	Status      string `json:"status"`
-	OriginalKey string `json:"originalKey"`
-	NewKey      string `json:"newKey,omitempty"`
-	Message     string `json:"message,omitempty"`
+	Status       string               `json:"status"`
+	OriginalKey  string               `json:"originalKey"`
+	NewKey       string               `json:"newKey,omitempty"`
+	Message      string               `json:"message,omitempty"`
+	MessageId    string               `json:"messageId,omitempty"`
+	AvifEncoding *AvifEncodingOptions `json:"avifEncoding,omitempty"`
+	ParamSource  string               `json:"paramSource,omitempty"`
+}
+
+type BatchConversionResult struct {
+	Status  string             `json:"status"`
+	Results []ConversionResult `json:"results"`
 }
 
 var s3Client *s3.Client
 var destinationBucket string 
 
+// paramSource decides where AVIF options come from: "auto" (image statistics, default)
+// or "event" (the avifEncoding carried in the message, e.g. from the Bedrock analysis).
+var paramSource string
+
 func init() {
 	cfg, err := config.LoadDefaultConfig(context.TODO(),
 		config.WithRegion("ap-northeast-2"),
@@ -58,17 +86,86 @@ func init() {
 		log.Fatal("Error: DESTINATION_BUCKET 환경변수가 설정되어야 합니다.")
 	}
 
+	paramSource = os.Getenv("AVIF_PARAM_SOURCE")
+	if paramSource == "" {
+		paramSource = "auto"
+	}
+
 	vips.Startup(nil)
 	log.Println("S3 client and vips initialized successfully")
 }
 
-func HandleRequest(ctx context.Context, event TranscodeEvent) (ConversionResult, error) {
-	eventBytes, _ := json.Marshal(event)
-	log.Printf("Lambda 핸들러 시작. 입력 데이터: %s", string(eventBytes))
+func HandleRequest(ctx context.Context, payload json.RawMessage) (interface{}, error) {
+	log.Printf("Lambda 핸들러 시작. 입력 데이터: %s", string(payload))
+
+	payload, err := resolveClaimCheck(ctx, payload)
+	if err != nil {
+		return ConversionResult{Status: "FAILED"}, err
+	}
+
+	var batchEvent TranscodeBatchEvent
+	if err := json.Unmarshal(payload, &batchEvent); err == nil && len(batchEvent.Images) > 0 {
+		result, err := processBatch(ctx, batchEvent)
+		if batchEvent.Result != nil {
+			// 결과를 남기지 못하면 부분 성공을 알릴 수 없으므로 작업 전체를 실패로 돌려 재시도하게 함
+			if writeErr := writeBatchResult(ctx, *batchEvent.Result, result); writeErr != nil {
+				return result, fmt.Errorf("failed to write packed job result: %w", writeErr)
+			}
+		}
+		return result, err
+	}
 
+	var event TranscodeEvent
+	if err := json.Unmarshal(payload, &event); err != nil {
+		return ConversionResult{Status: "FAILED"}, fmt.Errorf("failed to parse transcode event: %w", err)
+	}
 	return processImage(ctx, event)
 }
 
+// processBatch transcodes every image of a packed job in order. The job only fails when every
+// image fails; a PARTIAL result carries per-image Results so check-succeed-batch-job can delete
+// the converted images' messages and retry just the failed ones.
+func processBatch(ctx context.Context, batchEvent TranscodeBatchEvent) (BatchConversionResult, error) {
+	results := make([]ConversionResult, 0, len(batchEvent.Images))
+	failed := 0
+
+	for _, event := range batchEvent.Images {
+		result, err := processImage(ctx, event)
+		result.MessageId = event.MessageId
+		if err != nil {
+			failed++
+			result.Message = err.Error()
+			log.Printf("Failed to transcode %s: %v", event.SourceKey, err)
+		}
+		results = append(results, result)
+	}
+
+	log.Printf("Packed job finished: %d images, %d failed", len(batchEvent.Images), failed)
+
+	if failed == len(results) {
+		return BatchConversionResult{Status: "FAILED", Results: results}, fmt.Errorf("all %d images in packed job failed", failed)
+	}
+	if failed > 0 {
+		return BatchConversionResult{Status: "PARTIAL", Results: results}, nil
+	}
+	return BatchConversionResult{Status: "CONVERTED", Results: results}, nil
+}
+
+// writeBatchResult stores a packed job's result as JSON for check-succeed-batch-job.
+func writeBatchResult(ctx context.Context, location ResultLocation, result BatchConversionResult) error {
+	body, err := json.Marshal(result)
+	if err != nil {
+		return err
+	}
+	_, err = s3Client.PutObject(ctx, &s3.PutObjectInput{
+		Bucket:      aws.String(location.Bucket),
+		Key:         aws.String(location.Key),
+		Body:        bytes.NewReader(body),
+		ContentType: aws.String("application/json"),
+	})
+	return err
+}
+
 
 func main() {
 	lambda.Start(HandleRequest)
@@ -112,10 +209,12 @@ func processImage(ctx context.Context, event TranscodeEvent) (ConversionResult,
 	}
 	defer image.Close()
 
+	encoding, source := selectEncoding(image, event.AvifEncoding)
+
 	options := &vips.HeifsaveBufferOptions{
-		Q:             event.AvifEncoding.Quality,
-		Bitdepth:      event.AvifEncoding.Bitdepth,
-		Effort:        event.AvifEncoding.Effort,
+		Q:             encoding.Quality,
+		Bitdepth:      encoding.Bitdepth,
+		Effort:        encoding.Effort,
 		Lossless:      false,
 		SubsampleMode: vips.SubsampleAuto,
 		Compression:   vips.HeifCompressionAv1,
@@ -149,12 +248,54 @@ func processImage(ctx context.Context, event TranscodeEvent) (ConversionResult,
 	}
 
 	return ConversionResult{
-		Status:      "CONVERTED",
-		OriginalKey: decodedSrcKey,
-		NewKey:      newKey,
+		Status:       "CONVERTED",
+		OriginalKey:  decodedSrcKey,
+		NewKey:       newKey,
+		AvifEncoding: &encoding,
+		ParamSource:  source,
 	}, nil
 }
 
+// selectEncoding chooses AVIF options from statistics of a small preview of the decoded image.
+// It falls back to the requested options when they are explicitly preferred or the preview fails.
+func selectEncoding(image *vips.Image, requested AvifEncodingOptions) (AvifEncodingOptions, string) {
+	if paramSource == "event" && requested.Quality > 0 {
+		return requested, "event"
+	}
+
+	stats, err := previewStats(image)
+	if err != nil {
+		log.Printf("Failed to compute image statistics, using requested options: %v", err)
+		if requested.Quality > 0 {
+			return requested, "event"
+		}
+		fallback := avifparams.Select(avifparams.Stats{Width: image.Width(), Height: image.Height()})
+		return AvifEncodingOptions{Quality: fallback.Quality, Effort: fallback.Effort, Bitdepth: fallback.Bitdepth}, "fallback"
+	}
+
+	selected := avifparams.Select(stats)
+	log.Printf("Selected AVIF options %+v from stats %+v (%s)", selected, stats, avifparams.Version)
+	return AvifEncodingOptions{Quality: selected.Quality, Effort: selected.Effort, Bitdepth: selected.Bitdepth}, "auto:" + avifparams.Version
+}
+
+func previewStats(image *vips.Image) (avifparams.Stats, error) {
+	preview, err := image.Copy(nil)
+	if err != nil {
+		return avifparams.Stats{}, fmt.Errorf("failed to copy image for preview: %w", err)
+	}
+	defer preview.Close()
+
+	if err := preview.ThumbnailImage(avifparams.PreviewSize, &vips.ThumbnailImageOptions{Crop: vips.InterestingNone}); err != nil {
+		return avifparams.Stats{}, fmt.Errorf("failed to create preview: %w", err)
+	}
+	previewBytes, err := preview.JpegsaveBuffer(&vips.JpegsaveBufferOptions{Q: 95})
+	if err != nil {
+		return avifparams.Stats{}, fmt.Errorf("failed to encode preview: %w", err)
+	}
+
+	return avifparams.StatsFromPreview(previewBytes, image.Width(), image.Height())
+}
+
 func replaceExtension(key, newExt string) string {
 	ext := filepath.Ext(key)
 	if ext == "" {
@@ -1,27 +1,289 @@
+import copy
+import hashlib
 import json
 import logging
+import os
+import time
+from prism_common import aws_clients, claim_check, ddb_batch, metrics, transcode_status
+from prism_common.lazy_import import lazy_module
 
 
+# 상태 인덱스를 쓰지 않는 경로에서는 botocore를 로드하지 않도록 지연 import
+botocore_exceptions = lazy_module("botocore.exceptions")
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# 변환 완료 여부를 기록하는 상태 인덱스 (SourceKey -> Status, EncodingKey, ConvertedAt)
+TRANSCODE_STATUS_TABLE_NAME = os.environ.get("TRANSCODE_STATUS_TABLE_NAME")
+
+# image-transcoding이 묶음 작업의 이미지별 결과를 남기는 위치. Batch .sync 결과(DescribeJobs)에는
+# 컨테이너의 반환값이 없으므로 check-succeed-batch-job이 여기서 부분 성공을 확인함
+TRANSCODE_RESULT_BUCKET = os.environ.get("TRANSCODE_RESULT_BUCKET") or claim_check.CLAIM_CHECK_BUCKET
+TRANSCODE_RESULT_PREFIX = os.environ.get(
+    "TRANSCODE_RESULT_PREFIX", f"{claim_check.CLAIM_CHECK_PREFIX}transcode-results/"
+)
+
+# 숫자가 작을수록 먼저 처리. 신규 업로드가 백필보다 먼저 AVIF로 변환되도록 함
+PRIORITY_BY_ORIGIN = {"upload": 0, "retry": 5, "backfill": 10}
+DEFAULT_ORIGIN = "upload"
+
+# 하나의 Batch 작업이 목표로 하는 실행 시간(초)과 작업당 최대 이미지 수
+JOB_RUNTIME_BUDGET_SECONDS = float(os.environ.get("JOB_RUNTIME_BUDGET_SECONDS", "600"))
+MAX_IMAGES_PER_JOB = int(os.environ.get("MAX_IMAGES_PER_JOB", "50"))
+
+# 이미지 1장당 고정 비용(S3 GET/PUT, 디코딩 준비)과 메가픽셀당 AVIF 인코딩 비용(초)
+PER_IMAGE_OVERHEAD_SECONDS = 0.5
+SECONDS_PER_MEGAPIXEL_BY_EFFORT = {
+    0: 0.2,
+    1: 0.3,
+    2: 0.4,
+    3: 0.6,
+    4: 0.9,
+    5: 1.3,
+    6: 1.8,
+    7: 2.6,
+    8: 3.6,
+    9: 5.0,
+}
+DEFAULT_EFFORT = 4
+
+# 크기 정보가 없을 때 사용하는 추정치 (JPEG 기준 약 0.35MB/MP)
+BYTES_PER_MEGAPIXEL = 350_000
+DEFAULT_MEGAPIXELS = 12.0
+
+
+def _size_hint(job_info, field):
+    """Reads a size field from the job or from an attached image-dispatcher RoutingDecision."""
+    value = job_info.get(field)
+    if value is None:
+        value = job_info.get("routingDecision", {}).get(field)
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_job_seconds(job_info):
+    width = _size_hint(job_info, "width")
+    height = _size_hint(job_info, "height")
+    file_size = _size_hint(job_info, "fileSize")
+
+    if width and height:
+        megapixels = width * height / 1_000_000
+    elif file_size:
+        megapixels = file_size / BYTES_PER_MEGAPIXEL
+    else:
+        megapixels = DEFAULT_MEGAPIXELS
+
+    try:
+        effort = int(job_info["avifEncoding"].get("effort", DEFAULT_EFFORT))
+    except (TypeError, ValueError):
+        effort = DEFAULT_EFFORT
+    effort = min(max(effort, 0), max(SECONDS_PER_MEGAPIXEL_BY_EFFORT))
+
+    return PER_IMAGE_OVERHEAD_SECONDS + megapixels * SECONDS_PER_MEGAPIXEL_BY_EFFORT[effort]
+
+
+def make_correlation_id(message_handles):
+    """
+    Stable id for a packed job, derived from its SQS message ids.
+    Used as the Batch JobName so check-succeed-batch-job can join results without relying on order.
+    """
+    digest = hashlib.sha1(
+        "\n".join(sorted(handle["Id"] for handle in message_handles)).encode("utf-8")
+    ).hexdigest()
+    return f"transcode-{digest[:20]}"
+
+
+def job_priority(job_info):
+    if "priority" in job_info:
+        try:
+            return int(job_info["priority"])
+        except (TypeError, ValueError):
+            pass
+    origin = job_info.get("origin", DEFAULT_ORIGIN)
+    return PRIORITY_BY_ORIGIN.get(origin, PRIORITY_BY_ORIGIN[DEFAULT_ORIGIN])
+
+
+def deduplicate(entries):
+    """
+    Collapses entries with the same sourceKey + avifEncoding, keeping the newest (by SentTimestamp).
+    The older messages ride along with the survivor so they are deleted once it succeeds.
+    """
+    newest = {}
+    for entry in entries:
+        dedupe_key = (entry["job"]["sourceKey"], entry["encodingKey"])
+        current = newest.get(dedupe_key)
+        if current is None:
+            newest[dedupe_key] = entry
+            continue
+
+        if entry["sentTimestamp"] >= current["sentTimestamp"]:
+            entry, current = current, entry
+            newest[dedupe_key] = current
+        current["duplicates"].append(entry["message"])
+        current["duplicates"].extend(entry["duplicates"])
+        current["priority"] = min(current["priority"], entry["priority"])
+
+    return list(newest.values())
+
+
+def find_already_transcoded(entries):
+    """Returns the entries whose output already exists per the status index, newer than the message."""
+    if not TRANSCODE_STATUS_TABLE_NAME or not entries:
+        return []
+
+    dynamodb_client = aws_clients.get_client("dynamodb")
+
+    source_keys = list({entry["job"]["sourceKey"] for entry in entries})
+    statuses = {}
+
+    for i in range(0, len(source_keys), 100):
+        request = {
+            TRANSCODE_STATUS_TABLE_NAME: {
+                "Keys": [{"SourceKey": {"S": key}} for key in source_keys[i : i + 100]],
+                "ProjectionExpression": "SourceKey, #st, EncodingKey, ConvertedAt",
+                "ExpressionAttributeNames": {"#st": "Status"},
+            }
+        }
+        try:
+            with metrics.phase("ddb_read"):
+                responses, unprocessed = ddb_batch.get(dynamodb_client, request)
+        except botocore_exceptions.ClientError as e:
+            # 상태 인덱스를 읽지 못하면 중복 변환을 감수하고 그대로 진행
+            logger.error(f"변환 상태 인덱스 조회 실패: {e}")
+            return []
+        for item in responses.get(TRANSCODE_STATUS_TABLE_NAME, []):
+            statuses[item["SourceKey"]["S"]] = item
+        if unprocessed:
+            # 조회하지 못한 키는 변환 기록이 없는 것으로 보고 그대로 변환
+            logger.warning(f"변환 상태 인덱스에서 {ddb_batch.count(unprocessed)}개를 조회하지 못했습니다.")
+
+    already_done = []
+    for entry in entries:
+        status = statuses.get(entry["job"]["sourceKey"])
+        if (
+            status
+            and status.get("Status", {}).get("S") == "CONVERTED"
+            and status.get("EncodingKey", {}).get("S") == entry["encodingKey"]
+            and int(status.get("ConvertedAt", {}).get("N", "0")) >= entry["sentTimestamp"]
+        ):
+            already_done.append(entry)
+    return already_done
+
+
+def pack_jobs(entries, start_index=0):
+    """
+    Groups (job_info, messages) entries into multi-image Batch jobs with first-fit decreasing.
+    An image that alone exceeds the budget still gets a job of its own.
+    """
+    estimated = sorted(
+        (
+            (estimate_job_seconds(job_info), job_info, job_messages)
+            for job_info, job_messages in entries
+        ),
+        key=lambda entry: entry[0],
+        reverse=True,
+    )
 
+    bins = []
+    for seconds, job_info, job_messages in estimated:
+        for packed in bins:
+            if (
+                len(packed["images"]) < MAX_IMAGES_PER_JOB
+                and packed["estimatedSeconds"] + seconds <= JOB_RUNTIME_BUDGET_SECONDS
+            ):
+                break
+        else:
+            packed = {"images": [], "messages": [], "estimatedSeconds": 0.0}
+            bins.append(packed)
+
+        packed["images"].append(job_info)
+        packed["messages"].extend(job_messages)
+        packed["estimatedSeconds"] += seconds
+
+    batch_jobs = []
+    for index, packed in enumerate(bins, start=start_index):
+        correlation_id = make_correlation_id(packed["messages"])
+        payload = {"images": packed["images"]}
+        job = {
+            "correlationId": correlation_id,
+            "jobIndex": index,
+            "imageCount": len(packed["images"]),
+            "estimatedSeconds": round(packed["estimatedSeconds"], 1),
+            "images": packed["images"],
+            "messages": packed["messages"],
+        }
+        result = result_location(correlation_id)
+        if result:
+            payload["result"] = job["result"] = result
+        # AWS Batch 파라미터는 문자열만 허용하므로 컨테이너 입력을 JSON 문자열로 함께 전달
+        job["payload"] = json.dumps(payload, ensure_ascii=False)
+        batch_jobs.append(job)
+    return batch_jobs
+
+
+def result_location(correlation_id):
+    """Where image-transcoding writes the per-image results of a packed job, or None."""
+    if not TRANSCODE_RESULT_BUCKET:
+        return None
+    # 같은 메시지 묶음이 다시 들어와도 이전 실행의 결과를 읽지 않도록 시각을 붙임
+    return {
+        "bucket": TRANSCODE_RESULT_BUCKET,
+        "key": f"{TRANSCODE_RESULT_PREFIX}{correlation_id}-{int(time.time() * 1000)}.json",
+    }
+
+
+def offload_large_output(output):
+    """
+    Keeps the state output under the Step Functions payload limit. The message lists are only
+    read by check-succeed-batch-job, so they go to S3 first; if the packed jobs are still too
+    large, each job's images/messages and Batch payload follow. The Map state only needs
+    correlationId and payload to submit a job, and image-transcoding resolves the payload.
+    """
+    output = claim_check.shrink(
+        output,
+        ["successful_jobs", "failed_messages", "messages_to_delete", "skipped_messages"],
+        "sqs-to-batch",
+    )
+    if not claim_check.CLAIM_CHECK_BUCKET or claim_check.encoded_size(output) <= claim_check.THRESHOLD_BYTES:
+        return output
+
+    offloaded_jobs = []
+    for job in output["batch_jobs"]:
+        name = f"sqs-to-batch/{job['correlationId']}"
+        job = claim_check.shrink(job, ["images", "messages"], name, budget=0)
+        job["payload"] = json.dumps(claim_check.offload(json.loads(job["payload"]), f"{name}/payload"))
+        offloaded_jobs.append(job)
+    return {**output, "batch_jobs": offloaded_jobs}
+
+
+@metrics.instrumented
 def lambda_handler(event, context):
+    metrics.log_payload("Received event", event, logger)
 
     messages = event.get("Messages", [])
     if not messages:
         logger.info("처리할 메시지가 없습니다.")
-        return {"successful_jobs": [], "failed_messages": [], "messages_to_delete": []}
+        return {
+            "successful_jobs": [],
+            "batch_jobs": [],
+            "failed_messages": [],
+            "messages_to_delete": [],
+            "skipped_messages": [],
+        }
 
     logger.info(f"총 {len(messages)}개의 메시지 처리를 시작합니다.")
 
-    successful_jobs = []
     failed_messages = []
     messages_to_delete = []
+    entries = []
 
     for message in messages:
         message_id = message.get("MessageId", "N/A")
         receipt_handle = message.get("ReceiptHandle", "N/A")
+        attributes = message.get("Attributes", {})
 
         try:
 
@@ -33,42 +295,98 @@ def lambda_handler(event, context):
 
             job_info = body_data.get("MessageBody", body_data)
 
-            if (
-                not isinstance(job_info, dict)
-                or "sourceKey" not in job_info
-                or "avifEncoding" not in job_info
-            ):
-                raise ValueError(
-                    "'sourceKey' 또는 'avifEncoding' 필드가 누락되었습니다."
-                )
-
-            encoding_dict = job_info["avifEncoding"]
+            if not isinstance(job_info, dict) or "sourceKey" not in job_info:
+                raise ValueError("'sourceKey' 필드가 누락되었습니다.")
 
-            job_info["avifEncoding"] = {
-                key: str(value) for key, value in encoding_dict.items()
-            }
+            # avifEncoding이 없으면 image-transcoding이 이미지 통계로 파라미터를 선택함
+            if not isinstance(job_info.get("avifEncoding"), dict):
+                job_info["avifEncoding"] = {"mode": "auto"}
 
-            successful_jobs.append(job_info)
+            job_info["messageId"] = message_id
 
+            entries.append(
+                {
+                    "job": job_info,
+                    "encodingKey": transcode_status.encoding_key(job_info["avifEncoding"]),
+                    "priority": job_priority(job_info),
+                    "sentTimestamp": int(attributes.get("SentTimestamp", 0)),
+                    "message": {
+                        "Id": message_id,
+                        "ReceiptHandle": receipt_handle,
+                        "ReceiveCount": int(attributes.get("ApproximateReceiveCount", 1)),
+                    },
+                    "duplicates": [],
+                }
+            )
             messages_to_delete.append(
                 {"Id": message_id, "ReceiptHandle": receipt_handle}
             )
 
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
+        except (json.JSONDecodeError, ValueError, KeyError, AttributeError) as e:
 
             logger.error(f"메시지(ID: {message_id}) 처리 중 오류 발생: {e}")
             failed_messages.append(
                 {
                     "message_id": message_id,
                     "error": str(e),
-                    "original_message_body": message.get("body"),
+                    "original_message_body": message.get("Body"),
                 }
             )
 
-    logger.info(f"성공: {len(successful_jobs)}개, 실패: {len(failed_messages)}개")
+    unique_entries = deduplicate(entries)
+    already_done = find_already_transcoded(unique_entries)
+    done_ids = {entry["message"]["Id"] for entry in already_done}
 
-    return {
-        "successful_jobs": successful_jobs,
-        "failed_messages": failed_messages,
-        "messages_to_delete": messages_to_delete,
-    }
+    # 이미 변환된 이미지의 메시지(중복 포함)는 Batch 없이 바로 삭제 대상
+    skipped_messages = []
+    for entry in already_done:
+        for message in [entry["message"], *entry["duplicates"]]:
+            skipped_messages.append(
+                {"Id": message["Id"], "ReceiptHandle": message["ReceiptHandle"]}
+            )
+
+    to_transcode = sorted(
+        (entry for entry in unique_entries if entry["message"]["Id"] not in done_ids),
+        key=lambda entry: (entry["priority"], -entry["sentTimestamp"]),
+    )
+
+    successful_jobs = []
+    entries_by_priority = {}
+    for entry in to_transcode:
+        job_info = entry["job"]
+        if entry["duplicates"]:
+            job_info["duplicateMessageIds"] = [m["Id"] for m in entry["duplicates"]]
+        packed_info = copy.deepcopy(job_info)
+
+        job_info["avifEncoding"] = {
+            key: str(value) for key, value in job_info["avifEncoding"].items()
+        }
+        successful_jobs.append(job_info)
+
+        entries_by_priority.setdefault(entry["priority"], []).append(
+            (packed_info, [entry["message"], *entry["duplicates"]])
+        )
+
+    # 우선순위가 다른 작업은 같은 Batch 작업에 섞지 않음
+    batch_jobs = []
+    for priority in sorted(entries_by_priority):
+        packed = pack_jobs(entries_by_priority[priority], start_index=len(batch_jobs))
+        for job in packed:
+            job["priority"] = priority
+        batch_jobs.extend(packed)
+
+    logger.info(
+        f"성공: {len(entries)}개, 실패: {len(failed_messages)}개, "
+        f"중복 제거: {len(entries) - len(unique_entries)}개, 변환 완료로 건너뜀: {len(already_done)}개, "
+        f"Batch 작업: {len(batch_jobs)}개로 묶음"
+    )
+
+    return offload_large_output(
+        {
+            "successful_jobs": successful_jobs,
+            "batch_jobs": batch_jobs,
+            "failed_messages": failed_messages,
+            "messages_to_delete": messages_to_delete,
+            "skipped_messages": skipped_messages,
+        }
+    )
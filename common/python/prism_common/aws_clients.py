@@ -0,0 +1,157 @@
+"""
+Lazily created, cached AWS clients shared by every Python Lambda.
+
+Clients are created from a shared botocore session, so boto3 (~50 ms of extra import at
+cold start) is only loaded by functions that use the resource API. Nothing is imported until
+the first client is requested. Each service gets a bounded retry/timeout profile instead of
+open-ended adaptive retries.
+"""
+
+import os
+import threading
+
+# 동시 처리 경로(ThreadPoolExecutor 등)에서 커넥션 풀이 병목이 되지 않도록 기본값보다 크게 설정
+MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "32"))
+
+DEFAULT_PROFILE = {
+    "connect_timeout": 2,
+    "read_timeout": 10,
+    "retries": {"max_attempts": 3, "mode": "standard"},
+}
+
+SERVICE_PROFILES = {
+    "s3": {
+        "connect_timeout": 2,
+        "read_timeout": 30,
+        "retries": {"max_attempts": 4, "mode": "standard"},
+    },
+    "dynamodb": {
+        "connect_timeout": 1,
+        "read_timeout": 5,
+        "retries": {"max_attempts": 5, "mode": "standard"},
+    },
+    "ssm": {
+        "connect_timeout": 1,
+        "read_timeout": 5,
+        "retries": {"max_attempts": 3, "mode": "standard"},
+    },
+    "rekognition": {
+        "connect_timeout": 2,
+        "read_timeout": 15,
+        "retries": {"max_attempts": 3, "mode": "standard"},
+    },
+    # 모델 응답은 수십 초가 걸릴 수 있으므로 read_timeout은 길게 유지.
+    # 제한(ThrottlingException)은 bedrock_governor가 BedrockDeferred로 바꿔 Step Functions에 맡기므로
+    # SDK가 예산 밖에서 다시 호출하지 않도록 재시도하지 않음 (botocore의 max_attempts는 재시도 횟수라서
+    # 첫 호출을 포함한 total_max_attempts로 지정)
+    "bedrock-runtime": {
+        "connect_timeout": 2,
+        "read_timeout": 60,
+        "retries": {"total_max_attempts": 1, "mode": "standard"},
+    },
+    # 동기 호출(tools/backfill)은 함수 실행 시간만큼 응답을 기다림
+    "lambda": {
+        "connect_timeout": 2,
+        "read_timeout": 900,
+        "retries": {"max_attempts": 3, "mode": "standard"},
+    },
+}
+
+SERVICE_REGIONS = {
+    "bedrock-runtime": os.environ.get("BEDROCK_REGION", "ap-northeast-2"),
+}
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+_tables = {}
+_overrides = {}
+
+
+def _config(service_name):
+    from botocore.config import Config
+
+    profile = SERVICE_PROFILES.get(service_name, DEFAULT_PROFILE)
+    return Config(max_pool_connections=MAX_POOL_CONNECTIONS, **profile)
+
+
+def _botocore_session():
+    global _session
+    if _session is None:
+        import botocore.session
+
+        from prism_common import metrics
+
+        session = botocore.session.get_session()
+        metrics.register_botocore_hooks(session)
+        _session = session
+    return _session
+
+
+def get_client(service_name):
+    if service_name in _overrides:
+        return _overrides[service_name]
+
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+
+    with _lock:
+        if service_name not in _clients:
+            _clients[service_name] = _botocore_session().create_client(
+                service_name,
+                region_name=SERVICE_REGIONS.get(service_name),
+                config=_config(service_name),
+            )
+        return _clients[service_name]
+
+
+def get_resource(service_name):
+    if service_name in _overrides:
+        return _overrides[service_name]
+
+    resource = _resources.get(service_name)
+    if resource is not None:
+        return resource
+
+    with _lock:
+        if service_name not in _resources:
+            import boto3.session
+
+            session = boto3.session.Session(botocore_session=_botocore_session())
+            _resources[service_name] = session.resource(
+                service_name,
+                region_name=SERVICE_REGIONS.get(service_name),
+                config=_config(service_name),
+            )
+        return _resources[service_name]
+
+
+def get_table(table_name):
+    table = _tables.get(table_name)
+    if table is None:
+        table = get_resource("dynamodb").Table(table_name)
+        _tables[table_name] = table
+    return table
+
+
+def get_credentials():
+    """Frozen credentials of the shared session (refreshed by botocore when close to expiry)."""
+    credentials = _botocore_session().get_credentials()
+    return credentials.get_frozen_credentials() if credentials is not None else None
+
+
+def override(service_name, client):
+    """Replaces a service's client/resource, e.g. with an in-process stand-in for local runs."""
+    with _lock:
+        _overrides[service_name] = client
+        _tables.clear()
+
+
+def reset():
+    with _lock:
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
+        _overrides.clear()
@@ -0,0 +1,316 @@
+"""
+Shared Bedrock rate and token budget for every Lambda that calls invoke_model.
+
+Each model has a token bucket with two levels, requests and tokens, refilled continuously at
+BEDROCK_RPM / BEDROCK_TPM per minute and capped at one minute's worth. A call reserves one
+request and its estimated tokens (input estimate + maxTokens, which is how Bedrock counts
+against the quota) before invoking, and the difference to the reported usage is refunded
+afterwards with the same conditional write, so a refund cannot be lost to a concurrent
+reservation.
+
+Priorities:
+
+- INTERACTIVE (image tagging a user is waiting for) may use the whole bucket and waits up to
+  BEDROCK_INTERACTIVE_MAX_WAIT_SECONDS for it to refill.
+- BACKGROUND (album re-sorts) must leave BEDROCK_BACKGROUND_RESERVE of the bucket to
+  interactive calls and waits at most BEDROCK_BACKGROUND_MAX_WAIT_SECONDS.
+
+A caller never polls: the wait is computed from the refill rate and slept once. When it is
+longer than allowed, `BedrockDeferred` is raised so the state machine retries the task later
+(Retry on "BedrockDeferred" with backoff) instead of the Lambda burning its time on throttled
+retries. A ThrottlingException from Bedrock empties the bucket for everyone and is also
+raised as `BedrockDeferred`.
+
+The bucket is an item of BEDROCK_GOVERNOR_TABLE_NAME (BucketID = model id) updated with an
+optimistic condition on UpdatedAt; a caller that loses the race backs off with jitter before
+reading the bucket again. Without the table, a per-process MemoryStore is used; tests and the
+local pipeline use it as the stand-in. bedrock-runtime clients do not retry (see aws_clients),
+so every model call passes through the budget exactly once.
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from decimal import Decimal
+
+from prism_common import aws_clients, metrics
+from prism_common.lazy_import import lazy_module
+
+botocore_exceptions = lazy_module("botocore.exceptions")
+
+GOVERNOR_TABLE_NAME = os.environ.get("BEDROCK_GOVERNOR_TABLE_NAME")
+REQUESTS_PER_MINUTE = float(os.environ.get("BEDROCK_RPM", "200"))
+TOKENS_PER_MINUTE = float(os.environ.get("BEDROCK_TPM", "400000"))
+BACKGROUND_RESERVE = float(os.environ.get("BEDROCK_BACKGROUND_RESERVE", "0.25"))
+INTERACTIVE_MAX_WAIT_SECONDS = float(os.environ.get("BEDROCK_INTERACTIVE_MAX_WAIT_SECONDS", "5"))
+BACKGROUND_MAX_WAIT_SECONDS = float(os.environ.get("BEDROCK_BACKGROUND_MAX_WAIT_SECONDS", "1"))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Nova 기준 근사치: 텍스트는 UTF-8 4바이트당 1토큰(한글은 대략 글자당 1토큰), 이미지는 750픽셀당 1토큰
+BYTES_PER_TOKEN = 4
+PIXELS_PER_IMAGE_TOKEN = 750
+MAX_IMAGE_TOKENS = 1600
+
+# 동시에 같은 버킷을 갱신하는 호출이 많을 때 조건부 쓰기를 다시 시도하는 횟수와 그 사이 대기
+_MAX_CONFLICTS = 8
+CONFLICT_BASE_DELAY_SECONDS = 0.01
+CONFLICT_MAX_DELAY_SECONDS = 0.2
+
+
+class BedrockDeferred(Exception):
+    """The budget is exhausted; retry the task after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def conflict_delay(attempt):
+    """Full-jitter delay after losing the bucket update `attempt` times in a row (1-based)."""
+    return random.uniform(0, min(CONFLICT_MAX_DELAY_SECONDS, CONFLICT_BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+
+
+def estimate_tokens(request, image_sizes=()):
+    """Input estimate plus maxTokens for a messages-v1 request; image_sizes are (width, height)."""
+    text_bytes = 0
+    images = 0
+    for message in request.get("messages", []):
+        for part in message.get("content", []):
+            if "text" in part:
+                text_bytes += len(part["text"].encode("utf-8"))
+            if "image" in part:
+                images += 1
+    for part in request.get("system", []):
+        text_bytes += len(part.get("text", "").encode("utf-8"))
+
+    image_tokens = sum(
+        min(width * height // PIXELS_PER_IMAGE_TOKEN, MAX_IMAGE_TOKENS) for width, height in image_sizes
+    )
+    image_tokens += MAX_IMAGE_TOKENS * max(images - len(image_sizes), 0)
+    max_tokens = request.get("inferenceConfig", {}).get("maxTokens", 0)
+    return text_bytes // BYTES_PER_TOKEN + image_tokens + max_tokens
+
+
+class MemoryStore:
+    """In-process bucket storage with the same compare-and-set contract as DynamoDBStore."""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def load(self, bucket_id):
+        with self._lock:
+            item = self._items.get(bucket_id)
+            return dict(item) if item else None
+
+    def save(self, bucket_id, state, expected_updated_at):
+        with self._lock:
+            current = self._items.get(bucket_id)
+            if (current["UpdatedAt"] if current else None) != expected_updated_at:
+                return False
+            self._items[bucket_id] = dict(state)
+            return True
+
+
+class DynamoDBStore:
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    def load(self, bucket_id):
+        with metrics.phase("bedrock_governor"):
+            response = aws_clients.get_table(self.table_name).get_item(
+                Key={"BucketID": bucket_id}, ConsistentRead=True
+            )
+        item = response.get("Item")
+        if not item:
+            return None
+        return {
+            "Requests": float(item["Requests"]),
+            "Tokens": float(item["Tokens"]),
+            "UpdatedAt": int(item["UpdatedAt"]),
+        }
+
+    def save(self, bucket_id, state, expected_updated_at):
+        item = {
+            "BucketID": bucket_id,
+            "Requests": Decimal(str(round(state["Requests"], 3))),
+            "Tokens": Decimal(str(round(state["Tokens"], 1))),
+            "UpdatedAt": state["UpdatedAt"],
+        }
+        if expected_updated_at is None:
+            condition = {"ConditionExpression": "attribute_not_exists(BucketID)"}
+        else:
+            condition = {
+                "ConditionExpression": "UpdatedAt = :expected",
+                "ExpressionAttributeValues": {":expected": expected_updated_at},
+            }
+        try:
+            with metrics.phase("bedrock_governor"):
+                aws_clients.get_table(self.table_name).put_item(Item=item, **condition)
+            return True
+        except botocore_exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+
+class Governor:
+    def __init__(
+        self,
+        store,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        self.store = store
+        self.capacity = {"Requests": requests_per_minute, "Tokens": tokens_per_minute}
+        self.clock = clock
+        self.sleep = sleep
+
+    def _refilled(self, state, now_ms):
+        if state is None:
+            return dict(self.capacity)
+        elapsed = max(now_ms - state["UpdatedAt"], 0) / 60000
+        return {
+            level: min(self.capacity[level], state[level] + self.capacity[level] * elapsed)
+            for level in self.capacity
+        }
+
+    def _try_acquire(self, bucket_id, cost, priority):
+        """Reserves `cost` and returns 0, or returns the seconds until it could be reserved."""
+        for attempt in range(1, _MAX_CONFLICTS + 1):
+            state = self.store.load(bucket_id)
+            now_ms = int(self.clock() * 1000)
+            # 같은 밀리초에 두 번 쓰면 UpdatedAt 조건이 구분하지 못하므로 항상 증가시킴
+            if state is not None and now_ms <= state["UpdatedAt"]:
+                now_ms = state["UpdatedAt"] + 1
+            levels = self._refilled(state, now_ms)
+
+            floor = BACKGROUND_RESERVE if priority == BACKGROUND else 0.0
+            wait = 0.0
+            for level, amount in cost.items():
+                needed = amount + self.capacity[level] * floor - levels[level]
+                if needed > 0:
+                    if amount + self.capacity[level] * floor > self.capacity[level]:
+                        raise ValueError(f"요청 하나가 Bedrock {level} 한도보다 큽니다: {amount}")
+                    wait = max(wait, needed / self.capacity[level] * 60)
+            if wait > 0:
+                # 버킷 시각은 밀리초 단위이므로 그보다 짧게 기다리면 같은 상태를 다시 읽음
+                return math.ceil(wait * 1000) / 1000
+
+            remaining = {level: levels[level] - cost[level] for level in cost}
+            expected = state["UpdatedAt"] if state else None
+            if self.store.save(bucket_id, {**remaining, "UpdatedAt": now_ms}, expected):
+                return 0.0
+            # 모두 같은 순간에 다시 읽으면 또 충돌하므로 흩어서 재시도
+            if attempt < _MAX_CONFLICTS:
+                self.sleep(conflict_delay(attempt))
+        # 경합이 계속되면 acquire가 대기 시간으로 세도록 돌려줌
+        return conflict_delay(_MAX_CONFLICTS)
+
+    def acquire(self, bucket_id, estimated_tokens, priority=INTERACTIVE):
+        cost = {"Requests": 1.0, "Tokens": float(estimated_tokens)}
+        max_wait = INTERACTIVE_MAX_WAIT_SECONDS if priority == INTERACTIVE else BACKGROUND_MAX_WAIT_SECONDS
+        waited = 0.0
+        with metrics.phase("bedrock_wait"):
+            while True:
+                wait = self._try_acquire(bucket_id, cost, priority)
+                if wait == 0:
+                    return waited
+                if waited + wait > max_wait:
+                    metrics.set_property("bedrockDeferred", priority)
+                    raise BedrockDeferred(
+                        f"Bedrock 예산 부족으로 {priority} 호출을 미룹니다 ({wait:.1f}초 필요)", retry_after=wait
+                    )
+                # 필요한 만큼 한 번에 기다림 (계산된 시간 뒤에는 보통 바로 예약됨)
+                self.sleep(wait)
+                waited += wait
+
+    def _update(self, bucket_id, change):
+        """
+        Read-modify-write of the bucket under the UpdatedAt condition. `change(state, now_ms)`
+        returns the new levels, or None to leave the bucket as it is. False if every attempt lost.
+        """
+        for attempt in range(1, _MAX_CONFLICTS + 1):
+            state = self.store.load(bucket_id)
+            expected = state["UpdatedAt"] if state else None
+            now_ms = max(int(self.clock() * 1000), (expected or 0) + 1)
+            levels = change(state, now_ms)
+            if levels is None or self.store.save(bucket_id, {**levels, "UpdatedAt": now_ms}, expected):
+                return True
+            if attempt < _MAX_CONFLICTS:
+                self.sleep(conflict_delay(attempt))
+        return False
+
+    def settle(self, bucket_id, estimated_tokens, actual_tokens):
+        """Refunds the unused estimate, or charges usage above it."""
+        delta = estimated_tokens - actual_tokens
+        if not delta:
+            return
+
+        def refund(state, now_ms):
+            if state is None:
+                return None
+            levels = self._refilled(state, now_ms)
+            levels["Tokens"] = min(self.capacity["Tokens"], levels["Tokens"] + delta)
+            return levels
+
+        if not self._update(bucket_id, refund):
+            print(f"경고: 경합이 계속되어 Bedrock 버킷 '{bucket_id}'의 토큰 {delta:+.0f}개를 정산하지 못했습니다.")
+
+    def throttled(self, bucket_id):
+        """Bedrock throttled anyway (other accounts' traffic, quota change): empty the bucket."""
+        self._update(bucket_id, lambda state, now_ms: {"Requests": 0.0, "Tokens": 0.0})
+
+    def invoke_model(self, model_id, request, priority=INTERACTIVE, image_sizes=(), estimated_tokens=None):
+        """
+        invoke_model under the budget; returns the parsed response body. Requests that are not
+        messages-v1 (e.g. Titan embeddings) pass their own `estimated_tokens`.
+        """
+        estimated = estimate_tokens(request, image_sizes) if estimated_tokens is None else estimated_tokens
+        self.acquire(model_id, estimated, priority)
+        try:
+            with metrics.phase("bedrock_invoke"):
+                response = aws_clients.get_client("bedrock-runtime").invoke_model(
+                    modelId=model_id, body=json.dumps(request)
+                )
+                model_response = json.loads(response["body"].read())
+        except botocore_exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ThrottlingException":
+                self.throttled(model_id)
+                raise BedrockDeferred(f"Bedrock이 {model_id} 호출을 제한했습니다.", retry_after=60)
+            # 실패한 호출은 토큰을 쓰지 않았으므로 요청 하나만 쓴 것으로 정산
+            self.settle(model_id, estimated, 0)
+            raise
+
+        usage = model_response.get("usage", {})
+        # Titan 임베딩은 usage 대신 inputTextTokenCount로 사용량을 알려줌
+        actual = usage.get("inputTokens", 0) + usage.get("outputTokens", 0) or model_response.get(
+            "inputTextTokenCount", 0
+        )
+        self.settle(model_id, estimated, actual or estimated)
+        return model_response
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                if GOVERNOR_TABLE_NAME:
+                    store = DynamoDBStore(GOVERNOR_TABLE_NAME)
+                else:
+                    print("경고: BEDROCK_GOVERNOR_TABLE_NAME이 없어 프로세스 안에서만 Bedrock 호출을 제한합니다.")
+                    store = MemoryStore()
+                _governor = Governor(store)
+    return _governor
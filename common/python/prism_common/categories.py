@@ -0,0 +1,213 @@
+"""
+Album categories stored as one item per (user, category).
+
+album-list-analyzer used to store the whole categorization as a `SortedData` map on the user's
+stats item, which grew toward the 400 KB item limit and made every stats read and write pay for
+it. Each category is now an item of DYNAMODB_CATEGORY_TABLE_NAME:
+
+    UserID, CategoryID, CategoryName, Description, ImageKeys (list), ImageCount, Version, UpdatedAt
+
+`plan` compares a sort result with the stored items, so only categories whose name, description
+or keys changed are written. `Version` increases with every write and is used as the write
+condition, so two sorts of the same user cannot overwrite each other's categories unnoticed.
+
+`write` applies a plan of up to MAX_TRANSACTION_ITEMS changes as one transaction, so a conflict
+leaves every category as it was. A larger plan needs several transactions; when a later one
+conflicts, the earlier ones are already committed and `write` raises `PartialWrite`. `save`
+then rolls forward: it re-reads the categories and writes a new plan for the same result, in
+which the committed changes are no-ops.
+"""
+
+import hashlib
+import os
+
+from prism_common import aws_clients, ddb_codec, metrics
+from prism_common.lazy_import import lazy_module
+
+botocore_exceptions = lazy_module("botocore.exceptions")
+
+CATEGORY_TABLE_NAME = os.environ.get("DYNAMODB_CATEGORY_TABLE_NAME")
+
+# 목록 조회(listCategories)에서 키 목록 없이 읽을 속성
+SUMMARY_ATTRIBUTES = ("CategoryID", "CategoryName", "Description", "ImageCount", "Version", "UpdatedAt")
+
+# TransactWriteItems 한 번에 넣을 수 있는 최대 작업 수
+MAX_TRANSACTION_ITEMS = 100
+
+# 쓰기 충돌로 보는 오류: 버전 조건 실패, 또는 같은 아이템을 건드린 다른 트랜잭션과의 충돌
+CONFLICT_ERRORS = {"ConditionalCheckFailedException", "TransactionCanceledException"}
+
+# 여러 트랜잭션에 걸친 쓰기가 중간에 충돌했을 때 다시 계획해서 이어 쓰는 횟수
+MAX_RESUME_ATTEMPTS = 3
+
+
+class PartialWrite(Exception):
+    """A plan larger than one transaction conflicted after `applied` changes were committed."""
+
+    def __init__(self, applied, error):
+        super().__init__(f"카테고리 {applied}개를 쓴 뒤 충돌했습니다: {error}")
+        self.applied = applied
+        self.error = error
+
+
+def category_id(name):
+    """Stable id of a category name; whitespace and case differences map to the same id."""
+    normalized = " ".join(name.split()).casefold()
+    return "cat-" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def load(table, user_id):
+    """All category items of a user."""
+    items = []
+    kwargs = {
+        "KeyConditionExpression": "UserID = :uid",
+        "ExpressionAttributeValues": {":uid": user_id},
+    }
+    with metrics.phase("ddb_query"):
+        while True:
+            response = table.query(**kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return items
+
+
+def to_sort_data(items):
+    """The `{"categories": [...]}` structure the sort prompt and the legacy SortedData use."""
+    return {
+        "categories": [
+            {
+                "categoryName": item["CategoryName"],
+                "description": item.get("Description", ""),
+                "imageKeys": list(item.get("ImageKeys", [])),
+            }
+            for item in sorted(items, key=lambda item: item["CategoryName"])
+        ]
+    }
+
+
+def _merged(sorted_result):
+    # 모델이 같은 이름의 카테고리를 두 번 돌려주는 경우가 있어 키를 합침
+    merged = {}
+    for category in sorted_result.get("categories", []):
+        name = (category.get("categoryName") or "").strip()
+        if not name:
+            continue
+        entry = merged.setdefault(
+            category_id(name), {"name": name, "description": category.get("description", ""), "keys": {}}
+        )
+        for key in category.get("imageKeys", []):
+            entry["keys"].setdefault(key, None)
+    return merged
+
+
+def plan(user_id, existing_items, sorted_result, updated_at):
+    """
+    Returns (puts, deletes) for bringing the stored categories to `sorted_result`.
+
+    puts: [(item, expected_version)], expected_version is None for a new category.
+    deletes: [(key, expected_version)] for categories the result no longer contains.
+    Keys already in a category keep their order and new keys are appended, so a re-sort does
+    not reshuffle a category a client is reading.
+    """
+    existing = {item["CategoryID"]: item for item in existing_items}
+    merged = _merged(sorted_result)
+    puts = []
+
+    for cid, entry in merged.items():
+        current = existing.get(cid)
+        keys = entry["keys"]
+        if current:
+            old_keys = list(current.get("ImageKeys", []))
+            kept_keys = [key for key in old_keys if key in keys]
+            seen = set(kept_keys)
+            image_keys = kept_keys + [key for key in keys if key not in seen]
+            if (
+                image_keys == old_keys
+                and entry["name"] == current["CategoryName"]
+                and entry["description"] == current.get("Description", "")
+            ):
+                continue
+            expected_version = int(current["Version"])
+        else:
+            image_keys = list(keys)
+            expected_version = None
+
+        puts.append(
+            (
+                {
+                    "UserID": user_id,
+                    "CategoryID": cid,
+                    "CategoryName": entry["name"],
+                    "Description": entry["description"],
+                    "ImageKeys": image_keys,
+                    "ImageCount": len(image_keys),
+                    "Version": (expected_version or 0) + 1,
+                    "UpdatedAt": updated_at,
+                },
+                expected_version,
+            )
+        )
+
+    deletes = [
+        ({"UserID": user_id, "CategoryID": cid}, int(item["Version"]))
+        for cid, item in existing.items()
+        if cid not in merged
+    ]
+    return puts, deletes
+
+
+def _version_condition(expected_version):
+    if expected_version is None:
+        return {"ConditionExpression": "attribute_not_exists(CategoryID)"}
+    return {
+        "ConditionExpression": "Version = :expected",
+        "ExpressionAttributeValues": {":expected": ddb_codec.encode_value(expected_version)},
+    }
+
+
+def write(table_name, puts, deletes):
+    """
+    Applies a plan with a version condition on every category in TransactWriteItems, so a
+    concurrent change cancels the write (TransactionCanceledException, see CONFLICT_ERRORS).
+    A plan of more than MAX_TRANSACTION_ITEMS changes is split into several transactions, and a
+    conflict after the first one raises PartialWrite.
+    """
+    actions = [
+        {"Put": {"TableName": table_name, "Item": ddb_codec.encode_value(item)["M"], **_version_condition(expected)}}
+        for item, expected in puts
+    ]
+    actions.extend(
+        {"Delete": {"TableName": table_name, "Key": ddb_codec.encode_value(key)["M"], **_version_condition(expected)}}
+        for key, expected in deletes
+    )
+
+    dynamodb_client = aws_clients.get_client("dynamodb")
+    with metrics.phase("ddb_write"):
+        for start in range(0, len(actions), MAX_TRANSACTION_ITEMS):
+            try:
+                dynamodb_client.transact_write_items(TransactItems=actions[start : start + MAX_TRANSACTION_ITEMS])
+            except botocore_exceptions.ClientError as e:
+                if start and e.response["Error"]["Code"] in CONFLICT_ERRORS:
+                    raise PartialWrite(start, e) from e
+                raise
+
+
+def save(table, table_name, user_id, existing_items, sorted_result, updated_at):
+    """
+    Plans and writes `sorted_result`, rolling forward after a PartialWrite. Returns the
+    (existing_items, puts, deletes) of the plan that completed. A conflict before anything was
+    committed raises the ClientError unchanged.
+    """
+    for attempt in range(MAX_RESUME_ATTEMPTS):
+        puts, deletes = plan(user_id, existing_items, sorted_result, updated_at)
+        try:
+            write(table_name, puts, deletes)
+            return existing_items, puts, deletes
+        except PartialWrite as e:
+            # 앞선 트랜잭션은 이미 저장되었으므로 되돌리지 않고, 저장된 상태에 맞춰 나머지를 다시 계획
+            if attempt == MAX_RESUME_ATTEMPTS - 1:
+                raise
+            print(f"경고: 사용자 '{user_id}'의 카테고리 쓰기가 중간에 충돌해 이어서 씁니다. ({e.applied}개 저장됨)")
+            existing_items = load(table, user_id)
@@ -0,0 +1,131 @@
+"""
+Claim-check references for Step Functions state payloads.
+
+State input and output are limited to 256 KiB. `shrink` stores the largest listed fields of a
+payload gzip-compressed in CLAIM_CHECK_BUCKET until the payload fits CLAIM_CHECK_THRESHOLD_BYTES,
+and puts a small reference in their place:
+
+    {"$claimCheck": {"bucket": "...", "key": "claim-check/<name>/<sha256>.json.gz", "bytes": 81234}}
+
+Handlers call `resolve` where they use a value, so a field a handler only passes along or does
+not need on its path is never downloaded. Keys are content hashes: a retried Lambda rewrites the
+same object, and a lifecycle rule on CLAIM_CHECK_PREFIX expires them. Without CLAIM_CHECK_BUCKET
+nothing is offloaded and references are still resolved.
+"""
+
+import decimal
+import hashlib
+import json
+import os
+import threading
+
+from prism_common import aws_clients, metrics
+from prism_common.lazy_import import lazy_module
+
+gzip = lazy_module("gzip")
+
+CLAIM_CHECK_BUCKET = os.environ.get("CLAIM_CHECK_BUCKET")
+CLAIM_CHECK_PREFIX = os.environ.get("CLAIM_CHECK_PREFIX", "claim-check/")
+# 한 상태의 입력에는 이전 상태 출력 외의 필드도 붙으므로 256KB보다 충분히 작게 유지
+THRESHOLD_BYTES = int(os.environ.get("CLAIM_CHECK_THRESHOLD_BYTES", str(96 * 1024)))
+
+REFERENCE_FIELD = "$claimCheck"
+
+# 참조 자체가 150바이트 정도이므로 이보다 작은 값은 옮겨도 이득이 없음
+MIN_OFFLOAD_BYTES = 1024
+
+# 같은 컨테이너에서 같은 참조를 다시 풀 때 S3를 다시 읽지 않도록 압축 해제된 본문을 보관
+_CACHE_ENTRIES = 8
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _default(value):
+    # DynamoDB resource API가 돌려주는 Decimal/set (Lambda 런타임의 직렬화와 같은 규칙)
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def encoded_size(value):
+    return len(_encode(value))
+
+
+def is_reference(value):
+    return isinstance(value, dict) and len(value) == 1 and REFERENCE_FIELD in value
+
+
+def offload(value, name):
+    """Stores `value` and returns its reference. `name` becomes part of the key (e.g. the stage)."""
+    if not CLAIM_CHECK_BUCKET:
+        raise ValueError("CLAIM_CHECK_BUCKET 환경 변수가 설정되지 않았습니다.")
+
+    body = _encode(value)
+    key = f"{CLAIM_CHECK_PREFIX}{name}/{hashlib.sha256(body).hexdigest()}.json.gz"
+    with metrics.phase("claim_check_put"):
+        aws_clients.get_client("s3").put_object(
+            Bucket=CLAIM_CHECK_BUCKET,
+            Key=key,
+            Body=gzip.compress(body, compresslevel=6),
+            ContentType="application/json",
+            ContentEncoding="gzip",
+        )
+    return {REFERENCE_FIELD: {"bucket": CLAIM_CHECK_BUCKET, "key": key, "bytes": len(body)}}
+
+
+def shrink(payload, fields, name, budget=None):
+    """
+    Copy of the dict `payload` in which the largest of `fields` are offloaded, one at a time,
+    until the encoded payload is at most `budget` bytes. Returns `payload` itself when it fits.
+    """
+    budget = THRESHOLD_BYTES if budget is None else budget
+    if not CLAIM_CHECK_BUCKET:
+        return payload
+
+    total = encoded_size(payload)
+    if total <= budget:
+        return payload
+
+    result = dict(payload)
+    candidates = sorted(
+        (
+            (encoded_size(result[field]), field)
+            for field in fields
+            if field in result and not is_reference(result[field])
+        ),
+        reverse=True,
+    )
+    for size, field in candidates:
+        if total <= budget or size < MIN_OFFLOAD_BYTES:
+            break
+        result[field] = offload(result[field], f"{name}/{field}")
+        total -= size - encoded_size(result[field])
+    return result
+
+
+def resolve(value):
+    """The stored value for a reference; any other value is returned unchanged."""
+    if not is_reference(value):
+        return value
+
+    reference = value[REFERENCE_FIELD]
+    with _cache_lock:
+        body = _cache.get(reference["key"])
+
+    if body is None:
+        with metrics.phase("claim_check_get"):
+            response = aws_clients.get_client("s3").get_object(Bucket=reference["bucket"], Key=reference["key"])
+            body = gzip.decompress(response["Body"].read())
+        with _cache_lock:
+            if len(_cache) >= _CACHE_ENTRIES:
+                _cache.pop(next(iter(_cache)))
+            _cache[reference["key"]] = body
+
+    # 호출자가 결과를 수정해도 캐시가 오염되지 않도록 매번 새로 파싱
+    return json.loads(body)
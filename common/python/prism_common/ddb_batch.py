@@ -0,0 +1,60 @@
+"""
+BatchGetItem / BatchWriteItem with bounded retries of unprocessed keys and items.
+
+DynamoDB returns UnprocessedKeys/UnprocessedItems when a batch is throttled or too large.
+Resubmitting them immediately just repeats the throttling, so each retry waits a capped,
+jittered exponential delay, and after MAX_ATTEMPTS requests whatever is still unprocessed is
+handed back to the caller instead of looping until the Lambda times out:
+
+    responses, unprocessed = ddb_batch.get(dynamodb_client, {table: {"Keys": [...]}})
+    unprocessed = ddb_batch.write(dynamodb_client, {table: [{"PutRequest": ...}]})
+"""
+
+import os
+import random
+import time
+
+MAX_ATTEMPTS = int(os.environ.get("DDB_BATCH_MAX_ATTEMPTS", "6"))
+BASE_DELAY_SECONDS = 0.05
+MAX_DELAY_SECONDS = 2.0
+
+
+def backoff_delay(attempt):
+    """Full-jitter delay before retry number `attempt` (1-based)."""
+    return random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+
+
+def get(client, request_items, max_attempts=MAX_ATTEMPTS, sleep=time.sleep):
+    """Returns ({table: [items]}, unprocessed request items or {})."""
+    responses = {}
+    request = request_items
+    for attempt in range(max_attempts):
+        if attempt:
+            sleep(backoff_delay(attempt))
+        response = client.batch_get_item(RequestItems=request)
+        for table, items in response.get("Responses", {}).items():
+            responses.setdefault(table, []).extend(items)
+        request = response.get("UnprocessedKeys")
+        if not request:
+            return responses, {}
+    return responses, request
+
+
+def write(client, request_items, max_attempts=MAX_ATTEMPTS, sleep=time.sleep):
+    """Returns the request items still unprocessed after `max_attempts` requests, or {}."""
+    request = request_items
+    for attempt in range(max_attempts):
+        if attempt:
+            sleep(backoff_delay(attempt))
+        request = client.batch_write_item(RequestItems=request).get("UnprocessedItems")
+        if not request:
+            return {}
+    return request
+
+
+def count(request_items):
+    """Number of keys or write requests in a (possibly unprocessed) request."""
+    return sum(
+        len(table_request["Keys"]) if isinstance(table_request, dict) else len(table_request)
+        for table_request in request_items.values()
+    )
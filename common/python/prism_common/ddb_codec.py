@@ -0,0 +1,229 @@
+"""
+Conversion between DynamoDB's typed attribute values and plain Python values, for handlers
+that call the low-level client.
+
+boto3's resource API runs every attribute through TypeDeserializer, which returns Decimal for
+numbers and set for string sets; handlers then converted those again (Tags to a list, counts
+to int) before returning JSON. A `Schema` knows the shape of an item, so each attribute is
+decoded by a handler built once at import:
+
+    item = ddb_codec.METADATA.decode(response["Items"][0])   # Tags -> sorted list, Display -> dict
+    typed = ddb_codec.METADATA.encode(item)                  # None and empty sets are omitted
+
+Numbers decode to int when they have no fraction and to float otherwise. Attributes that are
+not in the schema (or are stored with another type) fall back to `decode_value`.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+
+Field = namedtuple("Field", ["decode", "encode"])
+
+
+def _number(raw):
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+
+def _encode_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return {"N": str(value)}
+
+
+def _decode_list(raw):
+    return [decode_value(value) for value in raw]
+
+
+def _decode_map(raw):
+    return {name: decode_value(value) for name, value in raw.items()}
+
+
+_DECODERS = {
+    "S": lambda raw: raw,
+    "N": _number,
+    "BOOL": lambda raw: raw,
+    "NULL": lambda raw: None,
+    "B": lambda raw: raw,
+    "SS": sorted,
+    "NS": lambda raw: sorted(_number(value) for value in raw),
+    "BS": list,
+    "L": _decode_list,
+    "M": _decode_map,
+}
+
+
+def decode_value(value):
+    """Any typed value; sets become sorted lists so the result is JSON-serializable."""
+    ((tag, raw),) = value.items()
+    return _DECODERS[tag](raw)
+
+
+def encode_value(value):
+    """Any plain value (e.g. ExpressionAttributeValues); sets of str/numbers become SS/NS."""
+    if isinstance(value, str):
+        return {"S": value}
+    # bool은 int의 하위 클래스이므로 숫자보다 먼저 확인
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float, Decimal)):
+        return _encode_number(value)
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, dict):
+        return {"M": {name: encode_value(item) for name, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        if not value:
+            raise ValueError("DynamoDB는 빈 집합을 저장할 수 없습니다.")
+        if all(isinstance(item, str) for item in value):
+            return {"SS": sorted(value)}
+        return {"NS": [_encode_number(item)["N"] for item in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    raise TypeError(f"DynamoDB 값으로 변환할 수 없는 타입입니다: {type(value).__name__}")
+
+
+def encode_values(values):
+    """{":name": plain value} -> ExpressionAttributeValues for the low-level client."""
+    return {name: encode_value(value) for name, value in values.items()}
+
+
+def _typed(tag, convert, encode):
+    def decode(value):
+        raw = value.get(tag)
+        if raw is None:
+            # 스키마와 다른 타입으로 저장된 값(NULL 등)은 일반 규칙으로
+            return decode_value(value)
+        return convert(raw)
+
+    return Field(decode, encode)
+
+
+def _decode_string(value):
+    # 가장 많은 속성이라 변환 함수 호출 없이 처리
+    raw = value.get("S")
+    return raw if raw is not None else decode_value(value)
+
+
+STRING = Field(_decode_string, lambda value: {"S": value})
+NUMBER = _typed("N", _number, _encode_number)
+BOOLEAN = _typed("BOOL", bool, lambda value: {"BOOL": value})
+# 문자열 집합은 정렬된 list로 읽고, 쓸 때 빈 집합은 속성을 생략
+STRING_SET = _typed("SS", sorted, lambda value: {"SS": sorted(set(value))} if value else None)
+ANY = Field(decode_value, encode_value)
+
+
+def list_of(field):
+    item_decode, item_encode = field
+    return _typed(
+        "L",
+        lambda raw: [item_decode(value) for value in raw],
+        lambda value: {"L": [item_encode(item) for item in value]},
+    )
+
+
+def map_of(field):
+    item_decode, item_encode = field
+    return _typed(
+        "M",
+        lambda raw: {name: item_decode(value) for name, value in raw.items()},
+        lambda value: {"M": {name: item_encode(item) for name, item in value.items()}},
+    )
+
+
+class Schema:
+    def __init__(self, fields):
+        self.fields = dict(fields)
+        self._decoders = {name: field.decode for name, field in self.fields.items()}
+        self._encoders = {name: field.encode for name, field in self.fields.items()}
+        # 다른 Schema의 속성(M)으로 쓸 때의 처리
+        self.field = _typed("M", self.decode, lambda value: {"M": self.encode(value)})
+
+    def decode(self, item):
+        decoders = self._decoders
+        result = {}
+        for name, value in item.items():
+            decode = decoders.get(name)
+            result[name] = decode(value) if decode else decode_value(value)
+        return result
+
+    def decode_all(self, items):
+        return [self.decode(item) for item in items]
+
+    def encode(self, item):
+        encoders = self._encoders
+        result = {}
+        for name, value in item.items():
+            if value is None:
+                continue
+            encode = encoders.get(name, encode_value)
+            typed = encode(value)
+            if typed is not None:
+                result[name] = typed
+        return result
+
+
+# prism_common.display.build_display의 결과
+DISPLAY = Schema(
+    {
+        "Version": NUMBER,
+        "ImageName": STRING,
+        "ThumbnailKeys": map_of(STRING),
+        "TranscodedKey": STRING,
+        "FormattedCreatedAt": STRING,
+        "TagList": list_of(STRING),
+    }
+)
+
+# prism_common.variants의 카탈로그 항목
+VARIANT = Schema(
+    {
+        "Format": STRING,
+        "Width": NUMBER,
+        "Height": NUMBER,
+        "Key": STRING,
+        "Bytes": NUMBER,
+    }
+)
+
+# MemoryImageMetadata: AlbumID(파티션) + OriginalKey(정렬), byOriginalKey GSI
+METADATA = Schema(
+    {
+        "AlbumID": STRING,
+        "OriginalKey": STRING,
+        "UserID": STRING,
+        "SourceBucket": STRING,
+        "ProcessedKey": STRING,
+        "ImageSummary": STRING,
+        "AnalysisVersion": STRING,
+        "AvifEncoding": STRING,
+        "CreatedAt": STRING,
+        "UpdatedAt": STRING,
+        "Tags": STRING_SET,
+        "Display": DISPLAY.field,
+        "Variants": list_of(VARIANT.field),
+    }
+)
+
+# MemoryUserStats: UserID(파티션), 정렬 대기열은 prism_common.sort_queue 참고
+STATS = Schema(
+    {
+        "UserID": STRING,
+        "ImageCount": NUMBER,
+        "CategoryCount": NUMBER,
+        "PendingChanges": NUMBER,
+        "InFlightChanges": NUMBER,
+        "FirstPendingAt": NUMBER,
+        "LastUploadAt": NUMBER,
+        "LastSortedAt": STRING,
+        "SortStatus": STRING,
+        "SortStartedAt": NUMBER,
+        "SortQueue": STRING,
+        "NewImageKeys": STRING_SET,
+        "SortedData": ANY,
+    }
+)
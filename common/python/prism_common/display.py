@@ -0,0 +1,41 @@
+"""
+Display projection for a metadata item: everything the read path used to derive per request.
+
+result-to-dynamodb stores it as the `Display` map when the item is written, so the resolver
+only merges it and signs URLs. Items written before that are projected at read time with the
+same function.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+VERSION = 1
+
+KST = timezone(timedelta(hours=9))
+
+# thumbnail-generator가 만드는 확장자와 썸네일을 맞추는 상자 크기
+THUMBNAIL_EXTENSIONS = ("jpg", "webp", "avif")
+THUMBNAIL_WIDTH = 400
+
+
+def format_created_at(created_at_iso):
+    if not created_at_iso:
+        return None
+    try:
+        return datetime.fromisoformat(created_at_iso).astimezone(KST).strftime("%Y년 %m월 %d일 %p %I:%M")
+    except ValueError:
+        return created_at_iso
+
+
+def build_display(original_key, created_at_iso=None, tags=None):
+    directory, filename = os.path.split(original_key)
+    file_base = os.path.splitext(filename)[0]
+
+    return {
+        "Version": VERSION,
+        "ImageName": filename,
+        "ThumbnailKeys": {ext: f"{directory}/thumbnail/{file_base}.{ext}" for ext in THUMBNAIL_EXTENSIONS},
+        "TranscodedKey": f"{directory}/transcoded/{file_base}.avif",
+        "FormattedCreatedAt": format_created_at(created_at_iso),
+        "TagList": sorted(tag for tag in (tags or ()) if tag),
+    }
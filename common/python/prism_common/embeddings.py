@@ -0,0 +1,98 @@
+"""
+Text embedders for the image summary search.
+
+EMBEDDER selects the implementation:
+
+- `bedrock`: Titan Text Embeddings V2 through bedrock-runtime (normalized, EMBEDDING_DIMENSION
+  of 256, 512 or 1024). Calls go through bedrock_governor, so embeddings share the Bedrock
+  budget and a throttled call raises BedrockDeferred like every other model call.
+- `hash`: deterministic feature hashing of words and character trigrams. No model and no
+  network; texts sharing words or word fragments score higher. Used by the local pipeline
+  and for tests.
+
+Every embedder returns L2-normalized float32 rows, so a dot product is the cosine similarity.
+`model` names the embedder and dimension; vector_index refuses to mix vectors of different
+models.
+"""
+
+import hashlib
+import os
+import unicodedata
+
+from prism_common import bedrock_governor
+from prism_common.lazy_import import lazy_module
+
+np = lazy_module("numpy")
+
+EMBEDDER = os.environ.get("EMBEDDER", "bedrock")
+EMBEDDING_DIMENSION = int(os.environ.get("EMBEDDING_DIMENSION", "256"))
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v2:0")
+
+
+def document_text(summary, tags=None):
+    """The text embedded for an image: its summary followed by its tags."""
+    tag_text = ", ".join(sorted(tag for tag in (tags or ()) if tag))
+    return f"{summary}\n{tag_text}" if tag_text else summary
+
+
+def _normalized(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class BedrockEmbedder:
+    def __init__(self, dimension=EMBEDDING_DIMENSION, model_id=EMBEDDING_MODEL_ID):
+        self.dimension = dimension
+        self.model_id = model_id
+        self.model = f"{model_id}/{dimension}"
+
+    def embed(self, texts, priority=bedrock_governor.INTERACTIVE):
+        rows = []
+        governor = bedrock_governor.get_governor()
+        # Titan 임베딩 API는 요청당 텍스트 하나만 받음
+        for text in texts:
+            response = governor.invoke_model(
+                self.model_id,
+                {"inputText": text, "dimensions": self.dimension, "normalize": True},
+                priority=priority,
+                estimated_tokens=len(text.encode("utf-8")) // bedrock_governor.BYTES_PER_TOKEN + 1,
+            )
+            rows.append(response["embedding"])
+        return _normalized(np.asarray(rows, dtype=np.float32).reshape(len(texts), self.dimension))
+
+
+class HashEmbedder:
+    def __init__(self, dimension=EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.model = f"hash-v1/{dimension}"
+
+    @staticmethod
+    def _features(text):
+        words = unicodedata.normalize("NFKC", text).casefold().replace(",", " ").split()
+        for word in words:
+            yield f"w:{word}"
+            padded = f"<{word}>"
+            for start in range(max(len(padded) - 2, 1)):
+                yield f"t:{padded[start : start + 3]}"
+
+    def embed(self, texts, priority=None):
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                matrix[row, value % self.dimension] += 1.0 if value >> 63 else -1.0
+        return _normalized(matrix)
+
+
+_EMBEDDERS = {"bedrock": BedrockEmbedder, "hash": HashEmbedder}
+_embedder = None
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        if EMBEDDER not in _EMBEDDERS:
+            raise ValueError(f"지원하지 않는 EMBEDDER입니다: {EMBEDDER}")
+        _embedder = _EMBEDDERS[EMBEDDER]()
+    return _embedder
@@ -0,0 +1,38 @@
+"""
+Deferred imports for modules that are expensive at cold start but only needed on some paths.
+
+    botocore_exceptions = lazy_module("botocore.exceptions")
+    ...
+    except botocore_exceptions.ClientError:
+
+An ``except`` clause is only evaluated when an exception is raised, so the module (and the
+botocore package behind it) is imported on the error path instead of during Lambda init.
+"""
+
+import importlib
+import threading
+
+
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name):
+    return _LazyModule(name)
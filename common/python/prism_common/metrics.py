@@ -0,0 +1,190 @@
+"""
+Per-invocation metrics in CloudWatch Embedded Metric Format (EMF).
+
+    @metrics.instrumented
+    def lambda_handler(event, context):
+        metrics.log_payload("이벤트 수신", event)
+        with metrics.phase("s3_get"):
+            ...
+
+Phases are timed (and summed if repeated), every AWS call made through aws_clients is counted
+with its retries via botocore event hooks, and exactly one EMF JSON line is written to stdout
+when the handler returns or raises. Full payload logging only happens for a sampled share of
+invocations (DEBUG_PAYLOAD_SAMPLE_RATE, 0.0-1.0).
+"""
+
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "Prism")
+DEBUG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("DEBUG_PAYLOAD_SAMPLE_RATE", "0"))
+
+# EMF는 디렉티브 하나당 최대 100개 메트릭
+_MAX_METRICS = 100
+
+_lock = threading.Lock()
+_cold_start = True
+# Lambda는 프로세스당 한 번에 하나의 호출만 처리하므로 작업 스레드는 프로세스 전역 호출을 사용하고,
+# 여러 핸들러를 동시에 실행하는 로컬 하니스에서는 핸들러 스레드별 호출이 우선
+_local = threading.local()
+_process_current = None
+
+
+def _current():
+    return getattr(_local, "invocation", None) or _process_current
+
+
+class _Invocation:
+    def __init__(self, function_name, cold_start):
+        self.function_name = function_name
+        self.cold_start = cold_start
+        self.started = time.perf_counter()
+        self.phases = Counter()
+        self.calls = Counter()
+        self.retries = 0
+        self.errors = 0
+        self.properties = {}
+        self.sampled = DEBUG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < DEBUG_PAYLOAD_SAMPLE_RATE
+
+
+def _function_name(context):
+    name = getattr(context, "function_name", None)
+    return name or os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local")
+
+
+@contextmanager
+def phase(name):
+    """Times a block into the current invocation's `<name>` phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation = _current()
+        if invocation is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with _lock:
+                invocation.phases[name] += elapsed_ms
+
+
+def record_aws_call(service, operation, retries=0, failed=False):
+    invocation = _current()
+    if invocation is None:
+        return
+    with _lock:
+        invocation.calls[f"{service}.{operation}"] += 1
+        invocation.retries += retries
+        invocation.errors += failed
+
+
+def set_property(key, value):
+    """Adds a searchable, non-metric field (e.g. userID) to this invocation's EMF line."""
+    invocation = _current()
+    if invocation is not None:
+        invocation.properties[key] = value
+
+
+def payload_sampled():
+    invocation = _current()
+    return invocation is not None and invocation.sampled
+
+
+def log_payload(message, payload, logger=None):
+    """Logs a full payload (via `logger.info` if given, else print) only for sampled invocations."""
+    if not payload_sampled():
+        return
+    line = f"{message}: {json.dumps(payload, ensure_ascii=False, default=str)}"
+    if logger is not None:
+        logger.info(line)
+    else:
+        print(line)
+
+
+def _after_call(http_response=None, parsed=None, model=None, **kwargs):
+    metadata = (parsed or {}).get("ResponseMetadata", {})
+    status = metadata.get("HTTPStatusCode", 200)
+    record_aws_call(
+        model.service_model.service_name,
+        model.name,
+        retries=metadata.get("RetryAttempts", 0),
+        failed=status >= 400,
+    )
+
+
+def _after_call_error(model=None, **kwargs):
+    record_aws_call(model.service_model.service_name, model.name, failed=True)
+
+
+def register_botocore_hooks(session):
+    """Called by aws_clients when it creates the shared botocore session."""
+    session.register("after-call", _after_call, unique_id="prism-metrics-after-call")
+    session.register("after-call-error", _after_call_error, unique_id="prism-metrics-after-call-error")
+
+
+def _emit(invocation, duration_ms, failed):
+    metrics = {
+        "Duration": (duration_ms, "Milliseconds"),
+        "ColdStart": (int(invocation.cold_start), "Count"),
+        "Error": (int(failed), "Count"),
+        "AwsCalls": (sum(invocation.calls.values()), "Count"),
+        "AwsRetries": (invocation.retries, "Count"),
+        "AwsErrors": (invocation.errors, "Count"),
+    }
+    for name, elapsed_ms in invocation.phases.items():
+        metrics[f"Phase.{name}"] = (elapsed_ms, "Milliseconds")
+    for call, count in invocation.calls.items():
+        metrics[f"Calls.{call}"] = (count, "Count")
+
+    names = list(metrics)[:_MAX_METRICS]
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["FunctionName"]],
+                    "Metrics": [{"Name": name, "Unit": metrics[name][1]} for name in names],
+                }
+            ],
+        },
+        "FunctionName": invocation.function_name,
+        **invocation.properties,
+    }
+    for name in names:
+        record[name] = metrics[name][0]
+
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def instrumented(handler):
+    """Wraps a Lambda handler so each invocation emits one EMF line."""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _process_current, _cold_start
+
+        invocation = _Invocation(_function_name(context), _cold_start)
+        _cold_start = False
+        _local.invocation = _process_current = invocation
+
+        failed = False
+        try:
+            return handler(event, context)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - invocation.started) * 1000
+            _local.invocation = None
+            if _process_current is invocation:
+                _process_current = None
+            _emit(invocation, duration_ms, failed)
+
+    return wrapper
@@ -0,0 +1,115 @@
+"""
+Presigned S3 GET URLs that are identical for every request within a time bucket.
+
+botocore signs with the current second, so each call yields a new URL and CDN/browser caches
+never hit. In "aligned" mode the signing time is rounded down to a PRESIGN_BUCKET_SECONDS
+boundary and the URL stays valid for bucket + PRESIGN_OVERLAP_SECONDS: repeat views of the
+same object inside a bucket get byte-identical URLs, and a URL issued at the very end of a
+bucket still has at least the overlap left. URLs also change when the Lambda role's
+credentials rotate, and can never outlive the session token they were signed with.
+
+"rolling" mode falls back to the client's generate_presigned_url.
+"""
+
+import datetime
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import quote
+
+from prism_common import aws_clients
+
+PRESIGN_MODE = os.environ.get("PRESIGN_MODE", "aligned")
+PRESIGN_BUCKET_SECONDS = int(os.environ.get("PRESIGN_BUCKET_SECONDS", "3600"))
+PRESIGN_OVERLAP_SECONDS = int(os.environ.get("PRESIGN_OVERLAP_SECONDS", "900"))
+
+# SigV4 presigned URL의 최대 유효 기간 (7일)
+MAX_EXPIRES_SECONDS = 7 * 24 * 3600
+
+_ALGORITHM = "AWS4-HMAC-SHA256"
+_signing_keys = {}
+
+
+def _region():
+    return os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION") or "us-east-1"
+
+
+def _host_and_path(bucket, key, region):
+    encoded_key = quote(key, safe="/~")
+    # 점이 들어간 버킷은 가상 호스트 방식에서 TLS 인증서와 맞지 않으므로 경로 방식 사용
+    if "." in bucket:
+        return f"s3.{region}.amazonaws.com", f"/{bucket}/{encoded_key}"
+    return f"{bucket}.s3.{region}.amazonaws.com", f"/{encoded_key}"
+
+
+def _signing_key(secret_key, date_stamp, region):
+    cache_key = (secret_key, date_stamp, region)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        key = f"AWS4{secret_key}".encode("utf-8")
+        for part in (date_stamp, region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        if len(_signing_keys) > 16:
+            _signing_keys.clear()
+        _signing_keys[cache_key] = key
+    return key
+
+
+def sign_get_url(bucket, key, signing_time, expires_in, credentials, region):
+    """SigV4 query-string signature for GET s3://bucket/key at a fixed signing time."""
+    host, path = _host_and_path(bucket, key, region)
+    amz_date = signing_time.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = amz_date[:8]
+    scope = f"{date_stamp}/{region}/s3/aws4_request"
+
+    params = {
+        "X-Amz-Algorithm": _ALGORITHM,
+        "X-Amz-Credential": f"{credentials.access_key}/{scope}",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires_in),
+        "X-Amz-SignedHeaders": "host",
+    }
+    if credentials.token:
+        params["X-Amz-Security-Token"] = credentials.token
+
+    query = "&".join(
+        f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(params.items())
+    )
+    canonical_request = "\n".join(["GET", path, query, f"host:{host}", "", "host", "UNSIGNED-PAYLOAD"])
+    string_to_sign = "\n".join(
+        [_ALGORITHM, amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()]
+    )
+    signature = hmac.new(
+        _signing_key(credentials.secret_key, date_stamp, region),
+        string_to_sign.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+    return f"https://{host}{path}?{query}&X-Amz-Signature={signature}"
+
+
+def aligned_window(now=None):
+    """(signing_time, expires_in) for the bucket containing `now` (epoch seconds)."""
+    now = time.time() if now is None else now
+    start = int(now // PRESIGN_BUCKET_SECONDS) * PRESIGN_BUCKET_SECONDS
+    expires_in = min(PRESIGN_BUCKET_SECONDS + PRESIGN_OVERLAP_SECONDS, MAX_EXPIRES_SECONDS)
+    return datetime.datetime.fromtimestamp(start, datetime.timezone.utc), expires_in
+
+
+def presigned_get_url(bucket, key, expires_in=3600):
+    """
+    GET URL for s3://bucket/key. `expires_in` only applies in rolling mode; aligned URLs are
+    valid for at least PRESIGN_OVERLAP_SECONDS from now.
+    """
+    if PRESIGN_MODE != "aligned":
+        return aws_clients.get_client("s3").generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+    credentials = aws_clients.get_credentials()
+    if credentials is None:
+        raise ValueError("AWS 자격 증명을 찾을 수 없어 URL에 서명할 수 없습니다.")
+
+    signing_time, window_expires_in = aligned_window()
+    return sign_get_url(bucket, key, signing_time, window_expires_in, credentials, _region())
@@ -0,0 +1,95 @@
+"""
+Pending album sorts, kept on the user stats item instead of being decided per upload.
+
+result-to-dynamodb adds every new image to the user's pending changes:
+
+    PendingChanges   uploads since the last claimed sort
+    NewImageKeys     their keys (string set), the input of the incremental sort
+    FirstPendingAt   epoch seconds of the oldest of them
+    LastUploadAt     epoch seconds of the newest
+    SortQueue        "pending-<shard>", partition key of the sparse GSI SORT_QUEUE_INDEX_NAME
+
+The index's sort key is ImageCount, so album-sort-scheduler only reads users with at least
+SORT_MIN_IMAGES images; a smaller album enters the read range by itself once its uploads bring
+ImageCount to the threshold. Users sorted within SORT_MIN_INTERVAL_SECONDS are filtered out of
+the read as well (see `queue_query`).
+
+album-sort-scheduler reads the index on a schedule and claims users whose uploads have
+settled. A claim moves PendingChanges to InFlightChanges and marks the sort RUNNING;
+album-list-analyzer removes InFlightChanges when the sort is saved. A sort that fails or times
+out keeps InFlightChanges, so the scheduler counts those changes again. SortQueue stays set
+while anything is pending or in flight, and the scheduler removes it once both are zero.
+"""
+
+import os
+import zlib
+
+SORT_QUEUE_INDEX_NAME = os.environ.get("SORT_QUEUE_INDEX_NAME", "bySortQueue")
+# 인덱스 파티션 하나에 쓰기가 몰리지 않도록 사용자를 나눠 담음
+SORT_QUEUE_SHARDS = int(os.environ.get("SORT_QUEUE_SHARDS", "4"))
+
+RUNNING = "RUNNING"
+UPDATED = "UPDATED"
+NEEDS_UPDATE = "NEEDS_UPDATE"
+
+# 스케줄러가 인덱스에서 읽는 속성 (GSI에 INCLUDE로 프로젝션)
+QUEUE_ATTRIBUTES = (
+    "UserID",
+    "ImageCount",
+    "PendingChanges",
+    "InFlightChanges",
+    "FirstPendingAt",
+    "LastUploadAt",
+    "LastSortedAt",
+    "SortStatus",
+    "SortStartedAt",
+)
+
+
+def queue_name(user_id):
+    return f"pending-{zlib.crc32(user_id.encode('utf-8')) % SORT_QUEUE_SHARDS}"
+
+
+def queue_names():
+    return [f"pending-{shard}" for shard in range(SORT_QUEUE_SHARDS)]
+
+
+def queue_query(table_name, queue, min_images, sorted_before):
+    """
+    Query arguments for one queue shard: users with at least `min_images` images that were not
+    sorted after `sorted_before` (ISO time, as LastSortedAt), plus every user with a sort in flight.
+    """
+    return {
+        "TableName": table_name,
+        "IndexName": SORT_QUEUE_INDEX_NAME,
+        "KeyConditionExpression": "SortQueue = :queue AND ImageCount >= :min_images",
+        "FilterExpression": (
+            "attribute_not_exists(LastSortedAt) OR LastSortedAt < :sorted_before "
+            "OR attribute_exists(InFlightChanges)"
+        ),
+        "ExpressionAttributeValues": {
+            ":queue": {"S": queue},
+            ":min_images": {"N": str(int(min_images))},
+            ":sorted_before": {"S": sorted_before},
+        },
+    }
+
+
+def pending_update(table_name, user_id, original_key, now):
+    """Low-level TransactWriteItems entry recording one new image of `user_id`."""
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": {"UserID": {"S": user_id}},
+            "UpdateExpression": (
+                "ADD ImageCount :one, PendingChanges :one, NewImageKeys :key "
+                "SET LastUploadAt = :now, FirstPendingAt = if_not_exists(FirstPendingAt, :now), SortQueue = :queue"
+            ),
+            "ExpressionAttributeValues": {
+                ":one": {"N": "1"},
+                ":key": {"SS": [original_key]},
+                ":now": {"N": str(int(now))},
+                ":queue": {"S": queue_name(user_id)},
+            },
+        }
+    }
@@ -0,0 +1,75 @@
+"""
+Inverted index of image tags: one posting item per (user, normalized tag, image).
+
+    UserTag = "<user_id>#<normalized tag>" (partition), OriginalKey (sort), Tag, AlbumID, CreatedAt
+
+result-to-dynamodb writes the postings in the same transaction as the metadata item, so the
+index never disagrees with `Tags`. A tag search is a Query on one partition per tag; postings
+are read newest key first, and multi-tag searches merge the sorted posting lists page by page.
+"""
+
+import os
+import unicodedata
+
+TAG_INDEX_TABLE_NAME = os.environ.get("DYNAMODB_TAG_INDEX_TABLE_NAME")
+
+# TransactWriteItems는 100개까지: 메타데이터 Put, 통계 Update, 새 태그 Put, 지운 태그 Delete가 함께 들어감
+MAX_INDEXED_TAGS = 48
+
+
+def normalize(tag):
+    """'#Beach ', 'beach' and 'ＢＥＡＣＨ' map to the same posting list."""
+    if not isinstance(tag, str):
+        return ""
+    normalized = unicodedata.normalize("NFKC", tag).strip().lstrip("#")
+    return " ".join(normalized.split()).casefold()
+
+
+def normalized_tags(tags):
+    """{normalized: display tag} of the indexed tags; `Tags` is a set, so the order is by name."""
+    result = {}
+    for tag in sorted(tag for tag in tags or () if isinstance(tag, str)):
+        normalized = normalize(tag)
+        if normalized:
+            result.setdefault(normalized, tag.strip())
+    return {normalized: result[normalized] for normalized in sorted(result)[:MAX_INDEXED_TAGS]}
+
+
+def partition_key(user_id, normalized_tag):
+    return f"{user_id}#{normalized_tag}"
+
+
+def posting_changes(table_name, user_id, original_key, new_tags, old_tags=(), album_id=None, created_at=None):
+    """
+    Low-level TransactWriteItems entries that bring the postings of one image from `old_tags`
+    to `new_tags`. Current postings are always re-put, so images stored before the index
+    existed are indexed the next time they are written.
+    """
+    new = normalized_tags(new_tags)
+    old = normalized_tags(old_tags)
+
+    changes = []
+    for normalized, tag in new.items():
+        item = {
+            "UserTag": {"S": partition_key(user_id, normalized)},
+            "OriginalKey": {"S": original_key},
+            "Tag": {"S": tag},
+        }
+        if album_id:
+            item["AlbumID"] = {"S": album_id}
+        if created_at:
+            item["CreatedAt"] = {"S": created_at}
+        changes.append({"Put": {"TableName": table_name, "Item": item}})
+    for normalized in sorted(set(old) - set(new)):
+        changes.append(
+            {
+                "Delete": {
+                    "TableName": table_name,
+                    "Key": {
+                        "UserTag": {"S": partition_key(user_id, normalized)},
+                        "OriginalKey": {"S": original_key},
+                    }
+                }
+            }
+        )
+    return changes
@@ -0,0 +1,23 @@
+"""
+Transcode status index: SourceKey -> Status, EncodingKey, ConvertedAt.
+
+check-succeed-batch-job records every converted image, sqs-to-batch skips images already
+converted with the same EncodingKey, and tools/backfill re-enqueues the rest. All three must
+compute the key the same way, so it lives here.
+"""
+
+import json
+import os
+
+# image-transcoding의 AVIF_PARAM_SOURCE와 avifparams.Version에 맞춰 설정
+AVIF_PARAM_SOURCE = os.environ.get("AVIF_PARAM_SOURCE", "auto")
+AVIF_PARAMS_VERSION = os.environ.get("AVIF_PARAMS_VERSION", "stats-v1")
+
+
+def encoding_key(avif_encoding):
+    """Canonical form of avifEncoding so that 60 and "60" compare equal."""
+    canonical = {key: str(value) for key, value in avif_encoding.items()}
+    # image-transcoding이 이미지 통계로 파라미터를 고르는 경우, 보정 테이블이 바뀌면 다시 변환되도록 버전을 포함
+    if AVIF_PARAM_SOURCE != "event" or not avif_encoding.get("quality"):
+        canonical["paramsVersion"] = AVIF_PARAMS_VERSION
+    return json.dumps(canonical, sort_keys=True)
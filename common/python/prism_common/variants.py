@@ -0,0 +1,98 @@
+"""
+Display variant catalog of a metadata item: every stored rendition of the image, by width
+and format.
+
+derivative-generator encodes the thumbnails and one image per VARIANT_WIDTHS width (narrower
+than the original) in every VARIANT_FORMATS format, and result-to-dynamodb stores the list as
+`Variants`:
+
+    [{"Format": "avif", "Width": 1280, "Height": 960, "Key": "album/.../variants/IMG-1280w.avif", "Bytes": 81234}, ...]
+
+Keys are in the processed bucket. Items stored before the catalog existed fall back to their
+thumbnails. The resolver picks the smallest variant that covers the width the client draws,
+in the best format it accepts; when none is wide enough the original is the right image.
+"""
+
+from prism_common import display
+
+# 같은 너비에서 크기를 모를 때의 선호 순서 (보통 앞쪽이 더 작음)
+FORMAT_PREFERENCE = ("avif", "webp", "jpeg")
+
+# 클라이언트가 형식을 알려주지 않으면 모든 브라우저가 표시하는 형식만 사용
+DEFAULT_ACCEPT = ("webp", "jpeg")
+
+_FORMAT_ALIASES = {"jpg": "jpeg"}
+
+
+def normalize_format(value):
+    """'image/avif', 'AVIF' and 'avif' -> 'avif'; 'jpg' -> 'jpeg'."""
+    value = str(value).strip().lower()
+    if value.startswith("image/"):
+        value = value[len("image/"):]
+    return _FORMAT_ALIASES.get(value, value)
+
+
+def from_derivatives(variants):
+    """derivative-generator's `variants` output -> the stored `Variants` list."""
+    catalog = []
+    for variant in variants or ():
+        if not variant.get("key") or not variant.get("width"):
+            continue
+        entry = {
+            "Format": normalize_format(variant["format"]),
+            "Width": int(variant["width"]),
+            "Key": variant["key"],
+        }
+        if variant.get("height"):
+            entry["Height"] = int(variant["height"])
+        if variant.get("bytes"):
+            entry["Bytes"] = int(variant["bytes"])
+        catalog.append(entry)
+    return sorted(catalog, key=_order)
+
+
+def catalog(item):
+    """The item's variants, or its thumbnails for items stored before the catalog."""
+    if item.get("Variants"):
+        return item["Variants"]
+    projection = item.get("Display") or {}
+    thumbnail_keys = projection.get("ThumbnailKeys") or {}
+    # 썸네일은 THUMBNAIL_WIDTH 상자에 맞춘 크기라 실제 너비는 이보다 작을 수 있음
+    return sorted(
+        (
+            {"Format": normalize_format(extension), "Width": display.THUMBNAIL_WIDTH, "Key": key}
+            for extension, key in thumbnail_keys.items()
+        ),
+        key=_order,
+    )
+
+
+def _rank(variant):
+    image_format = variant["Format"]
+    return FORMAT_PREFERENCE.index(image_format) if image_format in FORMAT_PREFERENCE else len(FORMAT_PREFERENCE)
+
+
+def _order(variant):
+    # 너비 순, 같은 너비에서는 작은 파일(모르면 선호 형식) 먼저
+    return (variant["Width"], variant.get("Bytes") or 0, _rank(variant))
+
+
+def _accepted(variants, accept):
+    formats = {normalize_format(value) for value in accept} if accept else set(DEFAULT_ACCEPT)
+    return [variant for variant in variants if variant["Format"] in formats]
+
+
+def choose(variants, required_width, accept=None):
+    """Smallest accepted variant at least `required_width` pixels wide, or None (use the original)."""
+    adequate = [variant for variant in _accepted(variants, accept) if variant["Width"] >= required_width]
+    return min(adequate, key=_order) if adequate else None
+
+
+def srcset_entries(variants, accept=None):
+    """One accepted variant per width (the smallest file), narrowest first."""
+    best = {}
+    for variant in _accepted(variants, accept):
+        current = best.get(variant["Width"])
+        if current is None or _order(variant) < _order(current):
+            best[variant["Width"]] = variant
+    return [best[width] for width in sorted(best)]
@@ -0,0 +1,311 @@
+"""
+Per-user vector index of image summaries, stored in S3 as float32 segment files.
+
+    <VECTOR_INDEX_PREFIX><user_id>/base.pvi                compacted segment
+    <VECTOR_INDEX_PREFIX><user_id>/delta/<time>-<id>.pvi   one segment per indexed upload
+
+A segment is a 56-byte header (magic, version, dimension, row count, embedder model of at most
+MAX_MODEL_BYTES), the row-major float32 matrix and the newline-separated image keys. The matrix
+starts at a 4-byte-aligned offset, so the resolver memory-maps a downloaded base file instead of
+reading it.
+
+Uploads only add a delta, so concurrent uploads of one user never rewrite the same object.
+Once COMPACT_AFTER_DELTAS deltas exist, the uploading Lambda merges them into the base with a
+conditional put (If-Match on the base ETag); a compaction that loses the race changes nothing.
+For a key in several segments, the newest segment wins.
+
+`load` keeps the base and the deltas of a container's recent users in memory. The base is
+revalidated with If-None-Match; a delta is only downloaded when its listed ETag is new, and the
+missing deltas are downloaded concurrently.
+"""
+
+import hashlib
+import os
+import struct
+import threading
+import time
+
+from prism_common import aws_clients, metrics
+from prism_common.lazy_import import lazy_module
+
+np = lazy_module("numpy")
+botocore_exceptions = lazy_module("botocore.exceptions")
+# concurrent.futures는 logging까지 불러오므로 캐시에 없는 델타를 받을 때만 import
+futures = lazy_module("concurrent.futures")
+
+INDEX_BUCKET = os.environ.get("VECTOR_INDEX_BUCKET")
+INDEX_PREFIX = os.environ.get("VECTOR_INDEX_PREFIX", "vector-index/")
+COMPACT_AFTER_DELTAS = int(os.environ.get("VECTOR_INDEX_COMPACT_AFTER", "32"))
+CACHE_DIR = os.environ.get("VECTOR_INDEX_CACHE_DIR", "/tmp/vector-index")
+# 캐시에 없는 델타를 동시에 받는 수 (aws_clients의 커넥션 풀보다 작게)
+FETCH_CONCURRENCY = int(os.environ.get("VECTOR_INDEX_FETCH_CONCURRENCY", "16"))
+
+MAGIC = b"PVI1"
+VERSION = 1
+HEADER = struct.Struct("<4sIII40s")
+MAX_MODEL_BYTES = 40
+
+
+class Segment:
+    def __init__(self, model, keys, matrix):
+        self.model = model
+        self.keys = keys
+        self.matrix = matrix
+        self._positions = None
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = {key: row for row, key in enumerate(self.keys)}
+        return self._positions
+
+
+def encode(segment):
+    matrix = np.ascontiguousarray(segment.matrix, dtype="<f4")
+    count, dimension = matrix.shape
+    model = segment.model.encode("utf-8")
+    # struct의 40s는 긴 값을 말없이 잘라 서로 다른 모델이 같은 이름으로 저장될 수 있음
+    if len(model) > MAX_MODEL_BYTES:
+        raise ValueError(f"임베딩 모델 이름이 {MAX_MODEL_BYTES}바이트를 넘습니다: {segment.model}")
+    header = HEADER.pack(MAGIC, VERSION, dimension, count, model)
+    return header + matrix.tobytes() + "\n".join(segment.keys).encode("utf-8")
+
+
+def _header(buffer):
+    magic, version, dimension, count, model = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("벡터 색인 파일 형식이 올바르지 않습니다.")
+    return dimension, count, model.rstrip(b"\0").decode("utf-8")
+
+
+def _keys(data, count):
+    return data.decode("utf-8").split("\n") if count else []
+
+
+def decode(buffer):
+    dimension, count, model = _header(buffer)
+    end = HEADER.size + count * dimension * 4
+    matrix = np.frombuffer(buffer, dtype="<f4", count=count * dimension, offset=HEADER.size)
+    return Segment(model, _keys(buffer[end:], count), matrix.reshape(count, dimension))
+
+
+def open_file(path):
+    """A segment whose matrix is memory-mapped from `path`."""
+    with open(path, "rb") as f:
+        dimension, count, model = _header(f.read(HEADER.size))
+        f.seek(HEADER.size + count * dimension * 4)
+        keys = _keys(f.read(), count)
+    if not count:
+        return Segment(model, keys, np.zeros((0, dimension), dtype=np.float32))
+    matrix = np.memmap(path, dtype="<f4", mode="r", offset=HEADER.size, shape=(count, dimension))
+    return Segment(model, keys, matrix)
+
+
+def merge(segments):
+    """One segment with the newest row of every key; `segments` are ordered oldest first."""
+    segments = [segment for segment in segments if segment is not None]
+    _check_models(segments)
+    latest = {}
+    for index, segment in enumerate(segments):
+        for row, key in enumerate(segment.keys):
+            latest[key] = (index, row)
+    keys = sorted(latest)
+    dimension = segments[0].matrix.shape[1]
+    matrix = np.empty((len(keys), dimension), dtype=np.float32)
+    for out, key in enumerate(keys):
+        index, row = latest[key]
+        matrix[out] = segments[index].matrix[row]
+    return Segment(segments[0].model, keys, matrix)
+
+
+def _check_models(segments):
+    models = {segment.model for segment in segments}
+    if len(models) > 1:
+        raise ValueError(f"서로 다른 임베딩 모델의 벡터를 합칠 수 없습니다: {sorted(models)}")
+
+
+def top_k(segments, query, k):
+    """[(score, key)] of the k best rows; `segments` are ordered oldest first, query is normalized."""
+    query = np.asarray(query, dtype=np.float32)
+    candidates = []
+    hidden = set()
+    for position, segment in enumerate(reversed(segments)):
+        if not segment.keys:
+            continue
+        scores = np.asarray(segment.matrix @ query, dtype=np.float32)
+        # 더 최근 세그먼트에 같은 키가 있으면 이 세그먼트의 행은 오래된 벡터
+        stale = [segment.positions[key] for key in hidden if key in segment.positions]
+        if stale:
+            scores[stale] = -np.inf
+        # k번째 점수 이상인 행을 모두 후보로 둬야 동점일 때도 페이지마다 같은 순서(키 순)가 나옴
+        n = min(k, len(scores))
+        threshold = np.partition(scores, len(scores) - n)[len(scores) - n]
+        best = np.flatnonzero(scores >= threshold)
+        candidates.extend((float(scores[row]), segment.keys[row]) for row in best if np.isfinite(scores[row]))
+        if position < len(segments) - 1:
+            hidden.update(segment.keys)
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+    return candidates[:k]
+
+
+# --- S3 -------------------------------------------------------------------------------------
+
+
+def _user_prefix(user_id):
+    return f"{INDEX_PREFIX}{user_id}/"
+
+
+def _base_key(user_id):
+    return f"{_user_prefix(user_id)}base.pvi"
+
+
+def _error_code(error):
+    return error.response.get("Error", {}).get("Code")
+
+
+def _list_deltas(user_id):
+    """[(key, ETag)] of a user's deltas, oldest first."""
+    paginator = aws_clients.get_client("s3").get_paginator("list_objects_v2")
+    deltas = []
+    with metrics.phase("s3_list"):
+        for page in paginator.paginate(Bucket=INDEX_BUCKET, Prefix=f"{_user_prefix(user_id)}delta/"):
+            deltas.extend((obj["Key"], obj.get("ETag")) for obj in page.get("Contents", []))
+    return sorted(deltas)
+
+
+def _get(key, **kwargs):
+    """(bytes, ETag) of an index object, or (None, None) when it does not exist."""
+    try:
+        with metrics.phase("s3_get"):
+            response = aws_clients.get_client("s3").get_object(Bucket=INDEX_BUCKET, Key=key, **kwargs)
+            return response["Body"].read(), response.get("ETag")
+    except botocore_exceptions.ClientError as e:
+        if _error_code(e) in ("NoSuchKey", "404"):
+            return None, None
+        raise
+
+
+def append(user_id, segment):
+    """Stores `segment` as a new delta and returns the number of deltas now waiting."""
+    if not INDEX_BUCKET:
+        raise ValueError("VECTOR_INDEX_BUCKET 환경 변수가 설정되지 않았습니다.")
+
+    digest = hashlib.sha1("\n".join(segment.keys).encode("utf-8")).hexdigest()[:12]
+    key = f"{_user_prefix(user_id)}delta/{time.time_ns():020d}-{digest}.pvi"
+    with metrics.phase("s3_put"):
+        aws_clients.get_client("s3").put_object(
+            Bucket=INDEX_BUCKET, Key=key, Body=encode(segment), ContentType="application/octet-stream"
+        )
+    return len(_list_deltas(user_id))
+
+
+def compact(user_id):
+    """Merges the base and the current deltas; False when another compaction got there first."""
+    deltas = _list_deltas(user_id)
+    base_bytes, base_etag = _get(_base_key(user_id))
+
+    segments = [decode(base_bytes) if base_bytes else None]
+    merged_deltas = []
+    for key, _ in deltas:
+        data, _ = _get(key)
+        # 목록 조회 뒤 다른 압축이 지운 델타는 이미 그쪽 base에 들어감
+        if data is not None:
+            segments.append(decode(data))
+            merged_deltas.append(key)
+    if not merged_deltas:
+        return False
+
+    condition = {"IfMatch": base_etag} if base_etag else {"IfNoneMatch": "*"}
+    try:
+        with metrics.phase("s3_put"):
+            aws_clients.get_client("s3").put_object(
+                Bucket=INDEX_BUCKET,
+                Key=_base_key(user_id),
+                Body=encode(merge(segments)),
+                ContentType="application/octet-stream",
+                **condition,
+            )
+    except botocore_exceptions.ClientError as e:
+        if _error_code(e) in ("PreconditionFailed", "ConditionalRequestConflict", "412"):
+            print(f"사용자 '{user_id}'의 벡터 색인을 다른 호출이 먼저 압축했습니다.")
+            return False
+        raise
+
+    with metrics.phase("s3_delete"):
+        for start in range(0, len(merged_deltas), 1000):
+            aws_clients.get_client("s3").delete_objects(
+                Bucket=INDEX_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in merged_deltas[start : start + 1000]], "Quiet": True},
+            )
+    return True
+
+
+# 같은 컨테이너에서는 base를 ETag가 바뀔 때만 다시 받음: user_id -> (etag, Segment)
+_bases = {}
+_bases_lock = threading.Lock()
+
+
+def _cached_base(user_id):
+    with _bases_lock:
+        cached = _bases.get(user_id)
+
+    kwargs = {"IfNoneMatch": cached[0]} if cached else {}
+    try:
+        data, etag = _get(_base_key(user_id), **kwargs)
+    except botocore_exceptions.ClientError as e:
+        if cached and _error_code(e) in ("304", "NotModified"):
+            return cached[1]
+        raise
+    if data is None:
+        return None
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{hashlib.sha1(user_id.encode('utf-8')).hexdigest()}-{time.time_ns()}.pvi")
+    with open(path, "wb") as f:
+        f.write(data)
+    segment = open_file(path)
+    # 열린 memmap은 파일이 지워져도 유효하므로 /tmp 공간만 바로 돌려줌
+    os.unlink(path)
+
+    with _bases_lock:
+        _bases[user_id] = (etag, segment)
+    return segment
+
+
+# 델타는 키마다 한 번만 쓰이므로 목록의 ETag가 같으면 다시 받지 않음: user_id -> {key: (etag, Segment)}
+_deltas = {}
+
+
+def _fetch_delta(key):
+    data, etag = _get(key)
+    return key, etag, decode(data) if data is not None else None
+
+
+def _cached_deltas(user_id):
+    listed = _list_deltas(user_id)
+    with _bases_lock:
+        cached = _deltas.get(user_id, {})
+    fresh = {key: cached[key] for key, etag in listed if key in cached and cached[key][0] == etag}
+
+    missing = [key for key, _ in listed if key not in fresh]
+    if missing:
+        with futures.ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(missing))) as executor:
+            for key, etag, segment in executor.map(_fetch_delta, missing):
+                # 목록 조회 뒤 압축으로 지워진 델타는 아래에서 읽는 base에 들어 있음
+                if segment is not None:
+                    fresh[key] = (etag, segment)
+
+    # 목록에서 사라진(압축된) 델타는 캐시에서도 버림
+    with _bases_lock:
+        _deltas[user_id] = fresh
+    return [fresh[key][1] for key, _ in listed if key in fresh]
+
+
+def load(user_id):
+    """Segments of a user's index, oldest first (base, then deltas)."""
+    # 델타를 먼저 읽고 base를 나중에 읽어야, 그 사이 압축으로 지워진 델타가 새 base에 들어 있음
+    deltas = _cached_deltas(user_id)
+    base = _cached_base(user_id)
+    segments = ([base] if base else []) + deltas
+    _check_models(segments)
+    return segments
@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+COMMON_PYTHON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(COMMON_PYTHON))
+
+if COMMON_PYTHON not in sys.path:
+    sys.path.insert(0, COMMON_PYTHON)
+
+# 테스트가 실제 AWS 자격 증명을 읽거나 호출하지 않도록 고정 (서명은 이 값으로 만들어짐)
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-northeast-2")
+os.environ["AWS_ACCESS_KEY_ID"] = "AKIDEXAMPLE"
+os.environ["AWS_SECRET_ACCESS_KEY"] = "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY"
+os.environ.pop("AWS_SESSION_TOKEN", None)
+os.environ.pop("AWS_PROFILE", None)
+
+
+@pytest.fixture
+def load_lambda(monkeypatch):
+    """Loads `<function_dir>/lambda_function.py` as a fresh module, after applying env overrides."""
+
+    def load(function_dir, **env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        path = os.path.join(REPO_ROOT, function_dir, "lambda_function.py")
+        module_name = "test_" + function_dir.replace("/", "_").replace("-", "_")
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
+
+
+@pytest.fixture
+def stub_client():
+    """Overrides an aws_clients service with a real botocore client wrapped in a Stubber."""
+    import botocore.session
+    from botocore.stub import Stubber
+
+    from prism_common import aws_clients
+
+    stubbers = []
+
+    def stub(service_name):
+        client = botocore.session.get_session().create_client(service_name, region_name="ap-northeast-2")
+        stubber = Stubber(client)
+        stubber.activate()
+        stubbers.append(stubber)
+        aws_clients.override(service_name, client)
+        return stubber
+
+    yield stub
+    for stubber in stubbers:
+        stubber.deactivate()
+    aws_clients.reset()
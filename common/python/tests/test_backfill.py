@@ -0,0 +1,127 @@
+import argparse
+import importlib.util
+import json
+import os
+
+import pytest
+
+from prism_common import aws_clients, transcode_status
+
+BACKFILL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "tools",
+    "backfill",
+    "backfill.py",
+)
+AUTO = {"mode": "auto"}
+
+
+@pytest.fixture(scope="module")
+def backfill():
+    spec = importlib.util.spec_from_file_location("test_tools_backfill", BACKFILL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _args(**overrides):
+    args = {
+        "targets": ["transcode"],
+        "status_table": "status",
+        "queue_url": "https://sqs.ap-northeast-2.amazonaws.com/123456789012/transcode",
+        "avif_encoding": AUTO,
+        "force": False,
+        "dry_run": False,
+    }
+    return argparse.Namespace(**{**args, **overrides})
+
+
+def _status(key, status, encoding_key):
+    return {"SourceKey": {"S": key}, "Status": {"S": status}, "EncodingKey": {"S": encoding_key}}
+
+
+def _expect_status_lookup(dynamodb, keys, statuses):
+    dynamodb.add_response(
+        "batch_get_item",
+        {"Responses": {"status": statuses}},
+        {
+            "RequestItems": {
+                "status": {
+                    "Keys": [{"SourceKey": {"S": key}} for key in keys],
+                    "ProjectionExpression": "SourceKey, #st, EncodingKey",
+                    "ExpressionAttributeNames": {"#st": "Status"},
+                }
+            }
+        },
+    )
+
+
+def _expect_enqueue(sqs, args, keys):
+    entries = [
+        {
+            "Id": str(index),
+            "MessageBody": json.dumps({"sourceKey": key, "avifEncoding": args.avif_encoding, "origin": "backfill"}),
+        }
+        for index, key in enumerate(keys)
+    ]
+    sqs.add_response(
+        "send_message_batch",
+        {"Successful": [{"Id": entry["Id"], "MessageId": entry["Id"], "MD5OfMessageBody": "-"} for entry in entries], "Failed": []},
+        {"QueueUrl": args.queue_url, "Entries": entries},
+    )
+
+
+KEYS = ["current.jpg", "old-version.jpg", "unversioned.jpg", "failed.jpg", "missing.jpg"]
+
+
+def _statuses():
+    current = transcode_status.encoding_key(AUTO)
+    return [
+        _status("current.jpg", "CONVERTED", current),
+        # 보정 테이블 버전이 바뀌기 전에 변환된 이미지
+        _status("old-version.jpg", "CONVERTED", json.dumps({"mode": "auto", "paramsVersion": "stats-v0"}, sort_keys=True)),
+        # EncodingKey에 버전이 들어가기 전에 기록된 항목
+        _status("unversioned.jpg", "CONVERTED", json.dumps(AUTO)),
+        _status("failed.jpg", "FAILED", current),
+    ]
+
+
+@pytest.mark.parametrize(
+    "force, expected",
+    [
+        (False, ["old-version.jpg", "unversioned.jpg", "failed.jpg", "missing.jpg"]),
+        (True, KEYS),
+    ],
+)
+def test_enqueue_transcodes_skips_only_current_conversions(backfill, stub_client, force, expected):
+    dynamodb, sqs = stub_client("dynamodb"), stub_client("sqs")
+    args = _args(force=force)
+    _expect_status_lookup(dynamodb, KEYS, _statuses())
+    _expect_enqueue(sqs, args, expected)
+    counts, failures = backfill.Counter(), []
+
+    backfill.Backfill(args, aws_clients).enqueue_transcodes(
+        [{"OriginalKey": {"S": key}} for key in KEYS], counts, failures
+    )
+
+    assert counts["transcode.enqueued"] == len(expected)
+    assert counts["transcode.skipped"] == len(KEYS) - len(expected)
+    assert failures == []
+    dynamodb.assert_no_pending_responses()
+    sqs.assert_no_pending_responses()
+
+
+def test_params_version_bump_re_enqueues_converted_images(backfill, stub_client, monkeypatch):
+    dynamodb = stub_client("dynamodb")
+    # 기록된 상태는 stats-v1 기준, 이번 실행은 stats-v2
+    _expect_status_lookup(dynamodb, KEYS, _statuses())
+    monkeypatch.setattr(transcode_status, "AVIF_PARAMS_VERSION", "stats-v2")
+    counts = backfill.Counter()
+
+    # 드라이런: 보낼 개수만 셈
+    backfill.Backfill(_args(dry_run=True), aws_clients).enqueue_transcodes(
+        [{"OriginalKey": {"S": key}} for key in KEYS], counts, []
+    )
+
+    assert counts == {"transcode.pending": len(KEYS)}
+    dynamodb.assert_no_pending_responses()
@@ -0,0 +1,139 @@
+import pytest
+
+from prism_common import aws_clients, bedrock_governor
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _governor(store=None, requests_per_minute=60, tokens_per_minute=6000):
+    clock = _Clock()
+    governor = bedrock_governor.Governor(
+        store or bedrock_governor.MemoryStore(),
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+    return governor, clock
+
+
+def test_estimate_tokens_counts_text_images_and_max_tokens():
+    request = {
+        "system": [{"text": "a" * 40}],
+        "messages": [{"role": "user", "content": [{"image": {}}, {"image": {}}, {"text": "b" * 80}]}],
+        "inferenceConfig": {"maxTokens": 100},
+    }
+    # 크기를 아는 이미지 하나는 750픽셀당 1토큰, 모르는 이미지는 최대치
+    expected = 120 // 4 + 300 * 250 // 750 + bedrock_governor.MAX_IMAGE_TOKENS + 100
+    assert bedrock_governor.estimate_tokens(request, image_sizes=[(300, 250)]) == expected
+
+
+def test_acquire_waits_for_the_refill_it_needs():
+    governor, clock = _governor()
+    for _ in range(60):
+        assert governor.acquire("m", 10) == 0
+
+    # 요청 버킷이 비었으므로 1분에 60개 -> 약 1초 기다림
+    waited = governor.acquire("m", 10)
+    assert waited == pytest.approx(1.0, abs=0.01)
+    assert sum(clock.sleeps) == pytest.approx(waited)
+
+
+def test_background_leaves_the_reserve_to_interactive(monkeypatch):
+    monkeypatch.setattr(bedrock_governor, "BACKGROUND_RESERVE", 0.5)
+    monkeypatch.setattr(bedrock_governor, "BACKGROUND_MAX_WAIT_SECONDS", 0)
+    governor, _ = _governor()
+    for _ in range(30):
+        governor.acquire("m", 10, priority=bedrock_governor.BACKGROUND)
+
+    with pytest.raises(bedrock_governor.BedrockDeferred) as deferred:
+        governor.acquire("m", 10, priority=bedrock_governor.BACKGROUND)
+    assert deferred.value.retry_after == pytest.approx(1.0, abs=0.05)
+    assert governor.acquire("m", 10) == 0
+
+
+def test_settle_refunds_the_unused_estimate():
+    governor, _ = _governor()
+    governor.acquire("m", 1000)
+    governor.settle("m", 1000, 400)
+
+    # 정산 쓰기는 1밀리초 뒤의 상태이므로 그만큼의 보충은 허용
+    assert governor.store.load("m")["Tokens"] == pytest.approx(6000 - 400, abs=1)
+
+
+class _InterleavedStore(bedrock_governor.MemoryStore):
+    """Runs `between` once, right after the next load returns (another caller's write)."""
+
+    def __init__(self):
+        super().__init__()
+        self.between = None
+
+    def load(self, bucket_id):
+        state = super().load(bucket_id)
+        between, self.between = self.between, None
+        if between:
+            between()
+        return state
+
+
+def test_settle_between_a_read_and_its_write_is_not_lost():
+    store = _InterleavedStore()
+    governor, _ = _governor(store)
+    governor.acquire("m", 1000)
+
+    # 다른 호출의 정산이 이 예약의 읽기와 조건부 쓰기 사이에 끼어듦
+    store.between = lambda: governor.settle("m", 1000, 400)
+    governor.acquire("m", 100)
+
+    # 예약 쓰기는 충돌로 다시 읽으므로 환불된 600토큰이 남아 있어야 함 (밀리초 단위 보충은 무시)
+    assert store.load("m")["Tokens"] == pytest.approx(6000 - 400 - 100, abs=1)
+
+
+class _ContendedStore(bedrock_governor.MemoryStore):
+    """Loses the conditional write `conflicts` times before behaving normally."""
+
+    def __init__(self, conflicts):
+        super().__init__()
+        self.conflicts = conflicts
+
+    def save(self, bucket_id, state, expected_updated_at):
+        if self.conflicts:
+            self.conflicts -= 1
+            return False
+        return super().save(bucket_id, state, expected_updated_at)
+
+
+def test_conflicts_back_off_with_growing_jitter():
+    governor, clock = _governor(_ContendedStore(conflicts=3))
+
+    assert governor.acquire("m", 10) == 0
+    assert len(clock.sleeps) == 3
+    for attempt, delay in enumerate(clock.sleeps, start=1):
+        assert 0 <= delay <= bedrock_governor.CONFLICT_BASE_DELAY_SECONDS * 2 ** (attempt - 1)
+
+
+def test_persistent_conflicts_return_a_bounded_wait():
+    governor, _ = _governor(_ContendedStore(conflicts=bedrock_governor._MAX_CONFLICTS))
+
+    wait = governor._try_acquire("m", {"Requests": 1.0, "Tokens": 10.0}, bedrock_governor.INTERACTIVE)
+    assert 0 <= wait <= bedrock_governor.CONFLICT_MAX_DELAY_SECONDS
+
+
+def test_bedrock_client_does_not_retry():
+    aws_clients.reset()
+    try:
+        config = aws_clients.get_client("bedrock-runtime").meta.config
+        assert config.retries["total_max_attempts"] == 1
+    finally:
+        aws_clients.reset()
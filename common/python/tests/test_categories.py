@@ -0,0 +1,186 @@
+import pytest
+
+from prism_common import aws_clients, categories
+
+USER = "user-1"
+NOW = "2026-01-01T00:00:00+09:00"
+
+
+def _stored(name, keys, version=1, description=""):
+    return {
+        "UserID": USER,
+        "CategoryID": categories.category_id(name),
+        "CategoryName": name,
+        "Description": description,
+        "ImageKeys": list(keys),
+        "ImageCount": len(keys),
+        "Version": version,
+    }
+
+
+def _result(*categories_):
+    return {"categories": [{"categoryName": name, "imageKeys": keys} for name, keys in categories_]}
+
+
+def test_category_id_ignores_case_and_whitespace():
+    assert categories.category_id("  Summer   Trip ") == categories.category_id("summer trip")
+    assert categories.category_id("Summer") != categories.category_id("Winter")
+
+
+def test_plan_skips_unchanged_and_keeps_key_order():
+    existing = [_stored("Trip", ["a", "b", "c"], version=3), _stored("Food", ["x"], version=2)]
+    puts, deletes = categories.plan(USER, existing, _result(("Trip", ["d", "c", "a"]), ("Food", ["x"])), NOW)
+
+    assert deletes == []
+    ((item, expected),) = puts
+    assert expected == 3
+    assert item["CategoryName"] == "Trip"
+    # 남은 키는 기존 순서, 새 키는 뒤에
+    assert item["ImageKeys"] == ["a", "c", "d"]
+    assert item["ImageCount"] == 3 and item["Version"] == 4
+
+
+def test_plan_merges_duplicate_names_and_deletes_missing():
+    existing = [_stored("Old", ["z"], version=5)]
+    puts, deletes = categories.plan(USER, existing, _result(("Pets", ["a", "b"]), (" pets ", ["b", "c"])), NOW)
+
+    ((item, expected),) = puts
+    assert expected is None and item["Version"] == 1
+    assert item["ImageKeys"] == ["a", "b", "c"]
+    assert deletes == [({"UserID": USER, "CategoryID": categories.category_id("Old")}, 5)]
+
+
+def test_write_sends_versioned_actions_in_chunks(stub_client, monkeypatch):
+    monkeypatch.setattr(categories, "MAX_TRANSACTION_ITEMS", 2)
+    puts = [
+        (_stored("New", ["a"]), None),
+        (_stored("Trip", ["b"], version=4), 3),
+    ]
+    deletes = [({"UserID": USER, "CategoryID": "cat-old"}, 7)]
+    stubber = stub_client("dynamodb")
+
+    def expect(*actions):
+        stubber.add_response("transact_write_items", {}, {"TransactItems": list(actions)})
+
+    item = lambda stored: categories.ddb_codec.encode_value(stored)["M"]
+    expect(
+        {
+            "Put": {
+                "TableName": "categories",
+                "Item": item(puts[0][0]),
+                "ConditionExpression": "attribute_not_exists(CategoryID)",
+            }
+        },
+        {
+            "Put": {
+                "TableName": "categories",
+                "Item": item(puts[1][0]),
+                "ConditionExpression": "Version = :expected",
+                "ExpressionAttributeValues": {":expected": {"N": "3"}},
+            }
+        },
+    )
+    expect(
+        {
+            "Delete": {
+                "TableName": "categories",
+                "Key": {"UserID": {"S": USER}, "CategoryID": {"S": "cat-old"}},
+                "ConditionExpression": "Version = :expected",
+                "ExpressionAttributeValues": {":expected": {"N": "7"}},
+            }
+        }
+    )
+
+    categories.write("categories", puts, deletes)
+    stubber.assert_no_pending_responses()
+
+
+class _CategoryTable:
+    def __init__(self, items):
+        self.items = items
+
+    def query(self, **kwargs):
+        return {"Items": self.items}
+
+
+def test_save_rolls_forward_after_a_conflict_in_a_later_transaction(stub_client):
+    result = _result(*((f"Category {index}", [f"k{index}"]) for index in range(120)))
+    first_puts, _ = categories.plan(USER, [], result, NOW)
+    stubber = stub_client("dynamodb")
+    stubber.add_response("transact_write_items", {})
+    stubber.add_client_error("transact_write_items", service_error_code="TransactionCanceledException")
+    # 이어 쓸 때는 첫 트랜잭션의 100개가 이미 저장되어 있어 나머지 20개만 씀
+    stubber.add_response("transact_write_items", {})
+    table = _CategoryTable([item for item, _ in first_puts[: categories.MAX_TRANSACTION_ITEMS]])
+
+    existing, puts, deletes = categories.save(table, "categories", USER, [], result, NOW)
+
+    assert len(existing) == 100 and deletes == []
+    assert [item["CategoryName"] for item, _ in puts] == [f"Category {index}" for index in range(100, 120)]
+    stubber.assert_no_pending_responses()
+
+
+def test_write_reports_a_partial_write_and_save_gives_up(stub_client, monkeypatch):
+    monkeypatch.setattr(categories, "MAX_RESUME_ATTEMPTS", 1)
+    result = _result(*((f"Category {index}", [f"k{index}"]) for index in range(101)))
+    stubber = stub_client("dynamodb")
+    stubber.add_response("transact_write_items", {})
+    stubber.add_client_error("transact_write_items", service_error_code="TransactionCanceledException")
+
+    with pytest.raises(categories.PartialWrite) as partial:
+        categories.save(_CategoryTable([]), "categories", USER, [], result, NOW)
+    assert partial.value.applied == 100
+
+
+def test_save_conflict_before_any_commit_leaves_everything(stub_client):
+    stubber = stub_client("dynamodb")
+    stubber.add_client_error("transact_write_items", service_error_code="TransactionCanceledException")
+
+    with pytest.raises(categories.botocore_exceptions.ClientError):
+        categories.save(_CategoryTable([]), "categories", USER, [], _result(("Trip", ["a"])), NOW)
+    stubber.assert_no_pending_responses()
+
+
+class _Table:
+    def __init__(self, item):
+        self.item = item
+        self.requests = []
+
+    def get_item(self, **kwargs):
+        self.requests.append(kwargs)
+        return {"Item": self.item} if self.item else {}
+
+
+class _Resource:
+    def __init__(self, table):
+        self.table = table
+
+    def Table(self, name):
+        return self.table
+
+
+@pytest.fixture
+def resolver(load_lambda):
+    yield load_lambda("api/appsync/appsync-category-resolver")
+    aws_clients.reset()
+
+
+def test_get_category_reads_only_the_page(resolver):
+    table = _Table({**_stored("Trip", ["c", "d"], version=2), "ImageCount": 5})
+    aws_clients.override("dynamodb", _Resource(table))
+
+    result = resolver.get_category(USER, {"categoryId": "cat-1", "limit": 2, "nextToken": None})
+
+    request = table.requests[0]
+    assert request["ProjectionExpression"].endswith("#k[0], #k[1]")
+    assert request["ExpressionAttributeNames"]["#k"] == "ImageKeys"
+    assert [entry["imageKey"] for entry in result["items"]] == ["c", "d"]
+    assert resolver.decode_token(result["nextToken"]) == {"offset": 2, "version": 2}
+
+
+def test_get_category_rejects_token_of_older_version(resolver):
+    aws_clients.override("dynamodb", _Resource(_Table(_stored("Trip", ["a"], version=3))))
+    token = resolver.encode_token({"offset": 2, "version": 2})
+
+    with pytest.raises(ValueError, match="Stale nextToken"):
+        resolver.get_category(USER, {"categoryId": "cat-1", "limit": 2, "nextToken": token})
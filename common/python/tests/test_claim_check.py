@@ -0,0 +1,94 @@
+import decimal
+import gzip
+import io
+import json
+
+import pytest
+from botocore.stub import ANY
+
+from prism_common import claim_check
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    monkeypatch.setattr(claim_check, "CLAIM_CHECK_BUCKET", "claims")
+    monkeypatch.setattr(claim_check, "_cache", {})
+    return "claims"
+
+
+def _expect_put(s3, bucket):
+    s3.add_response(
+        "put_object",
+        {},
+        {
+            "Bucket": bucket,
+            "Key": ANY,
+            "Body": ANY,
+            "ContentType": "application/json",
+            "ContentEncoding": "gzip",
+        },
+    )
+
+
+def test_shrink_leaves_small_payloads_alone(bucket):
+    payload = {"images": ["a"] * 10}
+
+    assert claim_check.shrink(payload, ["images"], "stage") is payload
+
+
+def test_shrink_without_bucket_never_offloads(monkeypatch):
+    monkeypatch.setattr(claim_check, "CLAIM_CHECK_BUCKET", None)
+    payload = {"images": ["a" * 100] * 100}
+
+    assert claim_check.shrink(payload, ["images"], "stage", budget=100) is payload
+
+
+def test_shrink_offloads_largest_fields_until_it_fits(bucket, stub_client):
+    s3 = stub_client("s3")
+    _expect_put(s3, bucket)
+    payload = {
+        "images": ["x" * 100] * 50,
+        "messages": ["y" * 100] * 20,
+        "tiny": ["z"] * 10,
+        "userID": "u1",
+    }
+    budget = claim_check.encoded_size(payload) - 4000
+
+    result = claim_check.shrink(payload, ["images", "messages", "tiny"], "stage", budget=budget)
+
+    # 가장 큰 필드 하나만 옮겨도 예산 안에 들어오므로 나머지는 그대로
+    assert claim_check.is_reference(result["images"])
+    assert result["messages"] == payload["messages"] and result["tiny"] == payload["tiny"]
+    assert claim_check.encoded_size(result) <= budget
+    reference = result["images"][claim_check.REFERENCE_FIELD]
+    assert reference["bucket"] == bucket
+    assert reference["key"].startswith(f"{claim_check.CLAIM_CHECK_PREFIX}stage/images/")
+    assert reference["bytes"] == claim_check.encoded_size(payload["images"])
+    s3.assert_no_pending_responses()
+
+
+def test_resolve_reads_once_and_returns_fresh_copies(bucket, stub_client):
+    s3 = stub_client("s3")
+    value = {"count": decimal.Decimal("3"), "ratio": decimal.Decimal("0.5"), "keys": {"b", "a"}}
+    _expect_put(s3, bucket)
+    reference = claim_check.offload(value, "stage")
+    body = gzip.compress(json.dumps({"count": 3, "ratio": 0.5, "keys": ["a", "b"]}).encode("utf-8"))
+    s3.add_response(
+        "get_object",
+        {"Body": io.BytesIO(body)},
+        {"Bucket": bucket, "Key": reference[claim_check.REFERENCE_FIELD]["key"]},
+    )
+
+    first = claim_check.resolve(reference)
+    first["count"] = 99
+    # 두 번째는 캐시에서 풀리므로 S3 응답을 더 등록하지 않음
+    assert claim_check.resolve(reference) == {"count": 3, "ratio": 0.5, "keys": ["a", "b"]}
+    assert claim_check.resolve(["not", "a", "reference"]) == ["not", "a", "reference"]
+    s3.assert_no_pending_responses()
+
+
+def test_offload_requires_a_bucket(monkeypatch):
+    monkeypatch.setattr(claim_check, "CLAIM_CHECK_BUCKET", None)
+
+    with pytest.raises(ValueError):
+        claim_check.offload({"a": 1}, "stage")
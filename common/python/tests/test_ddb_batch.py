@@ -0,0 +1,65 @@
+import pytest
+
+from prism_common import ddb_batch
+
+
+class _Client:
+    """Answers batch calls from a list of canned responses and records each request."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def batch_get_item(self, RequestItems):
+        self.requests.append(RequestItems)
+        return self.responses.pop(0)
+
+    batch_write_item = batch_get_item
+
+
+def _keys(*names):
+    return {"t": {"Keys": [{"K": {"S": name}} for name in names]}}
+
+
+def test_get_retries_unprocessed_keys_with_backoff():
+    client = _Client(
+        [
+            {"Responses": {"t": [{"K": {"S": "a"}}]}, "UnprocessedKeys": _keys("b")},
+            {"Responses": {"t": [{"K": {"S": "b"}}]}, "UnprocessedKeys": {}},
+        ]
+    )
+    delays = []
+    responses, unprocessed = ddb_batch.get(client, _keys("a", "b"), sleep=delays.append)
+
+    assert [item["K"]["S"] for item in responses["t"]] == ["a", "b"]
+    assert unprocessed == {}
+    assert client.requests[1] == _keys("b")
+    assert len(delays) == 1 and 0 <= delays[0] <= ddb_batch.BASE_DELAY_SECONDS
+
+
+def test_get_gives_up_after_max_attempts():
+    client = _Client([{"Responses": {}, "UnprocessedKeys": _keys("a")}] * 3)
+    delays = []
+    responses, unprocessed = ddb_batch.get(client, _keys("a"), max_attempts=3, sleep=delays.append)
+
+    assert responses == {}
+    assert unprocessed == _keys("a")
+    assert ddb_batch.count(unprocessed) == 1
+    assert len(client.requests) == 3 and len(delays) == 2
+
+
+def test_write_returns_remaining_items():
+    items = {"t": [{"PutRequest": {"Item": {"K": {"S": "a"}}}}, {"PutRequest": {"Item": {"K": {"S": "b"}}}}]}
+    remaining = {"t": items["t"][1:]}
+    client = _Client([{"UnprocessedItems": remaining}] * 2)
+
+    assert ddb_batch.write(client, items, max_attempts=2, sleep=lambda _: None) == remaining
+    assert ddb_batch.count(remaining) == 1
+    assert ddb_batch.write(_Client([{}]), items) == {}
+
+
+@pytest.mark.parametrize("attempt", [1, 3, 10, 30])
+def test_backoff_delay_is_capped(attempt):
+    for _ in range(20):
+        delay = ddb_batch.backoff_delay(attempt)
+        assert 0 <= delay <= min(ddb_batch.MAX_DELAY_SECONDS, ddb_batch.BASE_DELAY_SECONDS * 2 ** (attempt - 1))
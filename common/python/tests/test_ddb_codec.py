@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from prism_common import ddb_codec
+
+ITEM = {
+    "AlbumID": "u1/2026-01-02",
+    "OriginalKey": "album/u1/2026-01-02/a.jpg",
+    "UserID": "u1",
+    "Tags": ["beach", "sunset"],
+    "Display": {
+        "Version": 2,
+        "ImageName": "a.jpg",
+        "ThumbnailKeys": {"small": "thumb/s/a.avif", "large": "thumb/l/a.avif"},
+        "TagList": ["sunset", "beach"],
+    },
+    "Variants": [
+        {"Format": "avif", "Width": 640, "Height": 480, "Key": "v/a-640.avif", "Bytes": 51234},
+    ],
+    "Extra": {"ratio": 0.75, "flags": [True, None], "count": 3},
+}
+
+
+def test_metadata_round_trip():
+    typed = ddb_codec.METADATA.encode(ITEM)
+
+    assert typed["Tags"] == {"SS": ["beach", "sunset"]}
+    assert typed["Variants"]["L"][0]["M"]["Width"] == {"N": "640"}
+    assert ddb_codec.METADATA.decode(typed) == ITEM
+
+
+def test_decode_matches_the_resource_api_after_conversion():
+    # boto3 resource API가 돌려주던 값(Decimal, set)을 핸들러가 변환하던 결과와 같아야 함
+    typed = TypeSerializer().serialize(
+        {"n": Decimal("3"), "f": Decimal("0.5"), "ss": {"b", "a"}, "ns": {Decimal("2"), Decimal("1")}, "l": [Decimal("7")]}
+    )
+    expected = TypeDeserializer().deserialize(typed)
+
+    decoded = ddb_codec.decode_value(typed)
+    assert decoded == {"n": 3, "f": 0.5, "ss": ["a", "b"], "ns": [1, 2], "l": [7]}
+    assert decoded["n"] == expected["n"] and decoded["f"] == expected["f"]
+    assert set(decoded["ss"]) == expected["ss"] and set(decoded["ns"]) == expected["ns"]
+    assert isinstance(decoded["n"], int) and isinstance(decoded["f"], float)
+
+
+@pytest.mark.parametrize(
+    "value, typed",
+    [
+        (True, {"BOOL": True}),
+        (1, {"N": "1"}),
+        (2.0, {"N": "2"}),
+        (Decimal("1.5"), {"N": "1.5"}),
+        (None, {"NULL": True}),
+        ({"b", "a"}, {"SS": ["a", "b"]}),
+        (b"\x00", {"B": b"\x00"}),
+        (("x", 1), {"L": [{"S": "x"}, {"N": "1"}]}),
+    ],
+)
+def test_encode_value(value, typed):
+    assert ddb_codec.encode_value(value) == typed
+
+
+def test_encode_value_rejects_unstorable_values():
+    with pytest.raises(ValueError):
+        ddb_codec.encode_value(set())
+    with pytest.raises(TypeError):
+        ddb_codec.encode_value(object())
+
+
+def test_schema_omits_missing_values_and_tolerates_other_types():
+    typed = ddb_codec.STATS.encode({"UserID": "u1", "NewImageKeys": set(), "LastSortedAt": None, "ImageCount": 4})
+
+    assert typed == {"UserID": {"S": "u1"}, "ImageCount": {"N": "4"}}
+    # 스키마와 다른 타입으로 저장된 값은 일반 규칙으로 읽음
+    assert ddb_codec.STATS.decode({"ImageCount": {"NULL": True}, "SortStatus": {"N": "1"}}) == {
+        "ImageCount": None,
+        "SortStatus": 1,
+    }
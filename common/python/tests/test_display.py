@@ -0,0 +1,104 @@
+import pytest
+
+from prism_common import display, presign
+
+ORIGINAL_KEY = "album/u1/2026-01-02/IMG_0001.jpg"
+
+VARIANTS = [
+    {"Format": "avif", "Width": 640, "Height": 480, "Key": "album/u1/2026-01-02/variants/IMG_0001-640w.avif"},
+    {"Format": "webp", "Width": 640, "Height": 480, "Key": "album/u1/2026-01-02/variants/IMG_0001-640w.webp"},
+    {"Format": "webp", "Width": 1280, "Height": 960, "Key": "album/u1/2026-01-02/variants/IMG_0001-1280w.webp"},
+]
+
+
+def test_build_display():
+    projection = display.build_display(ORIGINAL_KEY, "2026-01-02T03:04:05+00:00", ["sunset", "", "beach"])
+
+    assert projection == {
+        "Version": display.VERSION,
+        "ImageName": "IMG_0001.jpg",
+        "ThumbnailKeys": {
+            "jpg": "album/u1/2026-01-02/thumbnail/IMG_0001.jpg",
+            "webp": "album/u1/2026-01-02/thumbnail/IMG_0001.webp",
+            "avif": "album/u1/2026-01-02/thumbnail/IMG_0001.avif",
+        },
+        "TranscodedKey": "album/u1/2026-01-02/transcoded/IMG_0001.avif",
+        "FormattedCreatedAt": "2026년 01월 02일 PM 12:04",
+        "TagList": ["beach", "sunset"],
+    }
+
+
+@pytest.mark.parametrize("created_at, expected", [(None, None), ("", None), ("어제", "어제")])
+def test_format_created_at_passes_unparseable_values_through(created_at, expected):
+    assert display.format_created_at(created_at) == expected
+
+
+@pytest.fixture
+def resolver(load_lambda, monkeypatch):
+    # 서명 대신 버킷/키가 드러나는 URL을 돌려주어 어떤 객체를 가리키는지 확인
+    monkeypatch.setattr(presign, "presigned_get_url", lambda bucket, key, expires_in=3600: f"s3://{bucket}/{key}")
+    return load_lambda("api/appsync/appsync-metadata-resolver", PROCESSED_BUCKET="processed")
+
+
+def _item(**fields):
+    return {"OriginalKey": ORIGINAL_KEY, "SourceBucket": "source", "CreatedAt": "2026-01-02T03:04:05+00:00", **fields}
+
+
+def test_stored_display_is_merged_as_is(resolver):
+    stored = dict(
+        display.build_display(ORIGINAL_KEY, None, ["beach"]),
+        ImageName="renamed.jpg",
+        FormattedCreatedAt="저장 시점 값",
+    )
+
+    item = resolver.generate_dynamic_fields(_item(Tags=["beach"], Display=stored))
+
+    assert "Display" not in item and "Variants" not in item
+    assert item["ImageName"] == "renamed.jpg"
+    assert item["FormattedCreatedAt"] == "저장 시점 값"
+    assert item["Tags"] == ["beach"]
+    assert item["DisplayUrl"] == item["presignedUrl"] == f"s3://source/{ORIGINAL_KEY}"
+    assert item["ThumbnailUrl"] == "s3://processed/album/u1/2026-01-02/thumbnail/IMG_0001.jpg"
+    # viewportWidth가 없으면 반응형 필드를 계산하지 않음
+    assert "VariantUrl" not in item and "Srcset" not in item
+
+
+def test_item_without_display_is_projected_at_read_time(resolver):
+    item = resolver.generate_dynamic_fields(_item(Tags=["sunset", "beach"]), "webp")
+
+    assert item["ImageName"] == "IMG_0001.jpg"
+    assert item["FormattedCreatedAt"] == "2026년 01월 02일 PM 12:04"
+    assert item["Tags"] == ["beach", "sunset"]
+    assert item["ThumbnailUrl"] == "s3://processed/album/u1/2026-01-02/thumbnail/IMG_0001.webp"
+
+
+@pytest.mark.parametrize(
+    "arguments, expected_key, expected_width",
+    [
+        ({"viewportWidth": 600}, "variants/IMG_0001-640w.webp", 640),
+        ({"viewportWidth": 600, "acceptFormats": ["image/avif", "image/webp"]}, "variants/IMG_0001-640w.avif", 640),
+        ({"viewportWidth": 400, "devicePixelRatio": 2}, "variants/IMG_0001-1280w.webp", 1280),
+        ({"viewportWidth": 641}, "variants/IMG_0001-1280w.webp", 1280),
+    ],
+)
+def test_viewport_width_chooses_the_variant(resolver, arguments, expected_key, expected_width):
+    item = resolver.generate_dynamic_fields(_item(Variants=list(VARIANTS)), "jpg", arguments)
+
+    assert item["VariantUrl"] == f"s3://processed/album/u1/2026-01-02/{expected_key}"
+    assert item["VariantWidth"] == expected_width
+    assert item["Srcset"].endswith(" 1280w")
+
+
+def test_missing_variant_falls_back_to_the_original(resolver):
+    item = resolver.generate_dynamic_fields(_item(Variants=list(VARIANTS)), "jpg", {"viewportWidth": 1000, "devicePixelRatio": 3})
+
+    assert item["VariantUrl"] == item["DisplayUrl"] == f"s3://source/{ORIGINAL_KEY}"
+    assert item["VariantWidth"] is None and item["VariantFormat"] is None
+
+
+def test_item_without_variants_uses_its_thumbnails(resolver):
+    item = resolver.generate_dynamic_fields(_item(), "jpg", {"viewportWidth": 300})
+
+    # 썸네일은 THUMBNAIL_WIDTH 너비로 간주
+    assert item["VariantUrl"] == "s3://processed/album/u1/2026-01-02/thumbnail/IMG_0001.webp"
+    assert item["Srcset"] == f"s3://processed/album/u1/2026-01-02/thumbnail/IMG_0001.webp {display.THUMBNAIL_WIDTH}w"
@@ -0,0 +1,43 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from prism_common import bedrock_governor, embeddings
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    governor = bedrock_governor.Governor(bedrock_governor.MemoryStore())
+    monkeypatch.setattr(bedrock_governor, "_governor", governor)
+    return governor
+
+
+def test_bedrock_embedder_calls_through_the_governor(governor, stub_client):
+    stubber = stub_client("bedrock-runtime")
+    body = json.dumps({"embedding": [3.0, 4.0], "inputTextTokenCount": 5}).encode("utf-8")
+    stubber.add_response(
+        "invoke_model",
+        {"body": io.BytesIO(body), "contentType": "application/json"},
+        {
+            "modelId": "titan",
+            "body": json.dumps({"inputText": "바다", "dimensions": 2, "normalize": True}),
+        },
+    )
+
+    vectors = embeddings.BedrockEmbedder(dimension=2, model_id="titan").embed(["바다"])
+
+    np.testing.assert_allclose(vectors, [[0.6, 0.8]])
+    # 예약한 추정치(6바이트 -> 2토큰)를 실제 사용량 5토큰으로 정산
+    state = governor.store.load("titan")
+    assert state["Requests"] == pytest.approx(governor.capacity["Requests"] - 1, abs=0.01)
+    assert state["Tokens"] == pytest.approx(governor.capacity["Tokens"] - 5, abs=10)
+
+
+def test_hash_embedder_is_normalized_and_deterministic():
+    embedder = embeddings.HashEmbedder(dimension=64)
+    first, second = embedder.embed(["해변 노을", "해변 노을"])
+
+    np.testing.assert_array_equal(first, second)
+    assert np.linalg.norm(first) == pytest.approx(1.0)
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from botocore.stub import Stubber
+
+from prism_common import aws_clients, metrics
+
+
+class _Context:
+    function_name = "test-function"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(metrics.time, "perf_counter", clock)
+    return clock
+
+
+def _emitted(capsys):
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+    assert len(lines) == 1
+    return json.loads(lines[0])
+
+
+def test_emits_one_emf_line_with_nested_phases(capsys, clock, monkeypatch):
+    monkeypatch.setattr(metrics, "_cold_start", True)
+
+    @metrics.instrumented
+    def handler(event, context):
+        metrics.set_property("userID", "u1")
+        with metrics.phase("outer"):
+            clock.now += 0.010
+            with metrics.phase("inner"):
+                clock.now += 0.005
+        # 같은 이름의 구간은 합산
+        with metrics.phase("inner"):
+            clock.now += 0.002
+        return "ok"
+
+    assert handler({}, _Context()) == "ok"
+
+    record = _emitted(capsys)
+    directive = record["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["FunctionName"]]
+    assert {"Name": "Phase.outer", "Unit": "Milliseconds"} in directive["Metrics"]
+    assert record["FunctionName"] == "test-function" and record["userID"] == "u1"
+    assert record["Phase.outer"] == pytest.approx(15)
+    assert record["Phase.inner"] == pytest.approx(7)
+    assert record["Duration"] == pytest.approx(17)
+    assert record["ColdStart"] == 1 and record["Error"] == 0
+
+    handler({}, _Context())
+    assert _emitted(capsys)["ColdStart"] == 0
+
+
+def test_failed_invocation_still_emits(capsys, clock):
+    @metrics.instrumented
+    def handler(event, context):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        handler({}, _Context())
+    assert _emitted(capsys)["Error"] == 1
+
+
+def test_phase_outside_an_invocation_is_ignored(capsys):
+    with metrics.phase("orphan"):
+        pass
+    metrics.record_aws_call("s3", "GetObject")
+    assert capsys.readouterr().out == ""
+
+
+def test_botocore_hooks_count_calls_and_errors(capsys):
+    aws_clients.reset()
+    stubber = Stubber(aws_clients.get_client("s3"))
+    stubber.add_response("list_objects_v2", {"KeyCount": 0})
+    stubber.add_client_error("get_object", service_error_code="NoSuchKey", http_status_code=404)
+
+    @metrics.instrumented
+    def handler(event, context):
+        s3 = aws_clients.get_client("s3")
+        s3.list_objects_v2(Bucket="b")
+        with pytest.raises(s3.exceptions.NoSuchKey):
+            s3.get_object(Bucket="b", Key="k")
+
+    try:
+        with stubber:
+            handler({}, _Context())
+    finally:
+        aws_clients.reset()
+
+    record = _emitted(capsys)
+    assert record["Calls.s3.ListObjectsV2"] == 1 and record["Calls.s3.GetObject"] == 1
+    assert record["AwsCalls"] == 2 and record["AwsErrors"] == 1
+
+
+@pytest.mark.parametrize("rate, logged", [(0.0, False), (1.0, True)])
+def test_log_payload_follows_the_sample_rate(capsys, monkeypatch, rate, logged):
+    monkeypatch.setattr(metrics, "DEBUG_PAYLOAD_SAMPLE_RATE", rate)
+
+    @metrics.instrumented
+    def handler(event, context):
+        metrics.log_payload("이벤트 수신", event)
+        return metrics.payload_sampled()
+
+    assert handler({"key": "값"}, _Context()) is logged
+    lines = capsys.readouterr().out.splitlines()
+    assert ('이벤트 수신: {"key": "값"}' in lines) is logged
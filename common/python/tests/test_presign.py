@@ -0,0 +1,61 @@
+import datetime
+
+import botocore.auth
+import botocore.config
+import botocore.session
+import pytest
+
+from prism_common import aws_clients, presign
+
+REGION = "ap-northeast-2"
+SIGNING_TIME = datetime.datetime(2026, 1, 2, 3, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def _botocore_url(monkeypatch, bucket, key, expires_in, addressing_style):
+    # botocore가 같은 시각으로 서명하도록 현재 시각을 고정
+    monkeypatch.setattr(botocore.auth, "get_current_datetime", lambda: SIGNING_TIME.replace(tzinfo=None))
+    client = botocore.session.get_session().create_client(
+        "s3",
+        region_name=REGION,
+        endpoint_url=f"https://s3.{REGION}.amazonaws.com",
+        config=botocore.config.Config(signature_version="s3v4", s3={"addressing_style": addressing_style}),
+    )
+    return client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in)
+
+
+@pytest.mark.parametrize(
+    "bucket, addressing_style",
+    [("thumbs", "virtual"), ("thumbs.example.com", "path")],
+)
+def test_sign_get_url_matches_botocore(monkeypatch, bucket, addressing_style):
+    key = "album/u 1/2026-01-02/사진+1.jpg"
+    url = presign.sign_get_url(bucket, key, SIGNING_TIME, 4500, aws_clients.get_credentials(), REGION)
+
+    assert url == _botocore_url(monkeypatch, bucket, key, 4500, addressing_style)
+
+
+def test_aligned_window_is_shared_within_a_bucket(monkeypatch):
+    monkeypatch.setattr(presign, "PRESIGN_BUCKET_SECONDS", 3600)
+    monkeypatch.setattr(presign, "PRESIGN_OVERLAP_SECONDS", 900)
+    start = SIGNING_TIME.timestamp()
+
+    assert presign.aligned_window(start) == (SIGNING_TIME, 4500)
+    assert presign.aligned_window(start + 3599) == (SIGNING_TIME, 4500)
+    assert presign.aligned_window(start + 3600)[0] == SIGNING_TIME + datetime.timedelta(hours=1)
+
+
+def test_aligned_window_never_exceeds_the_sigv4_maximum(monkeypatch):
+    monkeypatch.setattr(presign, "PRESIGN_BUCKET_SECONDS", presign.MAX_EXPIRES_SECONDS)
+
+    assert presign.aligned_window(0)[1] == presign.MAX_EXPIRES_SECONDS
+
+
+def test_presigned_get_url_repeats_within_a_bucket(monkeypatch):
+    monkeypatch.setattr(presign, "PRESIGN_MODE", "aligned")
+    monkeypatch.setattr(presign, "PRESIGN_BUCKET_SECONDS", 3600)
+    monkeypatch.setattr(presign.time, "time", lambda: SIGNING_TIME.timestamp() + 10)
+    first = presign.presigned_get_url("thumbs", "a.jpg")
+    monkeypatch.setattr(presign.time, "time", lambda: SIGNING_TIME.timestamp() + 3000)
+
+    assert presign.presigned_get_url("thumbs", "a.jpg") == first
+    assert "X-Amz-Date=20260102T030000Z" in first
@@ -0,0 +1,132 @@
+import datetime
+
+import pytest
+
+from prism_common import aws_clients, sort_queue
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def scheduler(load_lambda):
+    return load_lambda(
+        "image/album-sort-scheduler",
+        DYNAMODB_STATS_TABLE_NAME="stats",
+        SORT_STATE_MACHINE_ARN="arn:aws:states:ap-northeast-2:123456789012:stateMachine:sort",
+        SORT_SOURCE_BUCKET="originals",
+    )
+
+
+def _user(user_id, pending=10, images=50, quiet_for=600, **attributes):
+    return {
+        "UserID": user_id,
+        "ImageCount": images,
+        "PendingChanges": pending,
+        "LastUploadAt": NOW - quiet_for,
+        "FirstPendingAt": NOW - quiet_for - 60,
+        **attributes,
+    }
+
+
+def _iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+def test_plan_starts_settled_users_most_pending_first(scheduler):
+    candidates = [
+        _user("few", pending=6),
+        _user("many", pending=30),
+        _user("uploading", pending=30, quiet_for=10),
+        _user("small", pending=30, images=5),
+        _user("recent", pending=30, LastSortedAt=_iso(NOW - 60)),
+        _user("done", pending=0),
+    ]
+    to_start, drained = scheduler.plan(candidates, NOW)
+
+    assert [(pending, item["UserID"]) for pending, item in to_start] == [(30, "many"), (6, "few")]
+    assert [item["UserID"] for item in drained] == ["done"]
+
+
+def test_plan_starts_overdue_users_and_counts_running_sorts(scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_RUNNING", 2)
+    running = _user("running", pending=0, InFlightChanges=5, SortStatus=sort_queue.RUNNING, SortStartedAt=NOW - 60)
+    overdue = _user("overdue", pending=1, quiet_for=10, FirstPendingAt=NOW - scheduler.MAX_DELAY_SECONDS)
+    to_start, _ = scheduler.plan([running, overdue, _user("other", pending=8)], NOW)
+
+    # 진행 중인 정렬 1개 + 시작 1개 = MAX_RUNNING
+    assert [item["UserID"] for _, item in to_start] == ["other"]
+
+    monkeypatch.setattr(scheduler, "MAX_RUNNING", 3)
+    to_start, _ = scheduler.plan([running, overdue, _user("other", pending=8)], NOW)
+    assert [item["UserID"] for _, item in to_start] == ["other", "overdue"]
+
+
+def test_plan_requeues_changes_of_a_timed_out_sort(scheduler):
+    stale = _user(
+        "stale",
+        pending=2,
+        InFlightChanges=7,
+        SortStatus=sort_queue.RUNNING,
+        SortStartedAt=NOW - scheduler.RUNNING_TIMEOUT_SECONDS - 1,
+    )
+    ((pending, item),), _ = scheduler.plan([stale], NOW)
+
+    assert pending == 9 and item["UserID"] == "stale"
+
+
+def test_claim_moves_pending_changes_conditionally(scheduler, stub_client):
+    stubber = stub_client("dynamodb")
+    item = _user("u1", pending=4)
+    stubber.add_response(
+        "update_item",
+        {},
+        {
+            "TableName": "stats",
+            "Key": {"UserID": {"S": "u1"}},
+            "UpdateExpression": (
+                "SET PendingChanges = :zero, InFlightChanges = :pending, SortStatus = :running, "
+                "SortStartedAt = :now REMOVE FirstPendingAt"
+            ),
+            "ConditionExpression": "PendingChanges = :seen AND attribute_not_exists(InFlightChanges)",
+            "ExpressionAttributeValues": {
+                ":seen": {"N": "4"},
+                ":zero": {"N": "0"},
+                ":pending": {"N": "4"},
+                ":running": {"S": sort_queue.RUNNING},
+                ":now": {"N": str(int(NOW))},
+            },
+        },
+    )
+    stubber.add_client_error("update_item", service_error_code="ConditionalCheckFailedException")
+
+    client = aws_clients.get_client("dynamodb")
+    assert scheduler.claim(client, item, 4, NOW) is True
+    assert scheduler.claim(client, item, 4, NOW) is False
+
+
+def test_queue_query_reads_only_startable_users():
+    query = sort_queue.queue_query("stats", "pending-1", 20, "2026-01-01T00:00:00+00:00")
+
+    assert query["IndexName"] == sort_queue.SORT_QUEUE_INDEX_NAME
+    assert query["KeyConditionExpression"] == "SortQueue = :queue AND ImageCount >= :min_images"
+    assert query["ExpressionAttributeValues"][":min_images"] == {"N": "20"}
+    assert "attribute_exists(InFlightChanges)" in query["FilterExpression"]
+
+
+def test_close_sort_clauses_deletes_only_processed_keys(load_lambda, monkeypatch):
+    from prism_common import categories
+
+    # prism_common.categories는 이미 import되어 있으므로 테이블 이름을 직접 지정
+    monkeypatch.setattr(categories, "CATEGORY_TABLE_NAME", "categories")
+    analyzer = load_lambda(
+        "image/step-function/album-list-analyzer",
+        DYNAMODB_STATS_TABLE_NAME="stats",
+        DYNAMODB_METADATA_TABLE_NAME="metadata",
+    )
+
+    clauses, values = analyzer.close_sort_clauses(["a", "b"], remove=["SortedData"])
+    assert clauses == "REMOVE SortedData, InFlightChanges, SortStartedAt DELETE NewImageKeys :processed"
+    assert values == {":processed": {"a", "b"}}
+
+    clauses, values = analyzer.close_sort_clauses([])
+    assert clauses == "REMOVE InFlightChanges, SortStartedAt" and values == {}
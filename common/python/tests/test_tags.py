@@ -0,0 +1,103 @@
+import pytest
+
+from prism_common import tags
+
+
+class _PostingTable:
+    """Answers the tag resolver's Query shapes from in-memory postings, counting the calls."""
+
+    def __init__(self, postings):
+        self.postings = postings
+        self.queries = 0
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, Limit, ScanIndexForward, **kwargs):
+        assert ScanIndexForward is False
+        self.queries += 1
+        keys = sorted(self.postings.get(ExpressionAttributeValues[":tag"], ()), reverse=True)
+        bound = ExpressionAttributeValues.get(":bound")
+        if "OriginalKey <= :bound" in KeyConditionExpression:
+            keys = [key for key in keys if key <= bound]
+        elif "OriginalKey < :bound" in KeyConditionExpression:
+            keys = [key for key in keys if key < bound]
+        response = {"Items": [{"OriginalKey": key} for key in keys[:Limit]]}
+        if len(keys) > Limit:
+            response["LastEvaluatedKey"] = {"OriginalKey": keys[Limit - 1]}
+        return response
+
+
+@pytest.fixture
+def resolver(load_lambda):
+    return load_lambda("api/appsync/appsync-tag-search-resolver", DYNAMODB_TAG_INDEX_TABLE_NAME="tags")
+
+
+def _keys(*numbers):
+    return [f"img-{number:04d}" for number in numbers]
+
+
+def _lists(resolver, table, tag_names, page_size=3, below=None):
+    return [resolver.PostingList(table, "u1", tag, below, page_size) for tag in tag_names]
+
+
+def test_search_all_intersects_across_pages(resolver):
+    table = _PostingTable(
+        {
+            "u1#beach": _keys(*range(0, 40)),
+            "u1#sunset": _keys(*range(0, 40, 3)),
+            "u1#dog": _keys(3, 9, 12, 30, 39),
+        }
+    )
+    lists = _lists(resolver, table, ["beach", "sunset", "dog"])
+
+    assert resolver.search_all(lists, 10) == _keys(39, 30, 12, 9, 3)
+
+
+def test_search_all_seeks_past_a_common_tag(resolver):
+    table = _PostingTable({"u1#common": _keys(*range(1000)), "u1#rare": _keys(5, 500, 990)})
+    lists = _lists(resolver, table, ["common", "rare"], page_size=10)
+
+    assert resolver.search_all(lists, 10) == _keys(990, 500, 5)
+    # 흔한 태그를 처음부터 다 읽었다면 100번 넘게 조회했을 것
+    assert table.queries < 15
+
+
+def test_search_any_merges_without_duplicates(resolver):
+    table = _PostingTable({"u1#a": _keys(1, 4, 7, 8), "u1#b": _keys(2, 4, 8, 9), "u1#c": []})
+    lists = _lists(resolver, table, ["a", "b", "c"], page_size=2)
+
+    assert resolver.search_any(lists, 10) == _keys(9, 8, 7, 4, 2, 1)
+
+
+def test_search_resumes_below_the_token(resolver):
+    table = _PostingTable({"u1#a": _keys(*range(10)), "u1#b": _keys(*range(0, 10, 2))})
+
+    first = resolver.search_all(_lists(resolver, table, ["a", "b"]), 2)
+    rest = resolver.search_all(_lists(resolver, table, ["a", "b"], below=first[-1]), 10)
+
+    assert first == _keys(8, 6) and rest == _keys(4, 2, 0)
+
+
+def test_posting_changes_puts_current_and_deletes_removed_tags():
+    changes = tags.posting_changes(
+        "index",
+        "u1",
+        "a.jpg",
+        new_tags={"#Beach ", "ＢＥＡＣＨ", "Sunset"},
+        old_tags={"beach", "Dog"},
+        album_id="album-1",
+    )
+
+    puts = [change["Put"]["Item"] for change in changes if "Put" in change]
+    deletes = [change["Delete"]["Key"] for change in changes if "Delete" in change]
+    assert [(item["UserTag"]["S"], item["Tag"]["S"]) for item in puts] == [
+        ("u1#beach", "#Beach"),
+        ("u1#sunset", "Sunset"),
+    ]
+    assert all(item["AlbumID"] == {"S": "album-1"} and "CreatedAt" not in item for item in puts)
+    assert deletes == [{"UserTag": {"S": "u1#dog"}, "OriginalKey": {"S": "a.jpg"}}]
+
+
+def test_normalized_tags_caps_the_indexed_tags():
+    many = {f"tag{index:03d}" for index in range(tags.MAX_INDEXED_TAGS + 5)}
+
+    assert len(tags.normalized_tags(many)) == tags.MAX_INDEXED_TAGS
+    assert tags.normalized_tags([None, " ", "#"]) == {}
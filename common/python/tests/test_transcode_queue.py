@@ -0,0 +1,271 @@
+import io
+import json
+
+import pytest
+
+from prism_common import transcode_status
+
+SQS_TO_BATCH = "batch/step-function/sqs-to-batch"
+CHECK_SUCCEED = "batch/step-function/check-succeed-batch-job"
+
+
+@pytest.fixture
+def sqs_to_batch(load_lambda):
+    return load_lambda(SQS_TO_BATCH, JOB_RUNTIME_BUDGET_SECONDS="100", MAX_IMAGES_PER_JOB="3")
+
+
+@pytest.fixture
+def check_succeed(load_lambda):
+    return load_lambda(CHECK_SUCCEED)
+
+
+def _job(key, megapixels, effort=4, **extra):
+    # 1000 x (megapixels * 1000) 픽셀
+    return {
+        "sourceKey": key,
+        "width": 1000,
+        "height": int(megapixels * 1000),
+        "avifEncoding": {"effort": effort},
+        **extra,
+    }
+
+
+def _message(message_id):
+    return {"Id": message_id, "ReceiptHandle": f"rh-{message_id}", "ReceiveCount": 1}
+
+
+@pytest.mark.parametrize(
+    "job, expected",
+    [
+        (_job("a", 10, effort=4), 0.5 + 10 * 0.9),
+        (_job("a", 10, effort=99), 0.5 + 10 * 5.0),
+        ({"sourceKey": "a", "fileSize": 3_500_000, "avifEncoding": {}}, 0.5 + 10 * 0.9),
+        ({"sourceKey": "a", "avifEncoding": {"mode": "auto"}}, 0.5 + 12 * 0.9),
+        (
+            {"sourceKey": "a", "routingDecision": {"width": 2000, "height": 1000}, "avifEncoding": {"effort": "0"}},
+            0.5 + 2 * 0.2,
+        ),
+    ],
+)
+def test_estimate_job_seconds(sqs_to_batch, job, expected):
+    assert sqs_to_batch.estimate_job_seconds(job) == pytest.approx(expected)
+
+
+def test_pack_jobs_first_fit_decreasing(sqs_to_batch):
+    # 추정치: 90.5s, 45.5s, 45.5s, 9.5s
+    entries = [
+        (_job("small", 10), [_message("m1")]),
+        (_job("big", 100), [_message("m2")]),
+        (_job("mid-1", 50), [_message("m3")]),
+        (_job("mid-2", 50), [_message("m4"), _message("m4-dup")]),
+    ]
+    jobs = sqs_to_batch.pack_jobs(entries, start_index=7)
+
+    assert [[image["sourceKey"] for image in job["images"]] for job in jobs] == [
+        ["big", "small"],
+        ["mid-1", "mid-2"],
+    ]
+    assert [job["jobIndex"] for job in jobs] == [7, 8]
+    assert [m["Id"] for m in jobs[1]["messages"]] == ["m3", "m4", "m4-dup"]
+    assert json.loads(jobs[0]["payload"]) == {"images": jobs[0]["images"]}
+    assert all(job["estimatedSeconds"] <= 100 for job in jobs)
+
+
+def test_pack_jobs_caps_images_and_isolates_oversized(sqs_to_batch):
+    entries = [(_job(f"tiny-{i}", 0.1), [_message(f"t{i}")]) for i in range(4)]
+    entries.append((_job("huge", 1000), [_message("h")]))
+    jobs = sqs_to_batch.pack_jobs(entries)
+
+    assert [job["imageCount"] for job in jobs] == [1, 3, 1]
+    assert jobs[0]["images"][0]["sourceKey"] == "huge"
+
+
+def test_correlation_id_ignores_message_order(sqs_to_batch):
+    forward = sqs_to_batch.make_correlation_id([_message("a"), _message("b")])
+    backward = sqs_to_batch.make_correlation_id([_message("b"), _message("a")])
+    assert forward == backward
+    assert forward != sqs_to_batch.make_correlation_id([_message("a")])
+
+
+@pytest.mark.parametrize(
+    "job, expected",
+    [
+        ({}, 0),
+        ({"origin": "backfill"}, 10),
+        ({"origin": "retry"}, 5),
+        ({"origin": "unknown"}, 0),
+        ({"origin": "backfill", "priority": "2"}, 2),
+        ({"origin": "backfill", "priority": "high"}, 10),
+    ],
+)
+def test_job_priority(sqs_to_batch, job, expected):
+    assert sqs_to_batch.job_priority(job) == expected
+
+
+def _entry(sqs_to_batch, message_id, key, sent, origin="upload", encoding=None):
+    job = {"sourceKey": key, "avifEncoding": encoding or {"quality": 60}, "origin": origin}
+    return {
+        "job": job,
+        "encodingKey": transcode_status.encoding_key(job["avifEncoding"]),
+        "priority": sqs_to_batch.job_priority(job),
+        "sentTimestamp": sent,
+        "message": _message(message_id),
+        "duplicates": [],
+    }
+
+
+def test_deduplicate_keeps_newest_and_best_priority(sqs_to_batch):
+    entries = [
+        _entry(sqs_to_batch, "old", "a.jpg", 100, origin="upload"),
+        _entry(sqs_to_batch, "new", "a.jpg", 300, origin="backfill"),
+        _entry(sqs_to_batch, "mid", "a.jpg", 200, origin="backfill", encoding={"quality": "60"}),
+        _entry(sqs_to_batch, "other", "a.jpg", 50, encoding={"quality": 70}),
+    ]
+    unique = {entry["message"]["Id"]: entry for entry in sqs_to_batch.deduplicate(entries)}
+
+    assert set(unique) == {"new", "other"}
+    assert sorted(m["Id"] for m in unique["new"]["duplicates"]) == ["mid", "old"]
+    # 업로드로 들어온 중복이 있으면 백필보다 먼저 처리
+    assert unique["new"]["priority"] == 0
+    assert unique["other"]["duplicates"] == []
+
+
+def test_encoding_key_tracks_the_avif_params_version(monkeypatch):
+    auto = {"mode": "auto"}
+    v1 = transcode_status.encoding_key(auto)
+    monkeypatch.setattr(transcode_status, "AVIF_PARAMS_VERSION", "stats-v2")
+
+    # 보정 테이블 버전이 바뀌면 이미 변환된 이미지도 다시 변환 대상이 됨
+    assert transcode_status.encoding_key(auto) != v1
+
+    # 메시지의 파라미터를 그대로 쓰는 경우에는 버전과 무관
+    event_mode = {"quality": 60}
+    monkeypatch.setattr(transcode_status, "AVIF_PARAM_SOURCE", "event")
+    v2 = transcode_status.encoding_key(event_mode)
+    monkeypatch.setattr(transcode_status, "AVIF_PARAMS_VERSION", "stats-v1")
+    assert transcode_status.encoding_key(event_mode) == v2 == '{"quality": "60"}'
+
+
+def _batch_job(correlation_id, images):
+    messages = []
+    for image in images:
+        for message_id in [image["messageId"], *image.get("duplicateMessageIds", [])]:
+            messages.append(_message(message_id))
+    return {"correlationId": correlation_id, "images": images, "messages": messages}
+
+
+def _image(message_id, *duplicates):
+    image = {"sourceKey": f"{message_id}.jpg", "messageId": message_id, "avifEncoding": {"mode": "auto"}}
+    if duplicates:
+        image["duplicateMessageIds"] = list(duplicates)
+    return image
+
+
+def _flatten(batches):
+    return sorted(entry["Id"] for batch in batches for entry in batch)
+
+
+def test_check_succeed_joins_results_by_correlation_id(check_succeed):
+    jobs = [
+        _batch_job("job-ok", [_image("a", "a-dup")]),
+        _batch_job("job-failed", [_image("b")]),
+        _batch_job("job-missing", [_image("c")]),
+    ]
+    event = {
+        "lambdaOutput": {"batch_jobs": jobs, "skipped_messages": [_message("s")]},
+        # Map 결과 순서는 batch_jobs와 다름
+        "mapResult": [
+            {"JobName": "job-failed", "Status": "FAILED", "StatusReason": "OOM"},
+            {"JobName": "job-ok", "Status": "SUCCEEDED"},
+            {"JobName": "unknown", "Status": "SUCCEEDED"},
+        ],
+    }
+    result = check_succeed.lambda_handler(event, None)
+
+    assert _flatten(result["deleteBatches"]) == ["a", "a-dup", "s"]
+    assert _flatten(result["visibilityBatches"]) == ["b", "c"]
+    assert result["summary"]["failedJobs"] == 2
+
+
+def test_check_succeed_partial_job_deletes_only_converted_images(check_succeed):
+    jobs = [_batch_job("job-partial", [_image("a", "a-dup"), _image("b")])]
+    event = {
+        "lambdaOutput": {"batch_jobs": jobs},
+        "mapResult": [
+            {
+                "correlationId": "job-partial",
+                "jobResult": {
+                    "Status": "PARTIAL",
+                    "Results": [
+                        {"status": "CONVERTED", "messageId": "a"},
+                        {"status": "FAILED", "messageId": "b", "message": "decode error"},
+                    ],
+                },
+            }
+        ],
+    }
+    result = check_succeed.lambda_handler(event, None)
+
+    assert _flatten(result["deleteBatches"]) == ["a", "a-dup"]
+    assert _flatten(result["visibilityBatches"]) == ["b"]
+    assert result["summary"]["partialJobs"] == 1
+    assert result["summary"]["failedJobs"] == 0
+
+
+def test_pack_jobs_tells_the_container_where_to_write_results(load_lambda):
+    sqs_to_batch = load_lambda(SQS_TO_BATCH, TRANSCODE_RESULT_BUCKET="state", TRANSCODE_RESULT_PREFIX="results/")
+    (job,) = sqs_to_batch.pack_jobs([(_job("a", 1), [_message("m1")])])
+
+    assert job["result"]["bucket"] == "state"
+    assert job["result"]["key"].startswith(f"results/{job['correlationId']}-")
+    assert json.loads(job["payload"])["result"] == job["result"]
+
+
+def _stored_result(s3, key, status, results):
+    body = json.dumps({"status": status, "results": results}).encode("utf-8")
+    s3.add_response("get_object", {"Body": io.BytesIO(body)}, {"Bucket": "state", "Key": key})
+
+
+def test_check_succeed_reads_partial_results_of_a_succeeded_batch_job(check_succeed, stub_client):
+    s3 = stub_client("s3")
+    job = _batch_job("job-partial", [_image("a", "a-dup"), _image("b")])
+    job["result"] = {"bucket": "state", "key": "results/job-partial.json"}
+    # Batch .sync 결과는 DescribeJobs이므로 컨테이너가 PARTIAL을 돌려줘도 SUCCEEDED로만 보임
+    _stored_result(
+        s3,
+        "results/job-partial.json",
+        "PARTIAL",
+        [{"status": "CONVERTED", "messageId": "a"}, {"status": "FAILED", "messageId": "b"}],
+    )
+    event = {
+        "lambdaOutput": {"batch_jobs": [job]},
+        "mapResult": [{"JobName": "job-partial", "Status": "SUCCEEDED"}],
+    }
+    result = check_succeed.lambda_handler(event, None)
+
+    assert _flatten(result["deleteBatches"]) == ["a", "a-dup"]
+    assert _flatten(result["visibilityBatches"]) == ["b"]
+    assert result["summary"]["partialJobs"] == 1
+    s3.assert_no_pending_responses()
+
+
+def test_check_succeed_treats_a_missing_result_object_as_success(check_succeed, stub_client):
+    s3 = stub_client("s3")
+    job = _batch_job("job-ok", [_image("a")])
+    job["result"] = {"bucket": "state", "key": "results/job-ok.json"}
+    s3.add_client_error("get_object", service_error_code="NoSuchKey")
+    event = {"lambdaOutput": {"batch_jobs": [job]}, "mapResult": [{"JobName": "job-ok", "Status": "SUCCEEDED"}]}
+    result = check_succeed.lambda_handler(event, None)
+
+    assert _flatten(result["deleteBatches"]) == ["a"]
+    assert result["summary"]["succeededJobs"] == 1
+
+
+def test_check_succeed_dead_letters_after_max_receives(check_succeed):
+    job = _batch_job("job", [_image("a")])
+    job["messages"][0]["ReceiveCount"] = check_succeed.MAX_RECEIVE_COUNT
+    event = {"lambdaOutput": {"batch_jobs": [job]}, "mapResult": [{"JobName": "job", "Status": "FAILED"}]}
+    result = check_succeed.lambda_handler(event, None)
+
+    assert _flatten(result["deadLetterDeleteBatches"]) == ["a"]
+    assert json.loads(result["deadLetterBatches"][0][0]["MessageBody"])["MessageBody"]["sourceKey"] == "a.jpg"
@@ -0,0 +1,143 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+FUNCTION = "api/api-gateway/generate-s3-presignedurl"
+MIB = 1024**2
+
+
+@pytest.fixture
+def presign_upload(load_lambda):
+    return load_lambda(FUNCTION, S3_BUCKET_NAME="uploads", MAX_PARTS_PER_PRESIGN="10", MAX_BATCH_PART_URLS="25")
+
+
+@pytest.fixture
+def s3(stub_client):
+    return stub_client("s3")
+
+
+def _event(body):
+    return {"requestContext": {"authorizer": {"claims": {"sub": "user-1"}}}, "body": json.dumps(body)}
+
+
+def _expect_multipart(s3, count):
+    s3.add_response("list_objects_v2", {"Contents": []})
+    for index in range(count):
+        s3.add_response("create_multipart_upload", {"UploadId": f"upload-{index}"})
+
+
+def test_part_size_grows_past_max_part_count(presign_upload):
+    assert presign_upload.part_size_for(0) == 16 * MIB
+    assert presign_upload.part_size_for(16 * MIB * 10000) == 16 * MIB
+    size = 16 * MIB * 10000 + 1
+    part_size = presign_upload.part_size_for(size)
+    assert part_size % MIB == 0 and -(-size // part_size) <= 10000
+
+
+def test_batch_presigns_at_most_max_parts_per_file(presign_upload, s3):
+    _expect_multipart(s3, 1)
+    response = presign_upload.lambda_handler(_event({"files": [{"fileName": "a.mov", "size": 1024 * MIB}]}), None)
+
+    upload = json.loads(response["body"])["files"][0]
+    assert upload["method"] == "MULTIPART"
+    assert upload["partCount"] == 64
+    assert upload["maxPartsPerRequest"] == 10
+    assert [part["partNumber"] for part in upload["parts"]] == list(range(1, 11))
+
+    query = parse_qs(urlparse(upload["parts"][0]["url"]).query)
+    assert query["uploadId"] == ["upload-0"] and query["partNumber"] == ["1"]
+    assert query["X-Amz-Expires"] == [str(presign_upload.BATCH_URL_EXPIRES_SECONDS)]
+    s3.assert_no_pending_responses()
+
+
+def test_batch_caps_part_urls_across_files(presign_upload, s3):
+    _expect_multipart(s3, 4)
+    files = [{"fileName": f"{index}.mov", "size": 1024 * MIB} for index in range(4)]
+    response = presign_upload.lambda_handler(_event({"files": files}), None)
+
+    uploads = json.loads(response["body"])["files"]
+    assert [len(upload["parts"]) for upload in uploads] == [10, 10, 5, 0]
+    assert all(upload["partCount"] == 64 for upload in uploads)
+
+
+def test_batch_small_files_get_single_put_urls(presign_upload, s3):
+    s3.add_response("list_objects_v2", {"Contents": []})
+    manifest = {"width": 4032, "height": 3024, "format": "jpg"}
+    response = presign_upload.lambda_handler(
+        _event({"files": [{"fileName": "../a.jpg", "size": 10, "contentType": "image/jpeg", "manifest": manifest}]}),
+        None,
+    )
+
+    upload = json.loads(response["body"])["files"][0]
+    assert upload["method"] == "PUT"
+    assert upload["objectKey"].endswith("/a.jpg")
+    assert upload["headers"]["x-amz-meta-format"] == "jpeg"
+    assert "x-amz-meta-width" in parse_qs(urlparse(upload["uploadUrl"]).query)["X-Amz-SignedHeaders"][0]
+
+
+def test_presign_parts_enforces_max_parts(presign_upload, s3):
+    body = {"action": "presignParts", "objectKey": "album/user-1/a.mov", "uploadId": "u", "partNumbers": list(range(1, 12))}
+    assert presign_upload.lambda_handler(_event(body), None)["statusCode"] == 400
+
+    s3.add_response("list_parts", {"Parts": []})
+    body["partNumbers"] = [11, 12]
+    response = presign_upload.lambda_handler(_event(body), None)
+    assert [part["partNumber"] for part in json.loads(response["body"])["parts"]] == [11, 12]
+
+
+def test_multipart_rejects_keys_outside_callers_album(presign_upload):
+    body = {"action": "abortMultipart", "objectKey": "album/user-2/a.mov", "uploadId": "u"}
+    assert presign_upload.lambda_handler(_event(body), None)["statusCode"] == 403
+
+
+def _complete(**fields):
+    return _event({"action": "completeMultipart", "objectKey": "album/user-1/a.mov", "uploadId": "u", **fields})
+
+
+def _uploaded(*sizes_by_number):
+    return {"Parts": [{"PartNumber": number, "ETag": f'"e{number}"', "Size": size} for number, size in sizes_by_number]}
+
+
+def test_complete_without_parts_requires_the_declared_size(presign_upload):
+    response = presign_upload.lambda_handler(_complete(), None)
+
+    assert response["statusCode"] == 400
+    assert "size" in json.loads(response["body"])["error"]
+
+
+def test_complete_without_parts_rejects_missing_parts(presign_upload, s3):
+    # 40 MiB / 16 MiB 파트 = 3개인데 2번 파트가 올라가지 않음
+    s3.add_response("list_parts", _uploaded((1, 16 * MIB), (3, 8 * MIB)))
+    response = presign_upload.lambda_handler(_complete(size=40 * MIB), None)
+
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 400
+    assert body["missingParts"] == [2] and body["partCount"] == 3
+    s3.assert_no_pending_responses()
+
+
+def test_complete_without_parts_uses_listed_parts_when_they_match(presign_upload, s3):
+    s3.add_response("list_parts", _uploaded((1, 16 * MIB), (2, 16 * MIB), (3, 8 * MIB)))
+    s3.add_response(
+        "complete_multipart_upload",
+        {},
+        {
+            "Bucket": "uploads",
+            "Key": "album/user-1/a.mov",
+            "UploadId": "u",
+            "MultipartUpload": {"Parts": [{"PartNumber": n, "ETag": f'"e{n}"'} for n in (1, 2, 3)]},
+        },
+    )
+    response = presign_upload.lambda_handler(_complete(size=40 * MIB), None)
+
+    assert response["statusCode"] == 200 and json.loads(response["body"])["partCount"] == 3
+    s3.assert_no_pending_responses()
+
+
+def test_complete_rejects_gaps_in_explicit_parts(presign_upload):
+    parts = [{"partNumber": 1, "etag": "a"}, {"partNumber": 3, "etag": "c"}]
+    response = presign_upload.lambda_handler(_complete(parts=parts), None)
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["missingParts"] == [2]
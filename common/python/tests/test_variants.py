@@ -0,0 +1,65 @@
+import pytest
+
+from prism_common import variants
+
+CATALOG = variants.from_derivatives(
+    [
+        {"format": "jpeg", "width": 400, "height": 300, "key": "t.jpg", "bytes": 30000},
+        {"format": "webp", "width": 400, "height": 300, "key": "t.webp", "bytes": 20000},
+        {"format": "avif", "width": 400, "height": 300, "key": "t.avif", "bytes": 15000},
+        {"format": "image/webp", "width": 1280, "height": 960, "key": "1280.webp", "bytes": 90000},
+        {"format": "AVIF", "width": 1280, "height": 960, "key": "1280.avif", "bytes": 70000},
+        {"format": "avif", "width": 1920, "height": 1440, "key": "1920.avif"},
+        {"format": "webp", "width": 640, "key": "640.webp", "bytes": 40000},
+        {"format": "webp", "key": "no-width.webp"},
+    ]
+)
+
+
+def test_from_derivatives_normalizes_and_orders():
+    assert [(v["Width"], v["Format"]) for v in CATALOG] == [
+        (400, "avif"),
+        (400, "webp"),
+        (400, "jpeg"),
+        (640, "webp"),
+        (1280, "avif"),
+        (1280, "webp"),
+        (1920, "avif"),
+    ]
+    assert "Bytes" not in CATALOG[-1] and "Height" not in CATALOG[3]
+
+
+@pytest.mark.parametrize(
+    "required_width, accept, expected",
+    [
+        (300, None, "t.webp"),
+        (300, ["image/avif", "webp"], "t.avif"),
+        (500, None, "640.webp"),
+        (1000, ["avif", "webp"], "1280.avif"),
+        (1000, None, "1280.webp"),
+        (1500, ["avif"], "1920.avif"),
+        (1500, None, None),
+        (3000, ["avif"], None),
+        (100, ["jpg"], "t.jpg"),
+    ],
+)
+def test_choose(required_width, accept, expected):
+    chosen = variants.choose(CATALOG, required_width, accept)
+    assert (chosen and chosen["Key"]) == expected
+
+
+def test_srcset_entries_one_per_width():
+    entries = variants.srcset_entries(CATALOG, accept=["avif", "webp"])
+    assert [(v["Width"], v["Key"]) for v in entries] == [
+        (400, "t.avif"),
+        (640, "640.webp"),
+        (1280, "1280.avif"),
+        (1920, "1920.avif"),
+    ]
+
+
+def test_catalog_falls_back_to_thumbnails():
+    item = {"Display": {"ThumbnailKeys": {"jpg": "t.jpg", "avif": "t.avif"}}}
+    assert [v["Format"] for v in variants.catalog(item)] == ["avif", "jpeg"]
+    assert variants.catalog({"Variants": CATALOG}) is CATALOG
+    assert variants.catalog({}) == []
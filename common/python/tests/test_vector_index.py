@@ -0,0 +1,116 @@
+import io
+
+import numpy as np
+import pytest
+
+from prism_common import aws_clients, vector_index
+
+MODEL = "hash-v1/4"
+
+
+def _segment(rows):
+    """Segment from {key: vector}; vectors are normalized like embedder output."""
+    keys = list(rows)
+    matrix = np.asarray([rows[key] for key in keys], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return vector_index.Segment(MODEL, keys, matrix)
+
+
+def test_encode_round_trip():
+    segment = _segment({"a": [1, 0, 0, 0], "b": [0, 1, 0, 0]})
+    decoded = vector_index.decode(vector_index.encode(segment))
+
+    assert decoded.model == MODEL
+    assert decoded.keys == ["a", "b"]
+    np.testing.assert_array_equal(decoded.matrix, segment.matrix)
+
+
+def test_encode_rejects_model_ids_longer_than_the_header():
+    segment = _segment({"a": [1, 0, 0, 0]})
+    segment.model = "m" * (vector_index.MAX_MODEL_BYTES + 1)
+
+    with pytest.raises(ValueError):
+        vector_index.encode(segment)
+
+
+def test_top_k_orders_by_score_then_key():
+    segment = _segment({"c": [1, 0, 0, 0], "a": [1, 0, 0, 0], "b": [0, 1, 0, 0], "d": [1, 1, 0, 0]})
+    ranked = vector_index.top_k([segment], [1, 0, 0, 0], 3)
+
+    assert [key for _, key in ranked] == ["a", "c", "d"]
+    assert ranked[0][0] == pytest.approx(1.0)
+
+
+def test_top_k_uses_the_newest_vector_of_a_key():
+    base = _segment({"a": [1, 0, 0, 0], "b": [0.9, 0.1, 0, 0]})
+    delta = _segment({"a": [0, 1, 0, 0]})
+    ranked = vector_index.top_k([base, delta], [1, 0, 0, 0], 2)
+
+    assert [key for _, key in ranked] == ["b", "a"]
+    assert ranked[1][0] == pytest.approx(0.0)
+
+
+def test_merge_keeps_newest_row():
+    merged = vector_index.merge([_segment({"a": [1, 0, 0, 0]}), _segment({"a": [0, 1, 0, 0], "b": [0, 0, 1, 0]})])
+
+    assert merged.keys == ["a", "b"]
+    np.testing.assert_array_equal(merged.matrix[0], [0, 1, 0, 0])
+
+
+class _S3:
+    """list_objects_v2 pages and get_object from a dict of key -> (bytes, etag)."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.gets = []
+
+    def get_paginator(self, name):
+        s3 = self
+
+        class _Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {
+                    "Contents": [
+                        {"Key": key, "ETag": etag}
+                        for key, (_, etag) in s3.objects.items()
+                        if key.startswith(Prefix)
+                    ]
+                }
+
+        return _Paginator()
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.gets.append(Key)
+        if Key not in self.objects:
+            raise vector_index.botocore_exceptions.ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        data, etag = self.objects[Key]
+        return {"Body": io.BytesIO(data), "ETag": etag}
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setattr(vector_index, "INDEX_BUCKET", "index")
+    monkeypatch.setattr(vector_index, "_deltas", {})
+    monkeypatch.setattr(vector_index, "_bases", {})
+    fake = _S3({})
+    aws_clients.override("s3", fake)
+    yield fake
+    aws_clients.reset()
+
+
+def test_load_downloads_only_new_deltas(s3):
+    prefix = "vector-index/user-1/delta/"
+    s3.objects[prefix + "1.pvi"] = (vector_index.encode(_segment({"a": [1, 0, 0, 0]})), '"e1"')
+    s3.objects[prefix + "2.pvi"] = (vector_index.encode(_segment({"b": [0, 1, 0, 0]})), '"e2"')
+
+    assert [segment.keys for segment in vector_index.load("user-1")] == [["a"], ["b"]]
+
+    s3.gets.clear()
+    s3.objects[prefix + "3.pvi"] = (vector_index.encode(_segment({"c": [0, 0, 1, 0]})), '"e3"')
+    del s3.objects[prefix + "1.pvi"]
+    segments = vector_index.load("user-1")
+
+    assert [segment.keys for segment in segments] == [["b"], ["c"]]
+    # 캐시에 있던 델타는 다시 받지 않고, 압축으로 사라진 델타는 캐시에서 빠짐 (base는 없어서 매번 조회)
+    assert s3.gets == [prefix + "3.pvi", "vector-index/user-1/base.pvi"]
+    assert set(vector_index._deltas["user-1"]) == {prefix + "2.pvi", prefix + "3.pvi"}
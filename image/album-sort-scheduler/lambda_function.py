@@ -0,0 +1,219 @@
+import datetime
+import json
+import os
+import re
+from botocore.exceptions import ClientError
+from prism_common import aws_clients, ddb_codec, metrics, sort_queue
+
+
+STATS_TABLE_NAME = os.environ.get("DYNAMODB_STATS_TABLE_NAME")
+STATE_MACHINE_ARN = os.environ.get("SORT_STATE_MACHINE_ARN")
+SOURCE_BUCKET = os.environ.get("SORT_SOURCE_BUCKET")
+
+if not STATS_TABLE_NAME or not STATE_MACHINE_ARN or not SOURCE_BUCKET:
+    raise ValueError(
+        "환경 변수 'DYNAMODB_STATS_TABLE_NAME', 'SORT_STATE_MACHINE_ARN', 'SORT_SOURCE_BUCKET'이 모두 설정되어야 합니다."
+    )
+
+# 이 수보다 이미지가 적은 사용자는 정렬하지 않음
+MIN_IMAGES = int(os.environ.get("SORT_MIN_IMAGES", "20"))
+# 쌓인 변경이 이만큼은 되어야 업로드가 멈췄을 때 정렬
+MIN_PENDING = int(os.environ.get("SORT_MIN_PENDING", "5"))
+# 마지막 업로드 뒤 이 시간 동안 새 업로드가 없으면 업로드가 끝난 것으로 봄
+QUIET_SECONDS = int(os.environ.get("SORT_QUIET_SECONDS", "300"))
+# 계속 올리는 사용자나 변경이 적은 사용자도 첫 변경 뒤 이 시간이 지나면 정렬
+MAX_DELAY_SECONDS = int(os.environ.get("SORT_MAX_DELAY_SECONDS", "21600"))
+# 같은 사용자의 정렬 사이 최소 간격
+MIN_INTERVAL_SECONDS = int(os.environ.get("SORT_MIN_INTERVAL_SECONDS", "3600"))
+# 이 시간이 지나도 끝나지 않은 정렬은 실패한 것으로 보고 다시 대기열에 셈
+RUNNING_TIMEOUT_SECONDS = int(os.environ.get("SORT_RUNNING_TIMEOUT_SECONDS", "1800"))
+# 한 번 실행에서 시작하는 정렬 수와 동시에 진행 중인 정렬 수의 상한 (Bedrock 배경 예산 보호)
+MAX_STARTS_PER_RUN = int(os.environ.get("SORT_MAX_STARTS_PER_RUN", "10"))
+MAX_RUNNING = int(os.environ.get("SORT_MAX_RUNNING", "20"))
+
+
+def event_time(event):
+    """The scheduled event's time (EventBridge `time`), or now."""
+    value = (event or {}).get("time")
+    if value:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    return datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+
+def load_queue(dynamodb_client, now):
+    """Queued users that could start a sort (enough images, not sorted recently) or are running."""
+    sorted_before = datetime.datetime.fromtimestamp(now - MIN_INTERVAL_SECONDS, datetime.timezone.utc).isoformat()
+    candidates = []
+    for queue in sort_queue.queue_names():
+        kwargs = sort_queue.queue_query(STATS_TABLE_NAME, queue, MIN_IMAGES, sorted_before)
+        while True:
+            with metrics.phase("ddb_query"):
+                response = dynamodb_client.query(**kwargs)
+            candidates.extend(ddb_codec.STATS.decode_all(response.get("Items", [])))
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return candidates
+
+
+def is_running(item, now):
+    if "InFlightChanges" not in item or item.get("SortStatus") != sort_queue.RUNNING:
+        return False
+    return now - float(item.get("SortStartedAt", 0)) < RUNNING_TIMEOUT_SECONDS
+
+
+def pending_changes(item, now):
+    """Changes waiting for a sort, including those of a sort that failed or timed out."""
+    pending = int(item.get("PendingChanges", 0))
+    if "InFlightChanges" in item and not is_running(item, now):
+        pending += int(item["InFlightChanges"])
+    return pending
+
+
+def sorted_recently(item, now):
+    last_sorted_at = item.get("LastSortedAt")
+    if not last_sorted_at:
+        return False
+    try:
+        last_sorted = datetime.datetime.fromisoformat(last_sorted_at).timestamp()
+    except ValueError:
+        print(f"경고: 사용자 '{item['UserID']}'의 LastSortedAt 속성 형식이 올바르지 않습니다: {last_sorted_at}")
+        return False
+    return now - last_sorted < MIN_INTERVAL_SECONDS
+
+
+def plan(candidates, now):
+    """(users to sort, most pending first; users with nothing left to sort)."""
+    ready = []
+    drained = []
+    running = 0
+    for item in candidates:
+        if is_running(item, now):
+            running += 1
+            continue
+        pending = pending_changes(item, now)
+        if pending == 0:
+            drained.append(item)
+            continue
+        # load_queue가 이미 걸러내지만, 조회와 판단 사이에 바뀐 경우를 위해 다시 확인
+        if int(item.get("ImageCount", 0)) < MIN_IMAGES or sorted_recently(item, now):
+            continue
+
+        first_pending_at = float(item.get("FirstPendingAt", item.get("SortStartedAt", now)))
+        settled = now - float(item.get("LastUploadAt", 0)) >= QUIET_SECONDS and pending >= MIN_PENDING
+        overdue = now - first_pending_at >= MAX_DELAY_SECONDS
+        if settled or overdue:
+            ready.append((pending, first_pending_at, item))
+
+    ready.sort(key=lambda entry: (-entry[0], entry[1]))
+    capacity = max(min(MAX_STARTS_PER_RUN, MAX_RUNNING - running), 0)
+    return [(pending, item) for pending, _, item in ready[:capacity]], drained
+
+
+def claim(dynamodb_client, item, pending, now):
+    """Moves the user's pending changes to InFlightChanges; False if they changed since the query."""
+    condition = "PendingChanges = :seen"
+    values = {
+        ":seen": item.get("PendingChanges", 0),
+        ":zero": 0,
+        ":pending": pending,
+        ":running": sort_queue.RUNNING,
+        ":now": int(now),
+    }
+    # 다시 시작하는 정렬은 본 것과 같은 시도일 때만 가져감
+    if "SortStartedAt" in item:
+        condition += " AND SortStartedAt = :started"
+        values[":started"] = item["SortStartedAt"]
+    else:
+        condition += " AND attribute_not_exists(InFlightChanges)"
+    try:
+        with metrics.phase("ddb_write"):
+            dynamodb_client.update_item(
+                TableName=STATS_TABLE_NAME,
+                Key={"UserID": {"S": item["UserID"]}},
+                UpdateExpression=(
+                    "SET PendingChanges = :zero, InFlightChanges = :pending, SortStatus = :running, "
+                    "SortStartedAt = :now REMOVE FirstPendingAt"
+                ),
+                ConditionExpression=condition,
+                ExpressionAttributeValues=ddb_codec.encode_values(values),
+            )
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+
+
+def release(dynamodb_client, user_id):
+    """The execution did not start: leave the claimed changes for the next run."""
+    with metrics.phase("ddb_write"):
+        dynamodb_client.update_item(
+            TableName=STATS_TABLE_NAME,
+            Key={"UserID": {"S": user_id}},
+            UpdateExpression="SET SortStatus = :status",
+            ExpressionAttributeValues={":status": {"S": sort_queue.NEEDS_UPDATE}},
+        )
+
+
+def drop_from_queue(dynamodb_client, user_id):
+    try:
+        with metrics.phase("ddb_write"):
+            dynamodb_client.update_item(
+                TableName=STATS_TABLE_NAME,
+                Key={"UserID": {"S": user_id}},
+                UpdateExpression="REMOVE SortQueue",
+                ConditionExpression="PendingChanges = :zero AND attribute_not_exists(InFlightChanges)",
+                ExpressionAttributeValues={":zero": {"N": "0"}},
+            )
+    except ClientError as e:
+        # 조회 뒤 새 업로드가 들어온 경우 그대로 둠
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+def start_sort(user_id, pending, now):
+    # 실행 이름은 80자, 영숫자/-/_만 허용. 같은 이름+입력의 재시작은 Step Functions가 무시함
+    name = re.sub(r"[^A-Za-z0-9_-]", "-", f"sort-{user_id}")[:64] + f"-{int(now * 1000)}"
+    payload = {"s3Bucket": SOURCE_BUCKET, "body": {"userID": user_id, "pendingChanges": pending}}
+    with metrics.phase("sfn_start"):
+        response = aws_clients.get_client("stepfunctions").start_execution(
+            stateMachineArn=STATE_MACHINE_ARN, name=name, input=json.dumps(payload)
+        )
+    return response["executionArn"]
+
+
+@metrics.instrumented
+def lambda_handler(event, context):
+    metrics.log_payload("정렬 스케줄 이벤트 수신", event)
+
+    now = event_time(event)
+    dynamodb_client = aws_clients.get_client("dynamodb")
+
+    candidates = load_queue(dynamodb_client, now)
+    to_start, drained = plan(candidates, now)
+
+    for item in drained:
+        drop_from_queue(dynamodb_client, item["UserID"])
+
+    started = []
+    for pending, item in to_start:
+        user_id = item["UserID"]
+        if not claim(dynamodb_client, item, pending, now):
+            print(f"사용자 '{user_id}'의 대기 중인 변경이 조회 뒤 바뀌어 다음 실행으로 미룹니다.")
+            continue
+        try:
+            execution_arn = start_sort(user_id, pending, now)
+        except ClientError as e:
+            print(f"오류: 사용자 '{user_id}'의 정렬 Step Function을 시작하지 못했습니다. {e}")
+            release(dynamodb_client, user_id)
+            continue
+        print(f"사용자 '{user_id}'의 정렬을 시작했습니다. (변경 {pending}개, 실행: {execution_arn})")
+        started.append({"userID": user_id, "pendingChanges": pending})
+
+    metrics.set_property("sortsStarted", len(started))
+    print(f"대기열 {len(candidates)}명 중 {len(started)}명의 정렬을 시작하고 {len(drained)}명을 대기열에서 뺐습니다.")
+    return {
+        "statusCode": 200,
+        "body": {"queued": len(candidates), "started": started, "dropped": len(drained)},
+    }
@@ -1,11 +1,8 @@
-import boto3
 import os
 import json
 import urllib.parse
 from botocore.exceptions import ClientError
-
-s3_client = boto3.client("s3")
-rekognition_client = boto3.client("rekognition")
+from prism_common import aws_clients, metrics
 
 # KEY: 차단할 Rekognition 레이블 이름
 # VALUE: 해당 레이블을 차단할 최소 신뢰도(Confidence) 점수 (0-100)
@@ -21,6 +18,7 @@ MODERATION_POLICY = {
 # ---------------------------------------------
 
 
+@metrics.instrumented
 def lambda_handler(event, context):
     try:
         bucket = event["Records"][0]["s3"]["bucket"]["name"]
@@ -34,9 +32,11 @@ def lambda_handler(event, context):
     print(f"처리 시작: s3://{bucket}/{key}")
 
     try:
-        response = rekognition_client.detect_moderation_labels(
-            Image={"S3Object": {"Bucket": bucket, "Name": key}}, MinConfidence=80.0
-        )
+        s3_client = aws_clients.get_client("s3")
+        with metrics.phase("moderation"):
+            response = aws_clients.get_client("rekognition").detect_moderation_labels(
+                Image={"S3Object": {"Bucket": bucket, "Name": key}}, MinConfidence=80.0
+            )
 
         detected_labels = []
         if "ModerationLabels" in response:
@@ -77,10 +77,11 @@ def lambda_handler(event, context):
                 return
 
             copy_source = {"Bucket": bucket, "Key": key}
-            s3_client.copy_object(
-                CopySource=copy_source, Bucket=destination_bucket, Key=key
-            )
-            s3_client.delete_object(Bucket=bucket, Key=key)
+            with metrics.phase("s3_move"):
+                s3_client.copy_object(
+                    CopySource=copy_source, Bucket=destination_bucket, Key=key
+                )
+                s3_client.delete_object(Bucket=bucket, Key=key)
             print(
                 f"파일 이동 완료: s3://{bucket}/{key} -> s3://{destination_bucket}/{key}"
             )
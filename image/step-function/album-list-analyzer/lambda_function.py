@@ -1,33 +1,33 @@
 import json
 import os
 from collections import defaultdict
-import boto3
-from boto3.dynamodb.conditions import Key
 import datetime
 import re
 from botocore.exceptions import ClientError
-from botocore.config import Config
-
-config = Config(retries={"max_attempts": 100, "mode": "adaptive"})
-
-
-dynamodb = boto3.resource("dynamodb")
-bedrock_runtime = boto3.client(service_name="bedrock-runtime", config=config)
+from prism_common import aws_clients, bedrock_governor, categories, claim_check, ddb_codec, metrics, sort_queue
 
 
 STATS_TABLE_NAME = os.environ.get("DYNAMODB_STATS_TABLE_NAME")
 METADATA_TABLE_NAME = os.environ.get("DYNAMODB_METADATA_TABLE_NAME")
+CATEGORY_TABLE_NAME = categories.CATEGORY_TABLE_NAME
 
-if not STATS_TABLE_NAME or not METADATA_TABLE_NAME:
+if not STATS_TABLE_NAME or not METADATA_TABLE_NAME or not CATEGORY_TABLE_NAME:
     raise ValueError("환경 변수가 올바르게 설정되지 않았습니다.")
 
-stats_table = dynamodb.Table(STATS_TABLE_NAME)
-metadata_table = dynamodb.Table(METADATA_TABLE_NAME)
-
 
 MODEL_ID = "apac.amazon.nova-lite-v1:0"
 
 
+def close_sort_clauses(processed_keys, remove=()):
+    """REMOVE/DELETE clauses and values that end the sort album-sort-scheduler claimed."""
+    clauses = f"REMOVE {', '.join([*remove, 'InFlightChanges', 'SortStartedAt'])}"
+    if not processed_keys:
+        return clauses, {}
+    # 이번 정렬이 읽은 키만 지움: 정렬 중에 올라온 이미지는 NewImageKeys에 남아 다음 정렬에서 처리됨
+    # (최초 정렬도 마찬가지. 빈 집합은 DynamoDB가 받지 않으므로 그때는 절을 생략)
+    return f"{clauses} DELETE NewImageKeys :processed", {":processed": set(processed_keys)}
+
+
 def get_image_metadata(image_keys):
 
     if not image_keys:
@@ -42,18 +42,26 @@ def get_image_metadata(image_keys):
 
     for album_id, original_keys_set in albums_to_query.items():
         print(f"파티션 키 '{album_id}'에 대한 메타데이터를 쿼리합니다...")
+        kwargs = {
+            "TableName": METADATA_TABLE_NAME,
+            "KeyConditionExpression": "AlbumID = :album",
+            "ExpressionAttributeValues": {":album": {"S": album_id}},
+            # 프롬프트에 쓰는 속성만 읽어서 디코딩할 양을 줄임
+            "ProjectionExpression": "OriginalKey, ImageSummary, Tags",
+        }
         try:
+            while True:
+                with metrics.phase("ddb_query"):
+                    response = aws_clients.get_client("dynamodb").query(**kwargs)
 
-            response = metadata_table.query(
-                KeyConditionExpression=Key("AlbumID").eq(album_id)
-            )
-
-            items_from_db = response.get("Items", [])
+                for item in response.get("Items", []):
+                    original_key = item.get("OriginalKey", {}).get("S")
+                    if original_key in original_keys_set:
+                        all_found_items[original_key] = ddb_codec.METADATA.decode(item)
 
-            for item in items_from_db:
-
-                if item.get("OriginalKey") in original_keys_set:
-                    all_found_items[item["OriginalKey"]] = item
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
         except ClientError as e:
             print(f"오류: '{album_id}' 쿼리 실패. {e.response['Error']['Message']}")
@@ -132,22 +140,22 @@ Now, analyze the new images below and integrate them into the structure accordin
     return prompt
 
 
+@metrics.instrumented
 def lambda_handler(event, context):
-    print(f"이벤트 수신: {json.dumps(event, indent=2)}")
+    metrics.log_payload("이벤트 수신", event)
 
     try:
 
         input_data = event["body"]
         user_id = input_data["userID"]
         is_initial_sort = input_data["isInitialSort"]
+        metrics.set_property("userID", user_id)
 
-        image_keys_to_process = []
+        # generate-image-list가 큰 목록을 S3로 넘긴 경우 참조를 풀어서 사용
         if is_initial_sort:
-            image_keys_to_process = input_data["imageList"]
-            existing_sorted_data = None
+            image_keys_to_process = claim_check.resolve(input_data["imageList"])
         else:
-            image_keys_to_process = input_data["newImageList"]
-            existing_sorted_data = input_data["existingSortData"]
+            image_keys_to_process = claim_check.resolve(input_data["newImageList"])
 
         print(
             f"사용자 '{user_id}'의 정렬 시작. 최초 정렬: {is_initial_sort}, 처리할 이미지 수: {len(image_keys_to_process)}"
@@ -158,16 +166,30 @@ def lambda_handler(event, context):
 
             print("처리할 이미지 메타데이터가 없습니다. 프로세스를 종료합니다.")
 
-            stats_table.update_item(
-                Key={"UserID": user_id},
-                UpdateExpression="SET SortStatus = :status REMOVE NewImageKeys",
-                ExpressionAttributeValues={":status": "UPDATED"},
-            )
+            clauses, values = close_sort_clauses(image_keys_to_process)
+            with metrics.phase("ddb_write"):
+                aws_clients.get_table(STATS_TABLE_NAME).update_item(
+                    Key={"UserID": user_id},
+                    UpdateExpression=f"SET SortStatus = :status {clauses}",
+                    ExpressionAttributeValues={":status": sort_queue.UPDATED, **values},
+                )
             return {
                 "statusCode": 200,
                 "body": json.dumps({"message": "No new images to process."}),
             }
 
+        # 변경된 카테고리만 쓰기 위해 최초 정렬에서도 저장된 카테고리와 비교
+        category_table = aws_clients.get_table(CATEGORY_TABLE_NAME)
+        existing_categories = categories.load(category_table, user_id)
+
+        existing_sorted_data = None
+        if not is_initial_sort:
+            if "existingSortData" in input_data:
+                # 아직 SortedData에 정렬 결과가 있는 사용자 (이번 정렬에서 카테고리 아이템으로 옮겨짐)
+                existing_sorted_data = claim_check.resolve(input_data["existingSortData"])
+            else:
+                existing_sorted_data = categories.to_sort_data(existing_categories)
+
         prompt = generate_bedrock_prompt(
             is_initial_sort, image_metadata, existing_sorted_data
         )
@@ -178,12 +200,12 @@ def lambda_handler(event, context):
             "inferenceConfig": {"maxTokens": 4096, "temperature": 0.3},
         }
 
-        response = bedrock_runtime.invoke_model(
-            modelId=MODEL_ID, body=json.dumps(native_request)
+        # 정렬은 배경 작업: 예산이 모자라면 BedrockDeferred로 Step Functions 재시도에 맡김
+        model_response = bedrock_governor.get_governor().invoke_model(
+            MODEL_ID, native_request, priority=bedrock_governor.BACKGROUND
         )
-        model_response = json.loads(response["body"].read())
         result_text = model_response["output"]["message"]["content"][0]["text"]
-        print(f"Bedrock 분석 결과 (Raw):\n{result_text}")
+        metrics.log_payload("Bedrock 분석 결과 (Raw)", result_text)
 
         match = re.search(r"\{.*\}", result_text, re.DOTALL)
         if not match:
@@ -194,21 +216,56 @@ def lambda_handler(event, context):
 
         completion_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
-        stats_table.update_item(
-            Key={"UserID": user_id},
-            UpdateExpression="SET SortedData = :data, SortStatus = :status, LastSortedAt = :time REMOVE NewImageKeys",
-            ExpressionAttributeValues={
-                ":data": sorted_result,
-                ":status": "UPDATED",
-                ":time": completion_time,
-            },
+        try:
+            existing_categories, puts, deletes = categories.save(
+                category_table, CATEGORY_TABLE_NAME, user_id, existing_categories, sorted_result, completion_time
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in categories.CONFLICT_ERRORS:
+                raise
+            # 아무것도 저장되기 전에 같은 사용자의 다른 정렬이 먼저 카테고리를 바꿈: 덮어쓰지 않고 다음 정렬에서 다시 합침
+            # (InFlightChanges가 남아 있으므로 스케줄러가 이 변경을 다시 대기열에 셈)
+            # 일부가 저장된 뒤의 충돌은 categories.save가 이어 쓰고, 끝내 실패하면 PartialWrite로 실행을 실패시킴
+            print(f"경고: 사용자 '{user_id}'의 카테고리가 정렬 중에 변경되어 저장을 중단합니다.")
+            with metrics.phase("ddb_write"):
+                aws_clients.get_table(STATS_TABLE_NAME).update_item(
+                    Key={"UserID": user_id},
+                    UpdateExpression="SET SortStatus = :status",
+                    ExpressionAttributeValues={":status": sort_queue.NEEDS_UPDATE},
+                )
+            return {
+                "statusCode": 409,
+                "body": json.dumps({"message": "Categories changed during the sort; will retry."}),
+            }
+        category_count = len(existing_categories) + sum(
+            1 for _, expected_version in puts if expected_version is None
+        ) - len(deletes)
+
+        clauses, values = close_sort_clauses(image_keys_to_process, remove=["SortedData"])
+        with metrics.phase("ddb_write"):
+            aws_clients.get_table(STATS_TABLE_NAME).update_item(
+                Key={"UserID": user_id},
+                UpdateExpression=f"SET CategoryCount = :count, SortStatus = :status, LastSortedAt = :time {clauses}",
+                ExpressionAttributeValues={
+                    ":count": category_count,
+                    ":status": sort_queue.UPDATED,
+                    ":time": completion_time,
+                    **values,
+                },
+            )
+        print(
+            f"성공: 사용자 '{user_id}'의 카테고리 {category_count}개 중 {len(puts)}개를 저장하고 {len(deletes)}개를 삭제했습니다."
         )
-        print(f"성공: 사용자 '{user_id}'의 정렬 데이터를 DynamoDB에 저장했습니다.")
 
         return {
             "statusCode": 200,
             "body": json.dumps(
-                {"message": f"Successfully sorted and saved data for user {user_id}"}
+                {
+                    "message": f"Successfully sorted and saved data for user {user_id}",
+                    "categoryCount": category_count,
+                    "changedCategories": len(puts),
+                    "removedCategories": len(deletes),
+                }
             ),
         }
 
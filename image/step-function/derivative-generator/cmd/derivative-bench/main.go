@@ -0,0 +1,236 @@
+// Benchmark harness for the fused derivative stage.
+//
+// Runs every image of a local corpus through the current multi-stage path (image-resizer when
+// the dispatcher asks for it, thumbnail-generator, the base64 payload extract-image-tags sends)
+// and through derivatives.Generate, and reports CPU time, decodes and Bedrock payload size for
+// both. S3 transfer is not included; each stage reads the buffer from memory.
+//
+//	go run ./cmd/derivative-bench -corpus ./samples -runs 3
+package main
+
+import (
+	"encoding/base64"
+	"flag"
+	"fmt"
+	"log"
+	"os"
+	"path/filepath"
+	"strings"
+	"sync"
+	"text/tabwriter"
+	"time"
+
+	"github.com/cshum/vipsgen/vips"
+
+	"github.com/prism-memory/backend/image/step-function/derivative-generator/derivatives"
+)
+
+type pathResult struct {
+	duration     time.Duration
+	payloadBytes int
+	decodes      int
+}
+
+func main() {
+	corpus := flag.String("corpus", "", "directory containing sample images")
+	runs := flag.Int("runs", 3, "runs per image and path; the fastest is reported")
+	inferenceEdge := flag.Int("inference-edge", 1024, "longest edge of the fused inference image")
+	inferenceQuality := flag.Int("inference-quality", 80, "JPEG quality of the fused inference image")
+	flag.Parse()
+
+	if *corpus == "" {
+		log.Fatal("-corpus is required")
+	}
+
+	vips.Startup(nil)
+	defer vips.Shutdown()
+
+	files, err := corpusFiles(*corpus)
+	if err != nil {
+		log.Fatalf("failed to read corpus: %v", err)
+	}
+
+	options := derivatives.Options{InferenceMaxEdge: *inferenceEdge, InferenceQuality: *inferenceQuality}
+
+	table := tabwriter.NewWriter(os.Stdout, 0, 0, 2, ' ', 0)
+	fmt.Fprintln(table, "file\tsize\tdecision\tmulti ms\tfused ms\tsaved\tmulti payload\tfused payload")
+
+	var totalMulti, totalFused time.Duration
+	var payloadMulti, payloadFused, decodesMulti, decodesFused int
+	count := 0
+
+	for _, path := range files {
+		buffer, err := os.ReadFile(path)
+		if err != nil {
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+
+		decision, width, height, err := dispatch(buffer)
+		if err != nil {
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+
+		var multi, fused pathResult
+		for run := 0; run < *runs; run++ {
+			m, errMulti := multiStage(buffer, decision, width, height)
+			f, errFused := fusedStage(buffer, options, decision)
+			if errMulti != nil || errFused != nil {
+				err = fmt.Errorf("multi-stage=%v fused=%v", errMulti, errFused)
+				break
+			}
+			if run == 0 || m.duration < multi.duration {
+				multi = m
+			}
+			if run == 0 || f.duration < fused.duration {
+				fused = f
+			}
+		}
+		if err != nil {
+			log.Printf("skip %s: %v", path, err)
+			continue
+		}
+
+		fmt.Fprintf(table, "%s\t%dx%d\t%s\t%d\t%d\t%.1f%%\t%d\t%d\n",
+			filepath.Base(path), width, height, decision,
+			multi.duration.Milliseconds(), fused.duration.Milliseconds(),
+			100*(1-float64(fused.duration)/float64(multi.duration)),
+			multi.payloadBytes, fused.payloadBytes)
+
+		totalMulti += multi.duration
+		totalFused += fused.duration
+		payloadMulti += multi.payloadBytes
+		payloadFused += fused.payloadBytes
+		decodesMulti += multi.decodes
+		decodesFused += fused.decodes
+		count++
+	}
+	table.Flush()
+
+	if count == 0 {
+		log.Fatal("no images could be benchmarked")
+	}
+
+	fmt.Printf("\n%d images, fastest of %d runs\n", count, *runs)
+	fmt.Printf("wall time:       multi-stage %s, fused %s, saved %.1f%%\n",
+		totalMulti, totalFused, 100*(1-float64(totalFused)/float64(totalMulti)))
+	fmt.Printf("decodes:         multi-stage %d, fused %d\n", decodesMulti, decodesFused)
+	fmt.Printf("bedrock payload: multi-stage %d bytes, fused %d bytes\n", payloadMulti, payloadFused)
+}
+
+func corpusFiles(dir string) ([]string, error) {
+	var files []string
+	err := filepath.WalkDir(dir, func(path string, entry os.DirEntry, err error) error {
+		if err != nil {
+			return err
+		}
+		switch strings.ToLower(filepath.Ext(path)) {
+		case ".jpg", ".jpeg", ".png", ".webp", ".heic", ".tif", ".tiff":
+			files = append(files, path)
+		}
+		return nil
+	})
+	return files, err
+}
+
+// decide is image-dispatcher's routing rule.
+func decide(format string, width, height int) string {
+	isTooLarge := width > derivatives.MaxEdge || height > derivatives.MaxEdge
+	isFormatOK := strings.Contains(format, "jpeg") || strings.Contains(format, "png") || strings.Contains(format, "webp")
+	isTooSmall := width < 256 && height < 256
+	if !isFormatOK || isTooLarge || isTooSmall {
+		return "NeedsResizing"
+	}
+	return "IsAppropriate"
+}
+
+// dispatch is image-dispatcher's decode; it runs ahead of both paths, so it is not timed.
+func dispatch(buffer []byte) (string, int, int, error) {
+	img, err := vips.NewImageFromBuffer(buffer, nil)
+	if err != nil {
+		return "", 0, 0, err
+	}
+	defer img.Close()
+	format, err := img.GetString("vips-loader")
+	if err != nil {
+		return "", 0, 0, err
+	}
+	return decide(format, img.Width(), img.Height()), img.Width(), img.Height(), nil
+}
+
+// multiStage repeats the decode and encode work each current stage does on its own.
+func multiStage(buffer []byte, decision string, width, height int) (pathResult, error) {
+	start := time.Now()
+	result := pathResult{}
+
+	// image-resizer
+	payload := buffer
+	if decision == "NeedsResizing" {
+		img, err := vips.NewImageFromBuffer(buffer, nil)
+		if err != nil {
+			return result, err
+		}
+		edge := 0
+		if width > derivatives.MaxEdge || height > derivatives.MaxEdge {
+			edge = derivatives.WorkingCopyEdge
+		}
+		resized, err := derivatives.Resized(img, edge, edge)
+		img.Close()
+		if err != nil {
+			return result, err
+		}
+		encoded, err := derivatives.EncodeWorkingCopy(resized)
+		resized.Close()
+		if err != nil {
+			return result, err
+		}
+		payload = encoded.Bytes
+		result.decodes++
+	}
+
+	// thumbnail-generator
+	img, err := vips.NewImageFromBuffer(buffer, nil)
+	if err != nil {
+		return result, err
+	}
+	thumbnail, err := derivatives.Resized(img, derivatives.ThumbnailWidth, 0)
+	img.Close()
+	if err != nil {
+		return result, err
+	}
+	// thumbnail-generator encodes the formats concurrently, as Generate does
+	var wg sync.WaitGroup
+	errs := make([]error, len(derivatives.ThumbnailFormats))
+	for i, format := range derivatives.ThumbnailFormats {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			_, errs[i] = derivatives.EncodeThumbnail(thumbnail, format)
+		}()
+	}
+	wg.Wait()
+	thumbnail.Close()
+	for _, err := range errs {
+		if err != nil {
+			return result, err
+		}
+	}
+	result.decodes++
+
+	// extract-image-tags
+	result.payloadBytes = len(base64.StdEncoding.EncodeToString(payload))
+	result.duration = time.Since(start)
+	return result, nil
+}
+
+func fusedStage(buffer []byte, options derivatives.Options, decision string) (pathResult, error) {
+	start := time.Now()
+	options.WorkingCopy = decision == "NeedsResizing"
+	set, err := derivatives.Generate(buffer, options)
+	if err != nil {
+		return pathResult{}, err
+	}
+	payloadBytes := len(base64.StdEncoding.EncodeToString(set.Inference.Bytes))
+	return pathResult{duration: time.Since(start), payloadBytes: payloadBytes, decodes: 1}, nil
+}
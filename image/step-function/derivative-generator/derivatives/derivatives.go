@@ -0,0 +1,274 @@
+// Package derivatives produces every image the pipeline derives from an original from a single
+// decode: the resized working copy, the downscaled inference input for Bedrock and the
+// thumbnails. Encoding options are the ones image-resizer and thumbnail-generator use, so the
+// outputs are interchangeable with theirs.
+package derivatives
+
+import (
+	"fmt"
+	"sync"
+
+	"github.com/cshum/vipsgen/vips"
+)
+
+// ThumbnailWidth is the bounding box of the thumbnails, as in thumbnail-generator.
+const ThumbnailWidth = 400
+
+// Images above MaxEdge in either dimension are not recommended for Nova; the working copy of
+// such images is reduced to fit WorkingCopyEdge, as in image-resizer.
+const (
+	MaxEdge         = 8000
+	WorkingCopyEdge = 4000
+)
+
+var ThumbnailFormats = []string{"jpeg", "webp", "avif"}
+
+type Options struct {
+	WorkingCopy      bool // the dispatcher decided NeedsResizing
+	InferenceMaxEdge int  // longest edge of the image sent to Bedrock
+	InferenceQuality int
+	// Display variants: every width narrower than the original, in every format. Together with
+	// the thumbnails they make the variant catalog the metadata resolver picks from. Only
+	// GenerateVariants encodes them, so they stay out of the stage that tagging waits for.
+	VariantWidths  []int
+	VariantFormats []string
+}
+
+type Encoded struct {
+	Format      string
+	ContentType string
+	Extension   string
+	Width       int
+	Height      int
+	Bytes       []byte
+}
+
+type Set struct {
+	Loader      string
+	Width       int
+	Height      int
+	WorkingCopy *Encoded
+	Inference   Encoded
+	Thumbnails  []Encoded
+}
+
+// Generate decodes the original once and encodes all derivatives from that decode concurrently.
+func Generate(buffer []byte, options Options) (Set, error) {
+	source, err := vips.NewImageFromBuffer(buffer, nil)
+	if err != nil {
+		return Set{}, fmt.Errorf("failed to process image with vips: %w", err)
+	}
+	defer source.Close()
+
+	loader, err := source.GetString("vips-loader")
+	if err != nil {
+		return Set{}, fmt.Errorf("failed to get image format metadata: %w", err)
+	}
+	set := Set{Loader: loader, Width: source.Width(), Height: source.Height()}
+
+	thumbnail, err := Resized(source, ThumbnailWidth, 0)
+	if err != nil {
+		return Set{}, fmt.Errorf("failed to create base thumbnail: %w", err)
+	}
+	defer thumbnail.Close()
+
+	tasks := []func() (Encoded, error){
+		func() (Encoded, error) { return inference(source, options) },
+	}
+	for _, format := range ThumbnailFormats {
+		tasks = append(tasks, func() (Encoded, error) {
+			img, err := Resized(thumbnail, 0, 0)
+			if err != nil {
+				return Encoded{}, fmt.Errorf("failed to copy image for %s: %w", format, err)
+			}
+			defer img.Close()
+			return EncodeThumbnail(img, format)
+		})
+	}
+	if options.WorkingCopy {
+		tasks = append(tasks, func() (Encoded, error) { return workingCopy(source) })
+	}
+
+	outputs, err := runAll(tasks)
+	if err != nil {
+		return Set{}, err
+	}
+
+	set.Inference = outputs[0]
+	set.Thumbnails = outputs[1 : 1+len(ThumbnailFormats)]
+	if options.WorkingCopy {
+		set.WorkingCopy = &outputs[len(outputs)-1]
+	}
+	return set, nil
+}
+
+// GenerateVariants decodes the original and encodes the display variants: each width is resized
+// once and encoded in every format from copies, like the thumbnails. It runs as its own stage,
+// next to tagging, instead of inside Generate.
+func GenerateVariants(buffer []byte, options Options) ([]Encoded, error) {
+	source, err := vips.NewImageFromBuffer(buffer, nil)
+	if err != nil {
+		return nil, fmt.Errorf("failed to process image with vips: %w", err)
+	}
+	defer source.Close()
+
+	var tasks []func() (Encoded, error)
+	for _, width := range variantWidths(source.Width(), options.VariantWidths) {
+		base, err := resizedToWidth(source, width)
+		if err != nil {
+			return nil, fmt.Errorf("failed to create %dw variant: %w", width, err)
+		}
+		defer base.Close()
+		for _, format := range options.VariantFormats {
+			tasks = append(tasks, func() (Encoded, error) {
+				img, err := Resized(base, 0, 0)
+				if err != nil {
+					return Encoded{}, fmt.Errorf("failed to copy %dw variant for %s: %w", width, format, err)
+				}
+				defer img.Close()
+				return EncodeThumbnail(img, format)
+			})
+		}
+	}
+	return runAll(tasks)
+}
+
+// runAll runs the encoding tasks concurrently and returns their outputs in order.
+func runAll(tasks []func() (Encoded, error)) ([]Encoded, error) {
+	var wg sync.WaitGroup
+	outputs := make([]Encoded, len(tasks))
+	errs := make([]error, len(tasks))
+	for i, task := range tasks {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			outputs[i], errs[i] = task()
+		}()
+	}
+	wg.Wait()
+
+	for _, err := range errs {
+		if err != nil {
+			return nil, err
+		}
+	}
+	return outputs, nil
+}
+
+// Resized returns a copy of img fitted into width x height (height 0 = same as width).
+// A width of 0 returns an unresized copy.
+func Resized(img *vips.Image, width, height int) (*vips.Image, error) {
+	resized, err := img.Copy(nil)
+	if err != nil {
+		return nil, err
+	}
+	if width > 0 {
+		if err := resized.ThumbnailImage(width, &vips.ThumbnailImageOptions{Height: height, Crop: vips.InterestingNone}); err != nil {
+			resized.Close()
+			return nil, err
+		}
+	}
+	return resized, nil
+}
+
+// variantWidths keeps the widths that are wider than the thumbnails and narrower than the
+// original; larger displays use the original.
+func variantWidths(sourceWidth int, widths []int) []int {
+	var kept []int
+	for _, width := range widths {
+		if width > ThumbnailWidth && width < sourceWidth {
+			kept = append(kept, width)
+		}
+	}
+	return kept
+}
+
+// resizedToWidth fits the width only: the height of the box is the proportional height, rounded up.
+func resizedToWidth(source *vips.Image, width int) (*vips.Image, error) {
+	return Resized(source, width, proportionalHeight(source.Width(), source.Height(), width))
+}
+
+// proportionalHeight is the height of a sourceWidth x sourceHeight image scaled to width,
+// rounded up so the box never makes vips narrow the image to fit the height.
+func proportionalHeight(sourceWidth, sourceHeight, width int) int {
+	return (sourceHeight*width + sourceWidth - 1) / sourceWidth
+}
+
+func inference(source *vips.Image, options Options) (Encoded, error) {
+	edge := 0
+	if source.Width() > options.InferenceMaxEdge || source.Height() > options.InferenceMaxEdge {
+		edge = options.InferenceMaxEdge
+	}
+	img, err := Resized(source, edge, edge)
+	if err != nil {
+		return Encoded{}, fmt.Errorf("failed to create inference image: %w", err)
+	}
+	defer img.Close()
+
+	buffer, err := img.JpegsaveBuffer(&vips.JpegsaveBufferOptions{
+		Q:              options.InferenceQuality,
+		OptimizeCoding: true,
+		SubsampleMode:  vips.SubsampleAuto,
+	})
+	if err != nil {
+		return Encoded{}, fmt.Errorf("failed to encode inference image: %w", err)
+	}
+	return Encoded{Format: "jpeg", ContentType: "image/jpeg", Extension: ".jpg", Width: img.Width(), Height: img.Height(), Bytes: buffer}, nil
+}
+
+func workingCopy(source *vips.Image) (Encoded, error) {
+	edge := 0
+	if source.Width() > MaxEdge || source.Height() > MaxEdge {
+		edge = WorkingCopyEdge
+	}
+	img, err := Resized(source, edge, edge)
+	if err != nil {
+		return Encoded{}, fmt.Errorf("failed to create working copy: %w", err)
+	}
+	defer img.Close()
+	return EncodeWorkingCopy(img)
+}
+
+// EncodeWorkingCopy encodes with image-resizer's JPEG options.
+func EncodeWorkingCopy(img *vips.Image) (Encoded, error) {
+	buffer, err := img.JpegsaveBuffer(&vips.JpegsaveBufferOptions{
+		Q:              75,
+		OptimizeCoding: true,
+		SubsampleMode:  vips.SubsampleAuto,
+		TrellisQuant:   true,
+	})
+	if err != nil {
+		return Encoded{}, fmt.Errorf("failed to encode image to JPEG: %w", err)
+	}
+	return Encoded{Format: "jpeg", ContentType: "image/jpeg", Extension: ".jpg", Width: img.Width(), Height: img.Height(), Bytes: buffer}, nil
+}
+
+// EncodeThumbnail encodes with thumbnail-generator's options for format. Display variants use
+// the same options.
+func EncodeThumbnail(img *vips.Image, format string) (Encoded, error) {
+	var buffer []byte
+	var err error
+	encoded := Encoded{Format: format, Width: img.Width(), Height: img.Height()}
+
+	switch format {
+	case "jpeg":
+		options := &vips.JpegsaveBufferOptions{Q: 80, OptimizeCoding: true, Interlace: true, SubsampleMode: vips.SubsampleAuto, TrellisQuant: true, OptimizeScans: true}
+		buffer, err = img.JpegsaveBuffer(options)
+		encoded.ContentType, encoded.Extension = "image/jpeg", ".jpg"
+	case "webp":
+		options := &vips.WebpsaveBufferOptions{Q: 82, Effort: 4, SmartSubsample: true}
+		buffer, err = img.WebpsaveBuffer(options)
+		encoded.ContentType, encoded.Extension = "image/webp", ".webp"
+	case "avif":
+		options := &vips.HeifsaveBufferOptions{Q: 64, Bitdepth: 8, Effort: 4, Lossless: false, SubsampleMode: vips.SubsampleAuto, Compression: vips.HeifCompressionAv1, Encoder: vips.HeifEncoderSvt}
+		buffer, err = img.HeifsaveBuffer(options)
+		encoded.ContentType, encoded.Extension = "image/avif", ".avif"
+	default:
+		return Encoded{}, fmt.Errorf("unsupported format: %s", format)
+	}
+	if err != nil {
+		return Encoded{}, fmt.Errorf("failed to encode to %s: %w", format, err)
+	}
+	encoded.Bytes = buffer
+	return encoded, nil
+}
@@ -0,0 +1,92 @@
+package derivatives
+
+import (
+	"errors"
+	"fmt"
+	"reflect"
+	"testing"
+	"time"
+)
+
+func TestRunAllKeepsTaskOrder(t *testing.T) {
+	// Later tasks finish first, so the outputs are only in order if runAll places them by index.
+	var tasks []func() (Encoded, error)
+	for i := 0; i < 8; i++ {
+		tasks = append(tasks, func() (Encoded, error) {
+			time.Sleep(time.Duration(8-i) * 2 * time.Millisecond)
+			return Encoded{Format: fmt.Sprint(i), Width: i}, nil
+		})
+	}
+
+	outputs, err := runAll(tasks)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if len(outputs) != len(tasks) {
+		t.Fatalf("got %d outputs, want %d", len(outputs), len(tasks))
+	}
+	for i, output := range outputs {
+		if output.Width != i {
+			t.Errorf("outputs[%d] came from task %d", i, output.Width)
+		}
+	}
+}
+
+func TestRunAllReturnsTheFirstTaskError(t *testing.T) {
+	first, second := errors.New("first"), errors.New("second")
+	tasks := []func() (Encoded, error){
+		func() (Encoded, error) { return Encoded{}, nil },
+		func() (Encoded, error) { time.Sleep(5 * time.Millisecond); return Encoded{}, first },
+		func() (Encoded, error) { return Encoded{}, second },
+	}
+
+	outputs, err := runAll(tasks)
+	if !errors.Is(err, first) || outputs != nil {
+		t.Errorf("runAll = %v, %v; want nil, %v", outputs, err, first)
+	}
+
+	if outputs, err := runAll(nil); err != nil || len(outputs) != 0 {
+		t.Errorf("runAll(nil) = %v, %v", outputs, err)
+	}
+}
+
+func TestVariantWidths(t *testing.T) {
+	tests := []struct {
+		name        string
+		sourceWidth int
+		widths      []int
+		want        []int
+	}{
+		{"all narrower", 4000, []int{640, 1280, 1920}, []int{640, 1280, 1920}},
+		{"original between", 1500, []int{640, 1280, 1920}, []int{640, 1280}},
+		{"equal to the original", 1280, []int{640, 1280}, []int{640}},
+		{"not wider than the thumbnails", 4000, []int{ThumbnailWidth - 1, ThumbnailWidth, 640}, []int{640}},
+		{"original too small", 500, []int{640, 1280}, nil},
+		{"order kept", 4000, []int{1920, 640}, []int{1920, 640}},
+		{"none configured", 4000, nil, nil},
+	}
+	for _, tt := range tests {
+		if got := variantWidths(tt.sourceWidth, tt.widths); !reflect.DeepEqual(got, tt.want) {
+			t.Errorf("%s: variantWidths(%d, %v) = %v, want %v", tt.name, tt.sourceWidth, tt.widths, got, tt.want)
+		}
+	}
+}
+
+func TestProportionalHeight(t *testing.T) {
+	tests := []struct {
+		sourceWidth, sourceHeight, width int
+		want                             int
+	}{
+		{4000, 3000, 640, 480},   // exact
+		{4032, 3024, 1280, 960},  // exact
+		{1000, 333, 640, 214},    // 213.12 rounds up
+		{3000, 4000, 1280, 1707}, // portrait, 1706.67 rounds up
+		{1920, 1, 640, 1},        // never 0
+		{641, 1000, 640, 999},    // 998.4 rounds up
+	}
+	for _, tt := range tests {
+		if got := proportionalHeight(tt.sourceWidth, tt.sourceHeight, tt.width); got != tt.want {
+			t.Errorf("proportionalHeight(%d, %d, %d) = %d, want %d", tt.sourceWidth, tt.sourceHeight, tt.width, got, tt.want)
+		}
+	}
+}
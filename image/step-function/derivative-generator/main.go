@@ -0,0 +1,374 @@
+//Lambda to generate the working copy, thumbnails and inference input from a single decode.
+//Replaces image-resizer + thumbnail-generator in the state machine and hands the inference
+//bytes straight to extract-image-tags.
+//
+//With "stage": "variants" the same function encodes the display variants instead. The state
+//machine runs that stage in a Parallel branch next to extract-image-tags (with a Catch, since
+//the item is still usable with its thumbnails) and passes its `variants` to result-to-dynamodb
+//as `display_variants`, so the larger encodes never delay tagging.
+
+package main
+
+import (
+	"bytes"
+	"context"
+	"encoding/base64"
+	"encoding/json"
+	"fmt"
+	"io"
+	"log"
+	"os"
+	"path/filepath"
+	"strconv"
+	"strings"
+	"sync"
+	"time"
+
+	"github.com/aws/aws-lambda-go/lambda"
+	"github.com/aws/aws-sdk-go-v2/aws"
+	"github.com/aws/aws-sdk-go-v2/config"
+	"github.com/aws/aws-sdk-go-v2/service/s3"
+	"github.com/cshum/vipsgen/vips"
+
+	"github.com/prism-memory/backend/image/step-function/derivative-generator/derivatives"
+)
+
+// DerivativeEvent is the image-dispatcher's RoutingDecision.
+type DerivativeEvent struct {
+	S3Bucket     string            `json:"s3Bucket"`
+	S3Key        string            `json:"s3Key"`
+	ImageFormat  string            `json:"imageFormat"`
+	Width        int               `json:"width"`
+	Height       int               `json:"height"`
+	FileSize     int64             `json:"fileSize"`
+	Decision     string            `json:"decision"`
+	LastModified time.Time         `json:"lastModified"`
+	ContentType  string            `json:"contentType"`
+	UserMetadata map[string]string `json:"userMetadata"`
+	// "" for the derivative stage, "variants" for the display variant stage
+	Stage string `json:"stage,omitempty"`
+}
+
+type InferenceImage struct {
+	Format string `json:"format"`
+	Bytes  string `json:"bytes"` // base64, as Bedrock expects it
+	Width  int    `json:"width"`
+	Height int    `json:"height"`
+}
+
+// Variant is one entry of the display variant catalog result-to-dynamodb stores on the item.
+type Variant struct {
+	Format string `json:"format"`
+	Width  int    `json:"width"`
+	Height int    `json:"height"`
+	Key    string `json:"key"`
+	Bytes  int    `json:"bytes"`
+}
+
+type DerivativeResult struct {
+	Status        string            `json:"status"`
+	S3Bucket      string            `json:"s3Bucket"`
+	OriginalKey   string            `json:"originalKey"`
+	S3Key         string            `json:"newKey,omitempty"`
+	ThumbnailKeys map[string]string `json:"thumbnailKeys,omitempty"`
+	Variants      []Variant         `json:"variants,omitempty"` // the thumbnails, in the processed bucket
+	Message       string            `json:"message,omitempty"`
+	// Inline when small enough for the Step Functions payload, otherwise written to S3
+	InferenceImage  *InferenceImage   `json:"inferenceImage,omitempty"`
+	InferenceBucket string            `json:"inferenceBucket,omitempty"`
+	InferenceKey    string            `json:"inferenceKey,omitempty"`
+	ImageFormat     string            `json:"imageFormat"`
+	Width           int               `json:"width"`
+	Height          int               `json:"height"`
+	FileSize        int64             `json:"fileSize"`
+	LastModified    time.Time         `json:"lastModified"`
+	ContentType     string            `json:"contentType"`
+	UserMetadata    map[string]string `json:"userMetadata"`
+}
+
+// VariantsResult is the output of the "variants" stage.
+type VariantsResult struct {
+	Status      string    `json:"status"`
+	OriginalKey string    `json:"originalKey"`
+	Variants    []Variant `json:"variants"`
+}
+
+var (
+	s3Client *s3.Client
+	options  derivatives.Options
+	// Raw bytes; base64 adds a third, and the Step Functions state payload limit is 256 KiB
+	inlineInferenceMaxBytes int
+	// The whole marshalled result must stay under this when the image is inlined: the state
+	// also carries the execution input and the outputs of the other branches.
+	inlineResultMaxBytes int
+)
+
+func init() {
+	cfg, err := config.LoadDefaultConfig(context.TODO())
+	if err != nil {
+		log.Fatalf("unable to load SDK config, %v", err)
+	}
+	s3Client = s3.NewFromConfig(cfg)
+
+	options = derivatives.Options{
+		InferenceMaxEdge: envInt("INFERENCE_MAX_EDGE", 1024),
+		InferenceQuality: envInt("INFERENCE_QUALITY", 80),
+		VariantWidths:    envInts("VARIANT_WIDTHS", []int{640, 1280, 1920}),
+		VariantFormats:   envList("VARIANT_FORMATS", []string{"webp", "avif"}),
+	}
+	inlineInferenceMaxBytes = envInt("INLINE_INFERENCE_MAX_BYTES", 96*1024)
+	inlineResultMaxBytes = envInt("INLINE_RESULT_MAX_BYTES", 160*1024)
+
+	vips.Startup(nil)
+	log.Println("S3 client and vips initialized for Derivative Generator")
+}
+
+func envInt(name string, fallback int) int {
+	value, err := strconv.Atoi(os.Getenv(name))
+	if err != nil || value <= 0 {
+		return fallback
+	}
+	return value
+}
+
+// envInts parses a comma-separated list of positive integers; "none" turns the list off.
+func envInts(name string, fallback []int) []int {
+	fields := envList(name, []string{})
+	if fields == nil {
+		return nil
+	}
+	if len(fields) == 0 {
+		return fallback
+	}
+	values := make([]int, 0, len(fields))
+	for _, field := range fields {
+		value, err := strconv.Atoi(field)
+		if err != nil || value <= 0 {
+			return fallback
+		}
+		values = append(values, value)
+	}
+	return values
+}
+
+// envList parses a comma-separated list; unset returns fallback and "none" returns nil.
+func envList(name string, fallback []string) []string {
+	raw := strings.TrimSpace(os.Getenv(name))
+	if raw == "" {
+		return fallback
+	}
+	if raw == "none" {
+		return nil
+	}
+	var values []string
+	for _, field := range strings.Split(raw, ",") {
+		if field = strings.TrimSpace(field); field != "" {
+			values = append(values, field)
+		}
+	}
+	return values
+}
+
+func HandleRequest(ctx context.Context, event DerivativeEvent) (interface{}, error) {
+	if event.Stage == "variants" {
+		return generateVariants(ctx, event)
+	}
+	return generateDerivatives(ctx, event)
+}
+
+func generateDerivatives(ctx context.Context, event DerivativeEvent) (DerivativeResult, error) {
+	if event.Width < 256 && event.Height < 256 {
+		msg := fmt.Sprintf("Image is too small (%dx%d) to process.", event.Width, event.Height)
+		log.Println(msg)
+		return DerivativeResult{
+			Status:      "REJECTED_TOO_SMALL",
+			OriginalKey: event.S3Key,
+			Message:     msg,
+		}, nil
+	}
+
+	log.Printf("Generating derivatives for: bucket=%s, key=%s, decision=%s", event.S3Bucket, event.S3Key, event.Decision)
+
+	imageBuffer, err := readOriginal(ctx, event)
+	if err != nil {
+		return DerivativeResult{}, err
+	}
+
+	eventOptions := options
+	eventOptions.WorkingCopy = event.Decision == "NeedsResizing"
+	set, err := derivatives.Generate(imageBuffer, eventOptions)
+	if err != nil {
+		return DerivativeResult{}, err
+	}
+
+	destinationBucket := strings.Replace(event.S3Bucket, "originals", "processed", 1)
+	result := DerivativeResult{
+		Status:        "SUCCESS",
+		S3Bucket:      event.S3Bucket,
+		OriginalKey:   event.S3Key,
+		ThumbnailKeys: make(map[string]string),
+		ImageFormat:   event.ImageFormat,
+		Width:         event.Width,
+		Height:        event.Height,
+		FileSize:      event.FileSize,
+		LastModified:  event.LastModified,
+		ContentType:   event.ContentType,
+		UserMetadata:  event.UserMetadata,
+	}
+
+	var uploads []upload
+	for _, thumbnail := range set.Thumbnails {
+		key := generateThumbnailKey(event.S3Key, thumbnail.Extension)
+		uploads = append(uploads, upload{destinationBucket, key, thumbnail})
+		result.ThumbnailKeys[thumbnail.Format] = key
+		result.Variants = append(result.Variants, variantOf(thumbnail, key))
+	}
+	if set.WorkingCopy != nil {
+		result.S3Key = replaceExtensionWithSuffix(event.S3Key, "-processed.jpg")
+		uploads = append(uploads, upload{event.S3Bucket, result.S3Key, *set.WorkingCopy})
+	}
+	if len(set.Inference.Bytes) <= inlineInferenceMaxBytes {
+		result.InferenceImage = &InferenceImage{
+			Format: set.Inference.Format,
+			Bytes:  base64.StdEncoding.EncodeToString(set.Inference.Bytes),
+			Width:  set.Inference.Width,
+			Height: set.Inference.Height,
+		}
+		if payload, err := json.Marshal(result); err != nil || len(payload) > inlineResultMaxBytes {
+			result.InferenceImage = nil
+		}
+	}
+	if result.InferenceImage == nil {
+		result.InferenceBucket = destinationBucket
+		result.InferenceKey = generateDerivativeKey(event.S3Key, "inference", set.Inference.Extension)
+		uploads = append(uploads, upload{destinationBucket, result.InferenceKey, set.Inference})
+	}
+
+	if err := putAll(ctx, uploads); err != nil {
+		return DerivativeResult{}, err
+	}
+	log.Printf("Derivatives uploaded: %d objects, inference %dx%d (%d bytes, inline=%t)",
+		len(uploads), set.Inference.Width, set.Inference.Height, len(set.Inference.Bytes), result.InferenceImage != nil)
+
+	return result, nil
+}
+
+// generateVariants encodes and uploads the display variants of the original.
+func generateVariants(ctx context.Context, event DerivativeEvent) (VariantsResult, error) {
+	result := VariantsResult{Status: "SUCCESS", OriginalKey: event.S3Key, Variants: []Variant{}}
+	if len(options.VariantWidths) == 0 || len(options.VariantFormats) == 0 {
+		return result, nil
+	}
+
+	imageBuffer, err := readOriginal(ctx, event)
+	if err != nil {
+		return VariantsResult{}, err
+	}
+	encoded, err := derivatives.GenerateVariants(imageBuffer, options)
+	if err != nil {
+		return VariantsResult{}, err
+	}
+
+	destinationBucket := strings.Replace(event.S3Bucket, "originals", "processed", 1)
+	var uploads []upload
+	for _, variant := range encoded {
+		key := generateVariantKey(event.S3Key, variant.Width, variant.Extension)
+		uploads = append(uploads, upload{destinationBucket, key, variant})
+		result.Variants = append(result.Variants, variantOf(variant, key))
+	}
+	if err := putAll(ctx, uploads); err != nil {
+		return VariantsResult{}, err
+	}
+	log.Printf("Display variants uploaded: %d objects", len(uploads))
+	return result, nil
+}
+
+func readOriginal(ctx context.Context, event DerivativeEvent) ([]byte, error) {
+	s3Object, err := s3Client.GetObject(ctx, &s3.GetObjectInput{
+		Bucket: &event.S3Bucket,
+		Key:    &event.S3Key,
+	})
+	if err != nil {
+		return nil, fmt.Errorf("failed to get object from S3: %w", err)
+	}
+	defer func(Body io.ReadCloser) {
+		err := Body.Close()
+		if err != nil {
+
+		}
+	}(s3Object.Body)
+
+	imageBuffer, err := io.ReadAll(s3Object.Body)
+	if err != nil {
+		return nil, fmt.Errorf("failed to read image from S3 stream: %w", err)
+	}
+	return imageBuffer, nil
+}
+
+type upload struct {
+	bucket  string
+	key     string
+	encoded derivatives.Encoded
+}
+
+func putAll(ctx context.Context, uploads []upload) error {
+	var wg sync.WaitGroup
+	errors := make(chan error, len(uploads))
+
+	for _, u := range uploads {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			_, err := s3Client.PutObject(ctx, &s3.PutObjectInput{
+				Bucket:      aws.String(u.bucket),
+				Key:         aws.String(u.key),
+				Body:        bytes.NewReader(u.encoded.Bytes),
+				ContentType: aws.String(u.encoded.ContentType),
+			})
+			if err != nil {
+				errors <- fmt.Errorf("failed to upload %s to S3: %w", u.key, err)
+			}
+		}()
+	}
+	wg.Wait()
+	close(errors)
+
+	// Return the first error encountered.
+	for err := range errors {
+		return err
+	}
+	return nil
+}
+
+func main() {
+	lambda.Start(HandleRequest)
+}
+
+// Function to save image in target folder destination
+func replaceExtensionWithSuffix(key, suffix string) string {
+	ext := filepath.Ext(key)
+	if ext == "" {
+		return key + suffix
+	}
+	return key[0:len(key)-len(ext)] + suffix
+}
+
+func generateThumbnailKey(originalKey, newExtension string) string {
+	return generateDerivativeKey(originalKey, "thumbnail", newExtension)
+}
+
+func variantOf(encoded derivatives.Encoded, key string) Variant {
+	return Variant{Format: encoded.Format, Width: encoded.Width, Height: encoded.Height, Key: key, Bytes: len(encoded.Bytes)}
+}
+
+// generateVariantKey names a display variant by its width, e.g. album/u/d/variants/IMG_0001-1280w.avif
+func generateVariantKey(originalKey string, width int, newExtension string) string {
+	return generateDerivativeKey(originalKey, "variants", fmt.Sprintf("-%dw%s", width, newExtension))
+}
+
+// Function to save images in target folder destination
+func generateDerivativeKey(originalKey, folder, newExtension string) string {
+	dir, filename := filepath.Split(originalKey)
+	baseFilename := strings.TrimSuffix(filename, filepath.Ext(filename))
+	return filepath.Join(dir, folder, baseFilename+newExtension)
+}
@@ -0,0 +1,49 @@
+from prism_common import bedrock_governor, embeddings, metrics, vector_index
+
+
+@metrics.instrumented
+def lambda_handler(event, context):
+    metrics.log_payload("임베딩할 이벤트 수신", event)
+
+    try:
+        bedrock_analysis = event["bedrock_analysis"]
+        original_key = event["original_key"]
+    except KeyError as e:
+        print(f"오류: 입력 이벤트에 필수 키가 없습니다: {e}")
+        raise e
+
+    key_parts = original_key.split("/")
+    if len(key_parts) < 3 or key_parts[0] != "album":
+        raise ValueError(
+            f"'{original_key}'에서 UserID를 추출할 수 없는 경로 형식입니다. 'album/USER_ID/...' 형식을 예상했습니다."
+        )
+    user_id = key_parts[1]
+    metrics.set_property("userID", user_id)
+
+    summary = bedrock_analysis.get("imageSummary")
+    if not summary:
+        print(f"'{original_key}'에 요약이 없어 색인하지 않습니다.")
+        return {"statusCode": 200, "body": {"userID": user_id, "originalKey": original_key, "indexed": False}}
+
+    embedder = embeddings.get_embedder()
+    text = embeddings.document_text(summary, bedrock_analysis.get("tags"))
+    # 백필은 사용자가 기다리는 업로드보다 Bedrock 예산을 뒤에 씀
+    priority = bedrock_governor.BACKGROUND if event.get("origin") == "backfill" else bedrock_governor.INTERACTIVE
+    vectors = embedder.embed([text], priority=priority)
+
+    pending = vector_index.append(user_id, vector_index.Segment(embedder.model, [original_key], vectors))
+    compacted = False
+    if pending >= vector_index.COMPACT_AFTER_DELTAS:
+        compacted = vector_index.compact(user_id)
+    print(f"'{original_key}'를 사용자 '{user_id}'의 벡터 색인에 추가했습니다. (대기 중인 델타: {pending}, 압축: {compacted})")
+
+    return {
+        "statusCode": 200,
+        "body": {
+            "userID": user_id,
+            "originalKey": original_key,
+            "indexed": True,
+            "model": embedder.model,
+            "compacted": compacted,
+        },
+    }
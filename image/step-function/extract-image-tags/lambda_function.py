@@ -2,26 +2,59 @@ import base64
 import json
 import re
 import os
-import boto3
-from botocore.config import Config
 from botocore.exceptions import ClientError
+from prism_common import aws_clients, bedrock_governor, metrics
 
 
-s3_client = boto3.client("s3")
-ssm_client = boto3.client("ssm")
-
 PROMPT = os.environ.get("PROMPT_PARAM")
 
-config = Config(retries={"max_attempts": 100, "mode": "adaptive"})
 
-bedrock_runtime = boto3.client(
-    service_name="bedrock-runtime", region_name="ap-northeast-2", config=config
-)
+model_id = "apac.amazon.nova-lite-v1:0"
+
 
+def analysis_version(prompt_version):
+    """Stored as AnalysisVersion; tools/backfill skips images already analyzed with it."""
+    return f"{model_id}@{prompt_version}"
 
-model_id = "apac.amazon.nova-lite-v1:0"
 
+def image_format_for(key):
+    lower_key = key.lower()
+    if lower_key.endswith((".jpg", ".jpeg")):
+        return "jpeg"
+    if lower_key.endswith(".png"):
+        return "png"
+    if lower_key.endswith(".webp"):
+        return "webp"
+    return None
+
+
+def load_image(event, source_bucket, processed_key):
+    """
+    (format, base64 bytes) for Bedrock. derivative-generator passes its downscaled inference
+    image inline (`inferenceImage`) or, when too large for the state payload, by key; older
+    executions fetch the original or resized copy.
+    """
+    inline = event.get("inferenceImage")
+    if inline:
+        print("derivative-generator가 전달한 추론용 이미지를 사용합니다.")
+        return inline["format"], inline["bytes"]
+
+    bucket, key = source_bucket, processed_key
+    if event.get("inferenceKey"):
+        bucket, key = event.get("inferenceBucket", source_bucket), event["inferenceKey"]
+
+    image_format = image_format_for(key)
+    if not image_format:
+        return None, None
 
+    with metrics.phase("s3_get"):
+        response = aws_clients.get_client("s3").get_object(Bucket=bucket, Key=key)
+        image_bytes = response["Body"].read()
+    print(f"이미지를 s3://{bucket}/{key}에서 가져와 Base64로 인코딩했습니다.")
+    return image_format, base64.b64encode(image_bytes).decode("utf-8")
+
+
+@metrics.instrumented
 def lambda_handler(event, context):
     try:
         source_bucket = event["s3Bucket"]
@@ -36,8 +69,10 @@ def lambda_handler(event, context):
     print(f"분석할 이미지: s3://{source_bucket}/{processed_key}")
 
     try:
-        prompt_param = ssm_client.get_parameter(Name=PROMPT, WithDecryption=True)
+        with metrics.phase("ssm_get"):
+            prompt_param = aws_clients.get_client("ssm").get_parameter(Name=PROMPT, WithDecryption=True)
         prompt = prompt_param["Parameter"]["Value"]
+        prompt_version = prompt_param["Parameter"].get("Version", 0)
 
     except ClientError as e:
         return {
@@ -48,29 +83,16 @@ def lambda_handler(event, context):
         }
 
     try:
-        response = s3_client.get_object(Bucket=source_bucket, Key=processed_key)
-        image_bytes = response["Body"].read()
-
-        image_format = None
-        lower_key = processed_key.lower()
-        if lower_key.endswith((".jpg", ".jpeg")):
-            image_format = "jpeg"
-        elif lower_key.endswith(".png"):
-            image_format = "png"
-        elif lower_key.endswith(".webp"):
-            image_format = "webp"
-
-        if not image_format:
-            print("오류: 지원하지 않는 이미지 형식입니다 (jpg, png, webp만 지원).")
-            return {"statusCode": 400, "body": json.dumps("Unsupported image format")}
-
-        print(f"감지된 이미지 형식: {image_format}")
-        base64_image = base64.b64encode(image_bytes).decode("utf-8")
-        print("이미지를 성공적으로 가져와 Base64로 인코딩했습니다.")
+        image_format, base64_image = load_image(event, source_bucket, processed_key)
     except ClientError as e:
         print(f"오류: S3에서 이미지를 가져오는 데 실패했습니다. {e}")
         return {"statusCode": 500, "body": json.dumps("Error getting image from S3")}
 
+    if not image_format:
+        print("오류: 지원하지 않는 이미지 형식입니다 (jpg, png, webp만 지원).")
+        return {"statusCode": 400, "body": json.dumps("Unsupported image format")}
+    print(f"감지된 이미지 형식: {image_format}")
+
     message_list = [
         {
             "role": "user",
@@ -92,13 +114,22 @@ def lambda_handler(event, context):
         "inferenceConfig": {"maxTokens": 2048, "temperature": 0},
     }
 
+    # 크기를 아는 추론용 이미지는 토큰 예측에 사용하고, 모르면 이미지 최대 토큰으로 예약
+    inline = event.get("inferenceImage") or {}
+    image_sizes = [(inline["width"], inline["height"])] if inline.get("width") else ()
+
+    # 사용자가 기다리는 태깅은 배경 정렬보다 먼저 Bedrock 예산을 쓰고, 백필은 배경 작업으로 양보함
+    if event.get("origin") == "backfill":
+        priority = bedrock_governor.BACKGROUND
+    else:
+        priority = bedrock_governor.INTERACTIVE
+
     try:
-        response = bedrock_runtime.invoke_model(
-            modelId=model_id, body=json.dumps(native_request)
+        model_response = bedrock_governor.get_governor().invoke_model(
+            model_id, native_request, priority=priority, image_sizes=image_sizes
         )
-        model_response = json.loads(response["body"].read())
         result_text = model_response["output"]["message"]["content"][0]["text"]
-        print(f"Bedrock 분석 결과 (Raw):\n{result_text}")
+        metrics.log_payload("Bedrock 분석 결과 (Raw)", result_text)
 
         match = re.search(r"\{.*}", result_text, re.DOTALL)
         if match:
@@ -122,6 +153,10 @@ def lambda_handler(event, context):
             "processed_key": processed_key,
         },
         "bedrock_analysis": analysis_result,
+        "analysis_version": analysis_version(prompt_version),
     }
+    # derivative-generator가 만든 표시용 변형 목록은 result-to-dynamodb가 저장하도록 그대로 전달
+    if event.get("variants"):
+        final_output["source_info"]["variants"] = event["variants"]
 
     return final_output
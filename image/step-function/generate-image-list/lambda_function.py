@@ -1,18 +1,15 @@
 import json
 import os
-import boto3
 from botocore.exceptions import ClientError
-
-s3_client = boto3.client("s3")
-dynamodb = boto3.resource("dynamodb")
+from prism_common import aws_clients, claim_check, ddb_codec, metrics
 
 
 STATS_TABLE_NAME = os.environ.get("DYNAMODB_STATS_TABLE_NAME")
 if not STATS_TABLE_NAME:
     raise ValueError("환경 변수 'DYNAMODB_STATS_TABLE_NAME'이 설정되지 않았습니다.")
-stats_table = dynamodb.Table(STATS_TABLE_NAME)
 
 
+@metrics.instrumented
 def lambda_handler(event, context):
 
     source_bucket = event.get("s3Bucket")
@@ -33,9 +30,17 @@ def lambda_handler(event, context):
             ),
         }
 
+    metrics.set_property("userID", user_id)
+
     try:
-        response = stats_table.get_item(Key={"UserID": user_id})
-        item = response.get("Item", {})
+        with metrics.phase("ddb_read"):
+            # 카테고리는 별도 테이블에 있으므로 분기에 필요한 속성만 읽음
+            response = aws_clients.get_client("dynamodb").get_item(
+                TableName=STATS_TABLE_NAME,
+                Key={"UserID": {"S": user_id}},
+                ProjectionExpression="CategoryCount, NewImageKeys, SortedData",
+            )
+        item = ddb_codec.STATS.decode(response.get("Item", {}))
     except ClientError as e:
         print(f"DynamoDB 조회 오류: {e.response['Error']['Message']}")
         return {
@@ -43,9 +48,10 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": "사용자 정보 조회 중 오류가 발생했습니다."}),
         }
 
+    # SortedData는 카테고리 테이블로 옮기기 전의 사용자에게만 남아 있음
     existing_sorted_data = item.get("SortedData")
 
-    if not existing_sorted_data:
+    if not existing_sorted_data and "CategoryCount" not in item:
 
         print(
             f"사용자 '{user_id}'의 최초 정렬을 시작합니다. S3에서 전체 이미지 목록을 가져옵니다."
@@ -56,16 +62,17 @@ def lambda_handler(event, context):
         prefix = f"album/{user_id}/"
 
         try:
-            paginator = s3_client.get_paginator("list_objects_v2")
+            paginator = aws_clients.get_client("s3").get_paginator("list_objects_v2")
             pages = paginator.paginate(Bucket=source_bucket, Prefix=prefix)
 
-            for page in pages:
+            with metrics.phase("s3_list"):
+                for page in pages:
 
-                for obj in page.get("Contents", []):
-                    key = obj["Key"]
+                    for obj in page.get("Contents", []):
+                        key = obj["Key"]
 
-                    if not key.endswith("/"):
-                        all_image_keys.append(key)
+                        if not key.endswith("/"):
+                            all_image_keys.append(key)
 
             print(
                 f"'{prefix}' 경로에서 총 {len(all_image_keys)}개의 이미지를 찾았습니다."
@@ -87,13 +94,18 @@ def lambda_handler(event, context):
             f"사용자 '{user_id}'의 추가 정렬을 시작합니다. DynamoDB에서 새 이미지 목록을 가져옵니다."
         )
 
-        new_image_keys = list(item.get("NewImageKeys", set()))
+        new_image_keys = item.get("NewImageKeys", [])
 
         output = {
             "userID": user_id,
             "isInitialSort": False,
-            "existingSortData": existing_sorted_data,
             "newImageList": new_image_keys,
         }
-
-    return {"statusCode": 200, "body": output}
+        if existing_sorted_data:
+            output["existingSortData"] = existing_sorted_data
+
+    # 사용자 이미지가 많으면 목록이 Step Functions 페이로드 한도(256KB)를 넘으므로 S3로 넘김
+    body = claim_check.shrink(
+        output, ["imageList", "existingSortData", "newImageList"], f"generate-image-list/{user_id}"
+    )
+    return {"statusCode": 200, "body": body}
@@ -33,6 +33,8 @@ type RoutingDecision struct {
 	LastModified time.Time         `json:"lastModified"`
 	ContentType  string            `json:"contentType"`
 	UserMetadata map[string]string `json:"userMetadata"`
+	// "manifest" when width/height/format came from the upload manifest, "decoded" otherwise
+	MetadataSource string `json:"metadataSource"`
 }
 
 var s3Client *s3.Client
@@ -76,10 +78,33 @@ func HandleRequest(ctx context.Context, event S3Event) (RoutingDecision, error)
 		}
 	}(s3Object.Body)
 
-	imageBytes, err := io.ReadAll(s3Object.Body)
+	fileSizePtr := s3Object.ContentLength
+	if fileSizePtr == nil {
+		return RoutingDecision{}, fmt.Errorf("failed to get file size from S3 object")
+	}
+	fileSize := *fileSizePtr
+
+	// 업로드 매니페스트가 있으면 헤더만 읽어 실제 해상도를 확인하고, 일치하면 나머지 본문은 받지 않음
+	var header []byte
+	if manifest, ok := manifestFromMetadata(userMetadata); ok {
+		var result RoutingDecision
+		header, result, ok = decideFromManifest(s3Object.Body, manifest)
+		if ok {
+			result.S3Bucket = event.S3Bucket
+			result.S3Key = srcKey
+			result.FileSize = fileSize
+			result.LastModified = lastModified
+			result.ContentType = contentType
+			result.UserMetadata = userMetadata
+			return result, nil
+		}
+	}
+
+	rest, err := io.ReadAll(s3Object.Body)
 	if err != nil {
 		return RoutingDecision{}, fmt.Errorf("failed to read image body: %w", err)
 	}
+	imageBytes := append(header, rest...)
 
 	image, err := vips.NewImageFromBuffer(imageBytes, nil)
 	if err != nil {
@@ -94,45 +119,64 @@ func HandleRequest(ctx context.Context, event S3Event) (RoutingDecision, error)
 		return RoutingDecision{}, fmt.Errorf("failed to get image format metadata: %w", err)
 	}
 
-	fileSizePtr := s3Object.ContentLength
-	if fileSizePtr == nil {
-		return RoutingDecision{}, fmt.Errorf("failed to get file size from S3 object")
-	}
-	fileSize := *fileSizePtr
-
 	// For debugging
 	//log.Printf("Metadata: format=%s, size=%dx%d, fileSize=%d bytes", format, width, height, fileSize)
 
-	var decision string
+	result := RoutingDecision{
+		S3Bucket:       event.S3Bucket,
+		S3Key:          srcKey,
+		ImageFormat:    format,
+		Width:          width,
+		Height:         height,
+		FileSize:       fileSize,
+		Decision:       decide(format, width, height), //this is for step function choice state
+		LastModified:   lastModified,
+		ContentType:    contentType,
+		UserMetadata:   userMetadata,
+		MetadataSource: "decoded",
+	}
 
+	return result, nil
+}
+
+func decide(format string, width int, height int) string {
 	isTooLarge := width > 8000 || height > 8000 //Not Recommended on AWS Nova model
 	isFormatOK := strings.Contains(format, "jpeg") || strings.Contains(format, "png") || strings.Contains(format, "webp")
 	isTooSmall := width < 256 && height < 256 //Not Recommended on AWS Nova model
 
 	if !isFormatOK || isTooLarge || isTooSmall {
-		decision = "NeedsResizing"
-	} else {
-		decision = "IsAppropriate"
+		return "NeedsResizing"
 	}
+	return "IsAppropriate"
+}
 
-	// For debugging
-	/*log.Printf("Image analysis for Nova complete. Decision: %s (FormatOK: %t, TooLarge: %t, TooSmall: %t)",
-	decision, isFormatOK, isTooLarge, isTooSmall)*/
-
-	result := RoutingDecision{
-		S3Bucket:     event.S3Bucket,
-		S3Key:        srcKey,
-		ImageFormat:  format,
-		Width:        width,
-		Height:       height,
-		FileSize:     fileSize,
-		Decision:     decision, //this is for step function choice state
-		LastModified: lastModified,
-		ContentType:  contentType,
-		UserMetadata: userMetadata,
+// decideFromManifest verifies the upload manifest against the object's header: the declared
+// format must match the sniffed container and the declared size the dimensions stored in it.
+// Only the header is read from body; it is returned so a caller that has to decode after all
+// (ok == false) can continue with the rest of the same stream.
+func decideFromManifest(body io.Reader, manifest uploadManifest) ([]byte, RoutingDecision, bool) {
+	header, sniffed, width, height, err := probeHeader(body)
+	if !formatMatches(manifest.Format, sniffed) {
+		log.Printf("Manifest format mismatch: declared=%s, sniffed=%s", manifest.Format, sniffed)
+		return header, RoutingDecision{}, false
+	}
+	if err != nil {
+		log.Printf("Manifest dimensions not verifiable from %d header bytes, decoding instead: %v", len(header), err)
+		return header, RoutingDecision{}, false
+	}
+	if !dimensionsMatch(manifest, width, height) {
+		log.Printf("Manifest dimensions mismatch: declared=%dx%d, header=%dx%d", manifest.Width, manifest.Height, width, height)
+		return header, RoutingDecision{}, false
 	}
 
-	return result, nil
+	format := vipsLoader(sniffed)
+	return header, RoutingDecision{
+		ImageFormat:    format,
+		Width:          width,
+		Height:         height,
+		Decision:       decide(format, width, height),
+		MetadataSource: "manifest",
+	}, true
 }
 
 func main() {
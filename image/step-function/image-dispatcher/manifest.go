@@ -0,0 +1,373 @@
+package main
+
+import (
+	"bytes"
+	"encoding/binary"
+	"errors"
+	"io"
+	"strconv"
+	"strings"
+)
+
+// Upload manifest written by api/api-gateway/generate-s3-presignedurl as signed
+// x-amz-meta-* headers (manifest-version, width, height, format, ...).
+const manifestVersion = "1"
+
+// Enough bytes to recognise every supported container from its magic number and, for
+// PNG/GIF/WebP, to read the dimensions.
+const headerProbeBytes = 64
+
+// JPEG APPn segments (EXIF, XMP, ICC) and HEIF meta boxes sit before the dimensions; give up
+// and decode once the header grows past this.
+const maxHeaderProbeBytes = 512 * 1024
+
+// errShortHeader means the dimensions lie beyond the bytes read so far.
+var errShortHeader = errors.New("image header truncated")
+
+var errNoDimensions = errors.New("image dimensions not found in header")
+
+type uploadManifest struct {
+	Width  int
+	Height int
+	Format string
+}
+
+func manifestFromMetadata(metadata map[string]string) (uploadManifest, bool) {
+	if metadata["manifest-version"] != manifestVersion {
+		return uploadManifest{}, false
+	}
+	width, err := strconv.Atoi(metadata["width"])
+	if err != nil || width <= 0 {
+		return uploadManifest{}, false
+	}
+	height, err := strconv.Atoi(metadata["height"])
+	if err != nil || height <= 0 {
+		return uploadManifest{}, false
+	}
+	format := strings.ToLower(metadata["format"])
+	if format == "" {
+		return uploadManifest{}, false
+	}
+	return uploadManifest{Width: width, Height: height, Format: format}, true
+}
+
+// sniffFormat identifies the container from the first bytes of the file.
+func sniffFormat(header []byte) string {
+	switch {
+	case bytes.HasPrefix(header, []byte{0xFF, 0xD8, 0xFF}):
+		return "jpeg"
+	case bytes.HasPrefix(header, []byte("\x89PNG\r\n\x1a\n")):
+		return "png"
+	case len(header) >= 12 && string(header[0:4]) == "RIFF" && string(header[8:12]) == "WEBP":
+		return "webp"
+	case bytes.HasPrefix(header, []byte("GIF87a")) || bytes.HasPrefix(header, []byte("GIF89a")):
+		return "gif"
+	case bytes.HasPrefix(header, []byte("II*\x00")) || bytes.HasPrefix(header, []byte("MM\x00*")):
+		return "tiff"
+	case len(header) >= 12 && string(header[4:8]) == "ftyp":
+		switch string(header[8:12]) {
+		case "avif", "avis":
+			return "avif"
+		case "heic", "heix", "hevc", "hevx", "heim", "heis", "mif1", "msf1":
+			return "heic"
+		}
+	}
+	return ""
+}
+
+// formatFamily groups formats decoded by the same vips loader; HEIF brands are often
+// generic (mif1), so heic/heif/avif are treated as one family.
+func formatFamily(format string) string {
+	switch format {
+	case "heic", "heif", "avif":
+		return "heif"
+	}
+	return format
+}
+
+func formatMatches(declared, sniffed string) bool {
+	return sniffed != "" && formatFamily(declared) == formatFamily(sniffed)
+}
+
+// vipsLoader is the loader name vips reports for a format, as returned by the decode path.
+func vipsLoader(format string) string {
+	if formatFamily(format) == "heif" {
+		return "heifload"
+	}
+	return format + "load"
+}
+
+// dimensionsMatch accepts the declared size in either orientation: clients may report the
+// EXIF/irot-rotated size while the container (and vips) report the stored one.
+func dimensionsMatch(manifest uploadManifest, width int, height int) bool {
+	return (manifest.Width == width && manifest.Height == height) ||
+		(manifest.Width == height && manifest.Height == width)
+}
+
+// probeHeader reads the start of the stream, growing from headerProbeBytes until the
+// container's dimensions can be parsed. It returns the bytes consumed so the caller can keep
+// reading the same body when it has to decode after all.
+func probeHeader(body io.Reader) (header []byte, format string, width int, height int, err error) {
+	want := headerProbeBytes
+	for {
+		chunk := make([]byte, want-len(header))
+		n, readErr := io.ReadFull(body, chunk)
+		header = append(header, chunk[:n]...)
+
+		format = sniffFormat(header)
+		if format == "" {
+			return header, "", 0, 0, errNoDimensions
+		}
+		width, height, err = imageDimensions(format, header)
+		if !errors.Is(err, errShortHeader) {
+			return header, format, width, height, err
+		}
+		if readErr != nil || want >= maxHeaderProbeBytes {
+			// 파일 끝 또는 한도에 도달
+			return header, format, 0, 0, errNoDimensions
+		}
+		want = min(want*4, maxHeaderProbeBytes)
+	}
+}
+
+// imageDimensions reads the stored width and height from a container header.
+func imageDimensions(format string, header []byte) (int, int, error) {
+	switch format {
+	case "jpeg":
+		return jpegDimensions(header)
+	case "png":
+		if len(header) < 24 {
+			return 0, 0, errShortHeader
+		}
+		if string(header[12:16]) != "IHDR" {
+			return 0, 0, errNoDimensions
+		}
+		return int(binary.BigEndian.Uint32(header[16:20])), int(binary.BigEndian.Uint32(header[20:24])), nil
+	case "gif":
+		if len(header) < 10 {
+			return 0, 0, errShortHeader
+		}
+		return int(binary.LittleEndian.Uint16(header[6:8])), int(binary.LittleEndian.Uint16(header[8:10])), nil
+	case "webp":
+		return webpDimensions(header)
+	case "tiff":
+		return tiffDimensions(header)
+	case "heic", "avif":
+		return heifDimensions(header)
+	}
+	return 0, 0, errNoDimensions
+}
+
+func jpegDimensions(b []byte) (int, int, error) {
+	i := 2
+	for {
+		if i >= len(b) {
+			return 0, 0, errShortHeader
+		}
+		if b[i] != 0xFF {
+			return 0, 0, errNoDimensions
+		}
+		// 마커 앞의 0xFF 채움 바이트는 건너뜀
+		for i < len(b) && b[i] == 0xFF {
+			i++
+		}
+		if i >= len(b) {
+			return 0, 0, errShortHeader
+		}
+		marker := b[i]
+		i++
+		switch {
+		case marker == 0x01 || marker == 0xD8 || (marker >= 0xD0 && marker <= 0xD7):
+			continue
+		case marker == 0xD9 || marker == 0xDA:
+			// SOF 없이 스캔/끝에 도달
+			return 0, 0, errNoDimensions
+		}
+		if i+2 > len(b) {
+			return 0, 0, errShortHeader
+		}
+		length := int(binary.BigEndian.Uint16(b[i : i+2]))
+		if length < 2 {
+			return 0, 0, errNoDimensions
+		}
+		// SOF0-SOF15 (DHT C4, JPG C8, DAC CC 제외): length, precision, height, width
+		if marker >= 0xC0 && marker <= 0xCF && marker != 0xC4 && marker != 0xC8 && marker != 0xCC {
+			if i+7 > len(b) {
+				return 0, 0, errShortHeader
+			}
+			height := int(binary.BigEndian.Uint16(b[i+3 : i+5]))
+			width := int(binary.BigEndian.Uint16(b[i+5 : i+7]))
+			return width, height, nil
+		}
+		i += length
+	}
+}
+
+func webpDimensions(b []byte) (int, int, error) {
+	if len(b) < 30 {
+		return 0, 0, errShortHeader
+	}
+	switch string(b[12:16]) {
+	case "VP8 ":
+		// 프레임 태그(3바이트) 뒤 시작 코드 9D 01 2A, 이어서 14비트 너비/높이
+		if !bytes.Equal(b[23:26], []byte{0x9D, 0x01, 0x2A}) {
+			return 0, 0, errNoDimensions
+		}
+		return int(binary.LittleEndian.Uint16(b[26:28]) & 0x3FFF), int(binary.LittleEndian.Uint16(b[28:30]) & 0x3FFF), nil
+	case "VP8L":
+		if b[20] != 0x2F {
+			return 0, 0, errNoDimensions
+		}
+		bits := binary.LittleEndian.Uint32(b[21:25])
+		return int(bits&0x3FFF) + 1, int((bits>>14)&0x3FFF) + 1, nil
+	case "VP8X":
+		width := int(b[24]) | int(b[25])<<8 | int(b[26])<<16
+		height := int(b[27]) | int(b[28])<<8 | int(b[29])<<16
+		return width + 1, height + 1, nil
+	}
+	return 0, 0, errNoDimensions
+}
+
+func tiffDimensions(b []byte) (int, int, error) {
+	if len(b) < 8 {
+		return 0, 0, errShortHeader
+	}
+	var order binary.ByteOrder = binary.LittleEndian
+	if b[0] == 'M' {
+		order = binary.BigEndian
+	}
+	ifd := int(order.Uint32(b[4:8]))
+	if ifd < 8 || ifd > maxHeaderProbeBytes {
+		return 0, 0, errNoDimensions
+	}
+	if ifd+2 > len(b) {
+		return 0, 0, errShortHeader
+	}
+	count := int(order.Uint16(b[ifd : ifd+2]))
+	if ifd+2+count*12 > len(b) {
+		return 0, 0, errShortHeader
+	}
+	width, height := 0, 0
+	for entry := ifd + 2; entry < ifd+2+count*12; entry += 12 {
+		var value int
+		switch order.Uint16(b[entry+2 : entry+4]) {
+		case 3: // SHORT
+			value = int(order.Uint16(b[entry+8 : entry+10]))
+		case 4: // LONG
+			value = int(order.Uint32(b[entry+8 : entry+12]))
+		default:
+			continue
+		}
+		switch order.Uint16(b[entry : entry+2]) {
+		case 256:
+			width = value
+		case 257:
+			height = value
+		}
+	}
+	if width == 0 || height == 0 {
+		return 0, 0, errNoDimensions
+	}
+	return width, height, nil
+}
+
+// isobmffBox is one box header: type, payload offsets within the buffer, and the box end.
+type isobmffBox struct {
+	kind  string
+	start int
+	end   int
+}
+
+// nextBox parses the box at offset i; the whole box must be inside b.
+func nextBox(b []byte, i int, limit int) (isobmffBox, error) {
+	if i+8 > limit {
+		return isobmffBox{}, errShortHeader
+	}
+	size := int(binary.BigEndian.Uint32(b[i : i+4]))
+	kind := string(b[i+4 : i+8])
+	start := i + 8
+	if size == 1 {
+		if i+16 > limit {
+			return isobmffBox{}, errShortHeader
+		}
+		large := binary.BigEndian.Uint64(b[i+8 : i+16])
+		if large > uint64(maxHeaderProbeBytes)*1024 {
+			// 디코딩해야 하는 거대한 박스(mdat 등)
+			return isobmffBox{kind: kind, start: i + 16, end: -1}, nil
+		}
+		size = int(large)
+		start = i + 16
+	}
+	if size == 0 || size < start-i {
+		return isobmffBox{kind: kind, start: start, end: -1}, nil
+	}
+	return isobmffBox{kind: kind, start: start, end: i + size}, nil
+}
+
+// heifDimensions returns the largest ispe (image spatial extents) property of the top-level
+// meta box: the primary image, or the grid that tiles it, is never smaller than its tiles,
+// thumbnails or auxiliary images.
+func heifDimensions(b []byte) (int, int, error) {
+	meta, err := findBox(b, 0, len(b), "meta", true)
+	if err != nil {
+		return 0, 0, err
+	}
+	// meta는 FullBox: 버전/플래그 4바이트 뒤에 자식 박스
+	iprp, err := findBox(b, meta.start+4, meta.end, "iprp", false)
+	if err != nil {
+		return 0, 0, err
+	}
+	ipco, err := findBox(b, iprp.start, iprp.end, "ipco", false)
+	if err != nil {
+		return 0, 0, err
+	}
+	width, height := 0, 0
+	for i := ipco.start; i < ipco.end; {
+		box, err := nextBox(b, i, ipco.end)
+		if err != nil || box.end < 0 || box.end > ipco.end {
+			return 0, 0, errNoDimensions
+		}
+		if box.kind == "ispe" && box.start+12 <= box.end {
+			w := int(binary.BigEndian.Uint32(b[box.start+4 : box.start+8]))
+			h := int(binary.BigEndian.Uint32(b[box.start+8 : box.start+12]))
+			if w*h > width*height {
+				width, height = w, h
+			}
+		}
+		i = box.end
+	}
+	if width == 0 || height == 0 {
+		return 0, 0, errNoDimensions
+	}
+	return width, height, nil
+}
+
+// findBox looks for a child box of the given kind in b[from:to] and requires it to be read in
+// full. At the top level, reaching mdat first means the metadata follows the image data.
+func findBox(b []byte, from int, to int, kind string, topLevel bool) (isobmffBox, error) {
+	for i := from; ; {
+		if topLevel && i >= len(b) {
+			return isobmffBox{}, errShortHeader
+		}
+		if !topLevel && i >= to {
+			return isobmffBox{}, errNoDimensions
+		}
+		box, err := nextBox(b, i, len(b))
+		if err != nil {
+			return isobmffBox{}, err
+		}
+		if box.end < 0 || (topLevel && box.kind == "mdat") {
+			return isobmffBox{}, errNoDimensions
+		}
+		if !topLevel && box.end > to {
+			return isobmffBox{}, errNoDimensions
+		}
+		if box.kind == kind {
+			if box.end > len(b) {
+				return isobmffBox{}, errShortHeader
+			}
+			return box, nil
+		}
+		i = box.end
+	}
+}
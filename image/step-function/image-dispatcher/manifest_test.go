@@ -0,0 +1,119 @@
+package main
+
+import (
+	"bytes"
+	"encoding/binary"
+	"errors"
+	"testing"
+)
+
+func be32(v int) []byte { return binary.BigEndian.AppendUint32(nil, uint32(v)) }
+
+func box(kind string, payload ...[]byte) []byte {
+	body := bytes.Join(payload, nil)
+	return append(append(be32(8+len(body)), kind...), body...)
+}
+
+func pngHeader(width, height int) []byte {
+	header := []byte("\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR")
+	return append(append(header, be32(width)...), be32(height)...)
+}
+
+func jpegHeader(width, height int, exifBytes int) []byte {
+	header := []byte{0xFF, 0xD8}
+	app1 := append([]byte{0xFF, 0xE1}, binary.BigEndian.AppendUint16(nil, uint16(exifBytes+2))...)
+	header = append(append(header, app1...), make([]byte, exifBytes)...)
+	sof := []byte{0xFF, 0xFF, 0xC2, 0x00, 0x11, 0x08}
+	sof = binary.BigEndian.AppendUint16(sof, uint16(height))
+	sof = binary.BigEndian.AppendUint16(sof, uint16(width))
+	return append(append(header, sof...), make([]byte, 64)...)
+}
+
+func webpHeader(chunk string, data []byte) []byte {
+	header := append([]byte("RIFF\x00\x00\x00\x00WEBP"), chunk...)
+	header = append(header, 0, 0, 0, 0)
+	return append(append(header, data...), make([]byte, 16)...)
+}
+
+func heifHeader(extents ...[2]int) []byte {
+	var properties [][]byte
+	for _, extent := range extents {
+		properties = append(properties, box("ispe", []byte{0, 0, 0, 0}, be32(extent[0]), be32(extent[1])))
+	}
+	meta := box("meta", []byte{0, 0, 0, 0}, box("hdlr", make([]byte, 20)), box("iprp", box("ipco", properties...)))
+	return append(append(box("ftyp", []byte("heic\x00\x00\x00\x00mif1heic")), meta...), box("mdat", make([]byte, 32))...)
+}
+
+func tiffHeader(width, height int) []byte {
+	header := []byte{'I', 'I', 42, 0, 8, 0, 0, 0, 2, 0}
+	entry := func(tag, kind, value int) []byte {
+		b := binary.LittleEndian.AppendUint16(nil, uint16(tag))
+		b = binary.LittleEndian.AppendUint16(b, uint16(kind))
+		b = binary.LittleEndian.AppendUint32(b, 1)
+		return binary.LittleEndian.AppendUint32(b, uint32(value))
+	}
+	return append(append(header, entry(256, 4, width)...), entry(257, 3, height)...)
+}
+
+func TestProbeHeader(t *testing.T) {
+	vp8x := []byte{0, 0, 0, 0, 0xFF, 0x0F, 0x00, 0xBF, 0x0B, 0x00}
+	vp8 := []byte{0, 0, 0, 0x9D, 0x01, 0x2A, 0x80, 0x07, 0x38, 0x04}
+	vp8l := append([]byte{0x2F}, binary.LittleEndian.AppendUint32(nil, uint32(1919|1079<<14))...)
+
+	cases := []struct {
+		name   string
+		data   []byte
+		format string
+		width  int
+		height int
+		err    error
+	}{
+		{"png", pngHeader(4032, 3024), "png", 4032, 3024, nil},
+		{"jpeg", jpegHeader(640, 480, 10), "jpeg", 640, 480, nil},
+		{"jpeg after large exif", jpegHeader(12000, 9000, 60000), "jpeg", 12000, 9000, nil},
+		{"webp vp8x", webpHeader("VP8X", vp8x), "webp", 4096, 3008, nil},
+		{"webp vp8", webpHeader("VP8 ", vp8), "webp", 1920, 1080, nil},
+		{"webp vp8l", webpHeader("VP8L", vp8l), "webp", 1920, 1080, nil},
+		{"gif", []byte("GIF89a\x20\x03\x58\x02"), "gif", 800, 600, nil},
+		{"tiff", tiffHeader(70000, 300), "tiff", 70000, 300, nil},
+		{"heic grid", heifHeader([2]int{512, 512}, [2]int{4032, 3024}, [2]int{320, 240}), "heic", 4032, 3024, nil},
+		{"jpeg without sof", []byte{0xFF, 0xD8, 0xFF, 0xDA, 0x00, 0x02}, "jpeg", 0, 0, errNoDimensions},
+		{"truncated png", pngHeader(1, 1)[:20], "png", 0, 0, errNoDimensions},
+		{"unknown", []byte("not an image"), "", 0, 0, errNoDimensions},
+	}
+	for _, c := range cases {
+		t.Run(c.name, func(t *testing.T) {
+			header, format, width, height, err := probeHeader(bytes.NewReader(c.data))
+			if format != c.format || width != c.width || height != c.height || !errors.Is(err, c.err) {
+				t.Fatalf("got %s %dx%d err=%v, want %s %dx%d err=%v", format, width, height, err, c.format, c.width, c.height, c.err)
+			}
+			if !bytes.HasPrefix(c.data, header) {
+				t.Fatalf("returned header is not a prefix of the stream")
+			}
+		})
+	}
+}
+
+func TestProbeHeaderStopsAtLimit(t *testing.T) {
+	// EXIF 세그먼트를 연달아 두어 SOF가 한도 밖에 있도록 함
+	var data []byte
+	data = append(data, 0xFF, 0xD8)
+	for len(data) < maxHeaderProbeBytes+1024 {
+		data = append(data, 0xFF, 0xE1, 0xFF, 0xFF)
+		data = append(data, make([]byte, 0xFFFF-2)...)
+	}
+	header, _, _, _, err := probeHeader(bytes.NewReader(data))
+	if !errors.Is(err, errNoDimensions) || len(header) != maxHeaderProbeBytes {
+		t.Fatalf("got %d bytes err=%v", len(header), err)
+	}
+}
+
+func TestDimensionsMatch(t *testing.T) {
+	manifest := uploadManifest{Width: 3024, Height: 4032, Format: "jpeg"}
+	if !dimensionsMatch(manifest, 3024, 4032) || !dimensionsMatch(manifest, 4032, 3024) {
+		t.Fatal("declared size in either orientation should match")
+	}
+	if dimensionsMatch(manifest, 30240, 40320) {
+		t.Fatal("a larger stored image must not match a small declared size")
+	}
+}
@@ -1,23 +1,23 @@
 import json
 import os
 import datetime
-import boto3
 from zoneinfo import ZoneInfo
 from botocore.exceptions import ClientError
-
-dynamodb_client = boto3.client("dynamodb")
+from prism_common import aws_clients, ddb_codec, display, metrics, sort_queue, tags as tag_index, variants
 
 METADATA_TABLE_NAME = os.environ.get("DYNAMODB_METADATA_TABLE_NAME")
 STATS_TABLE_NAME = os.environ.get("DYNAMODB_STATS_TABLE_NAME")
+TAG_INDEX_TABLE_NAME = tag_index.TAG_INDEX_TABLE_NAME
 
-if not METADATA_TABLE_NAME or not STATS_TABLE_NAME:
+if not METADATA_TABLE_NAME or not STATS_TABLE_NAME or not TAG_INDEX_TABLE_NAME:
     raise ValueError(
-        "환경 변수 'DYNAMODB_METADATA_TABLE_NAME'와 'DYNAMODB_STATS_TABLE_NAME'이 모두 설정되어야 합니다."
+        "환경 변수 'DYNAMODB_METADATA_TABLE_NAME', 'DYNAMODB_STATS_TABLE_NAME', 'DYNAMODB_TAG_INDEX_TABLE_NAME'이 모두 설정되어야 합니다."
     )
 
 
+@metrics.instrumented
 def lambda_handler(event, context):
-    print(f"DynamoDB에 저장할 이벤트 수신: {json.dumps(event, indent=2)}")
+    metrics.log_payload("DynamoDB에 저장할 이벤트 수신", event)
 
     try:
         source_info = event["source_info"]
@@ -34,75 +34,107 @@ def lambda_handler(event, context):
             )
         user_id = key_parts[1]
         album_id = os.path.dirname(original_key)
+        metrics.set_property("userID", user_id)
+
+        dynamodb_client = aws_clients.get_client("dynamodb")
 
         existing_item = None
         is_update = False
 
         try:
-            query_response = dynamodb_client.query(
-                TableName=METADATA_TABLE_NAME,
-                IndexName="byOriginalKey",
-                KeyConditionExpression="OriginalKey = :okey",
-                ExpressionAttributeValues={":okey": {"S": original_key}},
-            )
+            with metrics.phase("ddb_query"):
+                query_response = dynamodb_client.query(
+                    TableName=METADATA_TABLE_NAME,
+                    IndexName="byOriginalKey",
+                    KeyConditionExpression="OriginalKey = :okey",
+                    ExpressionAttributeValues={":okey": {"S": original_key}},
+                )
 
             if query_response["Items"]:
-                existing_item = query_response["Items"][0]
+                existing_item = ddb_codec.METADATA.decode(query_response["Items"][0])
                 is_update = True
-                print(f"기존 아이템 발견: {existing_item}")
+                print("기존 아이템 발견")
 
         except ClientError as e:
             print(f"오류: GSI 쿼리 중 에러 발생. {e}")
             raise e
 
-        timestamp_iso = datetime.datetime.now(ZoneInfo("Asia/Seoul")).isoformat()
+        now = datetime.datetime.now(ZoneInfo("Asia/Seoul"))
+        timestamp_iso = now.isoformat()
 
         item_to_save = {
-            "UserID": {"S": user_id},
-            "OriginalKey": {"S": original_key},
-            "SourceBucket": {"S": source_info["sourceBucket"]},
-            "ProcessedKey": {"S": source_info["processed_key"]},
-            "ImageSummary": {"S": bedrock_analysis["imageSummary"]},
-            "AvifEncoding": {"S": json.dumps(bedrock_analysis["avifEncoding"])},
+            "UserID": user_id,
+            "OriginalKey": original_key,
+            "SourceBucket": source_info["sourceBucket"],
+            "ProcessedKey": source_info["processed_key"],
+            "ImageSummary": bedrock_analysis["imageSummary"],
         }
 
+        # 어떤 모델/프롬프트 버전으로 분석했는지 기록 (백필이 이미 최신인 이미지를 건너뜀)
+        if event.get("analysis_version"):
+            item_to_save["AnalysisVersion"] = event["analysis_version"]
+
+        # AVIF 파라미터는 image-transcoding이 이미지 통계로 결정하므로 모델 응답은 참고용으로만 저장
+        if bedrock_analysis.get("avifEncoding"):
+            item_to_save["AvifEncoding"] = json.dumps(bedrock_analysis["avifEncoding"])
+
         if is_update:
             print("기존 아이템 갱신을 준비합니다.")
             item_to_save["AlbumID"] = existing_item["AlbumID"]
             item_to_save["CreatedAt"] = existing_item["CreatedAt"]
-            item_to_save["UpdatedAt"] = {"S": timestamp_iso}
+            item_to_save["UpdatedAt"] = timestamp_iso
         else:
             print("신규 아이템 생성을 준비합니다.")
-            item_to_save["AlbumID"] = {"S": album_id}
-            item_to_save["CreatedAt"] = {"S": timestamp_iso}
+            item_to_save["AlbumID"] = album_id
+            item_to_save["CreatedAt"] = timestamp_iso
+
+        # 표시용 변형 카탈로그: 썸네일(source_info.variants) + 태그 추출과 병렬로 만든 변형(display_variants).
+        # 새 변형이 없는 재분석(백필 등)은 저장된 카탈로그를 유지
+        variant_catalog = variants.from_derivatives(
+            [*(source_info.get("variants") or []), *(event.get("display_variants") or [])]
+        )
+        if variant_catalog:
+            item_to_save["Variants"] = variant_catalog
+        elif is_update and existing_item.get("Variants"):
+            item_to_save["Variants"] = existing_item["Variants"]
 
         tags = bedrock_analysis.get("tags")
         if tags and isinstance(tags, list):
-            unique_tags = {tag for tag in tags if tag}
-            if unique_tags:
-                item_to_save["Tags"] = {"SS": list(unique_tags)}
+            # 빈 집합은 ddb_codec이 속성째 생략
+            item_to_save["Tags"] = sorted({tag for tag in tags if tag})
 
-        print(f"메타데이터 테이블에 저장할 아이템: {json.dumps(item_to_save)}")
+        # 조회 시마다 하던 파일명/파생 키/KST 시간 포맷 계산을 저장 시점에 한 번만 수행
+        item_to_save["Display"] = display.build_display(
+            original_key, item_to_save["CreatedAt"], item_to_save.get("Tags")
+        )
+
+        metrics.log_payload("메타데이터 테이블에 저장할 아이템", item_to_save)
 
         transact_items = [
-            {"Put": {"TableName": METADATA_TABLE_NAME, "Item": item_to_save}},
+            {"Put": {"TableName": METADATA_TABLE_NAME, "Item": ddb_codec.METADATA.encode(item_to_save)}},
         ]
 
         if not is_update:
-            stats_update_item = {
-                "Update": {
-                    "TableName": STATS_TABLE_NAME,
-                    "Key": {"UserID": {"S": user_id}},
-                    "UpdateExpression": "ADD ImageCount :inc SET SortStatus = :status",
-                    "ExpressionAttributeValues": {
-                        ":inc": {"N": "1"},
-                        ":status": {"S": "NEEDS_UPDATE"},
-                    },
-                }
-            }
-            transact_items.append(stats_update_item)
-
-        dynamodb_client.transact_write_items(TransactItems=transact_items)
+            # 정렬 여부는 album-sort-scheduler가 쌓인 변경을 보고 정함
+            transact_items.append(
+                sort_queue.pending_update(STATS_TABLE_NAME, user_id, original_key, now.timestamp())
+            )
+
+        # 태그 검색용 역색인도 같은 트랜잭션으로 갱신해서 Tags와 어긋나지 않게 함
+        transact_items.extend(
+            tag_index.posting_changes(
+                TAG_INDEX_TABLE_NAME,
+                user_id,
+                original_key,
+                item_to_save.get("Tags"),
+                old_tags=(existing_item or {}).get("Tags"),
+                album_id=item_to_save["AlbumID"],
+                created_at=item_to_save["CreatedAt"],
+            )
+        )
+
+        with metrics.phase("ddb_write"):
+            dynamodb_client.transact_write_items(TransactItems=transact_items)
 
         operation_type = "updated" if is_update else "created"
         print(
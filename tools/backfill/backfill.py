@@ -0,0 +1,471 @@
+"""
+Resumable bulk reprocessing of stored images through the deployed handlers.
+
+Images are enumerated from the metadata table (one album, a user's albums, or a parallel scan
+of the whole table, optionally limited to a CreatedAt range) and, per target:
+
+- tags: extract-image-tags -> result-to-dynamodb (-> embed-image-summary), invoked as Lambda
+  functions with `origin: backfill`, so tagging runs on the background Bedrock budget. Images
+  whose AnalysisVersion already matches the current prompt version are skipped.
+- transcode: a transcoding request on the SQS queue with `origin: backfill` (lowest Batch
+  priority). Images the status index shows converted with the same avifEncoding are skipped.
+
+Progress is checkpointed per album/scan segment after every finished page, so an interrupted
+run resumes where it stopped. A page is only marked done once all its images are finished.
+
+    python tools/backfill/backfill.py --targets tags --checkpoint tags.json \\
+        --tags-function extract-image-tags --store-function result-to-dynamodb --prompt-param /prism/prompt/image-tags
+    python tools/backfill/backfill.py --targets transcode --user USER_ID --bucket memory-images-originals-dev \\
+        --queue-url https://sqs.../transcode --avif-encoding '{"mode": "auto"}' --checkpoint avif.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from botocore.exceptions import ClientError
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(TOOLS_DIR)
+COMMON_PYTHON = os.path.join(REPO_ROOT, "common", "python")
+
+CHECKPOINT_VERSION = 1
+# 실패 목록은 체크포인트가 커지지 않도록 앞부분만 보관 (나머지는 개수만 셈)
+MAX_RECORDED_FAILURES = 1000
+# 잠시 뒤 다시 시도하면 되는 오류 (Bedrock 예산 부족, Lambda 동시성 한도)
+RETRYABLE_ERRORS = {"BedrockDeferred", "TooManyRequestsException", "ThrottlingException"}
+PROJECTION = ["AlbumID", "OriginalKey", "SourceBucket", "ProcessedKey", "CreatedAt", "AnalysisVersion"]
+
+
+class HandlerFailed(Exception):
+    pass
+
+
+def _load_function(function_dir):
+    """A Lambda module of this repo, to reuse its version/key helpers instead of copying them."""
+    path = os.path.join(REPO_ROOT, function_dir, "lambda_function.py")
+    spec = importlib.util.spec_from_file_location(f"backfill_{os.path.basename(function_dir).replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _string(item, name):
+    return item.get(name, {}).get("S")
+
+
+class Checkpoint:
+    """Per-unit cursors and counters in a JSON file, replaced atomically on every save."""
+
+    def __init__(self, path, selection, units):
+        self.path = path
+        self.selection = selection
+        self.units = {unit: {"cursor": None, "done": False} for unit in units}
+        self.counts = Counter()
+        self.failures = []
+        self.elapsed_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, selection):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CHECKPOINT_VERSION or data["selection"] != selection:
+            raise SystemExit(
+                f"{path}의 대상/범위가 이번 실행과 다릅니다. 다른 --checkpoint를 쓰거나 --reset으로 처음부터 시작하세요."
+            )
+        checkpoint = cls(path, selection, [])
+        checkpoint.units = data["units"]
+        checkpoint.counts = Counter(data["counts"])
+        checkpoint.failures = data["failures"]
+        checkpoint.elapsed_seconds = data["elapsedSeconds"]
+        return checkpoint
+
+    def pending_units(self):
+        return [unit for unit, state in self.units.items() if not state["done"]]
+
+    def cursor(self, unit):
+        return self.units[unit]["cursor"]
+
+    def advance(self, unit, cursor, counts, failures):
+        with self._lock:
+            self.units[unit] = {"cursor": cursor, "done": cursor is None}
+            self.counts.update(counts)
+            kept = failures[: max(MAX_RECORDED_FAILURES - len(self.failures), 0)]
+            if len(kept) < len(failures):
+                self.counts["failures.dropped"] += len(failures) - len(kept)
+            self.failures.extend(kept)
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.counts)
+
+    def save(self, elapsed_seconds):
+        with self._lock:
+            data = {
+                "version": CHECKPOINT_VERSION,
+                "selection": self.selection,
+                "units": self.units,
+                "counts": dict(self.counts),
+                "failures": self.failures,
+                "elapsedSeconds": self.elapsed_seconds + elapsed_seconds,
+            }
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temporary, self.path)
+
+
+class Backfill:
+    def __init__(self, args, aws_clients):
+        self.args = args
+        self.aws_clients = aws_clients
+        self.dynamodb = aws_clients.get_client("dynamodb")
+        self.stop = threading.Event()
+        self.analysis_version = None
+        self.encoding_key = None
+
+        if "tags" in args.targets:
+            extract_image_tags = _load_function("image/step-function/extract-image-tags")
+            prompt = aws_clients.get_client("ssm").get_parameter(Name=args.prompt_param, WithDecryption=True)
+            self.analysis_version = extract_image_tags.analysis_version(prompt["Parameter"].get("Version", 0))
+        if "transcode" in args.targets:
+            from prism_common import transcode_status
+
+            self.encoding_key = transcode_status.encoding_key(args.avif_encoding)
+
+    # --- enumeration -----------------------------------------------------------------------
+
+    def units(self):
+        if self.args.album:
+            return [f"album:{self.args.album}"]
+        if self.args.user:
+            # 앨범 ID는 원본 버킷의 'album/<user>/<날짜>/' 경로와 같음
+            paginator = self.aws_clients.get_client("s3").get_paginator("list_objects_v2")
+            albums = []
+            for page in paginator.paginate(Bucket=self.args.bucket, Prefix=f"album/{self.args.user}/", Delimiter="/"):
+                albums.extend(prefix["Prefix"].rstrip("/") for prefix in page.get("CommonPrefixes", []))
+            return [f"album:{album}" for album in sorted(albums)]
+        return [f"scan:{segment}/{self.args.segments}" for segment in range(self.args.segments)]
+
+    def pages(self, unit, cursor):
+        """(items, next cursor) per page of `unit`, starting after `cursor`."""
+        names = {f"#p{index}": name for index, name in enumerate(PROJECTION)}
+        kwargs = {
+            "TableName": self.args.table,
+            "ProjectionExpression": ", ".join(names),
+            "ExpressionAttributeNames": dict(names),
+            "ExpressionAttributeValues": {},
+            "Limit": self.args.page_size,
+        }
+        filters = []
+        if self.args.since:
+            filters.append("#created >= :since")
+            kwargs["ExpressionAttributeValues"][":since"] = {"S": self.args.since}
+        if self.args.until:
+            filters.append("#created < :until")
+            kwargs["ExpressionAttributeValues"][":until"] = {"S": self.args.until}
+        if filters:
+            kwargs["FilterExpression"] = " AND ".join(filters)
+            kwargs["ExpressionAttributeNames"]["#created"] = "CreatedAt"
+
+        kind, _, target = unit.partition(":")
+        if kind == "album":
+            kwargs["KeyConditionExpression"] = "AlbumID = :album"
+            kwargs["ExpressionAttributeValues"][":album"] = {"S": target}
+            read = self.dynamodb.query
+        else:
+            segment, total = target.split("/")
+            kwargs["Segment"], kwargs["TotalSegments"] = int(segment), int(total)
+            read = self.dynamodb.scan
+        if not kwargs["ExpressionAttributeValues"]:
+            del kwargs["ExpressionAttributeValues"]
+
+        while not self.stop.is_set():
+            if cursor:
+                kwargs["ExclusiveStartKey"] = cursor
+            response = read(**kwargs)
+            cursor = response.get("LastEvaluatedKey")
+            yield response.get("Items", []), cursor
+            if cursor is None:
+                return
+
+    # --- handlers --------------------------------------------------------------------------
+
+    def invoke(self, function_name, payload):
+        lambda_client = self.aws_clients.get_client("lambda")
+        for attempt in range(self.args.max_attempts):
+            if attempt:
+                # 지수 백오프 + 지터: 여러 스레드가 같은 순간에 다시 몰리지 않게 함
+                time.sleep(min(2**attempt, 60) * random.uniform(0.5, 1.0))
+            try:
+                response = lambda_client.invoke(FunctionName=function_name, Payload=json.dumps(payload).encode("utf-8"))
+            except ClientError as e:
+                if e.response["Error"]["Code"] in RETRYABLE_ERRORS:
+                    continue
+                raise
+            body = json.loads(response["Payload"].read() or b"null")
+            if response.get("FunctionError"):
+                error_type = (body or {}).get("errorType")
+                if error_type in RETRYABLE_ERRORS:
+                    continue
+                raise HandlerFailed(f"{function_name}: {error_type}: {(body or {}).get('errorMessage')}")
+            return body
+        raise HandlerFailed(f"{function_name}: {self.args.max_attempts}번 시도했지만 계속 미뤄졌습니다.")
+
+    def retag(self, item):
+        original_key = _string(item, "OriginalKey")
+        event = {"s3Bucket": _string(item, "SourceBucket"), "s3Key": original_key, "origin": "backfill"}
+        processed_key = _string(item, "ProcessedKey")
+        if processed_key and processed_key != original_key:
+            event["newKey"] = processed_key
+
+        analysis = self.invoke(self.args.tags_function, event)
+        if not isinstance(analysis, dict) or "bedrock_analysis" not in analysis:
+            raise HandlerFailed(f"{self.args.tags_function}: {analysis}")
+        stored = {**analysis, "original_key": original_key}
+        self.invoke(self.args.store_function, stored)
+        if self.args.embed_function:
+            self.invoke(self.args.embed_function, stored)
+
+    def transcode_statuses(self, keys):
+        from prism_common import ddb_batch
+
+        statuses = {}
+        if not self.args.status_table:
+            return statuses
+        for start in range(0, len(keys), 100):
+            request = {
+                self.args.status_table: {
+                    "Keys": [{"SourceKey": {"S": key}} for key in keys[start : start + 100]],
+                    "ProjectionExpression": "SourceKey, #st, EncodingKey",
+                    "ExpressionAttributeNames": {"#st": "Status"},
+                }
+            }
+            # 조회하지 못한 키는 변환 기록이 없는 것으로 보고 다시 큐에 넣음 (sqs-to-batch가 중복을 거름)
+            responses, _ = ddb_batch.get(self.dynamodb, request)
+            for status in responses.get(self.args.status_table, []):
+                statuses[_string(status, "SourceKey")] = status
+        return statuses
+
+    def enqueue_transcodes(self, items, counts, failures):
+        keys = [_string(item, "OriginalKey") for item in items]
+        statuses = self.transcode_statuses(keys)
+        to_send = []
+        for key in keys:
+            status = statuses.get(key, {})
+            if (
+                _string(status, "Status") == "CONVERTED"
+                and _string(status, "EncodingKey") == self.encoding_key
+                and not self.args.force
+            ):
+                counts["transcode.skipped"] += 1
+            else:
+                to_send.append(key)
+        if self.args.dry_run:
+            counts["transcode.pending"] += len(to_send)
+            return
+
+        sqs = self.aws_clients.get_client("sqs")
+        for start in range(0, len(to_send), 10):
+            batch = to_send[start : start + 10]
+            entries = [
+                {
+                    "Id": str(index),
+                    "MessageBody": json.dumps(
+                        {"sourceKey": key, "avifEncoding": self.args.avif_encoding, "origin": "backfill"},
+                        ensure_ascii=False,
+                    ),
+                }
+                for index, key in enumerate(batch)
+            ]
+            response = sqs.send_message_batch(QueueUrl=self.args.queue_url, Entries=entries)
+            counts["transcode.enqueued"] += len(response.get("Successful", []))
+            for failed in response.get("Failed", []):
+                counts["transcode.failed"] += 1
+                failures.append({"key": batch[int(failed["Id"])], "target": "transcode", "error": failed.get("Message")})
+
+    # --- run -------------------------------------------------------------------------------
+
+    def process_page(self, items, executor):
+        counts = Counter(scanned=len(items))
+        failures = []
+        if "transcode" in self.args.targets:
+            self.enqueue_transcodes(items, counts, failures)
+
+        if "tags" in self.args.targets:
+            futures = {}
+            for item in items:
+                if _string(item, "AnalysisVersion") == self.analysis_version and not self.args.force:
+                    counts["tags.skipped"] += 1
+                elif self.args.dry_run:
+                    counts["tags.pending"] += 1
+                else:
+                    futures[executor.submit(self.retag, item)] = _string(item, "OriginalKey")
+            wait(futures)
+            for future, key in futures.items():
+                error = future.exception()
+                if error is None:
+                    counts["tags.done"] += 1
+                else:
+                    counts["tags.failed"] += 1
+                    failures.append({"key": key, "target": "tags", "error": str(error)})
+        return counts, failures
+
+    def run_unit(self, unit, checkpoint, executor):
+        for items, cursor in self.pages(unit, checkpoint.cursor(unit)):
+            counts, failures = self.process_page(items, executor)
+            # 페이지의 이미지가 모두 끝난 뒤에만 커서를 옮겨서, 중단돼도 처리하지 않은 이미지를 건너뛰지 않음
+            checkpoint.advance(unit, cursor, counts, failures)
+
+
+def report_line(counts, elapsed):
+    scanned = counts["scanned"]
+    handled = counts["tags.done"] + counts["transcode.enqueued"]
+    rate = scanned / elapsed if elapsed else 0.0
+    details = ", ".join(f"{name} {value}" for name, value in sorted(counts.items()) if name != "scanned")
+    return f"[{elapsed:7.1f}s] scanned {scanned} ({rate:.1f}/s), handled {handled}; {details}"
+
+
+def run(args, aws_clients):
+    selection = {
+        "table": args.table,
+        "targets": sorted(args.targets),
+        "album": args.album,
+        "user": args.user,
+        "since": args.since,
+        "until": args.until,
+        "segments": args.segments,
+        "force": args.force,
+        "avifEncoding": args.avif_encoding if "transcode" in args.targets else None,
+    }
+    backfill = Backfill(args, aws_clients)
+    # 프롬프트가 또 바뀌면 이전 체크포인트로 이어가지 않음 (건너뛴 이미지가 다시 대상이 됨)
+    selection["analysisVersion"] = backfill.analysis_version
+    if args.checkpoint and os.path.exists(args.checkpoint) and not args.reset:
+        checkpoint = Checkpoint.load(args.checkpoint, selection)
+        print(f"{args.checkpoint}에서 이어서 실행합니다: 남은 단위 {len(checkpoint.pending_units())}개", file=sys.stderr)
+    else:
+        checkpoint = Checkpoint(args.checkpoint, selection, backfill.units())
+
+    started = time.perf_counter()
+    last_saved = started
+
+    def save():
+        if args.checkpoint:
+            checkpoint.save(time.perf_counter() - started)
+
+    units = checkpoint.pending_units()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor, ThreadPoolExecutor(
+        max_workers=max(min(args.parallel_units, len(units)), 1)
+    ) as unit_executor:
+        futures = {unit_executor.submit(backfill.run_unit, unit, checkpoint, executor): unit for unit in units}
+        try:
+            while True:
+                done, running = wait(futures, timeout=args.report_interval)
+                now = time.perf_counter()
+                print(report_line(checkpoint.snapshot(), now - started), file=sys.stderr)
+                if now - last_saved >= args.checkpoint_interval:
+                    save()
+                    last_saved = now
+                if not running:
+                    break
+        except KeyboardInterrupt:
+            # 진행 중인 페이지는 끝까지 처리하고 그 위치를 저장
+            print("중단 요청: 진행 중인 페이지를 마치고 체크포인트를 저장합니다.", file=sys.stderr)
+            backfill.stop.set()
+            wait(futures)
+        errors = [f"{futures[future]}: {future.exception()!r}" for future in futures if future.exception()]
+    save()
+
+    elapsed = time.perf_counter() - started
+    counts = checkpoint.snapshot()
+    return {
+        "selection": selection,
+        "elapsed_seconds": elapsed,
+        "total_elapsed_seconds": checkpoint.elapsed_seconds + elapsed,
+        "scanned_per_second": counts["scanned"] / elapsed if elapsed else 0.0,
+        "counts": dict(counts),
+        "remaining_units": len(checkpoint.pending_units()),
+        "failures": checkpoint.failures[:20],
+        "unit_errors": errors,
+        "interrupted": backfill.stop.is_set(),
+    }
+
+
+def print_report(report):
+    counts = Counter(report["counts"])
+    print(report_line(counts, report["elapsed_seconds"]))
+    print(f"remaining units: {report['remaining_units']}, total elapsed {report['total_elapsed_seconds']:.1f}s")
+    for failure in report["failures"]:
+        print(f"  failed {failure['target']} {failure['key']}: {failure['error']}")
+    for error in report["unit_errors"]:
+        print(f"  unit error {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", type=lambda value: value.split(","), default=["tags"], help="tags,transcode")
+    parser.add_argument("--table", default=os.environ.get("DYNAMODB_METADATA_TABLE_NAME", "MemoryImageMetadata-dev"))
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--album", help="one album, e.g. album/USER_ID/25-01-01")
+    selection.add_argument("--user", help="every album of one user (needs --bucket)")
+    parser.add_argument("--bucket", help="originals bucket, to list a user's albums")
+    parser.add_argument("--since", help="CreatedAt lower bound (inclusive), e.g. 2025-01-01")
+    parser.add_argument("--until", help="CreatedAt upper bound (exclusive)")
+    parser.add_argument("--segments", type=int, default=16, help="parallel scan segments for the whole table")
+    parser.add_argument("--parallel-units", type=int, default=16, help="albums/segments read at the same time")
+    parser.add_argument("--concurrency", type=int, default=64, help="images processed at the same time")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-attempts", type=int, default=6, help="attempts per handler call on deferral/throttling")
+    parser.add_argument("--tags-function", default="extract-image-tags")
+    parser.add_argument("--store-function", default="result-to-dynamodb")
+    parser.add_argument("--embed-function", help="also re-embed summaries with this function")
+    parser.add_argument("--prompt-param", default=os.environ.get("PROMPT_PARAM"), help="SSM tagging prompt parameter")
+    parser.add_argument("--queue-url", help="transcoding SQS queue")
+    parser.add_argument("--status-table", default=os.environ.get("TRANSCODE_STATUS_TABLE_NAME"))
+    parser.add_argument("--avif-encoding", type=json.loads, default={"mode": "auto"})
+    parser.add_argument("--force", action="store_true", help="reprocess images that are already current")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be reprocessed")
+    parser.add_argument("--checkpoint", help="progress file; an existing one is resumed")
+    parser.add_argument("--reset", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0)
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    unknown = set(args.targets) - {"tags", "transcode"}
+    if unknown:
+        parser.error(f"unknown targets: {sorted(unknown)}")
+    if args.user and not args.bucket:
+        parser.error("--user needs --bucket")
+    if "tags" in args.targets and not args.prompt_param:
+        parser.error("tags needs --prompt-param (or PROMPT_PARAM)")
+    if "transcode" in args.targets and not args.queue_url and not args.dry_run:
+        parser.error("transcode needs --queue-url")
+
+    # 스레드마다 커넥션을 쓰므로 풀 크기를 동시 실행 수에 맞춤 (aws_clients import 전에 설정)
+    os.environ.setdefault("AWS_MAX_POOL_CONNECTIONS", str(args.concurrency + args.parallel_units))
+    if COMMON_PYTHON not in sys.path:
+        sys.path.insert(0, COMMON_PYTHON)
+    from prism_common import aws_clients
+
+    report = run(args, aws_clients)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if report["interrupted"]:
+        return 130
+    return 1 if report["unit_errors"] or report["counts"].get("tags.failed") or report["counts"].get("transcode.failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark of prism_common.ddb_codec against boto3's TypeDeserializer/TypeSerializer.
+
+Pages of synthetic metadata items (the shape result-to-dynamodb writes, including the Display
+map) are decoded the way the resource API did it - TypeDeserializer per attribute, then the
+handler's own conversion of Tags to a list - and with the METADATA schema. Encoding compares
+TypeSerializer with METADATA.encode.
+
+    python tools/codec_bench/codec_bench.py
+    python tools/codec_bench/codec_bench.py --page-sizes 100,1000 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, "common", "python"))
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer  # noqa: E402
+
+from prism_common import ddb_codec, display  # noqa: E402
+
+TAGS = ["해변", "노을", "여행", "가족", "바다", "여름", "친구", "산책", "음식", "카페", "강아지", "생일"]
+
+
+def sample_items(count):
+    items = []
+    for index in range(count):
+        original_key = f"album/user-1/25-01-{index % 28 + 1:02d}/IMG_{index:04d}.jpg"
+        created_at = f"2025-01-{index % 28 + 1:02d}T10:{index % 60:02d}:00+09:00"
+        tags = TAGS[index % 5 : index % 5 + 6]
+        item = {
+            "AlbumID": os.path.dirname(original_key),
+            "OriginalKey": original_key,
+            "UserID": "user-1",
+            "SourceBucket": "memory-images-originals-dev",
+            "ProcessedKey": original_key,
+            "ImageSummary": "해변에서 노을을 바라보는 두 사람과 강아지 한 마리",
+            "AnalysisVersion": "apac.amazon.nova-lite-v1:0@3",
+            "CreatedAt": created_at,
+            "Tags": tags,
+            "Display": display.build_display(original_key, created_at, tags),
+        }
+        items.append(ddb_codec.METADATA.encode(item))
+    return items
+
+
+def resource_decode(page, deserializer):
+    items = []
+    for typed in page:
+        item = {name: deserializer.deserialize(value) for name, value in typed.items()}
+        # 리소스 API를 쓰던 핸들러가 하던 추가 변환
+        if "Tags" in item:
+            item["Tags"] = sorted(item["Tags"])
+        items.append(item)
+    return items
+
+
+def resource_encode(items, serializer):
+    encoded = []
+    for item in items:
+        item = dict(item, Tags=set(item["Tags"]))
+        encoded.append({name: serializer.serialize(value) for name, value in item.items()})
+    return encoded
+
+
+def measure(function, repeat):
+    """Median seconds of `repeat` runs (after one warm-up run)."""
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-sizes", type=lambda value: [int(size) for size in value.split(",")], default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    deserializer = TypeDeserializer()
+    serializer = TypeSerializer()
+
+    print(f"{'page':>6}  {'operation':<8}  {'boto3 us/item':>14}  {'codec us/item':>14}  {'speedup':>8}")
+    for size in args.page_sizes:
+        page = sample_items(size)
+        decoded = ddb_codec.METADATA.decode_all(page)
+        # 두 방식이 같은 값을 만드는지 확인 (Decimal == int)
+        assert resource_decode(page, deserializer) == decoded
+
+        rows = [
+            (
+                "decode",
+                measure(lambda: resource_decode(page, deserializer), args.repeat),
+                measure(lambda: ddb_codec.METADATA.decode_all(page), args.repeat),
+            ),
+            (
+                "encode",
+                measure(lambda: resource_encode(decoded, serializer), args.repeat),
+                measure(lambda: [ddb_codec.METADATA.encode(item) for item in decoded], args.repeat),
+            ),
+        ]
+        for operation, boto3_seconds, codec_seconds in rows:
+            print(
+                f"{size:>6}  {operation:<8}  {boto3_seconds / size * 1e6:>14.1f}  "
+                f"{codec_seconds / size * 1e6:>14.1f}  {boto3_seconds / codec_seconds:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Reference Lambda for coldstart.py: the cost every Python function here pays before its own
+work (interpreter, prism_common, one AWS client and call). Budgets are relative to it.
+"""
+
+import json
+import logging
+import os
+
+from prism_common import aws_clients, metrics
+
+TABLE_NAME = os.environ.get("DDB_TABLE_NAME", "MemoryImageMetadata-dev")
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+@metrics.instrumented
+def lambda_handler(event, context):
+    response = aws_clients.get_client("dynamodb").get_item(TableName=TABLE_NAME, Key={"OriginalKey": {"S": event["key"]}})
+    return {"statusCode": 200, "body": json.dumps({"found": "Item" in response})}
@@ -0,0 +1,213 @@
+"""
+Cold-start benchmark for the Python Lambdas.
+
+Every function is measured in a fresh interpreter: import time of lambda_function.py, time to
+the first handled event (including AWS client creation) and peak RSS. AWS responses come from
+botocore Stubbers (see scenarios.py), so nothing leaves the machine.
+
+Budgets are relative to a reference function (tools/coldstart/baseline: prism_common, one
+client, one call) run alternately with each function, so they hold on any machine: times are
+multiples of the baseline's, peak RSS is MB above it. A function fails its budget when it is
+more than TIME_TOLERANCE (plus TIME_SLACK_MS) slower, or RSS_SLACK_MB larger, than recorded.
+
+    python tools/coldstart/coldstart.py                   # measure and check against budgets.json
+    python tools/coldstart/coldstart.py --runs 10 image/step-function/extract-image-tags
+    python tools/coldstart/coldstart.py --write-budgets   # record current numbers relative to the baseline
+
+Exits with status 1 when a median exceeds its budget.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(TOOLS_DIR))
+COMMON_PYTHON = os.path.join(REPO_ROOT, "common", "python")
+BUDGETS_PATH = os.path.join(TOOLS_DIR, "budgets.json")
+
+METRICS = ("import_ms", "first_event_ms", "peak_rss_mb")
+TIME_METRICS = ("import_ms", "first_event_ms")
+
+# 측정 잡음 허용치: 시간은 기록된 배율의 50% + 5 ms(수 ms짜리 측정용), RSS는 8 MB
+TIME_TOLERANCE = 0.5
+TIME_SLACK_MS = 5.0
+RSS_SLACK_MB = 8.0
+
+
+def run_worker(function_dir):
+    """Runs inside the child interpreter: import, first event, report one JSON line."""
+    sys.path.insert(0, COMMON_PYTHON)
+    sys.path.insert(0, os.path.join(REPO_ROOT, function_dir))
+
+    start = time.perf_counter()
+    import lambda_function
+
+    imported = time.perf_counter()
+
+    # 시나리오 모듈은 botocore를 import하므로 측정 대상 import가 끝난 뒤에 로드
+    sys.path.insert(0, TOOLS_DIR)
+    from botocore.stub import Stubber
+    from prism_common import aws_clients
+    from scenarios import SCENARIOS
+
+    scenario = SCENARIOS[function_dir]
+
+    event_start = time.perf_counter()
+    stubbers = {}
+    for service, kind, operation, response in scenario["calls"]:
+        if (service, kind) not in stubbers:
+            if kind == "resource":
+                client = aws_clients.get_resource(service).meta.client
+            else:
+                client = aws_clients.get_client(service)
+            stubbers[(service, kind)] = Stubber(client)
+        stubbers[(service, kind)].add_response(operation, response)
+    for stubber in stubbers.values():
+        stubber.activate()
+
+    lambda_function.lambda_handler(scenario["event"], None)
+    handled = time.perf_counter()
+
+    for stubber in stubbers.values():
+        stubber.assert_no_pending_responses()
+
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - start) * 1000,
+                "first_event_ms": (handled - event_start) * 1000,
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+        )
+    )
+
+
+def run_once(function_dir):
+    sys.path.insert(0, TOOLS_DIR)
+    from scenarios import COMMON_ENV, SCENARIOS
+
+    env = {**os.environ, **COMMON_ENV, **SCENARIOS[function_dir]["env"]}
+    env.pop("PYTHONPATH", None)
+
+    completed = subprocess.run(
+        [sys.executable, "-B", __file__, "--worker", function_dir],
+        env=env,
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{function_dir} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def median(samples):
+    return {metric: statistics.median(sample[metric] for sample in samples) for metric in METRICS}
+
+
+def measure(function_dir, runs, baseline_dir):
+    """Medians of the function and of the baseline, run alternately so both see the same machine state."""
+    samples, baseline_samples = [], []
+    for _ in range(runs):
+        baseline_samples.append(run_once(baseline_dir))
+        samples.append(run_once(function_dir))
+    return median(samples), median(baseline_samples)
+
+
+def load_budgets():
+    if not os.path.exists(BUDGETS_PATH):
+        return {}
+    with open(BUDGETS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def relative(result, baseline):
+    """Measured values as stored in budgets.json: times x baseline, RSS in MB above it."""
+    budget = {metric: round(result[metric] / baseline[metric], 3) for metric in TIME_METRICS}
+    budget["peak_rss_mb"] = round(result["peak_rss_mb"] - baseline["peak_rss_mb"], 1)
+    return budget
+
+
+def limits(budget, baseline):
+    """Absolute limits for this run from a budgets.json entry and the baseline just measured."""
+    result = {}
+    for metric in TIME_METRICS:
+        if metric in budget:
+            result[metric] = budget[metric] * baseline[metric] * (1 + TIME_TOLERANCE) + TIME_SLACK_MS
+    if "peak_rss_mb" in budget:
+        result["peak_rss_mb"] = baseline["peak_rss_mb"] + budget["peak_rss_mb"] + RSS_SLACK_MB
+    return result
+
+
+def print_row(name, result, marks=("", "", "")):
+    print(
+        f"{name:<62} {result['import_ms']:>9.1f}{marks[0] or ' '} "
+        f"{result['first_event_ms']:>12.1f}{marks[1] or ' '} {result['peak_rss_mb']:>11.1f}{marks[2] or ' '}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("functions", nargs="*", help="function directories (default: all)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--write-budgets", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return 0
+
+    sys.path.insert(0, TOOLS_DIR)
+    from scenarios import BASELINE, SCENARIOS
+
+    functions = args.functions or sorted(name for name in SCENARIOS if name != BASELINE)
+    budgets = load_budgets()
+    results = {}
+    failures = []
+
+    print(f"{'function':<62} {'import ms':>10} {'1st event ms':>13} {'peak RSS MB':>12}")
+    baselines = []
+    for function_dir in functions:
+        result, baseline = measure(function_dir, args.runs, BASELINE)
+        results[function_dir] = (result, baseline)
+        baselines.append(baseline)
+
+        limit = limits(budgets.get(function_dir, {}), baseline)
+        marks = []
+        for metric in METRICS:
+            over = metric in limit and result[metric] > limit[metric]
+            marks.append("!" if over else "")
+            if over:
+                failures.append(
+                    f"{function_dir}: {metric} {result[metric]:.1f} > {limit[metric]:.1f} "
+                    f"(budget {budgets[function_dir][metric]} relative to the baseline)"
+                )
+        print_row(function_dir, result, marks)
+    print_row(f"{BASELINE} (median)", median(baselines))
+
+    if args.write_budgets:
+        for function_dir, (result, baseline) in results.items():
+            budgets[function_dir] = relative(result, baseline)
+        with open(BUDGETS_PATH, "w", encoding="utf-8") as f:
+            json.dump(budgets, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbudgets written to {os.path.relpath(BUDGETS_PATH, REPO_ROOT)}")
+        return 0
+
+    if failures:
+        print("\nbudget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+Cold-start scenarios: one canned first event per Python Lambda, plus the AWS responses it needs.
+
+Responses are served by botocore's Stubber on real clients, so client creation and service
+model loading are measured exactly as they happen in Lambda; only the network is replaced.
+Each call is (service, "client" | "resource", operation, response).
+"""
+
+import io
+import json
+import struct
+
+from botocore.response import StreamingBody
+
+ORIGINAL_KEY = "album/user-1/25-01-01/IMG_0001.jpg"
+
+
+def _streaming(payload):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+def _bedrock_text(text):
+    return {
+        "body": _streaming({"output": {"message": {"content": [{"text": text}]}}}),
+        "contentType": "application/json",
+    }
+
+
+def _metadata_item():
+    return {
+        "AlbumID": {"S": "album/user-1/25-01-01"},
+        "UserID": {"S": "user-1"},
+        "OriginalKey": {"S": ORIGINAL_KEY},
+        "SourceBucket": {"S": "memory-images-originals-dev"},
+        "ProcessedKey": {"S": ORIGINAL_KEY},
+        "ImageSummary": {"S": "해변에서 노을을 바라보는 두 사람"},
+        "Tags": {"SS": ["해변", "노을", "여행"]},
+        "CreatedAt": {"S": "2025-01-01T10:00:00+09:00"},
+    }
+
+
+def _embedding(dimension=256):
+    vector = [0.0] * dimension
+    vector[0] = 1.0
+    return {
+        "body": _streaming({"embedding": vector, "inputTextTokenCount": 12}),
+        "contentType": "application/json",
+    }
+
+
+def _governor_bucket():
+    # 정산은 예약 뒤의 버킷을 읽어 조건부로 다시 씀
+    return {
+        "BucketID": {"S": "amazon.titan-embed-text-v2:0"},
+        "Requests": {"N": "199"},
+        "Tokens": {"N": "399980"},
+        "UpdatedAt": {"N": "1700000000000"},
+    }
+
+
+def _vector_segment(keys, dimension=256):
+    # prism_common.vector_index 형식: 헤더, float32 행렬, 줄바꿈으로 구분한 키
+    header = struct.pack("<4sIII40s", b"PVI1", 1, dimension, len(keys), b"amazon.titan-embed-text-v2:0/256")
+    rows = b"".join(struct.pack(f"<{dimension}f", *([1.0] + [0.0] * (dimension - 1))) for _ in keys)
+    return header + rows + "\n".join(keys).encode("utf-8")
+
+
+SCENARIOS = {
+    "api/api-gateway/generate-s3-presignedurl": {
+        "env": {"S3_BUCKET_NAME": "memory-images-originals-dev"},
+        "event": {
+            "requestContext": {"authorizer": {"claims": {"sub": "user-1"}}},
+            "body": json.dumps({"fileName": "IMG_0001.jpg", "contentType": "image/jpeg"}),
+        },
+        "calls": [],
+    },
+    "api/appsync/appsync-metadata-resolver": {
+        "env": {},
+        "event": {
+            "arguments": {"OriginalKey": ORIGINAL_KEY, "viewportWidth": 360, "devicePixelRatio": 3},
+            "info": {"fieldName": "getMemoryImageMetadata"},
+        },
+        "calls": [
+            ("dynamodb", "client", "query", {"Items": [_metadata_item()]}),
+        ],
+    },
+    "api/appsync/appsync-category-resolver": {
+        "env": {},
+        "event": {
+            "identity": {"sub": "user-1"},
+            "arguments": {"categoryId": "cat-0123456789abcdef", "limit": 50},
+            "info": {"fieldName": "getCategory"},
+        },
+        "calls": [
+            (
+                "dynamodb",
+                "resource",
+                "get_item",
+                {
+                    "Item": {
+                        "UserID": {"S": "user-1"},
+                        "CategoryID": {"S": "cat-0123456789abcdef"},
+                        "CategoryName": {"S": "여행"},
+                        "Description": {"S": "바다 여행"},
+                        "ImageKeys": {"L": [{"S": ORIGINAL_KEY}]},
+                        "ImageCount": {"N": "1"},
+                        "Version": {"N": "1"},
+                    }
+                },
+            ),
+        ],
+    },
+    "api/appsync/appsync-tag-search-resolver": {
+        "env": {},
+        "event": {
+            "identity": {"sub": "user-1"},
+            "arguments": {"tags": ["해변", "노을"], "mode": "AND", "limit": 30},
+            "info": {"fieldName": "searchByTags"},
+        },
+        "calls": [
+            ("dynamodb", "resource", "query", {"Items": [{"OriginalKey": {"S": ORIGINAL_KEY}}]}),
+            ("dynamodb", "resource", "query", {"Items": [{"OriginalKey": {"S": ORIGINAL_KEY}}]}),
+        ],
+    },
+    "api/appsync/appsync-image-search-resolver": {
+        "env": {},
+        "event": {
+            "identity": {"sub": "user-1"},
+            "arguments": {"query": "바다에서 본 노을", "limit": 20},
+            "info": {"fieldName": "searchImages"},
+        },
+        "calls": [
+            ("s3", "client", "list_objects_v2", {"KeyCount": 0, "IsTruncated": False}),
+            (
+                "s3",
+                "client",
+                "get_object",
+                {"Body": _streaming(_vector_segment([ORIGINAL_KEY] * 1)), "ETag": '"0123456789abcdef"'},
+            ),
+            # bedrock_governor: 예약, 호출, 실제 토큰 수로 정산 (읽고 조건부로 다시 씀)
+            ("dynamodb", "resource", "get_item", {}),
+            ("dynamodb", "resource", "put_item", {}),
+            ("bedrock-runtime", "client", "invoke_model", _embedding()),
+            ("dynamodb", "resource", "get_item", {"Item": _governor_bucket()}),
+            ("dynamodb", "resource", "put_item", {}),
+        ],
+    },
+    "api/appsync/generate-s3-presignedurl": {
+        "env": {
+            "ORIGINAL_IMAGES_BUCKET": "memory-images-originals-dev",
+            "PROCESSED_IMAGES_BUCKET": "memory-images-processed-dev",
+        },
+        "event": {"objectKey": ORIGINAL_KEY},
+        "calls": [
+            ("s3", "client", "head_object", {"ContentLength": 1024}),
+        ],
+    },
+    "batch/step-function/sqs-to-batch": {
+        "env": {},
+        "event": {
+            "Messages": [
+                {
+                    "MessageId": f"message-{i}",
+                    "ReceiptHandle": f"handle-{i}",
+                    "Attributes": {"ApproximateReceiveCount": "1", "SentTimestamp": "1735689600000"},
+                    "Body": json.dumps(
+                        {
+                            "sourceBucket": "memory-images-originals-dev",
+                            "sourceKey": f"album/user-1/25-01-01/IMG_{i:04d}.jpg",
+                            "width": 4032,
+                            "height": 3024,
+                        }
+                    ),
+                }
+                for i in range(10)
+            ]
+        },
+        "calls": [],
+    },
+    "batch/step-function/check-succeed-batch-job": {
+        "env": {},
+        "event": {
+            "mapResult": [{"JobName": "transcode-0", "Status": "SUCCEEDED"}],
+            "lambdaOutput": {
+                "batch_jobs": [
+                    {
+                        "correlationId": "transcode-0",
+                        "images": [{"sourceKey": ORIGINAL_KEY, "messageId": "message-0", "avifEncoding": {}}],
+                        "messages": [{"Id": "message-0", "ReceiptHandle": "handle-0", "ReceiveCount": 1}],
+                    }
+                ]
+            },
+        },
+        "calls": [],
+    },
+    "image/image-safefy-filter": {
+        "env": {"DESTINATION_BUCKET": "memory-images-originals-dev"},
+        "event": {
+            "Records": [
+                {"s3": {"bucket": {"name": "memory-images-upload-dev"}, "object": {"key": ORIGINAL_KEY}}}
+            ]
+        },
+        "calls": [
+            ("rekognition", "client", "detect_moderation_labels", {"ModerationLabels": []}),
+            ("s3", "client", "copy_object", {}),
+            ("s3", "client", "delete_object", {}),
+        ],
+    },
+    "image/album-sort-scheduler": {
+        "env": {
+            "SORT_STATE_MACHINE_ARN": "arn:aws:states:ap-northeast-2:000000000000:stateMachine:album-sort-dev",
+            "SORT_SOURCE_BUCKET": "memory-images-originals-dev",
+        },
+        "event": {"detail-type": "Scheduled Event", "source": "aws.events", "time": "2025-01-01T03:00:00Z"},
+        "calls": [
+            (
+                "dynamodb",
+                "client",
+                "query",
+                {
+                    "Items": [
+                        {
+                            "UserID": {"S": "user-1"},
+                            "ImageCount": {"N": "42"},
+                            "PendingChanges": {"N": "12"},
+                            "FirstPendingAt": {"N": "1735698000"},
+                            "LastUploadAt": {"N": "1735699800"},
+                        }
+                    ]
+                },
+            ),
+            ("dynamodb", "client", "query", {"Items": []}),
+            ("dynamodb", "client", "query", {"Items": []}),
+            ("dynamodb", "client", "query", {"Items": []}),
+            ("dynamodb", "client", "update_item", {}),
+            (
+                "stepfunctions",
+                "client",
+                "start_execution",
+                {
+                    "executionArn": "arn:aws:states:ap-northeast-2:000000000000:execution:album-sort-dev:sort-user-1",
+                    "startDate": 0,
+                },
+            ),
+        ],
+    },
+    "image/step-function/extract-image-tags": {
+        "env": {"PROMPT_PARAM": "/prism/prompt/image-tags"},
+        "event": {"s3Bucket": "memory-images-originals-dev", "s3Key": ORIGINAL_KEY},
+        "calls": [
+            ("ssm", "client", "get_parameter", {"Parameter": {"Value": "Describe the image as JSON."}}),
+            ("s3", "client", "get_object", {"Body": _streaming(b"\xff\xd8\xff\xe0" + b"\0" * 4096)}),
+            # bedrock_governor: 버킷 조회 후 예약
+            ("dynamodb", "resource", "get_item", {}),
+            ("dynamodb", "resource", "put_item", {}),
+            (
+                "bedrock-runtime",
+                "client",
+                "invoke_model",
+                _bedrock_text(json.dumps({"imageSummary": "해변의 노을", "tags": ["해변", "노을"]})),
+            ),
+        ],
+    },
+    "image/step-function/result-to-dynamodb": {
+        "env": {},
+        "event": {
+            "source_info": {
+                "sourceBucket": "memory-images-originals-dev",
+                "sourceKey": ORIGINAL_KEY,
+                "processed_key": ORIGINAL_KEY,
+            },
+            "bedrock_analysis": {"imageSummary": "해변의 노을", "tags": ["해변", "노을"]},
+            "original_key": ORIGINAL_KEY,
+        },
+        "calls": [
+            ("dynamodb", "client", "query", {"Items": []}),
+            ("dynamodb", "client", "transact_write_items", {}),
+        ],
+    },
+    "image/step-function/embed-image-summary": {
+        "env": {},
+        "event": {
+            "bedrock_analysis": {"imageSummary": "해변의 노을", "tags": ["해변", "노을"]},
+            "original_key": ORIGINAL_KEY,
+        },
+        "calls": [
+            ("dynamodb", "resource", "get_item", {}),
+            ("dynamodb", "resource", "put_item", {}),
+            ("bedrock-runtime", "client", "invoke_model", _embedding()),
+            ("dynamodb", "resource", "get_item", {"Item": _governor_bucket()}),
+            ("dynamodb", "resource", "put_item", {}),
+            ("s3", "client", "put_object", {"ETag": '"0123456789abcdef"'}),
+            ("s3", "client", "list_objects_v2", {"KeyCount": 1, "IsTruncated": False, "Contents": [{"Key": "k"}]}),
+        ],
+    },
+    "image/step-function/generate-image-list": {
+        "env": {},
+        "event": {"s3Bucket": "memory-images-originals-dev", "body": {"userID": "user-1"}},
+        "calls": [
+            ("dynamodb", "client", "get_item", {}),
+            (
+                "s3",
+                "client",
+                "list_objects_v2",
+                {"Contents": [{"Key": f"album/user-1/25-01-01/IMG_{i:04d}.jpg"} for i in range(50)]},
+            ),
+        ],
+    },
+    "image/step-function/album-list-analyzer": {
+        "env": {},
+        "event": {"body": {"userID": "user-1", "isInitialSort": True, "imageList": [ORIGINAL_KEY]}},
+        "calls": [
+            ("dynamodb", "client", "query", {"Items": [_metadata_item()]}),
+            ("dynamodb", "resource", "query", {"Items": []}),
+            ("dynamodb", "resource", "get_item", {}),
+            ("dynamodb", "resource", "put_item", {}),
+            (
+                "bedrock-runtime",
+                "client",
+                "invoke_model",
+                _bedrock_text(
+                    json.dumps(
+                        {
+                            "categories": [
+                                {"categoryName": "여행", "description": "바다 여행", "imageKeys": [ORIGINAL_KEY]}
+                            ]
+                        },
+                        ensure_ascii=False,
+                    )
+                ),
+            ),
+            ("dynamodb", "client", "transact_write_items", {}),
+            ("dynamodb", "resource", "update_item", {}),
+        ],
+    },
+}
+
+# 빈 핸들러에 가까운 기준 함수. coldstart.py가 같은 실행에서 먼저 측정하고 예산은 이에 대한 상대값으로 둠
+BASELINE = "tools/coldstart/baseline"
+SCENARIOS[BASELINE] = {
+    "env": {},
+    "event": {"key": ORIGINAL_KEY},
+    "calls": [("dynamodb", "client", "get_item", {"Item": _metadata_item()})],
+}
+
+# 모든 함수에 공통으로 필요한 환경 변수 (실제 AWS에 연결되지 않도록 가짜 자격 증명 사용)
+COMMON_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+    "AWS_DEFAULT_REGION": "ap-northeast-2",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "DDB_TABLE_NAME": "MemoryImageMetadata-dev",
+    "DYNAMODB_METADATA_TABLE_NAME": "MemoryImageMetadata-dev",
+    "DYNAMODB_STATS_TABLE_NAME": "MemoryUserStats-dev",
+    "DYNAMODB_CATEGORY_TABLE_NAME": "MemoryAlbumCategories-dev",
+    "DYNAMODB_TAG_INDEX_TABLE_NAME": "MemoryImageTagIndex-dev",
+    "VECTOR_INDEX_BUCKET": "memory-pipeline-state-dev",
+    "BEDROCK_GOVERNOR_TABLE_NAME": "BedrockGovernor-dev",
+}
@@ -0,0 +1,760 @@
+"""
+In-process stand-ins for the AWS services the image pipeline uses.
+
+The fakes keep real state (objects, items, a byOriginalKey GSI) so the handlers can be chained
+exactly like the state machine does, return recorded responses for the model-backed services,
+sleep a configurable latency per call and count every call.
+"""
+
+import base64
+import copy
+import hashlib
+import io
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from prism_common import metrics
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class LatencyModel:
+    """Per-call latency in seconds, keyed by "service.operation" or "service", scaled globally."""
+
+    def __init__(self, latencies=None, scale=1.0, jitter=0.2, seed=None):
+        self.latencies = latencies or {}
+        self.scale = scale
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, service, operation):
+        base = self.latencies.get(f"{service}.{operation}", self.latencies.get(service, 0.0))
+        if not base or not self.scale:
+            return 0.0
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        return base * self.scale * factor
+
+
+class CallRecorder:
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, service, operation):
+        with self._lock:
+            self.counts[f"{service}.{operation}"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class FakeService:
+    service_name = None
+
+    def __init__(self, latency, recorder):
+        self._latency = latency
+        self._recorder = recorder
+        self._lock = threading.RLock()
+
+    def _call(self, operation):
+        self._recorder.record(self.service_name, operation)
+        # 실제 클라이언트의 botocore 훅과 같은 이름(GetObject 등)으로 호출별 메트릭에 집계
+        metrics.record_aws_call(self.service_name, "".join(part.title() for part in operation.split("_")))
+        delay = self._latency.delay(self.service_name, operation)
+        if delay:
+            time.sleep(delay)
+
+
+class _Body:
+    """Minimal StreamingBody replacement."""
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read() if amt is None else self._stream.read(amt)
+
+
+class FakeS3(FakeService):
+    service_name = "s3"
+
+    def __init__(self, latency, recorder):
+        super().__init__(latency, recorder)
+        self.objects = defaultdict(dict)
+
+    def put_object(
+        self, Bucket, Key, Body=b"", ContentType="application/octet-stream", Metadata=None,
+        IfMatch=None, IfNoneMatch=None, **kwargs
+    ):
+        self._call("put_object")
+        data = Body if isinstance(Body, bytes) else Body.read()
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self._lock:
+            # 조건부 쓰기: If-None-Match: * (없을 때만), If-Match: <ETag> (그대로일 때만)
+            current = self.objects[Bucket].get(Key)
+            if (IfNoneMatch == "*" and current) or (IfMatch and (not current or current["ETag"] != IfMatch)):
+                raise client_error("PreconditionFailed", "At least one of the pre-conditions failed", "PutObject")
+            self.objects[Bucket][Key] = {
+                "Body": data,
+                "ContentType": ContentType,
+                "Metadata": dict(Metadata or {}),
+                "LastModified": time.time(),
+                "ETag": etag,
+            }
+        return {"ETag": etag}
+
+    def _get(self, bucket, key, operation):
+        with self._lock:
+            obj = self.objects.get(bucket, {}).get(key)
+        if obj is None:
+            raise client_error("404" if operation == "HeadObject" else "NoSuchKey", "Not Found", operation)
+        return obj
+
+    def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None, **kwargs):
+        self._call("get_object")
+        obj = self._get(Bucket, Key, "GetObject")
+        if IfNoneMatch and IfNoneMatch == obj.get("ETag"):
+            raise client_error("304", "Not Modified", "GetObject")
+        data = obj["Body"]
+        response = {"ContentType": obj["ContentType"], "Metadata": dict(obj["Metadata"]), "ETag": obj.get("ETag")}
+        if Range:
+            start, _, end = Range.replace("bytes=", "").partition("-")
+            data = data[int(start) : int(end) + 1 if end else None]
+            response["ContentRange"] = f"bytes {start}-{int(start) + len(data) - 1}/{len(obj['Body'])}"
+        return {**response, "Body": _Body(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._call("head_object")
+        obj = self._get(Bucket, Key, "HeadObject")
+        return {
+            "ContentLength": len(obj["Body"]),
+            "ContentType": obj["ContentType"],
+            "Metadata": dict(obj["Metadata"]),
+        }
+
+    def copy_object(self, CopySource, Bucket, Key, **kwargs):
+        self._call("copy_object")
+        source = self._get(CopySource["Bucket"], CopySource["Key"], "CopyObject")
+        with self._lock:
+            self.objects[Bucket][Key] = copy.deepcopy(source)
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call("delete_object")
+        with self._lock:
+            self.objects.get(Bucket, {}).pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call("delete_objects")
+        with self._lock:
+            for entry in Delete["Objects"]:
+                self.objects.get(Bucket, {}).pop(entry["Key"], None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000, Delimiter=None, **kwargs):
+        self._call("list_objects_v2")
+        with self._lock:
+            keys = sorted(key for key in self.objects.get(Bucket, {}) if key.startswith(Prefix))
+        prefixes = []
+        if Delimiter:
+            # 구분자 아래의 키는 공통 접두사 하나로 묶음 (이 대체 구현에서는 첫 페이지에 모두 담음)
+            nested = {key for key in keys if Delimiter in key[len(Prefix) :]}
+            prefixes = sorted({key[: key.index(Delimiter, len(Prefix)) + 1] for key in nested})
+            keys = [key for key in keys if key not in nested]
+        start = int(ContinuationToken) if ContinuationToken else 0
+        page = keys[start : start + MaxKeys]
+        response = {
+            "Contents": [{"Key": key, "Size": len(self.objects[Bucket][key]["Body"])} for key in page],
+            "KeyCount": len(page),
+            "IsTruncated": start + MaxKeys < len(keys),
+        }
+        if prefixes and not start:
+            response["CommonPrefixes"] = [{"Prefix": prefix} for prefix in prefixes]
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + MaxKeys)
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        s3 = self
+
+        class _Paginator:
+            def paginate(self, **kwargs):
+                token = None
+                while True:
+                    page = s3.list_objects_v2(ContinuationToken=token, **kwargs)
+                    yield page
+                    if not page["IsTruncated"]:
+                        return
+                    token = page["NextContinuationToken"]
+
+        return _Paginator()
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        params = Params or {}
+        return (
+            f"https://{params.get('Bucket')}.s3.local/{params.get('Key')}"
+            f"?X-Amz-Expires={ExpiresIn}&X-Amz-Signature=local"
+        )
+
+
+class _Expression:
+    """Tiny evaluator for the DynamoDB expression subset the handlers use."""
+
+    def __init__(self, names, values):
+        self.names = names or {}
+        self.values = values or {}
+
+    def name(self, token):
+        token = token.strip()
+        return self.names.get(token, token)
+
+    def value(self, token):
+        return self.values[token.strip()]
+
+    def split_top_level(self, text, sep=","):
+        parts, depth, current = [], 0, ""
+        for char in text:
+            depth += char == "("
+            depth -= char == ")"
+            if char == sep and depth == 0:
+                parts.append(current)
+                current = ""
+            else:
+                current += char
+        if current.strip():
+            parts.append(current)
+        return [part.strip() for part in parts]
+
+    def split_keyword(self, text, keyword):
+        """Splits on a boolean keyword outside parentheses."""
+        parts, depth, start = [], 0, 0
+        for match in re.finditer(rf"\(|\)|\s+{keyword}\s+", text, flags=re.IGNORECASE):
+            token = match.group(0)
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+            elif depth == 0:
+                parts.append(text[start : match.start()])
+                start = match.end()
+        parts.append(text[start:])
+        return [part.strip() for part in parts]
+
+    def condition(self, expression, item):
+        if not expression:
+            return True
+        alternatives = self.split_keyword(expression.strip(), "OR")
+        if len(alternatives) > 1:
+            return any(self.condition(alternative, item) for alternative in alternatives)
+        for clause in self.split_keyword(expression.strip(), "AND"):
+            clause = clause.strip()
+            # 괄호로 묶인 OR 조건
+            if clause.startswith("(") and clause.endswith(")"):
+                if not self.condition(clause[1:-1], item):
+                    return False
+                continue
+            match = re.fullmatch(r"attribute_not_exists\((.+)\)", clause)
+            if match:
+                if self.name(match.group(1)) in item:
+                    return False
+                continue
+            match = re.fullmatch(r"attribute_exists\((.+)\)", clause)
+            if match:
+                if self.name(match.group(1)) not in item:
+                    return False
+                continue
+            match = re.fullmatch(r"begins_with\((.+),\s*(:\w+)\)", clause)
+            if match:
+                current = item.get(self.name(match.group(1)), {}).get("S", "")
+                if not current.startswith(self.value(match.group(2))["S"]):
+                    return False
+                continue
+            match = re.fullmatch(r"(.+?)\s*(=|<>|<=|>=|<|>)\s*(:\w+)", clause)
+            if match:
+                current = item.get(self.name(match.group(1)))
+                if not _compare(current, match.group(2), self.value(match.group(3))):
+                    return False
+                continue
+            raise NotImplementedError(f"condition not supported by fake: {clause}")
+        return True
+
+    def update(self, expression, item):
+        clauses = re.split(r"\b(SET|ADD|REMOVE|DELETE)\b", expression)
+        action = None
+        for token in clauses:
+            token = token.strip()
+            if token in ("SET", "ADD", "REMOVE", "DELETE"):
+                action = token
+                continue
+            if not token:
+                continue
+            for part in self.split_top_level(token):
+                getattr(self, f"_{action.lower()}")(part, item)
+
+    def _set(self, part, item):
+        target, _, expression = part.partition("=")
+        target = self.name(target)
+        expression = expression.strip()
+
+        match = re.fullmatch(r"if_not_exists\((.+?),\s*(:\w+)\)", expression)
+        if match:
+            existing = item.get(self.name(match.group(1)))
+            item[target] = existing if existing is not None else self.value(match.group(2))
+            return
+        match = re.fullmatch(r"list_append\((.+?),\s*(.+?)\)", expression)
+        if match:
+            left, right = (self._operand(token, item) for token in match.groups())
+            item[target] = {"L": (left or {"L": []})["L"] + (right or {"L": []})["L"]}
+            return
+        match = re.fullmatch(r"(.+?)\s*([+-])\s*(.+)", expression)
+        if match:
+            left = Decimal(self._operand(match.group(1), item)["N"])
+            right = Decimal(self._operand(match.group(3), item)["N"])
+            result = left + right if match.group(2) == "+" else left - right
+            item[target] = {"N": str(result)}
+            return
+        item[target] = self._operand(expression, item)
+
+    def _operand(self, token, item):
+        token = token.strip()
+        if token.startswith(":"):
+            return self.value(token)
+        return item.get(self.name(token))
+
+    def _add(self, part, item):
+        target, value_token = part.split()
+        target = self.name(target)
+        value = self.value(value_token)
+        current = item.get(target)
+        if "N" in value:
+            base = Decimal(current["N"]) if current else Decimal(0)
+            item[target] = {"N": str(base + Decimal(value["N"]))}
+        else:
+            set_type = next(iter(value))
+            merged = set(current[set_type]) if current else set()
+            merged.update(value[set_type])
+            item[target] = {set_type: sorted(merged)}
+
+    def _remove(self, part, item):
+        item.pop(self.name(part), None)
+
+    def _delete(self, part, item):
+        target, value_token = part.split()
+        target = self.name(target)
+        value = self.value(value_token)
+        current = item.get(target)
+        if not current:
+            return
+        set_type = next(iter(value))
+        remaining = set(current[set_type]) - set(value[set_type])
+        if remaining:
+            item[target] = {set_type: sorted(remaining)}
+        else:
+            item.pop(target)
+
+
+def _scalar(attribute):
+    if attribute is None:
+        return None
+    if "N" in attribute:
+        return Decimal(attribute["N"])
+    return next(iter(attribute.values()))
+
+
+def _compare(current, operator, expected):
+    left, right = _scalar(current), _scalar(expected)
+    if left is None:
+        return operator == "<>"
+    return {
+        "=": left == right,
+        "<>": left != right,
+        "<": left < right,
+        "<=": left <= right,
+        ">": left > right,
+        ">=": left >= right,
+    }[operator]
+
+
+class _FakeTable:
+    """Resource-style Table bound to a FakeDynamoDB, using plain Python values."""
+
+    def __init__(self, db, name):
+        self._db = db
+        self.name = name
+        self.table_name = name
+
+    @staticmethod
+    def _to_typed(values):
+        return {key: _serializer.serialize(value) for key, value in (values or {}).items()}
+
+    @staticmethod
+    def _to_python(item):
+        return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+    def _typed_kwargs(self, kwargs):
+        typed = dict(kwargs)
+        for field in ("Key", "Item", "ExclusiveStartKey"):
+            if field in typed:
+                typed[field] = self._to_typed(typed[field])
+        if "ExpressionAttributeValues" in typed:
+            typed["ExpressionAttributeValues"] = self._to_typed(typed["ExpressionAttributeValues"])
+        return typed
+
+    def get_item(self, **kwargs):
+        response = self._db.get_item(TableName=self.name, **self._typed_kwargs(kwargs))
+        if "Item" in response:
+            response["Item"] = self._to_python(response["Item"])
+        return response
+
+    def put_item(self, **kwargs):
+        return self._db.put_item(TableName=self.name, **self._typed_kwargs(kwargs))
+
+    def update_item(self, **kwargs):
+        response = self._db.update_item(TableName=self.name, **self._typed_kwargs(kwargs))
+        if "Attributes" in response:
+            response["Attributes"] = self._to_python(response["Attributes"])
+        return response
+
+    def delete_item(self, **kwargs):
+        return self._db.delete_item(TableName=self.name, **self._typed_kwargs(kwargs))
+
+    def query(self, **kwargs):
+        response = self._db.query(TableName=self.name, **self._typed_kwargs(kwargs))
+        response["Items"] = [self._to_python(item) for item in response["Items"]]
+        if "LastEvaluatedKey" in response:
+            response["LastEvaluatedKey"] = self._to_python(response["LastEvaluatedKey"])
+        return response
+
+
+class FakeDynamoDB(FakeService):
+    """
+    Low-level client API with typed attributes, plus Table() for the resource API.
+
+    schemas: {table: {"key": [hash, range?], "indexes": {name: [hash, range?]}}}
+    """
+
+    service_name = "dynamodb"
+
+    def __init__(self, latency, recorder, schemas):
+        super().__init__(latency, recorder)
+        self.schemas = schemas
+        self.tables = {name: {} for name in schemas}
+
+    def Table(self, name):
+        return _FakeTable(self, name)
+
+    def _key(self, table, item):
+        return tuple(json.dumps(item[attr], sort_keys=True) for attr in self.schemas[table]["key"])
+
+    def _check(self, table, item, kwargs, operation):
+        expression = _Expression(kwargs.get("ExpressionAttributeNames"), kwargs.get("ExpressionAttributeValues"))
+        if not expression.condition(kwargs.get("ConditionExpression"), item or {}):
+            raise client_error("ConditionalCheckFailedException", "The conditional request failed", operation)
+        return expression
+
+    def get_item(self, TableName, Key, **kwargs):
+        self._call("get_item")
+        with self._lock:
+            item = self.tables[TableName].get(self._key(TableName, Key))
+        return {"Item": copy.deepcopy(item)} if item else {}
+
+    def put_item(self, TableName, Item, **kwargs):
+        self._call("put_item")
+        with self._lock:
+            key = self._key(TableName, Item)
+            self._check(TableName, self.tables[TableName].get(key), kwargs, "PutItem")
+            self.tables[TableName][key] = copy.deepcopy(Item)
+        return {}
+
+    def delete_item(self, TableName, Key, **kwargs):
+        self._call("delete_item")
+        with self._lock:
+            key = self._key(TableName, Key)
+            self._check(TableName, self.tables[TableName].get(key), kwargs, "DeleteItem")
+            self.tables[TableName].pop(key, None)
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ReturnValues="NONE", **kwargs):
+        self._call("update_item")
+        with self._lock:
+            self._apply_update(TableName, Key, UpdateExpression, kwargs)
+            item = self.tables[TableName][self._key(TableName, Key)]
+            return {"Attributes": copy.deepcopy(item)} if ReturnValues == "ALL_NEW" else {}
+
+    def _apply_update(self, table, key_attrs, update_expression, kwargs):
+        key = self._key(table, key_attrs)
+        current = self.tables[table].get(key)
+        expression = self._check(table, current, kwargs, "UpdateItem")
+        item = copy.deepcopy(current) if current else copy.deepcopy(key_attrs)
+        expression.update(update_expression, item)
+        self.tables[table][key] = item
+
+    def query(self, TableName, KeyConditionExpression, IndexName=None, Limit=None,
+              ExclusiveStartKey=None, ScanIndexForward=True, FilterExpression=None, **kwargs):
+        self._call("query")
+        schema = self.schemas[TableName]
+        key_attrs = schema["indexes"][IndexName] if IndexName else schema["key"]
+        expression = _Expression(kwargs.get("ExpressionAttributeNames"), kwargs.get("ExpressionAttributeValues"))
+
+        with self._lock:
+            candidates = [
+                copy.deepcopy(item)
+                for item in self.tables[TableName].values()
+                if all(attr in item for attr in key_attrs)
+                and expression.condition(KeyConditionExpression, item)
+            ]
+
+        sort_attr = key_attrs[1] if len(key_attrs) > 1 else None
+        if sort_attr:
+            candidates.sort(key=lambda item: _scalar(item[sort_attr]), reverse=not ScanIndexForward)
+
+        if ExclusiveStartKey:
+            marker = tuple(json.dumps(ExclusiveStartKey[attr], sort_keys=True) for attr in schema["key"])
+            for index, item in enumerate(candidates):
+                if self._key(TableName, item) == marker:
+                    candidates = candidates[index + 1 :]
+                    break
+
+        response = {}
+        if Limit is not None and len(candidates) > Limit:
+            candidates = candidates[:Limit]
+            last = candidates[-1]
+            response["LastEvaluatedKey"] = {
+                attr: last[attr] for attr in {*schema["key"], *key_attrs}
+            }
+
+        if FilterExpression:
+            candidates = [item for item in candidates if expression.condition(FilterExpression, item)]
+
+        response.update({"Items": candidates, "Count": len(candidates)})
+        return response
+
+    def scan(self, TableName, Segment=0, TotalSegments=1, Limit=None, ExclusiveStartKey=None,
+             FilterExpression=None, **kwargs):
+        self._call("scan")
+        schema = self.schemas[TableName]
+        expression = _Expression(kwargs.get("ExpressionAttributeNames"), kwargs.get("ExpressionAttributeValues"))
+        with self._lock:
+            # 세그먼트는 키 해시로 나눔 (실제 DynamoDB처럼 세그먼트마다 겹치지 않음)
+            candidates = sorted(
+                (key, copy.deepcopy(item))
+                for key, item in self.tables[TableName].items()
+                if int(hashlib.md5(repr(key).encode("utf-8")).hexdigest(), 16) % TotalSegments == Segment
+            )
+        if ExclusiveStartKey:
+            marker = self._key(TableName, ExclusiveStartKey)
+            candidates = [(key, item) for key, item in candidates if key > marker]
+
+        response = {}
+        if Limit is not None and len(candidates) > Limit:
+            candidates = candidates[:Limit]
+            response["LastEvaluatedKey"] = {attr: candidates[-1][1][attr] for attr in schema["key"]}
+        items = [item for _, item in candidates]
+        if FilterExpression:
+            items = [item for item in items if expression.condition(FilterExpression, item)]
+        response.update({"Items": items, "Count": len(items)})
+        return response
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self._call("batch_get_item")
+        responses = {}
+        with self._lock:
+            for table, request in RequestItems.items():
+                responses[table] = [
+                    copy.deepcopy(self.tables[table][self._key(table, key)])
+                    for key in request["Keys"]
+                    if self._key(table, key) in self.tables[table]
+                ]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self._call("batch_write_item")
+        with self._lock:
+            for table, requests in RequestItems.items():
+                for request in requests:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        self.tables[table][self._key(table, item)] = copy.deepcopy(item)
+                    else:
+                        self.tables[table].pop(self._key(table, request["DeleteRequest"]["Key"]), None)
+        return {"UnprocessedItems": {}}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        self._call("transact_write_items")
+        with self._lock:
+            # 실패 시 되돌릴 수 있도록 건드리는 아이템만 백업
+            backup = {}
+            for entry in TransactItems:
+                (request,) = entry.values()
+                table = request["TableName"]
+                key = self._key(table, request.get("Item") or request["Key"])
+                backup[(table, key)] = self.tables[table].get(key)
+            try:
+                for entry in TransactItems:
+                    (action, request), = entry.items()
+                    table = request["TableName"]
+                    if action == "Put":
+                        key = self._key(table, request["Item"])
+                        self._check(table, self.tables[table].get(key), request, "TransactWriteItems")
+                        self.tables[table][key] = copy.deepcopy(request["Item"])
+                    elif action == "Update":
+                        self._apply_update(table, request["Key"], request["UpdateExpression"], request)
+                    elif action == "Delete":
+                        key = self._key(table, request["Key"])
+                        self._check(table, self.tables[table].get(key), request, "TransactWriteItems")
+                        self.tables[table].pop(key, None)
+                    elif action == "ConditionCheck":
+                        key = self._key(table, request["Key"])
+                        self._check(table, self.tables[table].get(key), request, "TransactWriteItems")
+            except ClientError:
+                for (table, key), item in backup.items():
+                    if item is None:
+                        self.tables[table].pop(key, None)
+                    else:
+                        self.tables[table][key] = item
+                raise client_error("TransactionCanceledException", "Transaction cancelled", "TransactWriteItems")
+        return {}
+
+
+class FakeSSM(FakeService):
+    service_name = "ssm"
+
+    def __init__(self, latency, recorder, parameters):
+        super().__init__(latency, recorder)
+        self.parameters = parameters
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self._call("get_parameter")
+        if Name not in self.parameters:
+            raise client_error("ParameterNotFound", Name, "GetParameter")
+        return {"Parameter": {"Name": Name, "Value": self.parameters[Name], "Version": 1}}
+
+
+class FakeStepFunctions(FakeService):
+    """Records start_execution calls; the pipeline runs the started sorts itself."""
+
+    service_name = "stepfunctions"
+
+    def __init__(self, latency, recorder):
+        super().__init__(latency, recorder)
+        self.executions = {}
+        self.pending = []
+
+    def start_execution(self, stateMachineArn, name, input="{}", **kwargs):
+        self._call("start_execution")
+        arn = f"{stateMachineArn.replace(':stateMachine:', ':execution:')}:{name}"
+        with self._lock:
+            if name in self.executions:
+                # 같은 이름과 입력이면 기존 실행을 돌려줌 (Standard 워크플로의 멱등성)
+                if self.executions[name] != input:
+                    raise client_error("ExecutionAlreadyExists", name, "StartExecution")
+                return {"executionArn": arn, "startDate": time.time()}
+            self.executions[name] = input
+            self.pending.append(json.loads(input))
+        return {"executionArn": arn, "startDate": time.time()}
+
+    def take_started(self):
+        with self._lock:
+            started, self.pending = self.pending, []
+        return started
+
+
+class FakeRekognition(FakeService):
+    """Serves recorded moderation responses; `flagged_ratio` of images get the flagged one."""
+
+    service_name = "rekognition"
+
+    def __init__(self, latency, recorder, recordings, flagged_ratio=0.0, seed=None):
+        super().__init__(latency, recorder)
+        self.clean = recordings["clean"]
+        self.flagged = recordings["flagged"]
+        self.flagged_ratio = flagged_ratio
+        self._random = random.Random(seed)
+
+    def detect_moderation_labels(self, Image, MinConfidence=50.0, **kwargs):
+        self._call("detect_moderation_labels")
+        with self._lock:
+            flagged = self._random.random() < self.flagged_ratio
+        return copy.deepcopy(self.flagged if flagged else self.clean)
+
+
+class FakeBedrockRuntime(FakeService):
+    """
+    Replays recorded model outputs. Image requests get the next recorded tagging analysis;
+    text-only (album sort) requests keep the existing categories in the prompt and spread the new
+    image keys over the recorded category names.
+    """
+
+    service_name = "bedrock-runtime"
+
+    def __init__(self, latency, recorder, recordings):
+        super().__init__(latency, recorder)
+        self._analyses = itertools.cycle(recordings["image_analyses"])
+        self._category_names = recordings["category_names"]
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._call("invoke_model")
+        request = json.loads(body)
+        content = request["messages"][0]["content"]
+        has_image = any("image" in part for part in content)
+        prompt = " ".join(part.get("text", "") for part in content)
+
+        if has_image:
+            with self._lock:
+                text = json.dumps(next(self._analyses), ensure_ascii=False)
+            image_bytes = sum(
+                len(base64.b64decode(part["image"]["source"]["bytes"])) for part in content if "image" in part
+            )
+            input_tokens = len(prompt) // 4 + min(image_bytes // 750, 1600)
+        else:
+            keys = re.findall(r"Image Key: (\S+)", prompt)
+            existing = re.search(r"\[Existing Categories\]\n(.*?)\n\nNow, analyze", prompt, re.DOTALL)
+            existing = json.loads(existing.group(1))["categories"] if existing else []
+            text = json.dumps({"categories": self._categorise(keys, existing)}, ensure_ascii=False)
+            input_tokens = len(prompt) // 4
+
+        output_tokens = len(text) // 4
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+        payload = json.dumps(
+            {
+                "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+                "usage": {"inputTokens": input_tokens, "outputTokens": output_tokens},
+            }
+        ).encode("utf-8")
+        return {"body": _Body(payload), "contentType": "application/json"}
+
+    def _categorise(self, keys, existing=()):
+        # 증분 정렬처럼 기존 카테고리는 유지하고 새 이미지만 나눠 넣음
+        groups = defaultdict(list)
+        for category in existing:
+            groups[category["categoryName"]].extend(category["imageKeys"])
+        for index, key in enumerate(sorted(keys)):
+            groups[self._category_names[index % len(self._category_names)]].append(key)
+        return [
+            {"categoryName": name, "description": f"{name}의 순간들", "imageKeys": image_keys}
+            for name, image_keys in groups.items()
+        ]
@@ -0,0 +1,243 @@
+"""
+Load generator for the local pipeline: N users each upload M images, processed with bounded
+concurrency (like Lambda reserved concurrency). Reports throughput, per-stage latency
+percentiles and AWS call counts. album-sort-scheduler runs on its own interval during the load,
+like the scheduled trigger, and once more at the end to drain the remaining sorts.
+
+    python tools/local_pipeline/loadgen.py --users 10 --uploads 30 --concurrency 16
+    python tools/local_pipeline/loadgen.py --latency-scale 0 --users 50 --uploads 40   # CPU only
+    python tools/local_pipeline/loadgen.py --latency bedrock-runtime=6 --json report.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline import LocalPipeline, StageFailed  # noqa: E402
+
+STAGE_ORDER = [
+    "image-safefy-filter",
+    "image-dispatcher",
+    "image-resizer",
+    "thumbnail-generator",
+    "derivative-generator",
+    "derivative-generator.variants",
+    "extract-image-tags",
+    "result-to-dynamodb",
+    "embed-image-summary",
+    "album-sort-scheduler",
+    "generate-image-list",
+    "album-list-analyzer",
+    "end-to-end",
+]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def synthetic_uploads(users, uploads, image_kb, manifest_ratio, seed):
+    rng = random.Random(seed)
+    jobs = []
+    for user in range(users):
+        user_id = f"local-user-{user:04d}"
+        for index in range(uploads):
+            day = 1 + index % 28
+            key = f"album/{user_id}/25-01-{day:02d}/IMG_{index:04d}.jpg"
+            # 일부는 리사이즈 경로를 타도록 해상도를 섞음
+            width, height = rng.choice([(4032, 3024), (3024, 4032), (1920, 1080), (9000, 6000), (200, 150)])
+            size = max(1, int(image_kb * 1024 * rng.uniform(0.5, 1.5)))
+            manifest = rng.random() < manifest_ratio
+            jobs.append((key, b"\xff\xd8\xff\xe0" + rng.randbytes(size), width, height, manifest))
+    rng.shuffle(jobs)
+    return jobs
+
+
+def run(args):
+    latencies = {}
+    for override in args.latency:
+        name, _, value = override.partition("=")
+        latencies[name] = float(value)
+
+    pipeline = LocalPipeline(latencies, args.latency_scale, args.flagged_ratio, seed=args.seed, fused=args.fused)
+    jobs = synthetic_uploads(args.users, args.uploads, args.image_kb, args.manifest_ratio, args.seed)
+
+    stage_timings = defaultdict(list)
+    outcomes = Counter()
+    errors = []
+    lock = threading.Lock()
+
+    def record(timings, outcome):
+        with lock:
+            if outcome:
+                outcomes[outcome] += 1
+            for stage, seconds in timings.items():
+                stage_timings[stage].append(seconds)
+
+    def schedule(now=None):
+        try:
+            scheduler_timings, sorts = pipeline.run_scheduler(now)
+        except Exception:
+            with lock:
+                errors.append(f"album-sort-scheduler: {traceback.format_exc(limit=3)}")
+                outcomes["failed"] += 1
+            return 0
+        record(scheduler_timings, None)
+        for timings, outcome in sorts:
+            record(timings, outcome)
+        return len(sorts)
+
+    stop = threading.Event()
+
+    def ticker():
+        while not stop.wait(args.scheduler_interval):
+            schedule()
+
+    def handle(job):
+        key, data, width, height, manifest = job
+        start = time.perf_counter()
+        pipeline.upload(key, data, width, height, manifest)
+        timings, outcome = pipeline.process(key)
+        timings["end-to-end"] = time.perf_counter() - start
+        return timings, outcome
+
+    # 핸들러의 print 출력이 측정을 방해하지 않도록 실행 중에는 버림
+    sink = sys.stdout if args.verbose else io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        scheduler = threading.Thread(target=ticker, daemon=True)
+        scheduler.start()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = {executor.submit(handle, job): job[0] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    timings, outcome = future.result()
+                except StageFailed as e:
+                    with lock:
+                        errors.append(f"{futures[future]}: {e}")
+                        outcomes["failed"] += 1
+                    continue
+                except Exception:
+                    with lock:
+                        errors.append(f"{futures[future]}: {traceback.format_exc(limit=3)}")
+                        outcomes["failed"] += 1
+                    continue
+                record(timings, outcome)
+        stop.set()
+        scheduler.join()
+        # 남은 변경은 하루 뒤 시각으로 실행해 업로드 종료 대기와 최대 지연을 모두 넘김
+        for _ in range(5):
+            if not schedule(time.time() + 86400):
+                break
+    elapsed = time.perf_counter() - started
+
+    calls = pipeline.recorder.snapshot()
+    return {
+        "config": {
+            "users": args.users,
+            "uploads_per_user": args.uploads,
+            "concurrency": args.concurrency,
+            "latency_scale": args.latency_scale,
+            "image_kb": args.image_kb,
+            "manifest_ratio": args.manifest_ratio,
+            "fused": args.fused,
+            "scheduler_interval": args.scheduler_interval,
+        },
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": len(jobs) / elapsed if elapsed else 0.0,
+        "outcomes": dict(outcomes),
+        "stages": {
+            stage: {
+                "count": len(values),
+                "mean_ms": statistics.fmean(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+            }
+            for stage, values in sorted(stage_timings.items(), key=lambda kv: STAGE_ORDER.index(kv[0]))
+        },
+        "aws_calls": dict(sorted(calls.items())),
+        "aws_calls_per_upload": sum(calls.values()) / len(jobs) if jobs else 0.0,
+        "bedrock_tokens": {"input": pipeline.bedrock.input_tokens, "output": pipeline.bedrock.output_tokens},
+        "errors": errors,
+    }
+
+
+def print_report(report):
+    config = report["config"]
+    print(
+        f"{config['users']} users x {config['uploads_per_user']} uploads, concurrency {config['concurrency']}, "
+        f"latency scale {config['latency_scale']}"
+    )
+    print(f"elapsed {report['elapsed_seconds']:.2f}s, throughput {report['throughput_per_second']:.2f} uploads/s")
+    print(f"outcomes: {report['outcomes']}\n")
+
+    print(f"{'stage':<30} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for stage, row in report["stages"].items():
+        print(
+            f"{stage:<30} {row['count']:>6} {row['mean_ms']:>9.1f} {row['p50_ms']:>9.1f} "
+            f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}"
+        )
+
+    print(f"\n{'AWS call':<40} {'count':>8}")
+    for call, count in report["aws_calls"].items():
+        print(f"{call:<40} {count:>8}")
+    print(f"{'per upload':<40} {report['aws_calls_per_upload']:>8.2f}")
+    tokens = report["bedrock_tokens"]
+    print(f"\nBedrock tokens: input {tokens['input']}, output {tokens['output']}")
+
+    if report["errors"]:
+        print(f"\n{len(report['errors'])} failed uploads, first:\n{report['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--uploads", type=int, default=25, help="uploads per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--image-kb", type=int, default=256)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for every fake latency")
+    parser.add_argument(
+        "--latency", action="append", default=[], metavar="NAME=SECONDS",
+        help="override a latency, e.g. bedrock-runtime=4 or s3.get_object=0.1",
+    )
+    parser.add_argument("--flagged-ratio", type=float, default=0.0, help="share of uploads Rekognition flags")
+    parser.add_argument(
+        "--manifest-ratio", type=float, default=0.0, help="share of uploads that declare an upload manifest"
+    )
+    parser.add_argument(
+        "--fused", action="store_true", help="run derivative-generator instead of the resizer and thumbnail generator"
+    )
+    parser.add_argument(
+        "--scheduler-interval", type=float, default=1.0, help="seconds between album-sort-scheduler runs"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show handler output")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
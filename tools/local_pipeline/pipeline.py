@@ -0,0 +1,425 @@
+"""
+Runs the image pipeline end to end in one process.
+
+Every Python Lambda is loaded from its own directory and invoked in state-machine order with
+the same event shapes Step Functions passes between states. AWS calls go to the stand-ins in
+fakes.py via aws_clients.override. The Go Lambdas (dispatcher, resizer, thumbnails) are emulated
+here with their S3 call pattern and a configurable compute time, since they need libvips.
+With `fused=True` the derivative-generator stage replaces the resizer and thumbnail generator.
+"""
+
+import base64
+import concurrent.futures
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import types
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(TOOLS_DIR))
+COMMON_PYTHON = os.path.join(REPO_ROOT, "common", "python")
+
+UPLOAD_BUCKET = "memory-images-upload-local"
+ORIGINALS_BUCKET = "memory-images-originals-local"
+PROCESSED_BUCKET = "memory-images-processed-local"
+STATE_BUCKET = "memory-pipeline-state-local"
+METADATA_TABLE = "MemoryImageMetadata-local"
+STATS_TABLE = "MemoryUserStats-local"
+CATEGORY_TABLE = "MemoryAlbumCategories-local"
+TAG_INDEX_TABLE = "MemoryImageTagIndex-local"
+GOVERNOR_TABLE = "BedrockGovernor-local"
+SORT_STATE_MACHINE_ARN = "arn:aws:states:ap-northeast-2:000000000000:stateMachine:album-sort-local"
+PROMPT_PARAM = "/prism/local/prompt/image-tags"
+MANIFEST_VERSION = "1"
+
+ENVIRONMENT = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "ap-northeast-2",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "DESTINATION_BUCKET": ORIGINALS_BUCKET,
+    "DYNAMODB_METADATA_TABLE_NAME": METADATA_TABLE,
+    "DYNAMODB_STATS_TABLE_NAME": STATS_TABLE,
+    "DYNAMODB_CATEGORY_TABLE_NAME": CATEGORY_TABLE,
+    "DYNAMODB_TAG_INDEX_TABLE_NAME": TAG_INDEX_TABLE,
+    "BEDROCK_GOVERNOR_TABLE_NAME": GOVERNOR_TABLE,
+    "DDB_TABLE_NAME": METADATA_TABLE,
+    "PROMPT_PARAM": PROMPT_PARAM,
+    "CLAIM_CHECK_BUCKET": STATE_BUCKET,
+    "VECTOR_INDEX_BUCKET": STATE_BUCKET,
+    "EMBEDDER": "hash",
+    "SORT_STATE_MACHINE_ARN": SORT_STATE_MACHINE_ARN,
+    "SORT_SOURCE_BUCKET": ORIGINALS_BUCKET,
+    # 부하 테스트가 몇 초 안에 끝나므로 업로드 종료 판단과 정렬 간격을 짧게 둠
+    "SORT_QUIET_SECONDS": "1",
+    "SORT_MIN_INTERVAL_SECONDS": "2",
+}
+
+TABLE_SCHEMAS = {
+    METADATA_TABLE: {
+        "key": ["AlbumID", "OriginalKey"],
+        "indexes": {"byOriginalKey": ["OriginalKey"]},
+    },
+    STATS_TABLE: {"key": ["UserID"], "indexes": {"bySortQueue": ["SortQueue", "ImageCount"]}},
+    CATEGORY_TABLE: {"key": ["UserID", "CategoryID"], "indexes": {}},
+    TAG_INDEX_TABLE: {"key": ["UserTag", "OriginalKey"], "indexes": {}},
+    GOVERNOR_TABLE: {"key": ["BucketID"], "indexes": {}},
+}
+
+FUNCTIONS = {
+    "image-safefy-filter": "image/image-safefy-filter",
+    "extract-image-tags": "image/step-function/extract-image-tags",
+    "result-to-dynamodb": "image/step-function/result-to-dynamodb",
+    "embed-image-summary": "image/step-function/embed-image-summary",
+    "album-sort-scheduler": "image/album-sort-scheduler",
+    "generate-image-list": "image/step-function/generate-image-list",
+    "album-list-analyzer": "image/step-function/album-list-analyzer",
+}
+
+# 초 단위. "service" 또는 "service.operation" 키, "lambda.<stage>"는 Go Lambda의 연산 시간
+DEFAULT_LATENCIES = {
+    "s3": 0.02,
+    "s3.get_object": 0.04,
+    "s3.put_object": 0.05,
+    "dynamodb": 0.008,
+    "dynamodb.transact_write_items": 0.015,
+    "ssm": 0.015,
+    "rekognition": 0.35,
+    "bedrock-runtime": 2.5,
+    "lambda.image-dispatcher": 0.12,
+    "lambda.image-resizer": 0.4,
+    "lambda.thumbnail-generator": 0.6,
+    "lambda.derivative-generator": 0.5,
+    "lambda.derivative-generator.variants": 0.4,
+}
+
+# derivative-generator의 INLINE_INFERENCE_MAX_BYTES, VARIANT_WIDTHS, VARIANT_FORMATS 기본값
+INLINE_INFERENCE_MAX_BYTES = 96 * 1024
+VARIANT_WIDTHS = (640, 1280, 1920)
+VARIANT_FORMATS = (("webp", "webp"), ("avif", "avif"))
+THUMBNAIL_WIDTH = 400
+
+
+class StageFailed(Exception):
+    def __init__(self, stage, result):
+        super().__init__(f"{stage}: {result}")
+        self.stage = stage
+        self.result = result
+
+
+def _load_function(name, function_dir):
+    path = os.path.join(REPO_ROOT, function_dir, "lambda_function.py")
+    spec = importlib.util.spec_from_file_location(f"local_pipeline_{name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LocalPipeline:
+    def __init__(self, latencies=None, latency_scale=1.0, flagged_ratio=0.0, seed=None, fused=False):
+        self.fused = fused
+        os.environ.update(ENVIRONMENT)
+        if COMMON_PYTHON not in sys.path:
+            sys.path.insert(0, COMMON_PYTHON)
+        sys.path.insert(0, TOOLS_DIR)
+
+        import fakes
+        from prism_common import aws_clients
+
+        with open(os.path.join(TOOLS_DIR, "recordings.json"), encoding="utf-8") as f:
+            recordings = json.load(f)
+
+        self.latency = fakes.LatencyModel({**DEFAULT_LATENCIES, **(latencies or {})}, latency_scale, seed=seed)
+        self.recorder = fakes.CallRecorder()
+        self.s3 = fakes.FakeS3(self.latency, self.recorder)
+        self.dynamodb = fakes.FakeDynamoDB(self.latency, self.recorder, TABLE_SCHEMAS)
+        self.bedrock = fakes.FakeBedrockRuntime(self.latency, self.recorder, recordings)
+        self.stepfunctions = fakes.FakeStepFunctions(self.latency, self.recorder)
+        services = {
+            "s3": self.s3,
+            "dynamodb": self.dynamodb,
+            "ssm": fakes.FakeSSM(self.latency, self.recorder, {PROMPT_PARAM: "Describe the image as JSON."}),
+            "rekognition": fakes.FakeRekognition(
+                self.latency, self.recorder, recordings["moderation"], flagged_ratio, seed=seed
+            ),
+            "bedrock-runtime": self.bedrock,
+            "stepfunctions": self.stepfunctions,
+        }
+
+        aws_clients.reset()
+        for service_name, fake in services.items():
+            aws_clients.override(service_name, fake)
+
+        self.functions = {name: _load_function(name, path) for name, path in FUNCTIONS.items()}
+        # 업로드된 키별 실제 해상도 (Go 디스패처의 vips 디코딩 결과 대용)
+        self.dimensions = {}
+
+    def _compute(self, stage):
+        delay = self.latency.delay("lambda", stage)
+        if delay:
+            time.sleep(delay)
+
+    @staticmethod
+    def _timed(stage, function, event):
+        start = time.perf_counter()
+        result = function(event)
+        return time.perf_counter() - start, result
+
+    def _invoke(self, stage, event, timings):
+        start = time.perf_counter()
+        try:
+            context = types.SimpleNamespace(function_name=stage, aws_request_id="local")
+            return self.functions[stage].lambda_handler(event, context)
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    # --- Go Lambda emulation -------------------------------------------------------------
+
+    def image_dispatcher(self, event):
+        # 한 번의 GET으로 메타데이터를 받고, 매니페스트가 있으면 헤더의 실제 해상도와 비교해
+        # 일치할 때 나머지 본문을 읽지 않음 (main.go의 decideFromManifest)
+        obj = self.s3.get_object(Bucket=event["s3Bucket"], Key=event["s3Key"])
+        metadata = obj["Metadata"]
+        header = obj["Body"].read(64)
+        # 디코딩/헤더 파싱 결과 대신 업로드 시점에 기록한 실제 해상도를 사용
+        width, height = self.dimensions[event["s3Key"]]
+        file_size = obj["ContentLength"]
+        if (
+            metadata.get("manifest-version") == MANIFEST_VERSION
+            and header.startswith(b"\xff\xd8\xff")
+            and {(width, height), (height, width)} & {(int(metadata["width"]), int(metadata["height"]))}
+        ):
+            image_format = metadata["format"]
+            source = "manifest"
+        else:
+            obj["Body"].read()
+            self._compute("image-dispatcher")
+            image_format = os.path.splitext(event["s3Key"])[1].lstrip(".").lower().replace("jpg", "jpeg")
+            source = "decoded"
+
+        is_format_ok = image_format in ("jpeg", "png", "webp")
+        is_too_large = width > 8000 or height > 8000
+        is_too_small = width < 256 and height < 256
+
+        return {
+            "s3Bucket": event["s3Bucket"],
+            "s3Key": event["s3Key"],
+            "imageFormat": f"{image_format}load",
+            "width": width,
+            "height": height,
+            "fileSize": file_size,
+            "decision": "NeedsResizing" if not is_format_ok or is_too_large or is_too_small else "IsAppropriate",
+            "contentType": obj["ContentType"],
+            "userMetadata": metadata,
+            "metadataSource": source,
+        }
+
+    def image_resizer(self, decision):
+        obj = self.s3.get_object(Bucket=decision["s3Bucket"], Key=decision["s3Key"])
+        data = obj["Body"].read()
+        self._compute("image-resizer")
+
+        new_key = os.path.splitext(decision["s3Key"])[0] + "-processed.jpg"
+        self.s3.put_object(Bucket=decision["s3Bucket"], Key=new_key, Body=data[: len(data) // 2], ContentType="image/jpeg")
+        return {**decision, "status": "SUCCESS", "originalKey": decision["s3Key"], "newKey": new_key}
+
+    def thumbnail_generator(self, event):
+        obj = self.s3.get_object(Bucket=event["sourceBucket"], Key=event["sourceKey"])
+        obj["Body"].read()
+        self._compute("thumbnail-generator")
+
+        keys = self._put_thumbnails(event["sourceKey"])
+        return {"status": "SUCCESS", "originalKey": event["sourceKey"], "thumbnailKeys": keys}
+
+    def derivative_generator(self, decision):
+        obj = self.s3.get_object(Bucket=decision["s3Bucket"], Key=decision["s3Key"])
+        data = obj["Body"].read()
+        self._compute("derivative-generator")
+
+        key = decision["s3Key"]
+        directory, filename = os.path.split(key)
+        base = os.path.splitext(filename)[0]
+        result = {
+            **decision,
+            "status": "SUCCESS",
+            "originalKey": key,
+            "thumbnailKeys": self._put_thumbnails(key),
+            "variants": self._thumbnail_variants(key),
+        }
+        if decision["decision"] == "NeedsResizing":
+            result["newKey"] = os.path.splitext(key)[0] + "-processed.jpg"
+            self.s3.put_object(
+                Bucket=decision["s3Bucket"], Key=result["newKey"], Body=data[: len(data) // 2], ContentType="image/jpeg"
+            )
+
+        # 1024px 추론용 JPEG 대용: 원본 크기와 무관하게 대략 일정한 크기
+        inference = data[: 96 * 1024]
+        if len(inference) <= INLINE_INFERENCE_MAX_BYTES:
+            result["inferenceImage"] = {"format": "jpeg", "bytes": base64.b64encode(inference).decode("ascii")}
+        else:
+            result["inferenceBucket"] = PROCESSED_BUCKET
+            result["inferenceKey"] = f"{directory}/inference/{base}.jpg"
+            self.s3.put_object(Bucket=PROCESSED_BUCKET, Key=result["inferenceKey"], Body=inference, ContentType="image/jpeg")
+        return result
+
+    def _put_thumbnails(self, key):
+        directory, filename = os.path.split(key)
+        base = os.path.splitext(filename)[0]
+        keys = {}
+        for image_format, extension in (("jpeg", "jpg"), ("webp", "webp"), ("avif", "avif")):
+            thumbnail_key = f"{directory}/thumbnail/{base}.{extension}"
+            self.s3.put_object(
+                Bucket=PROCESSED_BUCKET, Key=thumbnail_key, Body=b"\0" * 2048, ContentType=f"image/{image_format}"
+            )
+            keys[image_format] = thumbnail_key
+        return keys
+
+    def _thumbnail_variants(self, key):
+        """The thumbnails as derivative-generator reports them in `variants`."""
+        width, height = self.dimensions[key]
+        directory, filename = os.path.split(key)
+        base = os.path.splitext(filename)[0]
+
+        scale = min(THUMBNAIL_WIDTH / width, THUMBNAIL_WIDTH / height, 1)
+        return [
+            {
+                "format": image_format,
+                "width": round(width * scale),
+                "height": round(height * scale),
+                "key": f"{directory}/thumbnail/{base}.{extension}",
+                "bytes": 2048,
+            }
+            for image_format, extension in (("jpeg", "jpg"), ("webp", "webp"), ("avif", "avif"))
+        ]
+
+    def display_variants(self, decision):
+        """derivative-generator's "variants" stage: one object per narrower width and format."""
+        obj = self.s3.get_object(Bucket=decision["s3Bucket"], Key=decision["s3Key"])
+        obj["Body"].read()
+        self._compute("derivative-generator.variants")
+
+        key = decision["s3Key"]
+        width, height = self.dimensions[key]
+        directory, filename = os.path.split(key)
+        base = os.path.splitext(filename)[0]
+        variants = []
+        for variant_width in VARIANT_WIDTHS:
+            if not THUMBNAIL_WIDTH < variant_width < width:
+                continue
+            for image_format, extension in VARIANT_FORMATS:
+                variant_key = f"{directory}/variants/{base}-{variant_width}w.{extension}"
+                body = b"\0" * 4096
+                self.s3.put_object(Bucket=PROCESSED_BUCKET, Key=variant_key, Body=body, ContentType=f"image/{image_format}")
+                variants.append(
+                    {
+                        "format": image_format,
+                        "width": variant_width,
+                        "height": -(-height * variant_width // width),
+                        "key": variant_key,
+                        "bytes": len(body),
+                    }
+                )
+        return {"status": "SUCCESS", "originalKey": key, "variants": variants}
+
+    # --- state machine ---------------------------------------------------------------------
+
+    def upload(self, key, data, width, height, manifest=False):
+        """
+        Client upload through a presigned URL: lands in the upload bucket. With `manifest` the
+        client declared the image's metadata the way generate-s3-presignedurl signs it.
+        """
+        self.dimensions[key] = (width, height)
+        metadata = {}
+        if manifest:
+            metadata = {
+                "manifest-version": MANIFEST_VERSION,
+                "width": str(width),
+                "height": str(height),
+                "format": "jpeg",
+                "sha256": hashlib.sha256(data).hexdigest(),
+            }
+        self.s3.put_object(Bucket=UPLOAD_BUCKET, Key=key, Body=data, ContentType="image/jpeg", Metadata=metadata)
+
+    def process(self, key):
+        """
+        Runs one uploaded object through every stage. Returns (timings, outcome) where timings
+        maps stage name to seconds and outcome is "stored" or "blocked". Album sorts run
+        separately through run_scheduler, as they do on the scheduled trigger.
+        """
+        timings = {}
+
+        s3_event = {"Records": [{"s3": {"bucket": {"name": UPLOAD_BUCKET}, "object": {"key": key}}}]}
+        result = self._invoke("image-safefy-filter", s3_event, timings)
+        if not result or result.get("statusCode") != 200:
+            raise StageFailed("image-safefy-filter", result)
+        if not self.s3.objects[ORIGINALS_BUCKET].get(key):
+            return timings, "blocked"
+
+        start = time.perf_counter()
+        decision = self.image_dispatcher({"s3Bucket": ORIGINALS_BUCKET, "s3Key": key})
+        timings["image-dispatcher"] = time.perf_counter() - start
+
+        if self.fused:
+            start = time.perf_counter()
+            analysis_event = self.derivative_generator(decision)
+            timings["derivative-generator"] = time.perf_counter() - start
+        else:
+            analysis_event = {"s3Bucket": ORIGINALS_BUCKET, "s3Key": key}
+            if decision["decision"] == "NeedsResizing":
+                start = time.perf_counter()
+                resized = self.image_resizer(decision)
+                timings["image-resizer"] = time.perf_counter() - start
+                analysis_event = resized
+
+            # Step Functions에서는 Parallel 상태로 동시에 실행되지만 여기서는 순서대로 실행하고 각각 측정
+            start = time.perf_counter()
+            self.thumbnail_generator({"sourceBucket": ORIGINALS_BUCKET, "sourceKey": key})
+            timings["thumbnail-generator"] = time.perf_counter() - start
+
+        variants_stage = None
+        if self.fused:
+            # 표시용 변형은 Parallel 상태에서 태그 추출과 동시에 실행되므로 여기서도 스레드로 함께 실행
+            variants_stage = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            variants_future = variants_stage.submit(self._timed, "derivative-generator.variants", self.display_variants, decision)
+
+        analysis = self._invoke("extract-image-tags", analysis_event, timings)
+        if "bedrock_analysis" not in analysis:
+            raise StageFailed("extract-image-tags", analysis)
+
+        stored = {**analysis, "original_key": key}
+        if variants_stage is not None:
+            elapsed, variants_result = variants_future.result()
+            variants_stage.shutdown()
+            timings["derivative-generator.variants"] = elapsed
+            stored["display_variants"] = variants_result["variants"]
+
+        self._invoke("result-to-dynamodb", stored, timings)
+        self._invoke("embed-image-summary", {**analysis, "original_key": key}, timings)
+        return timings, "stored"
+
+    def run_scheduler(self, now=None):
+        """
+        One scheduled album-sort-scheduler run (EventBridge event at `now`, epoch seconds), then
+        the sort state machine for every execution it started. Returns (scheduler timings,
+        [(timings, outcome)] per sort) with outcome "sorted" or "sort-conflict".
+        """
+        scheduler_timings = {}
+        event = {"detail-type": "Scheduled Event", "source": "aws.events"}
+        if now is not None:
+            event["time"] = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).isoformat()
+        self._invoke("album-sort-scheduler", event, scheduler_timings)
+
+        results = []
+        for execution in self.stepfunctions.take_started():
+            timings = {}
+            image_list = self._invoke("generate-image-list", execution, timings)
+            if image_list["statusCode"] != 200:
+                raise StageFailed("generate-image-list", image_list)
+            analyzed = self._invoke("album-list-analyzer", {"body": image_list["body"]}, timings)
+            # 정렬 도중 카테고리가 바뀌면 카테고리 버전 검사에 걸리고 스케줄러가 다시 시작함
+            results.append((timings, "sort-conflict" if analyzed["statusCode"] == 409 else "sorted"))
+        return scheduler_timings, results